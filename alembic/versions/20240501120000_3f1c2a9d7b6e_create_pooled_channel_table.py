@@ -0,0 +1,44 @@
+"""create pooled_channel table
+
+Revision ID: 3f1c2a9d7b6e
+Revises: ef83c87be4de
+Create Date: 2024-05-01 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3f1c2a9d7b6e"
+down_revision = "ef83c87be4de"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "pooled_channel",
+        sa.Column("channel_id", sa.BigInteger(), nullable=False),
+        sa.Column("is_voice", sa.Boolean(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_pooled_channel")),
+        sa.UniqueConstraint("channel_id", name=op.f("uq_pooled_channel_channel_id")),
+    )
+    with op.batch_alter_table("pooled_channel", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_pooled_channel_created_at"), ["created_at"], unique=False
+        )
+        batch_op.create_index(
+            batch_op.f("ix_pooled_channel_is_voice"), ["is_voice"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("pooled_channel", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_pooled_channel_is_voice"))
+        batch_op.drop_index(batch_op.f("ix_pooled_channel_created_at"))
+
+    op.drop_table("pooled_channel")
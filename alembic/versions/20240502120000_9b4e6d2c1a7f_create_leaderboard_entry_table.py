@@ -0,0 +1,80 @@
+"""create leaderboard_entry table
+
+Revision ID: 9b4e6d2c1a7f
+Revises: 3f1c2a9d7b6e
+Create Date: 2024-05-02 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9b4e6d2c1a7f"
+down_revision = "3f1c2a9d7b6e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the rows are filled in by the bot the first time the leaderboard task runs
+    op.create_table(
+        "leaderboard_entry",
+        sa.Column("category_id", sa.String(), nullable=False),
+        sa.Column("player_id", sa.BigInteger(), nullable=False),
+        sa.Column("mu", sa.Float(), nullable=False),
+        sa.Column("sigma", sa.Float(), nullable=False),
+        sa.Column("rank", sa.Float(), nullable=False),
+        sa.Column(
+            "games_played_last_30_days",
+            sa.Integer(),
+            server_default=sa.text("0"),
+            nullable=False,
+        ),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["category_id"],
+            ["category.id"],
+            name=op.f("fk_leaderboard_entry_category_id_category"),
+        ),
+        sa.ForeignKeyConstraint(
+            ["player_id"],
+            ["player.id"],
+            name=op.f("fk_leaderboard_entry_player_id_player"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_leaderboard_entry")),
+        sa.UniqueConstraint(
+            "category_id", "player_id", name=op.f("uq_leaderboard_entry_category_id")
+        ),
+    )
+    with op.batch_alter_table("leaderboard_entry", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_leaderboard_entry_category_id"),
+            ["category_id"],
+            unique=False,
+        )
+        batch_op.create_index(
+            batch_op.f("ix_leaderboard_entry_player_id"), ["player_id"], unique=False
+        )
+        batch_op.create_index(
+            "ix_leaderboard_entry_category_id_rank",
+            ["category_id", "rank"],
+            unique=False,
+        )
+
+    with op.batch_alter_table("discord_channel", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("message_id", sa.BigInteger(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("discord_channel", schema=None) as batch_op:
+        batch_op.drop_column("message_id")
+
+    with op.batch_alter_table("leaderboard_entry", schema=None) as batch_op:
+        batch_op.drop_index("ix_leaderboard_entry_category_id_rank")
+        batch_op.drop_index(batch_op.f("ix_leaderboard_entry_player_id"))
+        batch_op.drop_index(batch_op.f("ix_leaderboard_entry_category_id"))
+
+    op.drop_table("leaderboard_entry")
@@ -0,0 +1,109 @@
+"""add composite indexes for hot queries
+
+Revision ID: 5d8a3c7f1b2e
+Revises: 9b4e6d2c1a7f
+Create Date: 2024-05-03 12:00:00.000000
+
+"""
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "5d8a3c7f1b2e"
+down_revision = "9b4e6d2c1a7f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # each composite index starts with the column of a single-column index that
+    # it makes redundant, so that one is dropped
+    with op.batch_alter_table("finished_game", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_finished_game_category_name_started_at",
+            ["category_name", "started_at"],
+            unique=False,
+        )
+        batch_op.drop_index(batch_op.f("ix_finished_game_category_name"))
+
+    with op.batch_alter_table("finished_game_player", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_finished_game_player_player_id_finished_game_id",
+            ["player_id", "finished_game_id"],
+            unique=False,
+        )
+        batch_op.drop_index(batch_op.f("ix_finished_game_player_player_id"))
+
+    with op.batch_alter_table("in_progress_game_player", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_in_progress_game_player_in_progress_game_id_team",
+            ["in_progress_game_id", "team"],
+            unique=False,
+        )
+        batch_op.drop_index(
+            batch_op.f("ix_in_progress_game_player_in_progress_game_id")
+        )
+
+    with op.batch_alter_table("player", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_player_last_activity_at"),
+            ["last_activity_at"],
+            unique=False,
+        )
+
+    with op.batch_alter_table("player_category_trueskill", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_player_category_trueskill_category_id_player_id",
+            ["category_id", "player_id"],
+            unique=False,
+        )
+        batch_op.drop_index(batch_op.f("ix_player_category_trueskill_category_id"))
+
+    with op.batch_alter_table("rotation_map", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_rotation_map_rotation_id_is_next",
+            ["rotation_id", "is_next"],
+            unique=False,
+        )
+        batch_op.drop_index(batch_op.f("ix_rotation_map_rotation_id"))
+
+
+def downgrade():
+    with op.batch_alter_table("rotation_map", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_rotation_map_rotation_id"), ["rotation_id"], unique=False
+        )
+        batch_op.drop_index("ix_rotation_map_rotation_id_is_next")
+
+    with op.batch_alter_table("player_category_trueskill", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_player_category_trueskill_category_id"),
+            ["category_id"],
+            unique=False,
+        )
+        batch_op.drop_index("ix_player_category_trueskill_category_id_player_id")
+
+    with op.batch_alter_table("player", schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f("ix_player_last_activity_at"))
+
+    with op.batch_alter_table("in_progress_game_player", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_in_progress_game_player_in_progress_game_id"),
+            ["in_progress_game_id"],
+            unique=False,
+        )
+        batch_op.drop_index("ix_in_progress_game_player_in_progress_game_id_team")
+
+    with op.batch_alter_table("finished_game_player", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_finished_game_player_player_id"), ["player_id"], unique=False
+        )
+        batch_op.drop_index("ix_finished_game_player_player_id_finished_game_id")
+
+    with op.batch_alter_table("finished_game", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_finished_game_category_name"),
+            ["category_name"],
+            unique=False,
+        )
+        batch_op.drop_index("ix_finished_game_category_name_started_at")
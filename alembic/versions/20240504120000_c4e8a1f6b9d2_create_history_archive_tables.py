@@ -0,0 +1,184 @@
+"""create history archive tables
+
+Revision ID: c4e8a1f6b9d2
+Revises: 5d8a3c7f1b2e
+Create Date: 2024-05-04 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c4e8a1f6b9d2"
+down_revision = "5d8a3c7f1b2e"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # the archive tables copy the columns of the tables they archive, without
+    # foreign keys or defaults, see _archive_table in models.py
+    op.create_table(
+        "finished_game_archive",
+        sa.Column("average_trueskill", sa.Float(), nullable=False),
+        sa.Column("game_id", sa.String(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=False),
+        sa.Column("is_rated", sa.Boolean(), nullable=False),
+        sa.Column("map_full_name", sa.String(), nullable=True),
+        sa.Column("map_short_name", sa.String(), nullable=True),
+        sa.Column("queue_name", sa.String(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=False),
+        sa.Column("win_probability", sa.Float(), nullable=False),
+        sa.Column("winning_team", sa.Integer(), nullable=False),
+        sa.Column("team0_name", sa.String(), nullable=False),
+        sa.Column("team1_name", sa.String(), nullable=False),
+        sa.Column("category_name", sa.String(), nullable=True),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_finished_game_archive")),
+    )
+    with op.batch_alter_table("finished_game_archive", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_finished_game_archive_finished_at", ["finished_at"], unique=False
+        )
+        batch_op.create_index(
+            "ix_finished_game_archive_game_id", ["game_id"], unique=False
+        )
+
+    op.create_table(
+        "finished_game_player_archive",
+        sa.Column("finished_game_id", sa.String(), nullable=False),
+        sa.Column("player_id", sa.BigInteger(), nullable=True),
+        sa.Column("player_name", sa.String(), nullable=False),
+        sa.Column("team", sa.Integer(), nullable=False),
+        sa.Column("rated_trueskill_mu_after", sa.Float(), nullable=False),
+        sa.Column("rated_trueskill_mu_before", sa.Float(), nullable=False),
+        sa.Column("rated_trueskill_sigma_after", sa.Float(), nullable=False),
+        sa.Column("rated_trueskill_sigma_before", sa.Float(), nullable=False),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_finished_game_player_archive")),
+    )
+    with op.batch_alter_table("finished_game_player_archive", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_finished_game_player_archive_player_id_finished_game_id",
+            ["player_id", "finished_game_id"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_finished_game_player_archive_finished_game_id",
+            ["finished_game_id"],
+            unique=False,
+        )
+
+    op.create_table(
+        "commend_archive",
+        sa.Column("finished_game_id", sa.String(), nullable=False),
+        sa.Column("commender_id", sa.BigInteger(), nullable=True),
+        sa.Column("commender_name", sa.String(), nullable=False),
+        sa.Column("commendee_id", sa.BigInteger(), nullable=True),
+        sa.Column("commendee_name", sa.String(), nullable=False),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_commend_archive")),
+    )
+    with op.batch_alter_table("commend_archive", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_commend_archive_commender_id", ["commender_id"], unique=False
+        )
+        batch_op.create_index(
+            "ix_commend_archive_commendee_id", ["commendee_id"], unique=False
+        )
+
+    op.create_table(
+        "economy_prediction_archive",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("player_id", sa.BigInteger(), nullable=False),
+        sa.Column("finished_game_id", sa.String(), nullable=True),
+        sa.Column("in_progress_game_id", sa.String(), nullable=True),
+        sa.Column("team", sa.Integer(), nullable=False),
+        sa.Column("prediction_value", sa.BigInteger(), nullable=False),
+        sa.Column("is_correct", sa.Boolean(), nullable=True),
+        sa.Column("cancelled", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_economy_prediction_archive")),
+    )
+    with op.batch_alter_table("economy_prediction_archive", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_economy_prediction_archive_player_id", ["player_id"], unique=False
+        )
+
+    op.create_table(
+        "economy_transaction_archive",
+        sa.Column("id", sa.String(), nullable=False),
+        sa.Column("player_id", sa.BigInteger(), nullable=True),
+        sa.Column("finished_game_id", sa.String(), nullable=True),
+        sa.Column("in_progress_game_id", sa.String(), nullable=True),
+        sa.Column("debit", sa.BigInteger(), nullable=False),
+        sa.Column("credit", sa.BigInteger(), nullable=False),
+        sa.Column("new_balance", sa.BigInteger(), nullable=True),
+        sa.Column("transaction_type", sa.String(), nullable=False),
+        sa.Column("economy_prediction_id", sa.String(), nullable=True),
+        sa.Column("economy_donation_id", sa.String(), nullable=True),
+        sa.Column("transacted_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_economy_transaction_archive")),
+    )
+    with op.batch_alter_table("economy_transaction_archive", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_economy_transaction_archive_player_id", ["player_id"], unique=False
+        )
+
+    op.create_table(
+        "player_history_rollup",
+        sa.Column("player_id", sa.BigInteger(), nullable=False),
+        sa.Column("category_name", sa.String(), nullable=True),
+        sa.Column("map_full_name", sa.String(), nullable=True),
+        sa.Column("archived_through", sa.DateTime(), nullable=False),
+        sa.Column("wins", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("losses", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("ties", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("id", sa.String(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["player_id"],
+            ["player.id"],
+            name=op.f("fk_player_history_rollup_player_id_player"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_player_history_rollup")),
+    )
+    with op.batch_alter_table("player_history_rollup", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_player_history_rollup_player_id_category_name",
+            ["player_id", "category_name"],
+            unique=False,
+        )
+
+
+def downgrade():
+    # archived rows are dropped with their tables, move them back first if
+    # they're still needed
+    with op.batch_alter_table("player_history_rollup", schema=None) as batch_op:
+        batch_op.drop_index("ix_player_history_rollup_player_id_category_name")
+    op.drop_table("player_history_rollup")
+
+    with op.batch_alter_table("economy_transaction_archive", schema=None) as batch_op:
+        batch_op.drop_index("ix_economy_transaction_archive_player_id")
+    op.drop_table("economy_transaction_archive")
+
+    with op.batch_alter_table("economy_prediction_archive", schema=None) as batch_op:
+        batch_op.drop_index("ix_economy_prediction_archive_player_id")
+    op.drop_table("economy_prediction_archive")
+
+    with op.batch_alter_table("commend_archive", schema=None) as batch_op:
+        batch_op.drop_index("ix_commend_archive_commendee_id")
+        batch_op.drop_index("ix_commend_archive_commender_id")
+    op.drop_table("commend_archive")
+
+    with op.batch_alter_table("finished_game_player_archive", schema=None) as batch_op:
+        batch_op.drop_index("ix_finished_game_player_archive_finished_game_id")
+        batch_op.drop_index(
+            "ix_finished_game_player_archive_player_id_finished_game_id"
+        )
+    op.drop_table("finished_game_player_archive")
+
+    with op.batch_alter_table("finished_game_archive", schema=None) as batch_op:
+        batch_op.drop_index("ix_finished_game_archive_game_id")
+        batch_op.drop_index("ix_finished_game_archive_finished_at")
+    op.drop_table("finished_game_archive")
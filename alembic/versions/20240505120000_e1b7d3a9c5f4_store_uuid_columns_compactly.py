@@ -0,0 +1,119 @@
+"""store uuid columns compactly
+
+Revision ID: e1b7d3a9c5f4
+Revises: c4e8a1f6b9d2
+Create Date: 2024-05-05 12:00:00.000000
+
+"""
+
+from alembic import op
+from discord_bots import config
+from discord_bots.uuid_storage import convert_uuid_storage
+
+# revision identifiers, used by Alembic.
+revision = "e1b7d3a9c5f4"
+down_revision = "c4e8a1f6b9d2"
+branch_labels = None
+depends_on = None
+
+# every column holding a uuid4 id as of this revision, see UUIDString
+UUID_COLUMNS = [
+    ("admin_role", "id"),
+    ("category", "id"),
+    ("commend", "finished_game_id"),
+    ("commend", "id"),
+    ("commend_archive", "finished_game_id"),
+    ("commend_archive", "id"),
+    ("custom_command", "id"),
+    ("discord_channel", "id"),
+    ("discord_guild", "id"),
+    ("discord_member", "id"),
+    ("economy_donation", "id"),
+    ("economy_prediction", "finished_game_id"),
+    ("economy_prediction", "id"),
+    ("economy_prediction", "in_progress_game_id"),
+    ("economy_prediction_archive", "finished_game_id"),
+    ("economy_prediction_archive", "id"),
+    ("economy_prediction_archive", "in_progress_game_id"),
+    ("economy_transaction", "economy_donation_id"),
+    ("economy_transaction", "economy_prediction_id"),
+    ("economy_transaction", "finished_game_id"),
+    ("economy_transaction", "id"),
+    ("economy_transaction", "in_progress_game_id"),
+    ("economy_transaction_archive", "economy_donation_id"),
+    ("economy_transaction_archive", "economy_prediction_id"),
+    ("economy_transaction_archive", "finished_game_id"),
+    ("economy_transaction_archive", "id"),
+    ("economy_transaction_archive", "in_progress_game_id"),
+    ("finished_game", "id"),
+    ("finished_game_archive", "id"),
+    ("finished_game_player", "finished_game_id"),
+    ("finished_game_player", "id"),
+    ("finished_game_player_archive", "finished_game_id"),
+    ("finished_game_player_archive", "id"),
+    ("in_progress_game", "id"),
+    ("in_progress_game", "queue_id"),
+    ("in_progress_game_channel", "id"),
+    ("in_progress_game_channel", "in_progress_game_id"),
+    ("in_progress_game_player", "id"),
+    ("in_progress_game_player", "in_progress_game_id"),
+    ("leaderboard_entry", "category_id"),
+    ("leaderboard_entry", "id"),
+    ("map", "id"),
+    ("map_vote", "id"),
+    ("map_vote", "rotation_map_id"),
+    ("player_category_trueskill", "category_id"),
+    ("player_category_trueskill", "id"),
+    ("player_decay", "id"),
+    ("player_history_rollup", "id"),
+    ("pooled_channel", "id"),
+    ("queue", "category_id"),
+    ("queue", "id"),
+    ("queue", "rotation_id"),
+    ("queue_notification", "id"),
+    ("queue_notification", "queue_id"),
+    ("queue_player", "id"),
+    ("queue_player", "queue_id"),
+    ("queue_role", "id"),
+    ("queue_role", "queue_id"),
+    ("queue_waitlist", "finished_game_id"),
+    ("queue_waitlist", "id"),
+    ("queue_waitlist", "in_progress_game_id"),
+    ("queue_waitlist", "queue_id"),
+    ("queue_waitlist_player", "id"),
+    ("queue_waitlist_player", "queue_id"),
+    ("queue_waitlist_player", "queue_waitlist_id"),
+    ("raffle", "id"),
+    ("rotation", "id"),
+    ("rotation_map", "id"),
+    ("rotation_map", "map_id"),
+    ("rotation_map", "rotation_id"),
+    ("schedule", "id"),
+    ("schedule_player", "id"),
+    ("schedule_player", "schedule_id"),
+    ("skip_map_vote", "id"),
+    ("skip_map_vote", "rotation_id"),
+    ("vote_passed_waitlist", "id"),
+    ("vote_passed_waitlist_player", "id"),
+    ("vote_passed_waitlist_player", "queue_id"),
+    ("vote_passed_waitlist_player", "vote_passed_waitlist_id"),
+]
+
+
+def upgrade():
+    # nothing to do unless the bot is going to read them compactly. Databases
+    # can be converted later, in either direction, with
+    # scripts/convert_uuid_storage.py, which is what's converting them while
+    # CONVERTING_UUIDS is set
+    if not config.COMPACT_UUIDS or config.CONVERTING_UUIDS:
+        return
+    # commits a chunk at a time, see convert_uuid_storage
+    with op.get_context().autocommit_block():
+        convert_uuid_storage(op.get_bind(), UUID_COLUMNS, compact=True)
+
+
+def downgrade():
+    if not config.COMPACT_UUIDS or config.CONVERTING_UUIDS:
+        return
+    with op.get_context().autocommit_block():
+        convert_uuid_storage(op.get_bind(), UUID_COLUMNS, compact=False)
@@ -0,0 +1,81 @@
+"""create player stats tables
+
+Revision ID: a3f9c2e7d1b8
+Revises: e1b7d3a9c5f4
+Create Date: 2024-05-06 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from discord_bots.uuid_storage import UUIDString
+
+# revision identifiers, used by Alembic.
+revision = "a3f9c2e7d1b8"
+down_revision = "e1b7d3a9c5f4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled in by the bot the first time it starts, or by
+    # scripts/rebuild_player_stats.py
+    op.create_table(
+        "player_stats_summary",
+        sa.Column("player_id", sa.BigInteger(), nullable=False),
+        sa.Column("category_name", sa.String(), nullable=True),
+        sa.Column("map_full_name", sa.String(), nullable=True),
+        sa.Column("wins", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("losses", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("ties", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("id", UUIDString(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["player_id"],
+            ["player.id"],
+            name=op.f("fk_player_stats_summary_player_id_player"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_player_stats_summary")),
+    )
+    with op.batch_alter_table("player_stats_summary", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_player_stats_summary_player_id_category_name",
+            ["player_id", "category_name"],
+            unique=False,
+        )
+
+    op.create_table(
+        "player_stats_day",
+        sa.Column("player_id", sa.BigInteger(), nullable=False),
+        sa.Column("category_name", sa.String(), nullable=True),
+        sa.Column("map_full_name", sa.String(), nullable=True),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("wins", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("losses", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("ties", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("id", UUIDString(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["player_id"],
+            ["player.id"],
+            name=op.f("fk_player_stats_day_player_id_player"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_player_stats_day")),
+    )
+    with op.batch_alter_table("player_stats_day", schema=None) as batch_op:
+        batch_op.create_index(
+            batch_op.f("ix_player_stats_day_day"), ["day"], unique=False
+        )
+        batch_op.create_index(
+            "ix_player_stats_day_player_id_day", ["player_id", "day"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("player_stats_day", schema=None) as batch_op:
+        batch_op.drop_index("ix_player_stats_day_player_id_day")
+        batch_op.drop_index(batch_op.f("ix_player_stats_day_day"))
+    op.drop_table("player_stats_day")
+
+    with op.batch_alter_table("player_stats_summary", schema=None) as batch_op:
+        batch_op.drop_index("ix_player_stats_summary_player_id_category_name")
+    op.drop_table("player_stats_summary")
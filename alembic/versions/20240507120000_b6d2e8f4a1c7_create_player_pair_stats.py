@@ -0,0 +1,75 @@
+"""create player pair stats
+
+Revision ID: b6d2e8f4a1c7
+Revises: a3f9c2e7d1b8
+Create Date: 2024-05-07 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from discord_bots.uuid_storage import UUIDString
+
+# revision identifiers, used by Alembic.
+revision = "b6d2e8f4a1c7"
+down_revision = "a3f9c2e7d1b8"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # filled in by the bot the first time it starts, or by
+    # scripts/rebuild_player_pairs.py
+    op.create_table(
+        "player_pair_stats",
+        sa.Column("player_id", sa.BigInteger(), nullable=False),
+        sa.Column("other_player_id", sa.BigInteger(), nullable=False),
+        sa.Column("category_name", sa.String(), nullable=True),
+        sa.Column(
+            "games_together", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column(
+            "wins_together", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column(
+            "losses_together", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column(
+            "games_against", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column(
+            "wins_against", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column(
+            "losses_against", sa.Integer(), server_default=sa.text("0"), nullable=False
+        ),
+        sa.Column("id", UUIDString(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["player_id"],
+            ["player.id"],
+            name=op.f("fk_player_pair_stats_player_id_player"),
+        ),
+        sa.ForeignKeyConstraint(
+            ["other_player_id"],
+            ["player.id"],
+            name=op.f("fk_player_pair_stats_other_player_id_player"),
+        ),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_player_pair_stats")),
+    )
+    with op.batch_alter_table("player_pair_stats", schema=None) as batch_op:
+        batch_op.create_index(
+            "ix_player_pair_stats_player_id_other_player_id",
+            ["player_id", "other_player_id"],
+            unique=False,
+        )
+        batch_op.create_index(
+            "ix_player_pair_stats_category_name", ["category_name"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("player_pair_stats", schema=None) as batch_op:
+        batch_op.drop_index("ix_player_pair_stats_category_name")
+        batch_op.drop_index("ix_player_pair_stats_player_id_other_player_id")
+    op.drop_table("player_pair_stats")
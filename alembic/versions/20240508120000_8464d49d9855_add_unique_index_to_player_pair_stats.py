@@ -0,0 +1,51 @@
+"""add unique index to player pair stats
+
+Revision ID: 8464d49d9855
+Revises: b6d2e8f4a1c7
+Create Date: 2024-05-08 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8464d49d9855"
+down_revision = "b6d2e8f4a1c7"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # a pair counted twice can't be told apart from one counted once, so start
+    # over. The bot rebuilds the table the next time it starts, see
+    # player_pairs.player_pairs_need_rebuild
+    has_duplicates = (
+        op.get_bind()
+        .execute(
+            sa.text(
+                "SELECT 1 FROM player_pair_stats"
+                " GROUP BY player_id, other_player_id, category_name"
+                " HAVING count(*) > 1 LIMIT 1"
+            )
+        )
+        .first()
+    )
+    if has_duplicates:
+        op.execute("DELETE FROM player_pair_stats")
+    # NULLs are distinct in a plain unique constraint, so categoryless pairs
+    # would still be duplicated
+    with op.batch_alter_table("player_pair_stats", schema=None) as batch_op:
+        batch_op.create_index(
+            "uq_player_pair_stats_player_id_other_player_id_category_name",
+            ["player_id", "other_player_id", sa.text("coalesce(category_name, '')")],
+            unique=True,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("player_pair_stats", schema=None) as batch_op:
+        batch_op.drop_index(
+            "uq_player_pair_stats_player_id_other_player_id_category_name"
+        )
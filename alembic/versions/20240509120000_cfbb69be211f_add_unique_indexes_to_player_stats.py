@@ -0,0 +1,77 @@
+"""add unique indexes to player stats
+
+Revision ID: cfbb69be211f
+Revises: 8464d49d9855
+Create Date: 2024-05-09 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "cfbb69be211f"
+down_revision = "8464d49d9855"
+branch_labels = None
+depends_on = None
+
+KEYS = "player_id, category_name, map_full_name"
+
+
+def _has_duplicates(table: str, keys: str) -> bool:
+    return (
+        op.get_bind()
+        .execute(
+            sa.text(
+                f"SELECT 1 FROM {table} GROUP BY {keys} HAVING count(*) > 1 LIMIT 1"
+            )
+        )
+        .first()
+        is not None
+    )
+
+
+def upgrade():
+    # duplicated rows each hold part of the counts, so start over. The bot
+    # rebuilds both tables the next time it starts, see
+    # player_stats.player_stats_need_rebuild
+    if _has_duplicates("player_stats_summary", KEYS) or _has_duplicates(
+        "player_stats_day", f"{KEYS}, day"
+    ):
+        op.execute("DELETE FROM player_stats_day")
+        op.execute("DELETE FROM player_stats_summary")
+    # NULLs are distinct in a plain unique constraint, so games without a
+    # category or map would still be duplicated
+    with op.batch_alter_table("player_stats_summary", schema=None) as batch_op:
+        batch_op.create_index(
+            "uq_player_stats_summary_player_id_category_name_map_full_name",
+            [
+                "player_id",
+                sa.text("coalesce(category_name, '')"),
+                sa.text("coalesce(map_full_name, '')"),
+            ],
+            unique=True,
+        )
+    with op.batch_alter_table("player_stats_day", schema=None) as batch_op:
+        batch_op.create_index(
+            "uq_player_stats_day_player_id_category_name_map_full_name_day",
+            [
+                "player_id",
+                sa.text("coalesce(category_name, '')"),
+                sa.text("coalesce(map_full_name, '')"),
+                "day",
+            ],
+            unique=True,
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("player_stats_day", schema=None) as batch_op:
+        batch_op.drop_index(
+            "uq_player_stats_day_player_id_category_name_map_full_name_day"
+        )
+    with op.batch_alter_table("player_stats_summary", schema=None) as batch_op:
+        batch_op.drop_index(
+            "uq_player_stats_summary_player_id_category_name_map_full_name"
+        )
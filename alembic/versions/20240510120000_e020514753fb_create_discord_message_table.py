@@ -0,0 +1,42 @@
+"""create discord message table
+
+Revision ID: e020514753fb
+Revises: cfbb69be211f
+Create Date: 2024-05-10 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from discord_bots.uuid_storage import UUIDString
+
+# revision identifiers, used by Alembic.
+revision = "e020514753fb"
+down_revision = "cfbb69be211f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "discord_message",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("channel_id", sa.BigInteger(), nullable=False),
+        sa.Column("message_id", sa.BigInteger(), nullable=False),
+        sa.Column("id", UUIDString(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_discord_message")),
+        sa.UniqueConstraint("name", name=op.f("uq_discord_message_name")),
+    )
+    # the leaderboard message used to be kept on a discord_channel row of its
+    # own, which clashed with any other row for the same channel. The bot finds
+    # the message again the next time it prints the leaderboard
+    op.execute("DELETE FROM discord_channel WHERE name = 'leaderboard'")
+    with op.batch_alter_table("discord_channel", schema=None) as batch_op:
+        batch_op.drop_column("message_id")
+
+
+def downgrade():
+    with op.batch_alter_table("discord_channel", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("message_id", sa.BigInteger(), nullable=True))
+    op.drop_table("discord_message")
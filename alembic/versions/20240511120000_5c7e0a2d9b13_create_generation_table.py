@@ -0,0 +1,33 @@
+"""create generation table
+
+Revision ID: 5c7e0a2d9b13
+Revises: e020514753fb
+Create Date: 2024-05-11 12:00:00.000000
+
+"""
+
+import sqlalchemy as sa
+
+from alembic import op
+from discord_bots.uuid_storage import UUIDString
+
+# revision identifiers, used by Alembic.
+revision = "5c7e0a2d9b13"
+down_revision = "e020514753fb"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "generation",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("value", sa.Integer(), server_default=sa.text("0"), nullable=False),
+        sa.Column("id", UUIDString(), nullable=False),
+        sa.PrimaryKeyConstraint("id", name=op.f("pk_generation")),
+        sa.UniqueConstraint("name", name=op.f("uq_generation_name")),
+    )
+
+
+def downgrade():
+    op.drop_table("generation")
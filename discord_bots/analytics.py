@@ -0,0 +1,248 @@
+"""
+Loads the match history into pandas for the scripts in scripts/, with helpers
+for the questions they ask of it.
+
+load_history reads every game (archived ones included, see archive.py) and
+every participant with one query each, instead of a query per player or per
+game. The result is cached on disk under the finished_at of the newest game,
+the number of games and a generation that /admin editgamewinner and /admin
+deletegame bump, so running a script again before any of those change doesn't
+touch the games at all. Ratings are always read fresh, since they also change
+without a game finishing (sigma decay, /trueskill resetplayer).
+
+    with Session() as session:
+        history = load_history(session)
+    print(player_results(history).sort_values("wins").tail())
+"""
+
+import logging
+import os
+from dataclasses import dataclass
+from glob import glob
+
+import numpy
+import pandas
+import sqlalchemy
+from sqlalchemy import func, select
+
+from discord_bots.archive import with_archived
+from discord_bots.export import GAME_COLUMNS, PLAYER_COLUMNS
+from discord_bots.generations import FINISHED_GAMES, get_generation
+from discord_bots.models import FinishedGame, FinishedGamePlayer, Player
+
+_log = logging.getLogger(__name__)
+
+CACHE_DIR = ".analytics_cache"
+
+
+@dataclass
+class History:
+    """
+    :games: One row per game, indexed by finished_game_id, oldest first
+    :participants: One row per player per game, in the order of games
+    :ratings: One row per player with their current rating, indexed by player_id
+    """
+
+    games: pandas.DataFrame
+    participants: pandas.DataFrame
+    ratings: pandas.DataFrame
+
+
+def _read_frame(session: sqlalchemy.orm.Session, statement) -> pandas.DataFrame:
+    # not pandas.read_sql, which only takes SQLAlchemy 2 connections
+    result = session.execute(statement)
+    return pandas.DataFrame.from_records(result.all(), columns=list(result.keys()))
+
+
+def _load_games(
+    session: sqlalchemy.orm.Session,
+) -> tuple[pandas.DataFrame, pandas.DataFrame]:
+    games_table = with_archived(FinishedGame.__table__)
+    games = _read_frame(
+        session,
+        select(
+            games_table.c.id.label("finished_game_id"),
+            *[games_table.c[name] for name in GAME_COLUMNS[1:]],
+        ).order_by(games_table.c.finished_at, games_table.c.id),
+    ).set_index("finished_game_id")
+
+    players_table = with_archived(FinishedGamePlayer.__table__)
+    participants = _read_frame(
+        session,
+        select(
+            players_table.c.finished_game_id,
+            *[players_table.c[name] for name in PLAYER_COLUMNS],
+        ),
+    )
+    # players that were deleted are None
+    participants["player_id"] = participants["player_id"].astype("Int64")
+    # the games' columns that nearly every question about a player needs
+    participants = participants.join(
+        games[["finished_at", "category_name", "winning_team"]],
+        on="finished_game_id",
+        how="inner",
+    )
+    participants["outcome"] = numpy.select(
+        [
+            participants["winning_team"] == -1,
+            participants["winning_team"] == participants["team"],
+        ],
+        ["tie", "win"],
+        default="loss",
+    )
+    participants = participants.sort_values(
+        ["finished_at", "finished_game_id", "team"], kind="stable"
+    ).reset_index(drop=True)
+    return games, participants
+
+
+def _cache_key(session: sqlalchemy.orm.Session) -> str:
+    games_table = with_archived(FinishedGame.__table__)
+    newest, count = session.execute(
+        select(func.max(games_table.c.finished_at), func.count())
+    ).one()
+    # the newest game and the count catch games finishing. Edited winners and
+    # deleted games bump the generation, see generations.py
+    newest_string = newest.strftime("%Y%m%d%H%M%S%f") if newest else "none"
+    generation = get_generation(session, FINISHED_GAMES)
+    return f"{newest_string}_{count}_{generation}"
+
+
+def load_history(
+    session: sqlalchemy.orm.Session, cache_dir: str | None = CACHE_DIR
+) -> History:
+    """
+    :cache_dir: Where loaded games are kept between runs, None to not cache
+    """
+    ratings = _read_frame(
+        session,
+        select(
+            Player.id.label("player_id"),
+            Player.name,
+            Player.rated_trueskill_mu,
+            Player.rated_trueskill_sigma,
+        ),
+    ).set_index("player_id")
+
+    if cache_dir is None:
+        games, participants = _load_games(session)
+        return History(games, participants, ratings)
+
+    path = os.path.join(cache_dir, f"history_{_cache_key(session)}.pkl")
+    if os.path.exists(path):
+        games, participants = pandas.read_pickle(path)
+        return History(games, participants, ratings)
+
+    games, participants = _load_games(session)
+    os.makedirs(cache_dir, exist_ok=True)
+    for old_path in glob(os.path.join(cache_dir, "history_*.pkl")):
+        os.remove(old_path)
+    pandas.to_pickle((games, participants), path)
+    _log.info(
+        f"[analytics] Cached {len(games)} games and {len(participants)} participants in {path}"
+    )
+    return History(games, participants, ratings)
+
+
+def player_results(history: History) -> pandas.DataFrame:
+    """
+    :returns: wins, losses, ties and games of each player, indexed by player_id
+    """
+    results = pandas.crosstab(
+        history.participants["player_id"], history.participants["outcome"]
+    ).reindex(columns=["win", "loss", "tie"], fill_value=0)
+    results.columns = ["wins", "losses", "ties"]
+    results["games"] = results.sum(axis=1)
+    return results
+
+
+def streaks(history: History) -> pandas.DataFrame:
+    """
+    :returns: the longest win and loss streaks of each player, and the outcome
+    and length of the streak they're on, indexed by player_id
+    """
+    participants = history.participants.dropna(subset=["player_id"]).sort_values(
+        ["player_id", "finished_at"], kind="stable"
+    )
+    outcomes = participants["outcome"]
+    # a new run starts at each player's first game and whenever the outcome changes
+    previous = outcomes.groupby(participants["player_id"]).shift()
+    runs = (
+        participants.assign(run=(outcomes != previous).cumsum())
+        .groupby(["player_id", "run"])
+        .agg(outcome=("outcome", "first"), length=("outcome", "size"))
+        .reset_index()
+    )
+    longest = (
+        runs.groupby(["player_id", "outcome"])["length"]
+        .max()
+        .unstack(fill_value=0)
+        .reindex(columns=["win", "loss"], fill_value=0)
+    )
+    current = runs.groupby("player_id").last()
+    return pandas.DataFrame(
+        {
+            "longest_win_streak": longest["win"],
+            "longest_loss_streak": longest["loss"],
+            "current_outcome": current["outcome"],
+            "current_streak": current["length"],
+        }
+    )
+
+
+def rating_trajectories(
+    history: History, player_ids: list[int] | None = None, freq: str = "D"
+) -> pandas.DataFrame:
+    """
+    :returns: each player's rated mu after their last game of each period
+    (freq, a pandas offset alias), one column per player_id. Periods the player
+    didn't play in carry their last rating forward
+    """
+    participants = history.participants
+    if player_ids is not None:
+        participants = participants[participants["player_id"].isin(player_ids)]
+    return (
+        participants.pivot_table(
+            index=pandas.Grouper(key="finished_at", freq=freq),
+            columns="player_id",
+            values="rated_trueskill_mu_after",
+            aggfunc="last",
+        )
+        .ffill()
+        .sort_index()
+    )
+
+
+def upsets(games: pandas.DataFrame) -> pandas.DataFrame:
+    """
+    :returns: the games the favored team lost, with the team that was favored
+    and its win probability
+    """
+    favored_team = numpy.select(
+        [games["win_probability"] > 0.5, games["win_probability"] < 0.5],
+        [0, 1],
+        default=-1,
+    )
+    is_upset = (
+        (favored_team != -1)
+        & (games["winning_team"] != -1)
+        & (games["winning_team"] != favored_team)
+    )
+    favored_win_probability = numpy.where(
+        favored_team == 0, games["win_probability"], 1 - games["win_probability"]
+    )
+    return games.assign(
+        favored_team=favored_team, favored_win_probability=favored_win_probability
+    )[is_upset]
+
+
+def prediction_accuracy(games: pandas.DataFrame) -> tuple[int, int]:
+    """
+    A prediction is right if team0 was favored and won, or wasn't and didn't
+
+    :returns: how many games were predicted right, and how many wrong
+    """
+    correct = int(
+        ((games["win_probability"] > 0.5) == (games["winning_team"] == 0)).sum()
+    )
+    return correct, len(games) - correct
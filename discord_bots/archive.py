@@ -0,0 +1,214 @@
+"""
+Hot/cold split of the game history.
+
+finished_game, finished_game_player, commend, economy_prediction and
+economy_transaction only ever grow, and most of what reads them only cares about
+the last year or so. Games that finished more than config.ARCHIVE_AFTER_DAYS ago
+are moved, with the rows of the other tables that point at them, into the
+*_archive copies of those tables in models.py. What they added to each player's
+wins, losses and ties is added to PlayerHistoryRollup in the same transaction,
+so totals don't need to read the archive at all.
+
+Queries that need archived rows themselves (an old /game history, /game show of
+an old game, /commendstats, the soft reset script) check archive_has_games first
+and only read with_archived when it says so.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy
+from sqlalchemy import and_, case, func, or_, select, union_all
+from sqlalchemy.sql.schema import Table
+from sqlalchemy.sql.selectable import Subquery
+
+import discord_bots.config as config
+from discord_bots.models import (
+    Commend,
+    EconomyPrediction,
+    EconomyTransaction,
+    FinishedGame,
+    FinishedGamePlayer,
+    PlayerHistoryRollup,
+    QueueWaitlist,
+    commend_archive,
+    economy_prediction_archive,
+    economy_transaction_archive,
+    finished_game_archive,
+    finished_game_player_archive,
+)
+
+_log = logging.getLogger(__name__)
+
+# /stats shows the last 365 days, which should never need the archive
+MIN_ARCHIVE_AFTER_DAYS = 365
+# games moved per transaction, so the database thread is never held for long
+ARCHIVE_BATCH_SIZE = 500
+
+ARCHIVE_TABLES: dict[str, Table] = {
+    table.name.removesuffix("_archive"): table
+    for table in (
+        commend_archive,
+        economy_prediction_archive,
+        economy_transaction_archive,
+        finished_game_archive,
+        finished_game_player_archive,
+    )
+}
+
+
+def archive_cutoff() -> datetime | None:
+    """
+    :returns: when a game has to have finished before to be archived, or None
+    if archiving is turned off
+    """
+    if config.ARCHIVE_AFTER_DAYS <= 0:
+        return None
+    days = max(config.ARCHIVE_AFTER_DAYS, MIN_ARCHIVE_AFTER_DAYS)
+    return datetime.now(timezone.utc) - timedelta(days=days)
+
+
+def archive_has_games(
+    session: sqlalchemy.orm.Session, since: datetime | None = None
+) -> bool:
+    """
+    :returns: whether any archived game finished at or after since (or at all)
+    """
+    statement = select(finished_game_archive.c.id).limit(1)
+    if since:
+        statement = statement.where(finished_game_archive.c.finished_at >= since)
+    return session.execute(statement).first() is not None
+
+
+def with_archived(table: Table) -> Subquery:
+    """
+    The rows of table and of its archive, with the same column names as table
+    """
+    return union_all(select(table), select(ARCHIVE_TABLES[table.name])).subquery(
+        table.name
+    )
+
+
+def _move(session: sqlalchemy.orm.Session, table: Table, condition):
+    archive = ARCHIVE_TABLES[table.name]
+    session.execute(
+        archive.insert().from_select(
+            [column.name for column in table.columns],
+            select(table).where(condition),
+        )
+    )
+    session.execute(table.delete().where(condition))
+
+
+def _roll_up(session: sqlalchemy.orm.Session, finished_game_ids: list[str]):
+    statement = (
+        select(
+            FinishedGamePlayer.player_id,
+            FinishedGame.category_name,
+            FinishedGame.map_full_name,
+            func.sum(
+                case((FinishedGame.winning_team == FinishedGamePlayer.team, 1), else_=0)
+            ),
+            func.sum(
+                case(
+                    (
+                        and_(
+                            FinishedGame.winning_team != FinishedGamePlayer.team,
+                            FinishedGame.winning_team != -1,
+                        ),
+                        1,
+                    ),
+                    else_=0,
+                )
+            ),
+            func.sum(case((FinishedGame.winning_team == -1, 1), else_=0)),
+            func.max(FinishedGame.finished_at),
+        )
+        .join(FinishedGame, FinishedGame.id == FinishedGamePlayer.finished_game_id)
+        .where(FinishedGamePlayer.finished_game_id.in_(finished_game_ids))
+        .group_by(
+            FinishedGamePlayer.player_id,
+            FinishedGame.category_name,
+            FinishedGame.map_full_name,
+        )
+    )
+    totals = session.execute(statement).all()
+    rollups: dict[tuple[int, str | None, str | None], PlayerHistoryRollup] = {
+        (rollup.player_id, rollup.category_name, rollup.map_full_name): rollup
+        for rollup in session.query(PlayerHistoryRollup).filter(
+            PlayerHistoryRollup.player_id.in_([row[0] for row in totals])
+        )
+    }
+    for player_id, category_name, map_full_name, wins, losses, ties, last in totals:
+        rollup = rollups.get((player_id, category_name, map_full_name))
+        if not rollup:
+            rollup = PlayerHistoryRollup(
+                player_id=player_id,
+                category_name=category_name,
+                map_full_name=map_full_name,
+                archived_through=last,
+            )
+            session.add(rollup)
+        rollup.wins += wins
+        rollup.losses += losses
+        rollup.ties += ties
+        rollup.archived_through = max(rollup.archived_through, last)
+
+
+def archive_finished_games(
+    session: sqlalchemy.orm.Session,
+    cutoff: datetime,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> int:
+    """
+    Archive up to batch_size of the oldest games that finished before cutoff.
+    The caller commits
+
+    :returns: the number of games archived
+    """
+    finished_game_ids: list[str] = list(
+        session.execute(
+            select(FinishedGame.id)
+            .where(
+                FinishedGame.finished_at < cutoff,
+                # still needed to put its players back in the queue
+                FinishedGame.id.not_in(select(QueueWaitlist.finished_game_id)),
+            )
+            .order_by(FinishedGame.finished_at)
+            .limit(batch_size)
+        ).scalars()
+    )
+    if not finished_game_ids:
+        return 0
+
+    _roll_up(session, finished_game_ids)
+    # children first. SQLite doesn't enforce the foreign keys (see storage.py),
+    # but postgres does
+    _move(
+        session,
+        EconomyTransaction.__table__,
+        or_(
+            EconomyTransaction.finished_game_id.in_(finished_game_ids),
+            EconomyTransaction.economy_prediction_id.in_(
+                select(EconomyPrediction.id).where(
+                    EconomyPrediction.finished_game_id.in_(finished_game_ids)
+                )
+            ),
+        ),
+    )
+    _move(
+        session,
+        EconomyPrediction.__table__,
+        EconomyPrediction.finished_game_id.in_(finished_game_ids),
+    )
+    _move(session, Commend.__table__, Commend.finished_game_id.in_(finished_game_ids))
+    _move(
+        session,
+        FinishedGamePlayer.__table__,
+        FinishedGamePlayer.finished_game_id.in_(finished_game_ids),
+    )
+    _move(session, FinishedGame.__table__, FinishedGame.id.in_(finished_game_ids))
+    _log.info(
+        f"[archive_finished_games] Archived {len(finished_game_ids)} games that finished before {cutoff}"
+    )
+    return len(finished_game_ids)
@@ -0,0 +1,255 @@
+"""
+Online backups of the bot's database, taken on a worker thread so the bot keeps
+running while they're written.
+
+Sqlite is copied with its online backup API a few pages at a time. With WAL
+(see storage.py) the copy holds a read transaction for its whole length, so it
+is a consistent snapshot and the bot keeps writing past it. Without WAL that
+would block writes, so the copy is left to restart when the bot writes to a
+page it already copied.
+
+Postgres is dumped with pg_dump, whose output is streamed into the backup file,
+so a backup can be restored with psql.
+
+Backups are written to a .partial file and renamed when complete, can be gzipped
+as they're written, and the oldest are deleted once there are more than
+BACKUP_KEEP of them.
+"""
+
+import asyncio
+import gzip
+import logging
+import os
+import shutil
+import sqlite3
+import subprocess
+import tempfile
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from glob import glob
+from typing import Awaitable, BinaryIO, Callable
+
+import discord_bots.config as config
+from discord_bots.models import engine
+
+_log = logging.getLogger(__name__)
+
+# pages copied per step of a sqlite backup, 25MB with the default page size
+SQLITE_PAGES_PER_STEP = 6400
+# bytes read from pg_dump at a time
+PG_DUMP_CHUNK_SIZE = 1024 * 1024
+
+# one backup at a time
+_lock = asyncio.Lock()
+
+
+class BackupError(Exception):
+    pass
+
+
+@dataclass
+class BackupProgress:
+    """
+    Updated from the backup thread as the backup is written
+
+    :total: Pages to copy for sqlite, 0 for postgres since pg_dump doesn't say
+    :done: Pages copied for sqlite, bytes written for postgres
+    """
+
+    total: int = 0
+    done: int = 0
+
+    def __str__(self) -> str:
+        if self.total:
+            return f"{round(100 * self.done / self.total)}%"
+        return f"{self.done / 1024 / 1024:.1f} MB"
+
+
+@dataclass
+class Backup:
+    path: str
+    size: int
+    seconds: float
+
+
+def _is_postgres() -> bool:
+    return engine.dialect.name == "postgresql"
+
+
+def _extension() -> str:
+    extension = ".sql" if _is_postgres() else ".db"
+    if config.BACKUP_COMPRESS:
+        extension += ".gz"
+    return extension
+
+
+def is_backup_filename(filename: str) -> bool:
+    """
+    Whether filename could be one of our backups, so that removing it is safe
+    """
+    return (
+        os.path.basename(filename) == filename
+        and filename.startswith(f"{config.DB_NAME}_")
+        and filename.endswith((".db", ".db.gz", ".sql", ".sql.gz"))
+    )
+
+
+def list_backups() -> list[str]:
+    """
+    :returns: the backup filenames in BACKUP_DIR, oldest first
+    """
+    paths = [
+        path
+        for path in glob(os.path.join(config.BACKUP_DIR, f"{config.DB_NAME}_*"))
+        if is_backup_filename(os.path.basename(path))
+    ]
+    return [os.path.basename(path) for path in sorted(paths, key=os.path.getmtime)]
+
+
+def _open_output(path: str) -> BinaryIO:
+    if config.BACKUP_COMPRESS:
+        return gzip.open(path, "wb")  # type: ignore
+    return open(path, "wb")
+
+
+def _backup_sqlite(destination: str, progress: BackupProgress):
+    source_path = engine.url.database
+    # compressed backups are copied uncompressed first, then gzipped
+    snapshot_path = destination + ".snapshot" if config.BACKUP_COMPRESS else destination
+    source = sqlite3.connect(f"file:{source_path}?mode=ro", uri=True)
+    target = sqlite3.connect(snapshot_path)
+    try:
+        if source.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+            # start the read transaction now, and hold it until the copy is done
+            source.execute("BEGIN")
+            source.execute("SELECT count(*) FROM sqlite_master").fetchone()
+
+        def on_step(status: int, remaining: int, total: int):
+            progress.total = total
+            progress.done = total - remaining
+
+        source.backup(target, pages=SQLITE_PAGES_PER_STEP, progress=on_step, sleep=0.01)
+    finally:
+        target.close()
+        source.close()
+    if config.BACKUP_COMPRESS:
+        try:
+            with open(snapshot_path, "rb") as snapshot:
+                with _open_output(destination) as output:
+                    shutil.copyfileobj(snapshot, output)
+        finally:
+            os.remove(snapshot_path)
+
+
+def _pg_dump_env() -> dict[str, str]:
+    """
+    The connection settings for pg_dump. They're passed through libpq's
+    environment variables, since command line arguments (and the password in
+    DATABASE_URI with them) can be read by anyone on the host with ps
+    """
+    url = engine.url
+    env = dict(os.environ)
+    for variable, value in [
+        ("PGHOST", url.host or url.query.get("host")),
+        ("PGPORT", url.port),
+        ("PGUSER", url.username),
+        ("PGPASSWORD", url.password),
+        ("PGDATABASE", url.database),
+        ("PGSSLMODE", url.query.get("sslmode")),
+    ]:
+        if value is not None:
+            env[variable] = str(value)
+    return env
+
+
+def _backup_postgres(destination: str, progress: BackupProgress):
+    # a file rather than a pipe, so pg_dump can't block on a full stderr
+    with tempfile.TemporaryFile() as stderr:
+        try:
+            process = subprocess.Popen(
+                ["pg_dump", "--no-owner", "--no-privileges"],
+                stdout=subprocess.PIPE,
+                stderr=stderr,
+                env=_pg_dump_env(),
+            )
+        except FileNotFoundError:
+            raise BackupError("pg_dump is not installed")
+        assert process.stdout
+        with _open_output(destination) as output:
+            while chunk := process.stdout.read(PG_DUMP_CHUNK_SIZE):
+                output.write(chunk)
+                progress.done += len(chunk)
+        if process.wait() != 0:
+            stderr.seek(0)
+            raise BackupError(
+                f"pg_dump exited with {process.returncode}: "
+                + stderr.read().decode(errors="replace")
+            )
+
+
+def _rotate():
+    if config.BACKUP_KEEP <= 0:
+        return
+    backups = list_backups()
+    for filename in backups[: -config.BACKUP_KEEP]:
+        os.remove(os.path.join(config.BACKUP_DIR, filename))
+        _log.info(f"[backup] Removed old backup {filename}")
+
+
+def _create_backup(progress: BackupProgress) -> Backup:
+    start = datetime.now(timezone.utc)
+    date_string = start.strftime("%Y-%m-%d_%H%M%S")
+    filename = f"{config.DB_NAME}_{date_string}{_extension()}"
+    path = os.path.join(config.BACKUP_DIR, filename)
+    partial_path = path + ".partial"
+    os.makedirs(config.BACKUP_DIR, exist_ok=True)
+    try:
+        if _is_postgres():
+            _backup_postgres(partial_path, progress)
+        else:
+            _backup_sqlite(partial_path, progress)
+    except Exception:
+        for leftover in (partial_path, partial_path + ".snapshot"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    os.replace(partial_path, path)
+    _rotate()
+    seconds = (datetime.now(timezone.utc) - start).total_seconds()
+    size = os.path.getsize(path)
+    _log.info(f"[backup] Wrote {filename} ({size} bytes) in {seconds:.1f}s")
+    return Backup(path, size, seconds)
+
+
+async def create_backup(
+    on_progress: Callable[[BackupProgress], Awaitable[None]] | None = None,
+    interval: float = 5,
+) -> Backup:
+    """
+    Back the database up into BACKUP_DIR on a worker thread, awaiting
+    on_progress every interval seconds until it's done. Errors raised by
+    on_progress are logged and don't stop the backup
+
+    :raises BackupError: if a backup is already running, or pg_dump fails
+    """
+    if _lock.locked():
+        raise BackupError("A backup is already running")
+    async with _lock:
+        progress = BackupProgress()
+        task = asyncio.create_task(asyncio.to_thread(_create_backup, progress))
+        try:
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=interval)
+                if done:
+                    return task.result()
+                if on_progress:
+                    try:
+                        await on_progress(progress)
+                    except Exception:
+                        # e.g. the interaction expired, the backup carries on
+                        _log.exception("[create_backup] Failed to report progress")
+        finally:
+            # the thread can't be stopped, so if the caller is cancelled keep
+            # the lock until it's done rather than let another backup start
+            if not task.done():
+                await asyncio.wait({task})
@@ -1,8 +1,19 @@
 # This file exists to avoid a circular reference
 
 import discord
+from discord import app_commands
 from discord.ext import commands
 import discord_bots.config as config
+from discord_bots.sqlstats import start_unit
+
+
+class CommandTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # runs in the same task as the command itself
+        if interaction.command:
+            start_unit(f"/{interaction.command.qualified_name}")
+        return True
+
 
 intents = discord.Intents.all()  # TODO: should manually specify each intent
 intents.members = True
@@ -14,4 +25,5 @@ bot = commands.Bot(
         width=108, verify_checks=False, dm_help=True
     ),
     intents=intents,
+    tree_cls=CommandTree,
 )
@@ -0,0 +1,63 @@
+"""
+Drops in-memory caches when the rows they were built from change. Flushes only
+mark the session, the cache is dropped once the changes are committed and other
+sessions can actually see them:
+
+    register_cache_invalidation((FinishedGame, Map), invalidate_global_map_stats)
+"""
+
+import itertools
+from typing import Callable
+
+import sqlalchemy
+from sqlalchemy import event
+
+from discord_bots.models import Session
+
+
+def register_cache_invalidation(
+    models: tuple[type, ...],
+    invalidate: Callable[[], None],
+    changes: Callable[[object], bool] | None = None,
+):
+    """
+    Call invalidate after every commit that added, changed or deleted an
+    instance of models
+
+    :changes: decides which flushed objects count, defaults to any instance of
+    models. Bulk query.update() and query.delete() on models always count
+    """
+    # one flag per registration, so each cache is only dropped by its own models
+    stale = f"{invalidate.__module__}.{invalidate.__qualname__}_is_stale"
+
+    def is_change(obj) -> bool:
+        return changes(obj) if changes else isinstance(obj, models)
+
+    def after_flush(session: sqlalchemy.orm.Session, flush_context):
+        if any(
+            is_change(obj)
+            for obj in itertools.chain(session.new, session.dirty, session.deleted)
+        ):
+            session.info[stale] = True
+
+    def do_orm_execute(orm_execute_state: sqlalchemy.orm.ORMExecuteState):
+        # bulk query.update() and query.delete() skip the flush entirely
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+            return
+        if any(
+            issubclass(mapper.class_, models)
+            for mapper in orm_execute_state.all_mappers
+        ):
+            orm_execute_state.session.info[stale] = True
+
+    def after_commit(session: sqlalchemy.orm.Session):
+        if session.info.pop(stale, False):
+            invalidate()
+
+    def after_rollback(session: sqlalchemy.orm.Session):
+        session.info.pop(stale, None)
+
+    event.listen(Session, "after_flush", after_flush)
+    event.listen(Session, "do_orm_execute", do_orm_execute)
+    event.listen(Session, "after_commit", after_commit)
+    event.listen(Session, "after_rollback", after_rollback)
@@ -0,0 +1,362 @@
+"""
+Keeps a pool of idle game channels (one text and two voice channels per game)
+under the TRIBES_VOICE_CATEGORY_CHANNEL_ID category. Creating and deleting
+channels are some of the slowest and most rate limited discord calls, so games
+take their channels from the pool and hand them back when they are done.
+
+Idle channels are hidden from @everyone and keep the name of the last game that
+used them, since discord only allows two renames per channel every ten minutes.
+"""
+
+import asyncio
+import logging
+
+import discord
+import sqlalchemy
+from discord import (
+    CategoryChannel,
+    Guild,
+    PermissionOverwrite,
+    TextChannel,
+    VoiceChannel,
+)
+
+import discord_bots.config as config
+from discord_bots.models import (
+    InProgressGame,
+    InProgressGameChannel,
+    PooledChannel,
+    Session,
+)
+
+_log = logging.getLogger(__name__)
+
+# Only used for channels created by the pool, so that any created right before a
+# crash (and never written to the database) can be recognized and adopted later
+IDLE_TEXT_CHANNEL_NAME = "idle-game"
+IDLE_VOICE_CHANNEL_NAME = "Idle Game"
+
+
+def _idle_overwrites(guild: Guild) -> dict:
+    return {
+        guild.default_role: PermissionOverwrite(view_channel=False),
+        guild.me: PermissionOverwrite(view_channel=True),
+    }
+
+
+def _idle_counts(session: sqlalchemy.orm.Session) -> tuple[int, int]:
+    """
+    :returns: the number of idle text channels and idle voice channels
+    """
+    num_voice: int = (
+        session.query(PooledChannel).filter(PooledChannel.is_voice == True).count()
+    )
+    num_text: int = (
+        session.query(PooledChannel).filter(PooledChannel.is_voice == False).count()
+    )
+    return num_text, num_voice
+
+
+def _claim_pooled_channel_ids(
+    session: sqlalchemy.orm.Session, num_text: int = 1, num_voice: int = 2
+) -> tuple[list[int], list[int]]:
+    """
+    Remove up to num_text text and num_voice voice channels from the pool, in
+    the caller's session. The deletes are committed before anything is awaited,
+    so no other game can claim them and the database isn't locked while discord
+    renames them
+    """
+    if config.CHANNEL_POOL_SIZE == 0:
+        return [], []
+    text_channels: list[PooledChannel] = (
+        session.query(PooledChannel)
+        .filter(PooledChannel.is_voice == False)
+        .order_by(PooledChannel.created_at.asc())
+        .limit(num_text)
+        .all()
+    )
+    voice_channels: list[PooledChannel] = (
+        session.query(PooledChannel)
+        .filter(PooledChannel.is_voice == True)
+        .order_by(PooledChannel.created_at.asc())
+        .limit(num_voice)
+        .all()
+    )
+    text_channel_ids = [pooled.channel_id for pooled in text_channels]
+    voice_channel_ids = [pooled.channel_id for pooled in voice_channels]
+    for pooled_channel in text_channels + voice_channels:
+        session.delete(pooled_channel)
+    session.commit()
+    return text_channel_ids, voice_channel_ids
+
+
+async def _pop_channel(
+    guild: Guild,
+    category: CategoryChannel,
+    channel_id: int | None,
+    name: str,
+    is_voice: bool,
+) -> TextChannel | VoiceChannel:
+    channel_type = VoiceChannel if is_voice else TextChannel
+    channel = guild.get_channel(channel_id) if channel_id else None
+    if isinstance(channel, channel_type):
+        try:
+            # sync_permissions drops the idle overwrites and makes the channel
+            # visible with the same permissions as the category
+            edited = await channel.edit(name=name, sync_permissions=True)
+            return edited or channel
+        except Exception:
+            _log.exception(
+                f"[pop_game_channels] Failed to reuse pooled channel {channel_id}, creating a new one instead"
+            )
+    elif channel_id:
+        _log.warning(
+            f"[pop_game_channels] Pooled channel {channel_id} no longer exists, creating a new one instead"
+        )
+    if is_voice:
+        return await guild.create_voice_channel(name, category=category)
+    return await guild.create_text_channel(name, category=category)
+
+
+async def pop_game_channels(
+    session: sqlalchemy.orm.Session,
+    guild: Guild,
+    category: CategoryChannel,
+    text_channel_name: str,
+    team0_name: str,
+    team1_name: str,
+) -> tuple[TextChannel, VoiceChannel, VoiceChannel]:
+    """
+    Take a text channel and two voice channels from the pool, renaming them for
+    the game. New channels are created for anything the pool can't provide.
+    Commits the session before awaiting discord, the caller must commit whatever
+    it adds for the channels
+
+    :returns: the match text channel, the team0 voice channel and the team1 voice channel
+    """
+    text_channel_ids, voice_channel_ids = _claim_pooled_channel_ids(session)
+    text_channel_ids += [None] * (1 - len(text_channel_ids))
+    voice_channel_ids += [None] * (2 - len(voice_channel_ids))
+    match_channel, team0_voice_channel, team1_voice_channel = await asyncio.gather(
+        _pop_channel(guild, category, text_channel_ids[0], text_channel_name, False),
+        _pop_channel(guild, category, voice_channel_ids[0], team0_name, True),
+        _pop_channel(guild, category, voice_channel_ids[1], team1_name, True),
+    )
+    return match_channel, team0_voice_channel, team1_voice_channel
+
+
+async def pop_team_voice_channels(
+    session: sqlalchemy.orm.Session,
+    guild: Guild,
+    category: CategoryChannel,
+    team0_name: str,
+    team1_name: str,
+) -> tuple[VoiceChannel, VoiceChannel]:
+    """
+    Like pop_game_channels, for a game that only needs the two voice channels
+
+    :returns: the team0 voice channel and the team1 voice channel
+    """
+    _, voice_channel_ids = _claim_pooled_channel_ids(session, num_text=0)
+    voice_channel_ids += [None] * (2 - len(voice_channel_ids))
+    team0_voice_channel, team1_voice_channel = await asyncio.gather(
+        _pop_channel(guild, category, voice_channel_ids[0], team0_name, True),
+        _pop_channel(guild, category, voice_channel_ids[1], team1_name, True),
+    )
+    return team0_voice_channel, team1_voice_channel
+
+
+async def _release_channel(
+    guild: Guild, channel: discord.abc.GuildChannel, keep: bool
+) -> bool:
+    """
+    :returns: whether the channel was returned to the pool rather than deleted
+    """
+    if keep:
+        try:
+            if isinstance(channel, TextChannel):
+                # the next game shouldn't see this game's messages
+                await channel.purge(limit=None)
+            await channel.edit(overwrites=_idle_overwrites(guild))
+            return True
+        except Exception:
+            _log.exception(
+                f"[release_game_channels] Failed to return channel {channel.id} to the pool, deleting it instead"
+            )
+    await channel.delete()
+    return False
+
+
+async def _release_channels(
+    session: sqlalchemy.orm.Session,
+    guild: Guild | None,
+    ipg_channels: list[InProgressGameChannel],
+):
+    num_text, num_voice = _idle_counts(session)
+    channels: list[discord.abc.GuildChannel] = []
+    coroutines = []
+    for ipg_channel in ipg_channels:
+        session.delete(ipg_channel)
+        if not guild:
+            continue
+        channel: discord.abc.GuildChannel | None = guild.get_channel(
+            ipg_channel.channel_id
+        )
+        if not channel:
+            continue
+        keep = False
+        if isinstance(channel, TextChannel) and num_text < config.CHANNEL_POOL_SIZE:
+            keep = True
+            num_text += 1
+        elif (
+            isinstance(channel, VoiceChannel)
+            # deleting an occupied voice channel is what kicks stragglers out
+            and not channel.members
+            and num_voice < 2 * config.CHANNEL_POOL_SIZE
+        ):
+            keep = True
+            num_voice += 1
+        channels.append(channel)
+        coroutines.append(_release_channel(guild, channel, keep))
+
+    results = await asyncio.gather(*coroutines, return_exceptions=True)
+    for channel, result in zip(channels, results):
+        if isinstance(result, BaseException):
+            _log.error(
+                f"[release_game_channels] Failed to release channel {channel.id}: {result}"
+            )
+        elif result:
+            session.add(
+                PooledChannel(
+                    channel_id=channel.id,
+                    is_voice=isinstance(channel, VoiceChannel),
+                )
+            )
+
+
+async def release_game_channels(
+    session: sqlalchemy.orm.Session, guild: Guild | None, in_progress_game_id: str
+):
+    """
+    Hand the channels of a finished or cancelled game back to the pool. Channels
+    that don't fit in the pool are deleted. The caller must commit the session
+    """
+    ipg_channels: list[InProgressGameChannel] = (
+        session.query(InProgressGameChannel)
+        .filter(InProgressGameChannel.in_progress_game_id == in_progress_game_id)
+        .all()
+    )
+    await _release_channels(session, guild, ipg_channels)
+
+
+async def reconcile_channel_pool(category: CategoryChannel):
+    """
+    Bring the pool back in line with what actually exists in the guild. Meant to
+    be run once at startup to clean up after crashes and manual deletes
+    """
+    guild = category.guild
+    session: sqlalchemy.orm.Session
+    with Session() as session:
+        tracked_channel_ids: set[int] = set()
+        for pooled_channel in session.query(PooledChannel).all():
+            if guild.get_channel(pooled_channel.channel_id):
+                tracked_channel_ids.add(pooled_channel.channel_id)
+            else:
+                session.delete(pooled_channel)
+
+        # channels belonging to games that are gone, e.g. the bot went down
+        # between deleting the game and cleaning up its channels
+        orphaned_ipg_channels: list[InProgressGameChannel] = (
+            session.query(InProgressGameChannel)
+            .outerjoin(
+                InProgressGame,
+                InProgressGame.id == InProgressGameChannel.in_progress_game_id,
+            )
+            .filter(InProgressGame.id.is_(None))
+            .all()
+        )
+        if orphaned_ipg_channels:
+            _log.info(
+                f"[reconcile_channel_pool] Releasing {len(orphaned_ipg_channels)} orphaned game channels"
+            )
+            await _release_channels(session, guild, orphaned_ipg_channels)
+            session.flush()
+            tracked_channel_ids.update(
+                pooled_channel.channel_id
+                for pooled_channel in session.query(PooledChannel).all()
+            )
+
+        tracked_channel_ids.update(
+            ipg_channel.channel_id
+            for ipg_channel in session.query(InProgressGameChannel).all()
+        )
+        # pool channels that were created but never written to the database
+        for channel in category.channels:
+            if channel.id in tracked_channel_ids:
+                continue
+            if (
+                isinstance(channel, TextChannel)
+                and channel.name == IDLE_TEXT_CHANNEL_NAME
+            ) or (
+                isinstance(channel, VoiceChannel)
+                and channel.name == IDLE_VOICE_CHANNEL_NAME
+            ):
+                _log.info(f"[reconcile_channel_pool] Adopting channel {channel.id}")
+                session.add(
+                    PooledChannel(
+                        channel_id=channel.id,
+                        is_voice=isinstance(channel, VoiceChannel),
+                    )
+                )
+        session.commit()
+
+
+async def replenish_channel_pool(category: CategoryChannel):
+    """
+    Create idle channels until the pool is full, or delete the surplus if
+    CHANNEL_POOL_SIZE was lowered
+    """
+    guild = category.guild
+    session: sqlalchemy.orm.Session
+    with Session() as session:
+        num_text, num_voice = _idle_counts(session)
+        for is_voice, num_idle, target in [
+            (False, num_text, config.CHANNEL_POOL_SIZE),
+            (True, num_voice, 2 * config.CHANNEL_POOL_SIZE),
+        ]:
+            if num_idle > target:
+                surplus: list[PooledChannel] = (
+                    session.query(PooledChannel)
+                    .filter(PooledChannel.is_voice == is_voice)
+                    .order_by(PooledChannel.created_at.desc())
+                    .limit(num_idle - target)
+                    .all()
+                )
+                for pooled_channel in surplus:
+                    session.delete(pooled_channel)
+                    session.commit()
+                    channel = guild.get_channel(pooled_channel.channel_id)
+                    if channel:
+                        try:
+                            await channel.delete()
+                        except Exception:
+                            _log.exception(
+                                f"[replenish_channel_pool] Failed to delete channel {channel.id}"
+                            )
+            for _ in range(target - num_idle):
+                # one at a time and committed right away, this isn't urgent and
+                # the pool shouldn't lose track of a channel if the bot goes down
+                if is_voice:
+                    channel = await guild.create_voice_channel(
+                        IDLE_VOICE_CHANNEL_NAME,
+                        category=category,
+                        overwrites=_idle_overwrites(guild),
+                    )
+                else:
+                    channel = await guild.create_text_channel(
+                        IDLE_TEXT_CHANNEL_NAME,
+                        category=category,
+                        overwrites=_idle_overwrites(guild),
+                    )
+                session.add(PooledChannel(channel_id=channel.id, is_voice=is_voice))
+                session.commit()
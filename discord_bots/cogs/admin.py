@@ -1,8 +1,8 @@
 import logging
 import os
 import sys
-from datetime import datetime, timezone
-from shutil import copyfile
+import tempfile
+from datetime import datetime
 from sqlalchemy.orm.session import Session as SQLAlchemySession
 from typing import List, Literal
 
@@ -10,6 +10,7 @@ from discord import (
     app_commands,
     Colour,
     Embed,
+    File,
     Interaction,
     Member,
     Role,
@@ -18,9 +19,11 @@ from discord.ext.commands import Bot
 from discord.utils import escape_markdown
 
 import discord_bots.config as config
+from discord_bots import backup, db, dispatcher, export, sqlstats
 from discord_bots.bot import bot
 from discord_bots.checks import is_admin_app_command, is_command_channel
 from discord_bots.cogs.base import BaseCog
+from discord_bots.dispatcher import Priority
 from discord_bots.models import (
     AdminRole,
     CustomCommand,
@@ -34,11 +37,26 @@ from discord_bots.models import (
     QueueWaitlistPlayer,
     Session,
 )
-from discord_bots.utils import finished_game_str
+from discord_bots.generations import FINISHED_GAMES, bump_generation
+from discord_bots.leaderboard import update_leaderboard_games_played
+from discord_bots.player_pairs import update_player_pairs
+from discord_bots.player_stats import update_player_stats
+from discord_bots.utils import code_block, finished_game_str, print_leaderboard
 
 _log = logging.getLogger(__name__)
 
 
+def _get_player_teams(
+    session: SQLAlchemySession, finished_game_id: str
+) -> list[tuple[int | None, int]]:
+    return [
+        (player_id, team)
+        for player_id, team in session.query(
+            FinishedGamePlayer.player_id, FinishedGamePlayer.team
+        ).filter(FinishedGamePlayer.finished_game_id == finished_game_id)
+    ]
+
+
 class AdminCommands(BaseCog):
     def __init__(self, bot: Bot):
         super().__init__(bot)
@@ -239,28 +257,48 @@ class AdminCommands(BaseCog):
     @app_commands.check(is_admin_app_command)
     @app_commands.check(is_command_channel)
     async def createdbbackup(self, interaction: Interaction):
-        # Only functions for SQLite
-        # TODO: Covert to work for Postgres
+        await interaction.response.defer(ephemeral=True)
+        message = await interaction.followup.send(
+            embed=Embed(description="Backing up the database...", colour=Colour.blue()),
+            ephemeral=True,
+            wait=True,
+        )
 
-        # Check for Postgres URI
-        if config.DATABASE_URI:
-            await interaction.response.send_message(
+        async def on_progress(progress: backup.BackupProgress):
+            await dispatcher.edit(
+                message,
                 embed=Embed(
-                    description="This command does not support Postgres databases",
-                    colour=Colour.yellow(),
+                    description=f"Backing up the database... {progress}",
+                    colour=Colour.blue(),
                 ),
-                ephemeral=True
             )
+
+        async def report(embed: Embed):
+            try:
+                await dispatcher.edit(message, Priority.DEFAULT, embed=embed)
+            except Exception:
+                # the interaction expires after 15 minutes, long backups can
+                # outlast it
+                _log.exception("[createdbbackup] Failed to edit the reply")
+                await dispatcher.send(interaction.user, Priority.DEFAULT, embed=embed)
+
+        try:
+            result = await backup.create_backup(on_progress)
+        except backup.BackupError as e:
+            await report(Embed(description=f"Backup failed: {e}", colour=Colour.red()))
             return
-        
-        date_string = datetime.now(timezone.utc).strftime("%Y-%m-%d")
-        copyfile(f"{config.DB_NAME}.db", f"{config.DB_NAME}_{date_string}.db")
-        await interaction.response.send_message(
-            embed=Embed(
-                description=f"Backup made to {config.DB_NAME}_{date_string}.db",
+        except Exception:
+            _log.exception("[createdbbackup] Backup failed")
+            await report(Embed(description="Backup failed", colour=Colour.red()))
+            return
+        await report(
+            Embed(
+                description=(
+                    f"Backup made to {os.path.basename(result.path)} "
+                    f"({result.size / 1024 / 1024:.1f} MB in {result.seconds:.0f}s)"
+                ),
                 colour=Colour.green(),
-            ),
-            ephemeral=True,
+            )
         )
 
     @group.command(name="deletegame", description="Deletes a finished game")
@@ -284,6 +322,13 @@ class AdminCommands(BaseCog):
                     ephemeral=True,
                 )
                 return
+            player_teams = _get_player_teams(session, finished_game.id)
+            update_player_stats(session, finished_game, player_teams, sign=-1)
+            update_player_pairs(session, finished_game, player_teams, sign=-1)
+            update_leaderboard_games_played(
+                session, finished_game, player_teams, sign=-1
+            )
+            bump_generation(session, FINISHED_GAMES)
             session.query(FinishedGamePlayer).filter(
                 FinishedGamePlayer.finished_game_id == finished_game.id
             ).delete()
@@ -295,6 +340,8 @@ class AdminCommands(BaseCog):
                     colour=Colour.green(),
                 )
             )
+        # players may have dropped below the category's minimum games
+        await print_leaderboard()
 
     @group.command(
         name="delplayer", description="Admin command to delete player from all queues"
@@ -358,6 +405,82 @@ class AdminCommands(BaseCog):
             )
         )
 
+    @group.command(
+        name="dbstats",
+        description="Shows the queries run by each command and task since startup",
+    )
+    @app_commands.check(is_admin_app_command)
+    @app_commands.check(is_command_channel)
+    @app_commands.describe(reset="Start counting again from zero")
+    async def dbstats(self, interaction: Interaction, reset: bool = False):
+        stats_by_unit = sqlstats.get_stats()
+        if reset:
+            sqlstats.reset_stats()
+        if not stats_by_unit:
+            await interaction.response.send_message(
+                embed=Embed(description="No queries yet", colour=Colour.blue()),
+                ephemeral=True,
+            )
+            return
+
+        # most total database time first
+        units = sorted(
+            stats_by_unit.items(), key=lambda item: item[1].seconds, reverse=True
+        )
+        lines = ["name: runs, queries/run, ms/run, max queries, N+1 suspects"]
+        for name, stats in units[:15]:
+            runs = max(stats.units, 1)
+            lines.append(
+                f"{name}: {stats.units}, {stats.queries / runs:.1f}, {stats.seconds / runs * 1000:.1f}, {stats.max_queries}, {stats.n_plus_one_suspects}"
+            )
+        slowest = sorted(
+            (
+                (seconds, name, statement)
+                for name, stats in units
+                for seconds, statement in stats.slowest
+            ),
+            reverse=True,
+        )[:3]
+        slowest_lines = [
+            f"{seconds * 1000:.1f}ms in {name}: {statement[:200]}"
+            for seconds, name, statement in slowest
+        ]
+        embed = Embed(
+            title="Database queries",
+            description=code_block("\n".join(lines)),
+            colour=Colour.blue(),
+        )
+        embed.add_field(
+            name="Slowest statements",
+            # at most 3 * ~220 characters, within the 1024 field limit
+            value=code_block("\n\n".join(slowest_lines)),
+            inline=False,
+        )
+        if reset:
+            embed.set_footer(text="Stats reset")
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+    @group.command(
+        name="dispatchstats", description="Shows the outbound message queue metrics"
+    )
+    @app_commands.check(is_admin_app_command)
+    @app_commands.check(is_command_channel)
+    async def dispatchstats(self, interaction: Interaction):
+        stats = dispatcher.dispatcher.stats()
+        lines = []
+        for key, value in stats.items():
+            if isinstance(value, dict):
+                value = ", ".join(f"{k}: {v}" for k, v in value.items())
+            lines.append(f"{key}: {value}")
+        await interaction.response.send_message(
+            embed=Embed(
+                title="Outbound message queue",
+                description=code_block("\n".join(lines)),
+                colour=Colour.blue(),
+            ),
+            ephemeral=True,
+        )
+
     @group.command(name="editcommand", description="Edit a custom command")
     @app_commands.check(is_admin_app_command)
     @app_commands.check(is_command_channel)
@@ -419,6 +542,11 @@ class AdminCommands(BaseCog):
                     ephemeral=True,
                 )
                 return
+            # take the old outcome out of the stats, and put the new one in
+            player_teams = _get_player_teams(session, game.id)
+            update_player_stats(session, game, player_teams, sign=-1)
+            update_player_pairs(session, game, player_teams, sign=-1)
+            update_leaderboard_games_played(session, game, player_teams, sign=-1)
             outcome_lower = outcome.lower()
             if outcome_lower == "tie":
                 game.winning_team = -1
@@ -435,6 +563,10 @@ class AdminCommands(BaseCog):
                     ephemeral=True,
                 )
                 return
+            update_player_stats(session, game, player_teams)
+            update_player_pairs(session, game, player_teams)
+            update_leaderboard_games_played(session, game, player_teams)
+            bump_generation(session, FINISHED_GAMES)
 
             session.add(game)
             session.commit()
@@ -446,6 +578,85 @@ class AdminCommands(BaseCog):
             )
         )
 
+    @group.command(
+        name="exportgames",
+        description="Exports the match history, one row per player per game",
+    )
+    @app_commands.check(is_admin_app_command)
+    @app_commands.check(is_command_channel)
+    @app_commands.describe(
+        export_format="csv (gzipped) or parquet",
+        category="Only games in this category",
+        queue="Only games in this queue",
+        since="Only games that finished on or after this date, e.g. 2024-01-31",
+        until="Only games that finished before this date",
+        member="Only games this player was in",
+    )
+    async def exportgames(
+        self,
+        interaction: Interaction,
+        export_format: Literal["csv", "parquet"] = "csv",
+        category: str | None = None,
+        queue: str | None = None,
+        since: str | None = None,
+        until: str | None = None,
+        member: Member | None = None,
+    ):
+        try:
+            export_filter = export.ExportFilter(
+                category_name=category,
+                queue_name=queue,
+                since=datetime.fromisoformat(since) if since else None,
+                until=datetime.fromisoformat(until) if until else None,
+                player_ids=[member.id] if member else [],
+            )
+        except ValueError:
+            await interaction.response.send_message(
+                embed=Embed(
+                    description="Dates must look like 2024-01-31",
+                    colour=Colour.red(),
+                ),
+                ephemeral=True,
+            )
+            return
+        await interaction.response.defer(ephemeral=True)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(
+                directory, "match_history" + export.EXTENSIONS[export_format]
+            )
+            try:
+                progress = await db.read(
+                    export.export_match_history, path, export_format, export_filter
+                )
+            except export.ExportError as e:
+                await interaction.followup.send(
+                    embed=Embed(description=f"Export failed: {e}", colour=Colour.red()),
+                    ephemeral=True,
+                )
+                return
+            size = os.path.getsize(path)
+            if interaction.guild and size > interaction.guild.filesize_limit:
+                await interaction.followup.send(
+                    embed=Embed(
+                        description=(
+                            f"The export is {size / 1024 / 1024:.1f} MB, which is "
+                            "too big to upload. Narrow it down or run "
+                            "scripts/export_match_history.py instead"
+                        ),
+                        colour=Colour.red(),
+                    ),
+                    ephemeral=True,
+                )
+                return
+            await interaction.followup.send(
+                embed=Embed(
+                    description=f"Exported {progress.games} games ({progress.rows} rows)",
+                    colour=Colour.green(),
+                ),
+                file=File(path),
+                ephemeral=True,
+            )
+
     @group.command(name="remove", description="Remove an admin")
     @app_commands.check(is_admin_app_command)
     @app_commands.check(is_command_channel)
@@ -550,27 +761,10 @@ class AdminCommands(BaseCog):
     @app_commands.check(is_command_channel)
     @app_commands.describe(db_filename="Name of backup file")
     async def removedbbackup(self, interaction: Interaction, db_filename: str):
-        # Only functions for SQLite
-        # TODO: Covert to work for Postgres
-
-        # Check for Postgres URI
-        if config.DATABASE_URI:
-            await interaction.response.send_message(
-                embed=Embed(
-                    description="This command does not support Postgres databases",
-                    colour=Colour.yellow(),
-                ),
-                ephemeral=True
-            )
-            return
-
-        
-        if not db_filename.startswith(config.DB_NAME) or not db_filename.endswith(
-            ".db"
-        ):
+        if not backup.is_backup_filename(db_filename):
             await interaction.response.send_message(
                 embed=Embed(
-                    description=f"Filename must be of the format {config.DB_NAME}_{{date}}.db",
+                    description=f"{db_filename} is not a backup, see /list dbbackup",
                     colour=Colour.red(),
                 ),
                 ephemeral=True,
@@ -578,7 +772,7 @@ class AdminCommands(BaseCog):
             return
 
         try:
-            os.remove(db_filename)
+            os.remove(os.path.join(config.BACKUP_DIR, db_filename))
         except Exception as e:
             _log.exception(f"Caught Exception in removedbbackup: {e}")
             await interaction.response.send_message(
@@ -7,7 +7,13 @@ from sqlalchemy.orm.session import Session as SQLAlchemySession
 
 from discord_bots.checks import is_admin_app_command, is_command_channel
 from discord_bots.cogs.base import BaseCog
-from discord_bots.models import Category, PlayerCategoryTrueskill, Queue, Session
+from discord_bots.models import (
+    Category,
+    LeaderboardEntry,
+    PlayerCategoryTrueskill,
+    Queue,
+    Session,
+)
 from discord_bots.utils import default_sigma_decay_amount, build_category_str
 
 _log = logging.getLogger(__name__)
@@ -60,6 +66,9 @@ class CategoryCommands(BaseCog):
             session.query(PlayerCategoryTrueskill).filter(
                 category.id == PlayerCategoryTrueskill.category_id
             ).delete()
+            session.query(LeaderboardEntry).filter(
+                category.id == LeaderboardEntry.category_id
+            ).delete()
             session.delete(category)
             session.commit()
             await interaction.response.send_message(
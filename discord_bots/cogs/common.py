@@ -1,31 +1,25 @@
 import asyncio
 import logging
-from bisect import bisect
 from collections import defaultdict
-from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm.session import Session as SQLAlchemySession
 from table2ascii import Alignment, PresetStyle, table2ascii
-from trueskill import Rating
 from typing import List, Optional
 
 from discord import Colour, Embed, Interaction, Message, TextChannel, app_commands
 from discord.ext.commands import Bot
 
+from discord_bots import db
 from discord_bots.bot import bot
 from discord_bots.checks import is_command_channel
 from discord_bots.cogs.base import BaseCog
 from discord_bots.config import (
     DEFAULT_RAFFLE_VALUE,
-    DEFAULT_TRUESKILL_MU,
-    DEFAULT_TRUESKILL_SIGMA,
     ENABLE_RAFFLE,
     LEADERBOARD_CHANNEL,
     SHOW_TRUESKILL,
 )
 from discord_bots.models import (
     Category,
-    FinishedGame,
-    FinishedGamePlayer,
     InProgressGame,
     InProgressGamePlayer,
     Map,
@@ -37,6 +31,12 @@ from discord_bots.models import (
     RotationMap,
     Session,
 )
+from discord_bots.percentiles import get_top_ratio, percentile_label
+from discord_bots.read_models import (
+    STATS_WINDOWS,
+    WinLossTie,
+    get_player_windowed_results,
+)
 from discord_bots.utils import (
     MU_LOWER_UNICODE,
     SIGMA_LOWER_UNICODE,
@@ -51,6 +51,162 @@ from discord_bots.utils import (
 _log = logging.getLogger(__name__)
 
 
+def _build_stats_embeds(
+    session: SQLAlchemySession, player_id: int, category_name: str | None
+) -> list[Embed]:
+    """
+    Runs on a database reader thread, see db.read
+    """
+    player: Player | None = session.query(Player).filter(Player.id == player_id).first()
+    if not player:
+        # Edge case where user has no record in the Players table
+        return [
+            Embed(description="You have not played any games", colour=Colour.blue())
+        ]
+    if not player.stats_enabled:
+        return [Embed(description="You have disabled `/stats`", colour=Colour.blue())]
+
+    # every window of every category, see player_stats.py
+    windowed = get_player_windowed_results(session, player.id, group_by="category_name")
+    if not windowed:
+        return [
+            Embed(description="You have not played any games", colour=Colour.blue())
+        ]
+
+    trueskill_pct = percentile_label(
+        get_top_ratio(session, player.rated_trueskill_mu, player.rated_trueskill_sigma)
+    )
+
+    def win_rate(wins, losses, ties):
+        denominator = max(wins + losses + ties, 1)
+        return round(100 * (wins + 0.5 * ties) / denominator, 1)
+
+    def get_table_col(windows: List[WinLossTie] | None):
+        cols = []
+        if not windows:
+            windows = [WinLossTie(0, 0, 0)] * len(STATS_WINDOWS)
+        for num_days, counts in zip(STATS_WINDOWS, windows):
+            winrate = round(win_rate(*counts))
+            col = [
+                "Total" if num_days is None else f"{num_days}D",
+                counts.wins,
+                counts.losses,
+                counts.ties,
+                counts.total,
+                f"{winrate}%",
+            ]
+            cols.append(col)
+        return cols
+
+    embeds: list[Embed] = []
+    trueskill_url = (
+        "https://www.microsoft.com/en-us/research/project/trueskill-ranking-system/"
+    )
+    footer_text = "{}\n{}\n{}".format(
+        f"Rating = {MU_LOWER_UNICODE} - 3*{SIGMA_LOWER_UNICODE}",
+        f"{MU_LOWER_UNICODE} (mu) = your average Rating",
+        f"{SIGMA_LOWER_UNICODE} (sigma) = the uncertainity of your Rating",
+    )
+    cols = []
+    conditions = []
+    conditions.append(PlayerCategoryTrueskill.player_id == player.id)
+    if category_name:
+        conditions.append(Category.name == category_name)
+    player_category_trueskills: list[PlayerCategoryTrueskill] | None = (
+        session.query(PlayerCategoryTrueskill)
+        .join(Category)
+        .filter(*conditions)
+        .order_by(Category.name)
+        .all()
+    )
+    # assume that if a guild uses categories, they will use them exclusively, i.e., no mixing categorized and uncategorized queues
+    if player_category_trueskills:
+        num_pct = len(player_category_trueskills)
+        for i, pct in enumerate(player_category_trueskills):
+            category: Category | None = (
+                session.query(Category).filter(Category.id == pct.category_id).first()
+            )
+            if not category:
+                # should never happen
+                _log.error(
+                    f"No Category found for player_category_trueskill with id {pct.id}"
+                )
+                return [Embed(description="Could not find your stats")]
+            title = f"Stats for {category.name}"
+            description = ""
+            if category.is_rated and SHOW_TRUESKILL:
+                description = f"Rating: {round(pct.rank, 1)}"
+                description += f"\n{MU_LOWER_UNICODE}: {round(pct.mu, 1)}"
+                description += f"\n{SIGMA_LOWER_UNICODE}: {round(pct.sigma, 1)}"
+            else:
+                category_pct = percentile_label(
+                    get_top_ratio(session, pct.mu, pct.sigma, pct.category_id)
+                )
+                description = f"Rating: {category_pct}"
+
+            cols = get_table_col(windowed.get(category.name))
+            table = table2ascii(
+                header=["Last", "W", "L", "T", "Total", "WR"],
+                body=cols,
+                first_col_heading=True,
+                style=PresetStyle.plain,
+                alignments=[
+                    Alignment.LEFT,
+                    Alignment.DECIMAL,
+                    Alignment.DECIMAL,
+                    Alignment.DECIMAL,
+                    Alignment.DECIMAL,
+                    Alignment.RIGHT,
+                ],
+            )
+            description += code_block(table)
+            embed = Embed(title=title, description=description)
+            if i == (num_pct - 1):
+                description += f"\n{trueskill_url}"
+                embed.set_footer(text=footer_text)
+            embeds.append(embed)
+    if not player_category_trueskills:
+        # no categories defined, display their global trueskill stats
+        description = ""
+        if SHOW_TRUESKILL:
+            description = f"Rating: {round(player.rated_trueskill_mu - 3 * player.rated_trueskill_sigma, 2)}"
+            description += (
+                f"\n{MU_LOWER_UNICODE}: {round(player.rated_trueskill_mu, 1)}"
+            )
+            description += (
+                f"\n{SIGMA_LOWER_UNICODE}: {round(player.rated_trueskill_sigma, 1)}"
+            )
+        else:
+            description = f"Rating: {trueskill_pct}"
+        # every category added together
+        overall = [
+            sum(counts, WinLossTie(0, 0, 0)) for counts in zip(*windowed.values())
+        ]
+        cols = get_table_col(overall)
+        table = table2ascii(
+            header=["Period", "Wins", "Losses", "Ties", "Total", "Win %"],
+            body=cols,
+            first_col_heading=True,
+            style=PresetStyle.plain,
+            alignments=[
+                Alignment.LEFT,
+                Alignment.DECIMAL,
+                Alignment.DECIMAL,
+                Alignment.DECIMAL,
+                Alignment.DECIMAL,
+                Alignment.DECIMAL,
+            ],
+        )
+        description += code_block(table)
+        embed = Embed(
+            title="Overall Stats",
+            description=description,
+        )
+        embed.set_footer(text=footer_text)
+        embeds.append(embed)
+    return embeds
+
+
 class CommonCommands(BaseCog):
     def __init__(self, bot: Bot):
         super().__init__(bot)
@@ -254,271 +410,11 @@ class CommonCommands(BaseCog):
         """
         Replies to the user with their TrueSkill statistics. Can be used both inside and out of a Guild
         """
-        session: SQLAlchemySession
-        with Session() as session:
-            player: Player | None = (
-                session.query(Player).filter(Player.id == interaction.user.id).first()
-            )
-            if not player:
-                # Edge case where user has no record in the Players table
-                await interaction.response.send_message(
-                    embed=Embed(
-                        description="You have not played any games",
-                        colour=Colour.blue(),
-                    ),
-                    ephemeral=True,
-                )
-                return
-            if not player.stats_enabled:
-                await interaction.response.send_message(
-                    embed=Embed(
-                        description="You have disabled `/stats`",
-                        colour=Colour.blue(),
-                    ),
-                    ephemeral=True,
-                )
-                return
-
-            fgps: List[FinishedGamePlayer] | None = (
-                session.query(FinishedGamePlayer)
-                .filter(FinishedGamePlayer.player_id == player.id)
-                .all()
-            )
-            if not fgps:
-                await interaction.response.send_message(
-                    embed=Embed(
-                        description="You have not played any games",
-                        colour=Colour.blue(),
-                    ),
-                    ephemeral=True,
-                )
-                return
-
-            finished_game_ids: List[str] | None = [fgp.finished_game_id for fgp in fgps]
-            fgs: List[FinishedGame] | None = (
-                session.query(FinishedGame)
-                .filter(FinishedGame.id.in_(finished_game_ids))
-                .all()
-            )
-            if not fgs:
-                await interaction.response.send_message(
-                    embed=Embed(
-                        description="You have not played any games",
-                        colour=Colour.blue(),
-                    ),
-                    ephemeral=True,
-                )
-                session.close()
-                return
-
-            fgps_by_finished_game_id: dict[str, FinishedGamePlayer] = {
-                fgp.finished_game_id: fgp for fgp in fgps
-            }
-
-            players: list[Player] = session.query(Player).all()
-
-            default_rating = Rating()
-            # Filter players that haven't played a game
-            players = list(
-                filter(
-                    lambda x: (
-                        x.rated_trueskill_mu != default_rating.mu
-                        and x.rated_trueskill_sigma != default_rating.sigma
-                    )
-                    and (
-                        x.rated_trueskill_mu != DEFAULT_TRUESKILL_MU
-                        and x.rated_trueskill_sigma != DEFAULT_TRUESKILL_SIGMA
-                    ),
-                    players,
-                )
-            )
-            trueskills = list(
-                sorted(
-                    [
-                        round(p.rated_trueskill_mu - 3 * p.rated_trueskill_sigma, 2)
-                        for p in players
-                    ]
-                )
-            )
-            trueskill_index = bisect(
-                trueskills,
-                round(player.rated_trueskill_mu - 3 * player.rated_trueskill_sigma, 2),
-            )
-            trueskill_ratio = (len(trueskills) - trueskill_index) / (
-                len(trueskills) or 1
-            )
-            if trueskill_ratio <= 0.05:
-                trueskill_pct = "Top 5%"
-            elif trueskill_ratio <= 0.10:
-                trueskill_pct = "Top 10%"
-            elif trueskill_ratio <= 0.25:
-                trueskill_pct = "Top 25%"
-            elif trueskill_ratio <= 0.50:
-                trueskill_pct = "Top 50%"
-            elif trueskill_ratio <= 0.75:
-                trueskill_pct = "Top 75%"
-            else:
-                trueskill_pct = "Top 100%"
-
-            # all of this below can probably be done more gracefull with a pandas dataframe
-            def wins_losses_ties_last_ndays(
-                finished_games: List[FinishedGame], n: int = -1
-            ) -> tuple[list[FinishedGame], list[FinishedGame], list[FinishedGame]]:
-                if n == -1:
-                    # all finished games
-                    last_nfgs = finished_games
-                else:
-                    # last n
-                    last_nfgs = [
-                        fg
-                        for fg in finished_games
-                        if fg.finished_at.replace(tzinfo=timezone.utc)
-                        > datetime.now(timezone.utc) - timedelta(days=n)
-                    ]
-                wins = [
-                    fg
-                    for fg in last_nfgs
-                    if fg.winning_team == fgps_by_finished_game_id[fg.id].team
-                ]
-                losses = [
-                    fg
-                    for fg in last_nfgs
-                    if fg.winning_team != fgps_by_finished_game_id[fg.id].team
-                    and fg.winning_team != -1
-                ]
-                ties = [fg for fg in last_nfgs if fg.winning_team == -1]
-                return wins, losses, ties
-
-            def win_rate(wins, losses, ties):
-                denominator = max(wins + losses + ties, 1)
-                return round(100 * (wins + 0.5 * ties) / denominator, 1)
-
-            def get_table_col(games: List[FinishedGame]):
-                cols = []
-                for num_days in [7, 30, 90, 365, -1]:
-                    wins, losses, ties = wins_losses_ties_last_ndays(games, num_days)
-                    num_wins, num_losses, num_ties = len(wins), len(losses), len(ties)
-                    winrate = round(win_rate(num_wins, num_losses, num_ties))
-                    col = [
-                        "Total" if num_days == -1 else f"{num_days}D",
-                        len(wins),
-                        len(losses),
-                        len(ties),
-                        num_wins + num_losses + num_ties,
-                        f"{winrate}%",
-                    ]
-                    cols.append(col)
-                return cols
-
-            embeds: list[Embed] = []
-            trueskill_url = "https://www.microsoft.com/en-us/research/project/trueskill-ranking-system/"
-            footer_text = "{}\n{}\n{}".format(
-                f"Rating = {MU_LOWER_UNICODE} - 3*{SIGMA_LOWER_UNICODE}",
-                f"{MU_LOWER_UNICODE} (mu) = your average Rating",
-                f"{SIGMA_LOWER_UNICODE} (sigma) = the uncertainity of your Rating",
-            )
-            cols = []
-            conditions = []
-            conditions.append(PlayerCategoryTrueskill.player_id == player.id)
-            if category_name:
-                conditions.append(Category.name == category_name)
-            player_category_trueskills: list[PlayerCategoryTrueskill] | None = (
-                session.query(PlayerCategoryTrueskill)
-                .join(Category)
-                .filter(*conditions)
-                .order_by(Category.name)
-                .all()
-            )
-            # assume that if a guild uses categories, they will use them exclusively, i.e., no mixing categorized and uncategorized queues
-            if player_category_trueskills:
-                num_pct = len(player_category_trueskills)
-                for i, pct in enumerate(player_category_trueskills):
-                    category: Category | None = (
-                        session.query(Category)
-                        .filter(Category.id == pct.category_id)
-                        .first()
-                    )
-                    if not category:
-                        # should never happen
-                        _log.error(
-                            f"No Category found for player_category_trueskill with id {pct.id}"
-                        )
-                        await interaction.response.send_message(
-                            embed=Embed(description="Could not find your stats")
-                        )
-                        return
-                    title = f"Stats for {category.name}"
-                    description = ""
-                    if category.is_rated and SHOW_TRUESKILL:
-                        description = f"Rating: {round(pct.rank, 1)}"
-                        description += f"\n{MU_LOWER_UNICODE}: {round(pct.mu, 1)}"
-                        description += f"\n{SIGMA_LOWER_UNICODE}: {round(pct.sigma, 1)}"
-                    else:
-                        description = f"Rating: {trueskill_pct}"
-
-                    category_games = [
-                        game
-                        for game in fgs
-                        if game.category_name and category.name == game.category_name
-                    ]
-                    cols = get_table_col(category_games)
-                    table = table2ascii(
-                        header=["Last", "W", "L", "T", "Total", "WR"],
-                        body=cols,
-                        first_col_heading=True,
-                        style=PresetStyle.plain,
-                        alignments=[
-                            Alignment.LEFT,
-                            Alignment.DECIMAL,
-                            Alignment.DECIMAL,
-                            Alignment.DECIMAL,
-                            Alignment.DECIMAL,
-                            Alignment.RIGHT,
-                        ],
-                    )
-                    description += code_block(table)
-                    embed = Embed(title=title, description=description)
-                    if i == (num_pct - 1):
-                        description += f"\n{trueskill_url}"
-                        embed.set_footer(text=footer_text)
-                    embeds.append(embed)
-            if not player_category_trueskills:
-                # no categories defined, display their global trueskill stats
-                description = ""
-                if SHOW_TRUESKILL:
-                    description = f"Rating: {round(player.rated_trueskill_mu - 3 * player.rated_trueskill_sigma, 2)}"
-                    description += (
-                        f"\n{MU_LOWER_UNICODE}: {round(player.rated_trueskill_mu, 1)}"
-                    )
-                    description += f"\n{SIGMA_LOWER_UNICODE}: {round(player.rated_trueskill_sigma, 1)}"
-                else:
-                    description = f"Rating: {trueskill_pct}"
-                cols = get_table_col(fgs)
-                table = table2ascii(
-                    header=["Period", "Wins", "Losses", "Ties", "Total", "Win %"],
-                    body=cols,
-                    first_col_heading=True,
-                    style=PresetStyle.plain,
-                    alignments=[
-                        Alignment.LEFT,
-                        Alignment.DECIMAL,
-                        Alignment.DECIMAL,
-                        Alignment.DECIMAL,
-                        Alignment.DECIMAL,
-                        Alignment.DECIMAL,
-                    ],
-                )
-                description += code_block(table)
-                embed = Embed(
-                    title="Overall Stats",
-                    description=description,
-                )
-                embed.set_footer(text=footer_text)
-                embeds.append(embed)
-            try:
-                await interaction.response.send_message(embeds=embeds, ephemeral=True)
-            except Exception:
-                _log.exception(f"Caught exception trying to send stats message")
+        embeds = await db.read(_build_stats_embeds, interaction.user.id, category_name)
+        try:
+            await interaction.response.send_message(embeds=embeds, ephemeral=True)
+        except Exception:
+            _log.exception(f"Caught exception trying to send stats message")
 
     """
     @app_commands.command(name="status", description="Display queue status")
@@ -1,4 +1,7 @@
+import asyncio
 import logging
+from collections import defaultdict
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
 from operator import itemgetter
 from pytz import utc
@@ -16,13 +19,13 @@ from discord import (
     Message,
     TextChannel,
     TextStyle,
-    VoiceChannel,
 )
 from discord.ext.commands import Bot
 from discord.member import Member
 from discord.ui import Button, Modal, TextInput, View
 from discord.utils import get
 
+from discord_bots import db, dispatcher
 from discord_bots.bot import bot
 from discord_bots.checks import (
     economy_enabled,
@@ -44,16 +47,165 @@ from discord_bots.models import (
     EconomyTransaction,
     FinishedGame,
     InProgressGame,
-    InProgressGameChannel,
     InProgressGamePlayer,
     Player,
     Queue,
     Session,
 )
+from discord_bots.settlement import (
+    compute_payouts,
+    compute_refunds,
+    settle_predictions,
+)
 from discord_bots.utils import short_uuid
+from discord_bots.uuid_storage import id_startswith
 
 _log = logging.getLogger(__name__)
 
+# How long to wait for more predictions before editing the prediction embed
+PREDICTION_EMBED_DEBOUNCE_SECONDS = 2
+
+
+@dataclass
+class PredictionTotals:
+    """
+    Running totals of the predictions on an in progress game, so that the
+    prediction embed can be redrawn without going back to the database
+    """
+
+    team0_total: int = 0
+    team1_total: int = 0
+    team0_predictors: set[int] = field(default_factory=set)
+    team1_predictors: set[int] = field(default_factory=set)
+
+    def add(self, prediction: EconomyPrediction):
+        if prediction.team == 0:
+            self.team0_total += prediction.prediction_value
+            self.team0_predictors.add(prediction.player_id)
+        else:
+            self.team1_total += prediction.prediction_value
+            self.team1_predictors.add(prediction.player_id)
+
+    def field_values(self) -> tuple[str, str]:
+        team0_ratio = "1.0"
+        team1_ratio = "1.0"
+        total = self.team0_total + self.team1_total
+        if not total == 0:
+            if not self.team0_total == 0:
+                team0_ratio = f"{round(1/(self.team0_total / total), 1)}"
+            if not self.team1_total == 0:
+                team1_ratio = f"{round(1/(self.team1_total / total), 1)}"
+        return (
+            f"> Total: {self.team0_total}\n> Win Ratio: 1:{team0_ratio}\n> Predictors: {len(self.team0_predictors)}",
+            f"> Total: {self.team1_total}\n> Win Ratio: 1:{team1_ratio}\n> Predictors: {len(self.team1_predictors)}",
+        )
+
+
+# keyed by in_progress_game id
+_prediction_totals: dict[str, PredictionTotals] = {}
+_prediction_embed_tasks: dict[str, asyncio.Task] = {}
+
+
+def get_prediction_totals(game_id: str) -> PredictionTotals:
+    totals = _prediction_totals.get(game_id)
+    if totals is None:
+        # not cached yet, e.g. the bot restarted while predictions were open
+        totals = PredictionTotals()
+        session: SQLAlchemySession
+        with Session() as session:
+            predictions: list[EconomyPrediction] = (
+                session.query(EconomyPrediction)
+                .filter(EconomyPrediction.in_progress_game_id == game_id)
+                .all()
+            )
+            for prediction in predictions:
+                totals.add(prediction)
+        _prediction_totals[game_id] = totals
+    return totals
+
+
+def record_prediction(prediction: EconomyPrediction, game: InProgressGame):
+    """
+    Add a committed prediction to the running totals and schedule an update of
+    the game's prediction embed
+    """
+    if prediction.in_progress_game_id in _prediction_totals:
+        _prediction_totals[prediction.in_progress_game_id].add(prediction)
+    else:
+        # loading from the database already includes this prediction
+        get_prediction_totals(prediction.in_progress_game_id)
+    schedule_prediction_embed_update(game)
+
+
+def forget_prediction_totals(game_id: str):
+    _prediction_totals.pop(game_id, None)
+    task = _prediction_embed_tasks.pop(game_id, None)
+    if task:
+        task.cancel()
+
+
+def create_prediction_embed(
+    game_id: str, team0_name: str, team1_name: str, totals: PredictionTotals
+) -> Embed:
+    team0_value, team1_value = totals.field_values()
+    embed = Embed(
+        title=f"Game {short_uuid(game_id)} Prediction",
+        colour=Colour.blue(),
+    )
+    embed.add_field(name=f"{team0_name}", value=team0_value, inline=True)
+    embed.add_field(name=f"{team1_name}", value=team1_value, inline=True)
+    return embed
+
+
+def schedule_prediction_embed_update(game: InProgressGame):
+    """
+    Debounced, a burst of predictions results in a single edit
+    """
+    if not game.prediction_message_id or not game.channel_id:
+        return
+    task = _prediction_embed_tasks.get(game.id)
+    if task and not task.done():
+        # the pending update will pick up the latest totals
+        return
+    _prediction_embed_tasks[game.id] = asyncio.create_task(
+        _update_prediction_embed(
+            game.id,
+            game.team0_name,
+            game.team1_name,
+            game.channel_id,
+            game.prediction_message_id,
+        )
+    )
+
+
+async def _update_prediction_embed(
+    game_id: str,
+    team0_name: str,
+    team1_name: str,
+    channel_id: int,
+    message_id: int,
+):
+    await asyncio.sleep(PREDICTION_EMBED_DEBOUNCE_SECONDS)
+    # anything recorded from here on needs another update
+    _prediction_embed_tasks.pop(game_id, None)
+    totals = _prediction_totals.get(game_id)
+    if totals is None:
+        # resolved or cancelled in the meantime
+        return
+    channel = bot.get_channel(channel_id)
+    if not isinstance(channel, TextChannel):
+        return
+    try:
+        # the embed is rebuilt from the totals, so there's no need to fetch the message
+        await dispatcher.edit(
+            channel.get_partial_message(message_id),
+            embed=create_prediction_embed(game_id, team0_name, team1_name, totals),
+        )
+    except Exception:
+        _log.exception(
+            f"[update_prediction_embed] Failed to edit prediction message {message_id} for game {game_id}"
+        )
+
 
 class EconomyCommands(BaseCog):
     def __init__(self, bot: Bot) -> None:
@@ -220,36 +372,23 @@ class EconomyCommands(BaseCog):
         with Session() as session:
             predictions: list[EconomyPrediction] = (
                 session.query(EconomyPrediction)
-                .filter(EconomyPrediction.in_progress_game_id.startswith(game_id))
+                .filter(id_startswith(EconomyPrediction.in_progress_game_id, game_id))
                 .all()
             )
 
             if len(predictions) == 0:
                 raise ValueError(f"No Predictions on game {game_id}")
 
-            for prediction in predictions:
-                try:
-                    await EconomyCommands.create_transaction(
-                        prediction.in_progress_game,
-                        prediction.player,
-                        prediction.prediction_value,
-                        prediction,
-                    )
-                except Exception:
-                    _log.exception(
-                        f"Exception while refunding prediction {prediction.id} for game {game_id}"
-                    )
-                    raise
-                else:
-                    player: Player | None = (
-                        session.query(Player)
-                        .filter(Player.id == prediction.player_id)
-                        .first()
-                    )
-                    player.currency += prediction.prediction_value
-                    prediction.cancelled = True
-                    session.delete(prediction)
-                    session.commit()
+            try:
+                await db.run(
+                    settle_predictions, compute_refunds(predictions), refund=True
+                )
+            except Exception:
+                _log.exception(
+                    f"Exception while refunding predictions for game {game_id}"
+                )
+                raise
+            forget_prediction_totals(game_id)
 
     async def close_predictions(self, in_progress_games: list[InProgressGame]):
         session: SQLAlchemySession
@@ -277,20 +416,12 @@ class EconomyCommands(BaseCog):
         if not ECONOMY_ENABLED:
             return None
 
-        short_game_id: str = short_uuid(in_progress_game.id)
-        embed = Embed(
-            title=f"Game {short_game_id} Prediction",
-            colour=Colour.blue(),
-        )
-        embed.add_field(
-            name=f"{in_progress_game.team0_name}",
-            value="> Total: 0\n> Win Ratio: 1:1.0\n> Predictors: 0",
-            inline=True,
-        )
-        embed.add_field(
-            name=f"{in_progress_game.team1_name}",
-            value="> Total: 0\n> Win Ratio: 1:1.0\n> Predictors: 0",
-            inline=True,
+        _prediction_totals[in_progress_game.id] = PredictionTotals()
+        embed = create_prediction_embed(
+            in_progress_game.id,
+            in_progress_game.team0_name,
+            in_progress_game.team1_name,
+            _prediction_totals[in_progress_game.id],
         )
 
         try:
@@ -345,7 +476,7 @@ class EconomyCommands(BaseCog):
         source: EconomyDonation | EconomyPrediction | str,
     ):
         session: SQLAlchemySession
-        with Session() as session:
+        with db.UnitOfWork() as session:
             if not ECONOMY_ENABLED:
                 raise Exception("Player economy is disabled")
             if not source_account:
@@ -431,8 +562,9 @@ class EconomyCommands(BaseCog):
                 )
             )
 
+            # committed by whoever started the unit of work, see db.UnitOfWork
             try:
-                session.commit()
+                session.flush()
             except IntegrityError:
                 _log.exception("integrity error?")
                 session.rollback()
@@ -569,6 +701,7 @@ class EconomyCommands(BaseCog):
                 else:
                     game_id = in_progress_game.id
 
+            forget_prediction_totals(in_progress_game.id)
             # Embed created with player award at index 0
             embed: Embed = await EconomyCommands.award_currency(
                 self, interaction, in_progress_game
@@ -662,76 +795,26 @@ class EconomyCommands(BaseCog):
                             )
                             pass
                     else:
-                        winning_total: int = sum(
-                            wt.prediction_value for wt in winning_predictions
-                        )
-                        losing_total: int = sum(
-                            lt.prediction_value for lt in losing_predictions
-                        )
-
-                        # Initialize dictionary for summing return messages
-                        summed_winners: dict = dict()
-                        summed_losers: dict = dict()
-
-                        for losing_prediction in losing_predictions:
-                            if any(
-                                x == losing_prediction.player_id
-                                for x in iter(summed_losers.keys())
-                            ):
-                                summed_losers[
-                                    losing_prediction.player_id
-                                ] += losing_prediction.prediction_value
-                            else:
-                                summed_losers[losing_prediction.player_id] = (
-                                    losing_prediction.prediction_value
-                                )
-
-                        for winning_prediction in winning_predictions:
-                            win_value: int = round(
-                                (winning_total + losing_total)
-                                * (winning_prediction.prediction_value / winning_total),
-                                None,
+                        results = compute_payouts(predictions, winning_team)
+                        summed_winners: dict[int, int] = defaultdict(int)
+                        try:
+                            await db.run(settle_predictions, results.payouts)
+                        except Exception as e:
+                            _log.exception(
+                                f"Exception while resolving predictions for game {game_id}"
                             )
-
-                            try:
-                                await EconomyCommands.create_transaction(
-                                    winning_prediction.in_progress_game,
-                                    winning_prediction.player,
-                                    win_value,
-                                    winning_prediction,
-                                )
-                            except Exception as e:
-                                embed.insert_field_at(
-                                    index=0,
-                                    name="",
-                                    value=f"Prediction resolution failed for <@{winning_prediction.player_id}> | Win Value = {win_value} | Exception: {e}",
-                                    inline=False,
-                                )
-                                pass
-                            else:
-                                player: Player | None = (
-                                    session.query(Player)
-                                    .filter(Player.id == winning_prediction.player_id)
-                                    .first()
-                                )
-                                player.currency += win_value
-                                winning_prediction.is_correct = True
-                                session.commit()
-
-                                # Adds win_value to player in dictionary, or creates new dict item
-                                # Combines multiple predictions into one win value to be returned
-                                # Mutliple transactions are still created (one per prediction)
-                                if any(
-                                    x == winning_prediction.player_id
-                                    for x in iter(summed_winners.keys())
-                                ):
-                                    summed_winners[
-                                        winning_prediction.player_id
-                                    ] += win_value
-                                else:
-                                    summed_winners[winning_prediction.player_id] = (
-                                        win_value
-                                    )
+                            embed.insert_field_at(
+                                index=0,
+                                name="",
+                                value=f"Prediction resolution failed | Exception: {e}",
+                                inline=False,
+                            )
+                        else:
+                            # Combines multiple predictions into one win value to be returned
+                            # Mutliple transactions are still created (one per prediction)
+                            for payout in results.payouts:
+                                summed_winners[payout.player_id] += payout.value
+                        summed_losers = results.losses
 
                         sorted_winners: dict = dict(
                             reversed(sorted(summed_winners.items(), key=itemgetter(1)))
@@ -810,74 +893,6 @@ class EconomyCommands(BaseCog):
                     ephemeral=True,
                 )
 
-    async def update_embeds(self, in_progress_games: list[InProgressGame]):
-        session: SQLAlchemySession
-        with Session() as session:
-            for game in in_progress_games:
-                if not game.prediction_message_id:
-                    continue
-                igp_channels: list[InProgressGameChannel] = (
-                    session.query(InProgressGameChannel)
-                    .filter(InProgressGameChannel.in_progress_game_id == game.id)
-                    .all()
-                )
-                for igp_channel in igp_channels:
-                    channel: TextChannel | VoiceChannel = bot.get_channel(
-                        igp_channel.channel_id
-                    )
-                    if type(channel) == TextChannel:
-                        message: Message = channel.get_partial_message(
-                            game.prediction_message_id
-                        )
-                        if message:
-                            message = await message.fetch()
-                        else:
-                            message = await channel.fetch_message(
-                                game.prediction_message_id
-                            )
-
-                        predictions: list[EconomyPrediction] = (
-                            session.query(EconomyPrediction)
-                            .filter(EconomyPrediction.in_progress_game_id == game.id)
-                            .all()
-                        )
-
-                        team0_total: int = 0
-                        team0_predictors: list[str] = []
-                        team1_total: int = 0
-                        team1_predictors: list[str] = []
-                        for prediction in predictions:
-                            if prediction.team == 0:
-                                team0_total += prediction.prediction_value
-                                if not prediction.player_id in team0_predictors:
-                                    team0_predictors.append(prediction.player_id)
-                            else:
-                                team1_total += prediction.prediction_value
-                                if not prediction.player_id in team1_predictors:
-                                    team1_predictors.append(prediction.player_id)
-
-                        team0_ratio = "1.0"
-                        team1_ratio = "1.0"
-                        if not team0_total + team1_total == 0:
-                            if not team0_total == 0:
-                                team0_ratio = f"{round(1/(team0_total / (team0_total + team1_total)), 1)}"
-                            if not team1_total == 0:
-                                team1_ratio = f"{round(1/(team1_total / (team1_total + team0_total)), 1)}"
-
-                        embed: Embed = message.embeds[0]
-                        embed.set_field_at(
-                            index=0,
-                            name=embed.fields[0].name,
-                            value=f"> Total: {team0_total}\n> Win Ratio: 1:{team0_ratio}\n> Predictors: {len(team0_predictors)}",
-                        )
-                        embed.set_field_at(
-                            index=1,
-                            name=embed.fields[1].name,
-                            value=f"> Total: {team1_total}\n> Win Ratio: 1:{team1_ratio}\n> Predictors: {len(team1_predictors)}",
-                        )
-
-                        await message.edit(embed=embed)
-
 
 class EconomyPredictionView(View):
     def __init__(self, game_id: str):
@@ -924,7 +939,7 @@ class EconomyPredictionView(View):
         with Session() as session:
             game: InProgressGame | None = (
                 session.query(InProgressGame)
-                .filter(InProgressGame.id.startswith(self.game_id))
+                .filter(id_startswith(InProgressGame.id, self.game_id))
                 .first()
             )
             self.game = game
@@ -1110,6 +1125,15 @@ class EconomyPredictionModal(Modal):
                 return
             else:
                 sender.currency -= self.value
+                # self.game can be older than the prediction message, so it may
+                # not have the prediction_message_id yet
+                game: InProgressGame | None = (
+                    session.query(InProgressGame)
+                    .filter(InProgressGame.id == self.game.id)
+                    .first()
+                )
+                if game:
+                    record_prediction(prediction, game)
                 await interaction.followup.send(
                     embed=Embed(
                         description=f"<@{sender.id}> predicted {self.team_name} for {self.value} {CURRENCY_NAME}",
@@ -24,17 +24,19 @@ from discord.ui import Button, button
 from sqlalchemy.orm.session import Session as SQLAlchemySession
 from trueskill import Rating, rate
 
-from discord_bots import config
+from discord_bots import config, db, dispatcher
+from discord_bots.channel_pool import release_game_channels
 from discord_bots.checks import is_admin_app_command, is_command_channel
 from discord_bots.cogs.base import BaseView
 from discord_bots.cogs.confirmation import ConfirmationView
 from discord_bots.cogs.economy import EconomyCommands
+from discord_bots.dispatcher import Priority
+from discord_bots.leaderboard import update_leaderboard_entries
 from discord_bots.models import (
     Category,
     FinishedGame,
     FinishedGamePlayer,
     InProgressGame,
-    InProgressGameChannel,
     InProgressGamePlayer,
     Map,
     Player,
@@ -45,6 +47,14 @@ from discord_bots.models import (
     RotationMap,
     Session,
 )
+from discord_bots.percentiles import update_rating_percentiles
+from discord_bots.player_pairs import update_player_pairs
+from discord_bots.player_stats import update_player_stats
+from discord_bots.read_models import (
+    get_archived_finished_game_summary,
+    get_finished_game_player_names,
+    get_recent_finished_game_summaries,
+)
 from discord_bots.utils import (
     create_cancelled_game_embed,
     create_finished_game_embed,
@@ -63,7 +73,9 @@ from discord_bots.utils import (
     get_n_best_teams,
     get_n_worst_teams,
     mock_teams_str,
+    render_finished_game_embed,
 )
+from discord_bots.uuid_storage import id_startswith
 
 if TYPE_CHECKING:
     from discord.ext.commands import Bot
@@ -73,6 +85,293 @@ _log = logging.getLogger(__name__)
 _lock = asyncio.Lock()
 
 
+def _record_finished_game(
+    session: SQLAlchemySession, in_progress_game_id: str, winning_team: int
+) -> tuple[str | None, str | None]:
+    """
+    Rate the players and store the finished game. Runs on the database thread,
+    see db.run
+
+    :returns: the id of the finished game, or an error to show the user
+    """
+    in_progress_game: InProgressGame = (
+        session.query(InProgressGame)
+        .filter(InProgressGame.id == in_progress_game_id)
+        .one()
+    )
+    queue: Queue | None = (
+        session.query(Queue).filter(Queue.id == in_progress_game.queue_id).first()
+    )
+    if not queue:
+        # should never happen
+        _log.error(
+            f"Could not find queue with id {in_progress_game.queue_id} for in_progress_game with id {in_progress_game.id}"
+        )
+        return None, "Oops, something went wrong...☹️️"
+
+    players = (
+        session.query(Player)
+        .join(InProgressGamePlayer)
+        .filter(
+            InProgressGamePlayer.player_id == Player.id,
+            InProgressGamePlayer.in_progress_game_id == in_progress_game.id,
+        )
+    ).all()
+    player_ids: list[str] = [player.id for player in players]
+    players_by_id: dict[int, Player] = {player.id: player for player in players}
+    player_category_trueskills_by_id: dict[int, PlayerCategoryTrueskill] = {}
+    if queue.category_id:
+        player_category_trueskills: list[PlayerCategoryTrueskill] = (
+            session.query(PlayerCategoryTrueskill)
+            .filter(
+                PlayerCategoryTrueskill.player_id.in_(player_ids),
+                PlayerCategoryTrueskill.category_id == queue.category_id,
+            )
+            .all()
+        )
+        player_category_trueskills_by_id = {
+            pct.player_id: pct for pct in player_category_trueskills
+        }
+    in_progress_game_players = (
+        session.query(InProgressGamePlayer)
+        .filter(InProgressGamePlayer.in_progress_game_id == in_progress_game.id)
+        .all()
+    )
+    team0_rated_ratings_before = []
+    team1_rated_ratings_before = []
+    team0_players: list[InProgressGamePlayer] = []
+    team1_players: list[InProgressGamePlayer] = []
+    for in_progress_game_player in in_progress_game_players:
+        player = players_by_id[in_progress_game_player.player_id]
+        if in_progress_game_player.team == 0:
+            team0_players.append(in_progress_game_player)
+            if player.id in player_category_trueskills_by_id:
+                pct = player_category_trueskills_by_id[player.id]
+                team0_rated_ratings_before.append(Rating(pct.mu, pct.sigma))
+            else:
+                team0_rated_ratings_before.append(
+                    Rating(player.rated_trueskill_mu, player.rated_trueskill_sigma)
+                )
+        else:
+            team1_players.append(in_progress_game_player)
+            if player.id in player_category_trueskills_by_id:
+                pct = player_category_trueskills_by_id[player.id]
+                team1_rated_ratings_before.append(Rating(pct.mu, pct.sigma))
+            else:
+                team1_rated_ratings_before.append(
+                    Rating(player.rated_trueskill_mu, player.rated_trueskill_sigma)
+                )
+
+    if queue.category_id:
+        category: Category | None = (
+            session.query(Category).filter(Category.id == queue.category_id).first()
+        )
+        if category:
+            category_name = category.name
+        else:
+            # should never happen
+            _log.error(
+                f"Could not find category with id {queue.category_id} for queue with id {queue.id}"
+            )
+            return None, "Something went wrong, please contact the server owner"
+    else:
+        category_name = None
+
+    game_finished_at = datetime.now(timezone.utc)
+    finished_game = FinishedGame(
+        average_trueskill=in_progress_game.average_trueskill,
+        finished_at=game_finished_at,
+        game_id=in_progress_game.id,
+        is_rated=queue.is_rated,
+        map_full_name=in_progress_game.map_full_name,
+        map_short_name=in_progress_game.map_short_name,
+        queue_name=queue.name,
+        category_name=category_name,
+        started_at=in_progress_game.created_at,
+        team0_name=in_progress_game.team0_name,
+        team1_name=in_progress_game.team1_name,
+        win_probability=in_progress_game.win_probability,
+        winning_team=winning_team,
+    )
+    session.add(finished_game)
+
+    result = None
+    if winning_team == -1:
+        result = [0, 0]
+    elif winning_team == 0:
+        result = [0, 1]
+    elif winning_team == 1:
+        result = [1, 0]
+
+    team0_rated_ratings_after: list[Rating]
+    team1_rated_ratings_after: list[Rating]
+    if len(players) > 1:
+        team0_rated_ratings_after, team1_rated_ratings_after = rate(
+            [team0_rated_ratings_before, team1_rated_ratings_before], result
+        )
+    else:
+        # Mostly useful for creating solo queues for testing, no real world
+        # application
+        team0_rated_ratings_after, team1_rated_ratings_after = (
+            team0_rated_ratings_before,
+            team1_rated_ratings_before,
+        )
+
+    updated_pcts: list[PlayerCategoryTrueskill] = []
+
+    def update_ratings(
+        team_players: list[InProgressGamePlayer],
+        ratings_before: list[Rating],
+        ratings_after: list[Rating],
+        game_finished_at: datetime,
+    ):
+        for i, team_gip in enumerate(team_players):
+            player = players_by_id[team_gip.player_id]
+            finished_game_player = FinishedGamePlayer(
+                finished_game_id=finished_game.id,
+                player_id=player.id,
+                player_name=player.name,
+                team=team_gip.team,
+                rated_trueskill_mu_before=ratings_before[i].mu,
+                rated_trueskill_sigma_before=ratings_before[i].sigma,
+                rated_trueskill_mu_after=ratings_after[i].mu,
+                rated_trueskill_sigma_after=ratings_after[i].sigma,
+            )
+            trueskill_rating = ratings_after[i]
+            # Regardless of category, always update the master trueskill. That way
+            # when we create new categories off of it the data isn't completely
+            # stale
+            player.rated_trueskill_mu = trueskill_rating.mu
+            player.rated_trueskill_sigma = trueskill_rating.sigma
+            if player.id in player_category_trueskills_by_id:
+                pct = player_category_trueskills_by_id[player.id]
+                pct.mu = trueskill_rating.mu
+                pct.sigma = trueskill_rating.sigma
+                pct.rank = trueskill_rating.mu - 3 * trueskill_rating.sigma
+                pct.last_game_finished_at = game_finished_at
+            else:
+                pct = PlayerCategoryTrueskill(
+                    player_id=player.id,
+                    category_id=queue.category_id,
+                    mu=trueskill_rating.mu,
+                    sigma=trueskill_rating.sigma,
+                    rank=trueskill_rating.mu - 3 * trueskill_rating.sigma,
+                    last_game_finished_at=game_finished_at,
+                )
+                session.add(pct)
+            updated_pcts.append(pct)
+            session.add(finished_game_player)
+
+    update_ratings(
+        team0_players,
+        team0_rated_ratings_before,
+        team0_rated_ratings_after,
+        game_finished_at,
+    )
+    update_ratings(
+        team1_players,
+        team1_rated_ratings_before,
+        team1_rated_ratings_after,
+        game_finished_at,
+    )
+    if queue.category_id:
+        update_leaderboard_entries(session, updated_pcts, in_progress_game.created_at)
+    player_teams = [(gip.player_id, gip.team) for gip in team0_players + team1_players]
+    update_player_stats(session, finished_game, player_teams)
+    update_player_pairs(session, finished_game, player_teams)
+    # read before the commit expires them
+    category_ratings = [(pct.player_id, pct.mu, pct.sigma) for pct in updated_pcts]
+    ratings = [
+        (player.id, player.rated_trueskill_mu, player.rated_trueskill_sigma)
+        for player in players
+    ]
+    session.commit()  # temporary solution until the foreign key constraint is resolved on EconomyPredictions/EconomyTransactions
+    if queue.category_id:
+        update_rating_percentiles(category_ratings, queue.category_id)
+    update_rating_percentiles(ratings)
+    return finished_game.id, None
+
+
+def _close_in_progress_game(
+    session: SQLAlchemySession,
+    in_progress_game_id: str,
+    finished_game_id: str,
+    guild_id: int | None,
+):
+    """
+    Mark the game as finished, start the re-add waitlist and hand out raffle
+    tickets. Runs on the database thread, see db.run
+    """
+    in_progress_game: InProgressGame = (
+        session.query(InProgressGame)
+        .filter(InProgressGame.id == in_progress_game_id)
+        .one()
+    )
+    players: list[Player] = (
+        session.query(Player)
+        .join(InProgressGamePlayer)
+        .filter(InProgressGamePlayer.in_progress_game_id == in_progress_game.id)
+        .all()
+    )
+    session.query(InProgressGamePlayer).filter(
+        InProgressGamePlayer.in_progress_game_id == in_progress_game.id
+    ).delete()
+    in_progress_game.is_finished = True
+    session.add(
+        QueueWaitlist(
+            channel_id=config.CHANNEL_ID,  # not sure about this column and what it's used for
+            finished_game_id=finished_game_id,
+            in_progress_game_id=in_progress_game.id,
+            guild_id=guild_id,
+            queue_id=in_progress_game.queue_id,
+            end_waitlist_at=datetime.now(timezone.utc)
+            + timedelta(seconds=config.RE_ADD_DELAY),
+        )
+    )
+
+    # Reward raffle tickets
+    reward = (
+        session.query(RotationMap.raffle_ticket_reward)
+        .join(Map, Map.id == RotationMap.map_id)
+        .join(Rotation, Rotation.id == RotationMap.rotation_id)
+        .join(Queue, Queue.rotation_id == Rotation.id)
+        .filter(Map.short_name == in_progress_game.map_short_name)
+        .filter(Queue.id == in_progress_game.queue_id)
+        .scalar()
+    )
+    if reward == 0:
+        reward = config.DEFAULT_RAFFLE_VALUE
+
+    for player in players:
+        player.raffle_tickets += reward
+        session.add(player)
+    session.commit()
+
+
+def _build_game_history_embeds(
+    session: SQLAlchemySession, player_id: int, count: int
+) -> list[Embed]:
+    """
+    Runs on a database reader thread, see db.read
+    """
+    finished_games = get_recent_finished_game_summaries(session, player_id, count)
+    player_names = get_finished_game_player_names(
+        session, [finished_game.id for finished_game in finished_games]
+    )
+    embeds = []
+    # show most recent games last
+    for finished_game in reversed(finished_games):
+        # TODO: bold the callers name to make their name easier to see in the embed
+        embed = render_finished_game_embed(
+            finished_game,
+            player_names[(finished_game.id, 0)],
+            player_names[(finished_game.id, 1)],
+        )
+        embed.timestamp = finished_game.finished_at
+        embeds.append(embed)
+    return embeds
+
+
 class InProgressGameCommands(commands.Cog):
     def __init__(self, bot: Bot):
         self.bot: Bot = bot
@@ -163,7 +462,7 @@ class InProgressGameCommands(commands.Cog):
             with Session() as session:
                 game = (
                     session.query(InProgressGame)
-                    .filter(InProgressGame.id.startswith(game_id))
+                    .filter(id_startswith(InProgressGame.id, game_id))
                     .first()
                 )
                 if not game:
@@ -209,8 +508,8 @@ class InProgressGameCommands(commands.Cog):
                 config.GAME_HISTORY_CHANNEL
             )
             if game_history_channel and isinstance(game_history_channel, TextChannel):
-                game_history_message = await game_history_channel.send(
-                    embed=cancelled_game_embed
+                game_history_message = await dispatcher.send(
+                    game_history_channel, Priority.DEFAULT, embed=cancelled_game_embed
                 )
 
         if game_history_message is not None:
@@ -221,7 +520,9 @@ class InProgressGameCommands(commands.Cog):
                 config.CHANNEL_ID
             )
             if main_channel and isinstance(main_channel, TextChannel):
-                await main_channel.send(embed=cancelled_game_embed)
+                await dispatcher.send(
+                    main_channel, Priority.DEFAULT, embed=cancelled_game_embed
+                )
                 if config.ECONOMY_ENABLED:
                     try:
                         economy_cog = self.bot.get_cog("EconomyCommands")
@@ -266,14 +567,7 @@ class InProgressGameCommands(commands.Cog):
             except Exception:
                 _log.exception("Ignored exception when moving a gameplayer to lobby:")
 
-        for ipg_channel in session.query(InProgressGameChannel).filter(
-            InProgressGameChannel.in_progress_game_id == game.id
-        ):
-            if interaction.guild:
-                guild_channel = interaction.guild.get_channel(ipg_channel.channel_id)
-                if guild_channel:
-                    await guild_channel.delete()
-            session.delete(ipg_channel)
+        await release_game_channels(session, interaction.guild, game.id)
         session.query(InProgressGame).filter(InProgressGame.id == game.id).delete()
         return True
 
@@ -305,46 +599,23 @@ class InProgressGameCommands(commands.Cog):
             return
 
         await interaction.response.defer(ephemeral=True, thinking=True)
-        session: SQLAlchemySession
-        with Session() as session:
-            finished_games: list[FinishedGame]
-            finished_games = (
-                session.query(FinishedGame)
-                .join(
-                    FinishedGamePlayer,
-                    FinishedGamePlayer.finished_game_id == FinishedGame.id,
-                )
-                .filter(FinishedGamePlayer.player_id == interaction.user.id)
-                .order_by(FinishedGame.finished_at.desc())
-                .limit(count)
-                .all()
-            )
-            if not finished_games:
-                await interaction.followup.send(
-                    embed=Embed(
-                        description=f"{interaction.user.mention} has not played any games",
-                    ),
-                    ephemeral=True,
-                    allowed_mentions=AllowedMentions.none(),
-                )
-                return
-
-            embeds = []
-            finished_games.reverse()  # show most recent games last
-            for finished_game in finished_games:
-                # TODO: bold the callers name to make their name easier to see in the embed
-                embed: Embed = create_finished_game_embed(
-                    session, finished_game.id, interaction.guild.id
-                )
-                embed.timestamp = finished_game.finished_at
-                embeds.append(embed)
-
+        embeds = await db.read(_build_game_history_embeds, interaction.user.id, count)
+        if not embeds:
             await interaction.followup.send(
-                content=f"Last {count} games for {interaction.user.mention}",
-                embeds=embeds,
+                embed=Embed(
+                    description=f"{interaction.user.mention} has not played any games",
+                ),
                 ephemeral=True,
                 allowed_mentions=AllowedMentions.none(),
             )
+            return
+
+        await interaction.followup.send(
+            content=f"Last {count} games for {interaction.user.mention}",
+            embeds=embeds,
+            ephemeral=True,
+            allowed_mentions=AllowedMentions.none(),
+        )
 
     @group.command(name="finish", description="Ends the current game you are in")
     @app_commands.check(is_command_channel)
@@ -420,23 +691,6 @@ class InProgressGameCommands(commands.Cog):
     ) -> bool:
         assert interaction is not None
         assert interaction.guild is not None
-        queue: Queue | None = (
-            session.query(Queue).filter(Queue.id == in_progress_game.queue_id).first()
-        )
-        if not queue:
-            # should never happen
-            _log.error(
-                f"Could not find queue with id {in_progress_game.queue_id} for in_progress_game with id {in_progress_game.id}"
-            )
-            await interaction.followup.send(
-                embed=Embed(
-                    description="Oops, something went wrong...☹️️",
-                    color=Colour.red(),
-                ),
-                ephemeral=True,
-            )
-            return False
-
         winning_team = -1
         if outcome == "win":
             winning_team = game_player.team
@@ -446,177 +700,18 @@ class InProgressGameCommands(commands.Cog):
             # tie
             winning_team = -1
 
-        players = (
-            session.query(Player)
-            .join(InProgressGamePlayer)
-            .filter(
-                InProgressGamePlayer.player_id == Player.id,
-                InProgressGamePlayer.in_progress_game_id == in_progress_game.id,
-            )
-        ).all()
-        player_ids: list[str] = [player.id for player in players]
-        players_by_id: dict[int, Player] = {player.id: player for player in players}
-        player_category_trueskills_by_id: dict[int, PlayerCategoryTrueskill] = {}
-        if queue.category_id:
-            player_category_trueskills: list[PlayerCategoryTrueskill] = (
-                session.query(PlayerCategoryTrueskill)
-                .filter(
-                    PlayerCategoryTrueskill.player_id.in_(player_ids),
-                    PlayerCategoryTrueskill.category_id == queue.category_id,
-                )
-                .all()
-            )
-            player_category_trueskills_by_id = {
-                pct.player_id: pct for pct in player_category_trueskills
-            }
-        in_progress_game_players = (
-            session.query(InProgressGamePlayer)
-            .filter(InProgressGamePlayer.in_progress_game_id == in_progress_game.id)
-            .all()
+        finished_game_id, error = await db.run(
+            _record_finished_game, in_progress_game.id, winning_team
         )
-        team0_rated_ratings_before = []
-        team1_rated_ratings_before = []
-        team0_players: list[InProgressGamePlayer] = []
-        team1_players: list[InProgressGamePlayer] = []
-        for in_progress_game_player in in_progress_game_players:
-            player = players_by_id[in_progress_game_player.player_id]
-            if in_progress_game_player.team == 0:
-                team0_players.append(in_progress_game_player)
-                if player.id in player_category_trueskills_by_id:
-                    pct = player_category_trueskills_by_id[player.id]
-                    team0_rated_ratings_before.append(Rating(pct.mu, pct.sigma))
-                else:
-                    team0_rated_ratings_before.append(
-                        Rating(player.rated_trueskill_mu, player.rated_trueskill_sigma)
-                    )
-            else:
-                team1_players.append(in_progress_game_player)
-                if player.id in player_category_trueskills_by_id:
-                    pct = player_category_trueskills_by_id[player.id]
-                    team1_rated_ratings_before.append(Rating(pct.mu, pct.sigma))
-                else:
-                    team1_rated_ratings_before.append(
-                        Rating(player.rated_trueskill_mu, player.rated_trueskill_sigma)
-                    )
-
-        if queue.category_id:
-            category: Category | None = (
-                session.query(Category).filter(Category.id == queue.category_id).first()
-            )
-            if category:
-                category_name = category.name
-            else:
-                # should never happen
-                _log.error(
-                    f"Could not find category with id {queue.category_id} for queue with id {queue.id}"
-                )
-                await interaction.followup.send(
-                    embed=Embed(
-                        description="Something went wrong, please contact the server owner",
-                        color=Colour.red(),
-                    ),
-                    ephemeral=True,
-                )
-                return False
-        else:
-            category_name = None
-
-        game_finished_at = datetime.now(timezone.utc)
-        finished_game = FinishedGame(
-            average_trueskill=in_progress_game.average_trueskill,
-            finished_at=game_finished_at,
-            game_id=in_progress_game.id,
-            is_rated=queue.is_rated,
-            map_full_name=in_progress_game.map_full_name,
-            map_short_name=in_progress_game.map_short_name,
-            queue_name=queue.name,
-            category_name=category_name,
-            started_at=in_progress_game.created_at,
-            team0_name=in_progress_game.team0_name,
-            team1_name=in_progress_game.team1_name,
-            win_probability=in_progress_game.win_probability,
-            winning_team=winning_team,
-        )
-        session.add(finished_game)
-
-        result = None
-        if winning_team == -1:
-            result = [0, 0]
-        elif winning_team == 0:
-            result = [0, 1]
-        elif winning_team == 1:
-            result = [1, 0]
-
-        team0_rated_ratings_after: list[Rating]
-        team1_rated_ratings_after: list[Rating]
-        if len(players) > 1:
-            team0_rated_ratings_after, team1_rated_ratings_after = rate(
-                [team0_rated_ratings_before, team1_rated_ratings_before], result
-            )
-        else:
-            # Mostly useful for creating solo queues for testing, no real world
-            # application
-            team0_rated_ratings_after, team1_rated_ratings_after = (
-                team0_rated_ratings_before,
-                team1_rated_ratings_before,
+        if not finished_game_id:
+            await interaction.followup.send(
+                embed=Embed(
+                    description=error,
+                    color=Colour.red(),
+                ),
+                ephemeral=True,
             )
-
-        def update_ratings(
-            team_players: list[InProgressGamePlayer],
-            ratings_before: list[Rating],
-            ratings_after: list[Rating],
-            game_finished_at: datetime,
-        ):
-            for i, team_gip in enumerate(team_players):
-                player = players_by_id[team_gip.player_id]
-                finished_game_player = FinishedGamePlayer(
-                    finished_game_id=finished_game.id,
-                    player_id=player.id,
-                    player_name=player.name,
-                    team=team_gip.team,
-                    rated_trueskill_mu_before=ratings_before[i].mu,
-                    rated_trueskill_sigma_before=ratings_before[i].sigma,
-                    rated_trueskill_mu_after=ratings_after[i].mu,
-                    rated_trueskill_sigma_after=ratings_after[i].sigma,
-                )
-                trueskill_rating = ratings_after[i]
-                # Regardless of category, always update the master trueskill. That way
-                # when we create new categories off of it the data isn't completely
-                # stale
-                player.rated_trueskill_mu = trueskill_rating.mu
-                player.rated_trueskill_sigma = trueskill_rating.sigma
-                if player.id in player_category_trueskills_by_id:
-                    pct = player_category_trueskills_by_id[player.id]
-                    pct.mu = trueskill_rating.mu
-                    pct.sigma = trueskill_rating.sigma
-                    pct.rank = trueskill_rating.mu - 3 * trueskill_rating.sigma
-                    pct.last_game_finished_at = game_finished_at
-                else:
-                    session.add(
-                        PlayerCategoryTrueskill(
-                            player_id=player.id,
-                            category_id=queue.category_id,
-                            mu=trueskill_rating.mu,
-                            sigma=trueskill_rating.sigma,
-                            rank=trueskill_rating.mu - 3 * trueskill_rating.sigma,
-                            last_game_finished_at=game_finished_at,
-                        )
-                    )
-                session.add(finished_game_player)
-
-        update_ratings(
-            team0_players,
-            team0_rated_ratings_before,
-            team0_rated_ratings_after,
-            game_finished_at,
-        )
-        update_ratings(
-            team1_players,
-            team1_rated_ratings_before,
-            team1_rated_ratings_after,
-            game_finished_at,
-        )
-        session.commit()  # temporary solution until the foreign key constraint is resolved on EconomyPredictions/EconomyTransactions
+            return False
         if config.ECONOMY_ENABLED:
             economy_cog = self.bot.get_cog("EconomyCommands")
             if economy_cog is not None and isinstance(economy_cog, EconomyCommands):
@@ -626,43 +721,16 @@ class InProgressGameCommands(commands.Cog):
             else:
                 _log.warning("Could not get EconomyCommands cog")
 
-        session.query(InProgressGamePlayer).filter(
-            InProgressGamePlayer.in_progress_game_id == in_progress_game.id
-        ).delete()
-        in_progress_game.is_finished = True
-        session.add(
-            QueueWaitlist(
-                channel_id=config.CHANNEL_ID,  # not sure about this column and what it's used for
-                finished_game_id=finished_game.id,
-                in_progress_game_id=in_progress_game.id,
-                guild_id=interaction.guild_id,
-                queue_id=queue.id,
-                end_waitlist_at=datetime.now(timezone.utc)
-                + timedelta(seconds=config.RE_ADD_DELAY),
-            )
+        await db.run(
+            _close_in_progress_game,
+            in_progress_game.id,
+            finished_game_id,
+            interaction.guild_id,
         )
 
-        # Reward raffle tickets
-        reward = (
-            session.query(RotationMap.raffle_ticket_reward)
-            .join(Map, Map.id == RotationMap.map_id)
-            .join(Rotation, Rotation.id == RotationMap.rotation_id)
-            .join(Queue, Queue.rotation_id == Rotation.id)
-            .filter(Map.short_name == in_progress_game.map_short_name)
-            .filter(Queue.id == in_progress_game.queue_id)
-            .scalar()
-        )
-        if reward == 0:
-            reward = config.DEFAULT_RAFFLE_VALUE
-
-        for player in players:
-            player.raffle_tickets += reward
-            session.add(player)
-        session.commit()
-
-        finished_game_embed = create_finished_game_embed(
-            session,
-            finished_game.id,
+        finished_game_embed = await db.run(
+            create_finished_game_embed,
+            finished_game_id,
             interaction.guild.id,
             (interaction.user.name, interaction.user.display_name),
         )
@@ -672,8 +740,8 @@ class InProgressGameCommands(commands.Cog):
                 config.GAME_HISTORY_CHANNEL
             )
             if isinstance(game_history_channel, TextChannel):
-                game_history_message = await game_history_channel.send(
-                    embed=finished_game_embed
+                game_history_message = await dispatcher.send(
+                    game_history_channel, Priority.DEFAULT, embed=finished_game_embed
                 )
                 await upload_stats_screenshot_imgkit_channel(game_history_channel)
         elif config.STATS_DIR:
@@ -684,7 +752,9 @@ class InProgressGameCommands(commands.Cog):
         if config.CHANNEL_ID:
             main_channel = interaction.guild.get_channel(config.CHANNEL_ID)
             if isinstance(main_channel, TextChannel):
-                await main_channel.send(embed=finished_game_embed)
+                await dispatcher.send(
+                    main_channel, Priority.DEFAULT, embed=finished_game_embed
+                )
         return True
 
     @group.command(
@@ -739,6 +809,19 @@ class InProgressGameCommands(commands.Cog):
                 .first()
             )
             if not finished_game:
+                archived_game = get_archived_finished_game_summary(session, game_id)
+                if archived_game:
+                    player_names = get_finished_game_player_names(
+                        session, [archived_game.id]
+                    )
+                    await interaction.response.send_message(
+                        embed=render_finished_game_embed(
+                            archived_game,
+                            player_names[(archived_game.id, 0)],
+                            player_names[(archived_game.id, 1)],
+                        )
+                    )
+                    return
                 await interaction.response.send_message(
                     embed=Embed(
                         description=f"Could not find game: {game_id}",
@@ -825,7 +908,7 @@ class InProgressGameCommands(commands.Cog):
             else:
                 in_progress_game: InProgressGame | None = (
                     session.query(InProgressGame)
-                    .filter(InProgressGame.id.startswith(game_id))
+                    .filter(id_startswith(InProgressGame.id, game_id))
                     .first()
                 )
                 if not in_progress_game:
@@ -1,15 +1,14 @@
 import logging
-from glob import glob
 
 from discord import Colour, Embed, Interaction, app_commands
 from discord.ext.commands import Bot
 from discord.utils import escape_markdown
 from sqlalchemy.orm.session import Session as SQLAlchemySession
 
+from discord_bots.backup import list_backups
 from discord_bots.bot import bot
 from discord_bots.checks import is_admin_app_command, is_command_channel
 from discord_bots.cogs.base import BaseCog
-from discord_bots.config import DB_NAME
 from discord_bots.models import (
     AdminRole,
     Category,
@@ -137,7 +136,7 @@ class ListCommands(BaseCog):
     @app_commands.check(is_command_channel)
     async def listdbbackups(self, interaction: Interaction):
         output = "Backups:"
-        for filename in glob(f"{DB_NAME}_*.db"):
+        for filename in list_backups():
             output += f"\n- {filename}"
 
         await interaction.response.send_message(
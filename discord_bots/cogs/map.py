@@ -16,10 +16,10 @@ from sqlalchemy.orm.exc import NoResultFound
 
 from discord_bots.checks import is_admin_app_command, is_command_channel
 from discord_bots.cogs.base import BaseCog
+from discord_bots.global_map_stats import get_cached_global_map_stats
 from discord_bots.models import (
     Category,
     FinishedGame,
-    FinishedGamePlayer,
     InProgressGame,
     Map,
     MapVote,
@@ -29,7 +29,12 @@ from discord_bots.models import (
     RotationMap,
     Session,
 )
+from discord_bots.read_models import (
+    WinLossTie,
+    get_player_windowed_results,
+)
 from discord_bots.utils import code_block, short_uuid, win_rate
+from discord_bots.uuid_storage import id_startswith
 
 _log = logging.getLogger(__name__)
 
@@ -89,7 +94,7 @@ class MapCommands(BaseCog):
         with Session() as session:
             ipg = (
                 session.query(InProgressGame)
-                .filter(InProgressGame.id.startswith(game_id))
+                .filter(id_startswith(InProgressGame.id, game_id))
                 .first()
             )
             finished_game = (
@@ -435,62 +440,34 @@ class MapCommands(BaseCog):
                     ephemeral=True,
                 )
                 return
-            fgps: List[FinishedGamePlayer] | None = (
-                session.query(FinishedGamePlayer)
-                .filter(FinishedGamePlayer.player_id == interaction.user.id)
-                .all()
+            # all time only, one row per map, see player_stats.py
+            totals = get_player_windowed_results(
+                session,
+                interaction.user.id,
+                group_by="map_full_name",
+                category_name=category_name,
+                windows=(None,),
             )
-            if not fgps:
+            if not totals:
                 await interaction.response.send_message(
                     embed=Embed(
-                        description=f"You have not played any games",
+                        description=(
+                            f"Could not find any finished games for you"
+                            if category_name
+                            else f"You have not played any games"
+                        ),
                         colour=Colour.red(),
                     ),
                     ephemeral=True,
                 )
                 return
-            finished_game_ids: List[str] | None = [fgp.finished_game_id for fgp in fgps]
-            conditions = [FinishedGame.id.in_(finished_game_ids)]
-            if category_name:
-                conditions.append(FinishedGame.category_name == category_name)
-            fgs: List[FinishedGame] | None = (
-                session.query(FinishedGame).filter(*conditions).all()
-            )
-            if not fgs:
-                await interaction.response.send_message(
-                    embed=Embed(
-                        description=f"Could not find any finished games for you",
-                        colour=Colour.red(),
-                    ),
-                    ephemeral=True,
-                )
-                return
-            fgps_by_finished_game_id: dict[str, FinishedGamePlayer] = {
-                fgp.finished_game_id: fgp for fgp in fgps
-            }
             cols = []
             for m in maps:
-
-                def map_stats(finished_games: list[FinishedGame]):
-                    wins = [
-                        fg
-                        for fg in finished_games
-                        if fg.winning_team == fgps_by_finished_game_id[fg.id].team
-                    ]
-                    losses = [
-                        fg
-                        for fg in finished_games
-                        if fg.winning_team != fgps_by_finished_game_id[fg.id].team
-                        and fg.winning_team != -1
-                    ]
-                    ties = [fg for fg in finished_games if fg.winning_team == -1]
-                    return len(wins), len(losses), len(ties)
-
-                fgs_for_map = [fg for fg in fgs if fg.map_full_name == m.full_name]
-                num_games = len(fgs_for_map)
+                (total,) = totals.get(m.full_name, [WinLossTie(0, 0, 0)])
+                wins, losses, ties = total
+                num_games = total.total
                 if num_games <= 0:
                     continue
-                wins, losses, ties = map_stats(fgs_for_map)
                 wr = win_rate(wins, losses, ties)
                 cols.append(
                     [
@@ -532,39 +509,24 @@ class MapCommands(BaseCog):
         self, interaction: Interaction, category_name: Optional[str] = None
     ):
         # Explicitly does not use a discord.Embed, due to the limit of the Embed length (Note: this won't look pretty on mobile)
-        session: SQLAlchemySession
-        with Session() as session:
-            maps: list[Map] | None = session.query(Map).order_by(Map.full_name).all()
-
-            def map_stats(finished_games: list[FinishedGame]):
-                team0_wins = [fg for fg in finished_games if fg.winning_team == 0]
-                team1_wins = [fg for fg in finished_games if fg.winning_team == 1]
-                ties = [fg for fg in finished_games if fg.winning_team == -1]
-                return len(team0_wins), len(team1_wins), len(ties)
-
-            cols = []
-            for m in maps:
-                conditions = [FinishedGame.map_full_name == m.full_name]
-                if category_name:
-                    conditions.append(FinishedGame.category_name == category_name)
-                finished_games = session.query(FinishedGame).filter(*conditions).all()
-                num_games = len(finished_games)
-                if num_games <= 0:
-                    continue
-                team0_wins, team1_wins, ties = map_stats(finished_games)
-                team0_win_rate = win_rate(team0_wins, team1_wins, ties)
-                team1_win_rate = win_rate(team1_wins, team0_wins, ties)
-                cols.append(
-                    [
-                        m.full_name,
-                        team0_wins,
-                        f"{team0_win_rate}%",
-                        team1_wins,
-                        f"{team1_win_rate}%",
-                        ties,
-                        len(finished_games),
-                    ]
-                )
+        # one grouped query at most, see global_map_stats.py
+        cols = []
+        for row in await get_cached_global_map_stats(category_name):
+            if row.total <= 0:
+                continue
+            team0_win_rate = win_rate(row.team0_wins, row.team1_wins, row.ties)
+            team1_win_rate = win_rate(row.team1_wins, row.team0_wins, row.ties)
+            cols.append(
+                [
+                    row.map_full_name,
+                    row.team0_wins,
+                    f"{team0_win_rate}%",
+                    row.team1_wins,
+                    f"{team1_win_rate}%",
+                    row.ties,
+                    row.total,
+                ]
+            )
         table = table2ascii(
             header=["Map", "Team0", "WR", "Team1", "WR", "Ties", "Total"],
             body=cols,
@@ -2,8 +2,8 @@ import logging
 from random import choice
 from sqlalchemy import func
 from sqlalchemy.orm.session import Session as SQLAlchemySession
-from sqlalchemy.sql import select
-from typing import List
+from sqlalchemy.sql import or_, select
+from typing import List, Optional
 
 from discord import (
     app_commands,
@@ -16,6 +16,8 @@ from discord import (
 from discord.ext.commands import Bot
 from discord.utils import escape_markdown
 
+from discord_bots import db
+from discord_bots.archive import archive_has_games, with_archived
 from discord_bots.bot import bot
 from discord_bots.checks import is_command_channel
 from discord_bots.cogs.base import BaseCog
@@ -25,11 +27,108 @@ from discord_bots.models import (
     FinishedGame,
     FinishedGamePlayer,
     Player,
+    PlayerPairStats,
     Session,
 )
+from discord_bots.player_pairs import PairStats, get_best_teammates, get_nemeses
+from discord_bots.utils import win_rate
 
 _log = logging.getLogger(__name__)
 
+# discord only allows 10 embeds per message
+MAX_PAIR_STATS_CATEGORIES = 10
+
+
+def _pair_lines(
+    pairs: list[tuple[int, PairStats]], names: dict[int, str], together: bool
+) -> str:
+    lines = []
+    for other_player_id, stats in pairs:
+        if together:
+            games, wins, losses = (
+                stats.games_together,
+                stats.wins_together,
+                stats.losses_together,
+            )
+        else:
+            games, wins, losses = (
+                stats.games_against,
+                stats.wins_against,
+                stats.losses_against,
+            )
+        name = escape_markdown(names.get(other_player_id, str(other_player_id)))
+        rate = win_rate(wins, losses, games - wins - losses)
+        lines.append(f"{name}: {wins}W {losses}L in {games} games ({rate}%)")
+    return "\n".join(lines) or "Not enough games yet"
+
+
+def _build_pair_stats_embeds(
+    session: SQLAlchemySession, player_id: int, category_name: str | None
+) -> list[Embed]:
+    """
+    Runs on a database reader thread, see db.read
+    """
+    player: Player | None = session.query(Player).filter(Player.id == player_id).first()
+    if not player:
+        return [
+            Embed(description="You have not played any games", colour=Colour.blue())
+        ]
+    if not player.stats_enabled:
+        return [Embed(description="You have disabled `/stats`", colour=Colour.blue())]
+
+    if category_name:
+        category_names: list[str | None] = [category_name]
+    else:
+        category_names = [
+            name
+            for (name,) in session.query(PlayerPairStats.category_name)
+            .filter(
+                or_(
+                    PlayerPairStats.player_id == player_id,
+                    PlayerPairStats.other_player_id == player_id,
+                )
+            )
+            .distinct()
+            .order_by(PlayerPairStats.category_name)
+            .limit(MAX_PAIR_STATS_CATEGORIES)
+        ]
+    if not category_names:
+        return [
+            Embed(description="You have not played any games", colour=Colour.blue())
+        ]
+
+    rankings = [
+        (
+            name,
+            get_best_teammates(session, player_id, name),
+            get_nemeses(session, player_id, name),
+        )
+        for name in category_names
+    ]
+    other_player_ids = {
+        other_player_id
+        for _, teammates, nemeses in rankings
+        for other_player_id, _ in teammates + nemeses
+    }
+    names: dict[int, str] = dict(
+        session.query(Player.id, Player.name).filter(Player.id.in_(other_player_ids))
+    )
+    embeds = []
+    for name, teammates, nemeses in rankings:
+        embed = Embed(title=name or "Uncategorized", colour=Colour.blue())
+        embed.add_field(
+            name="Best teammates",
+            value=_pair_lines(teammates, names, True),
+            inline=False,
+        )
+        embed.add_field(
+            name="Nemeses",
+            value=_pair_lines(nemeses, names, False),
+            inline=False,
+        )
+        embeds.append(embed)
+    return embeds
+
 
 class PlayerCommands(BaseCog):
     def __init__(self, bot: Bot):
@@ -165,19 +264,28 @@ class PlayerCommands(BaseCog):
     async def commendstats(self, interaction: Interaction):
         session: SQLAlchemySession
         with Session() as session:
+            commends = (
+                with_archived(Commend.__table__)
+                if archive_has_games(session)
+                else Commend.__table__
+            )
             most_commends_given_statement = (
-                select(Player, func.count(Commend.commender_id).label("commend_count"))
-                .join(Commend, Commend.commender_id == Player.id)
+                select(
+                    Player, func.count(commends.c.commender_id).label("commend_count")
+                )
+                .join(commends, commends.c.commender_id == Player.id)
                 .group_by(Player.id)
-                .having(func.count(Commend.commender_id) > 0)
-                .order_by(func.count(Commend.commender_id).desc())
+                .having(func.count(commends.c.commender_id) > 0)
+                .order_by(func.count(commends.c.commender_id).desc())
             )
             most_commends_received_statement = (
-                select(Player, func.count(Commend.commendee_id).label("commend_count"))
-                .join(Commend, Commend.commendee_id == Player.id)
+                select(
+                    Player, func.count(commends.c.commendee_id).label("commend_count")
+                )
+                .join(commends, commends.c.commendee_id == Player.id)
                 .group_by(Player.id)
-                .having(func.count(Commend.commendee_id) > 0)
-                .order_by(func.count(Commend.commendee_id).desc())
+                .having(func.count(commends.c.commendee_id) > 0)
+                .order_by(func.count(commends.c.commendee_id).desc())
             )
 
             most_commends_given: List[Player] = session.execute(
@@ -225,6 +333,51 @@ class PlayerCommands(BaseCog):
                     except Exception:
                         pass
 
+    @group.command(
+        name="teammates",
+        description="Privately displays who you win the most with and lose the most against",
+    )
+    @app_commands.check(is_command_channel)
+    @app_commands.describe(category_name="Category to show teammates for")
+    @app_commands.rename(category_name="category")
+    async def teammates(
+        self, interaction: Interaction, category_name: Optional[str] | None
+    ):
+        """
+        Only counts players you've played at least 10 games with or against, see
+        player_pairs.py
+        """
+        embeds = await db.read(
+            _build_pair_stats_embeds, interaction.user.id, category_name
+        )
+        await interaction.response.send_message(embeds=embeds, ephemeral=True)
+
+    @teammates.autocomplete("category_name")
+    async def teammates_category_autocomplete(
+        self, interaction: Interaction, current: str
+    ):
+        session: SQLAlchemySession
+        with Session() as session:
+            category_names: list[str] = [
+                name
+                for (name,) in session.query(PlayerPairStats.category_name)
+                .filter(
+                    or_(
+                        PlayerPairStats.player_id == interaction.user.id,
+                        PlayerPairStats.other_player_id == interaction.user.id,
+                    ),
+                    PlayerPairStats.category_name.is_not(None),
+                )
+                .distinct()
+                .order_by(PlayerPairStats.category_name)
+                .limit(25)  # discord only supports up to 25 choices
+            ]
+        return [
+            app_commands.Choice(name=name, value=name)
+            for name in category_names
+            if current in name
+        ]
+
     @group.command(
         name="toggleleaderboard", description="Enable/disable showing on leaderbaord"
     )
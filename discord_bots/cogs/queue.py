@@ -38,6 +38,8 @@ from discord_bots.models import (
     Session,
 )
 from discord_bots.queues import AddPlayerQueueMessage, add_player_queue
+from discord_bots.rating_distribution import get_rating_sketch
+from discord_bots.read_models import get_category_names, get_queue_names
 
 _log = logging.getLogger(__name__)
 
@@ -673,17 +675,7 @@ class QueueCommands(BaseCog):
         session: SQLAlchemySession
         with Session() as session:
             queue: Queue = session.query(Queue).filter(Queue.name.ilike(queue_name)).first()  # type: ignore
-            if queue:
-                queue.mu_min = min
-                queue.mu_max = max
-                session.commit()
-                await interaction.response.send_message(
-                    embed=Embed(
-                        description=f"Queue {queue.name} range set to [{min}, {max}]",
-                        colour=Colour.green(),
-                    )
-                )
-            else:
+            if not queue:
                 await interaction.response.send_message(
                     embed=Embed(
                         description=f"Queue not found: {queue_name}",
@@ -691,6 +683,36 @@ class QueueCommands(BaseCog):
                     ),
                     ephemeral=True,
                 )
+                return
+            queue.mu_min = min
+            queue.mu_max = max
+            session.commit()
+            description = f"Queue {queue.name} range set to [{min}, {max}]"
+            category_id = queue.category_id
+        await interaction.response.send_message(
+            embed=Embed(
+                description=description,
+                colour=Colour.green(),
+            )
+        )
+
+        # loading the sketch can take longer than discord waits for the
+        # response, so it's edited in afterwards
+        try:
+            sketch = await get_rating_sketch(category_id)
+            if sketch.count:
+                description += (
+                    f"\n{round(100 * sketch.fraction_between(min, max))}% of "
+                    f"{sketch.count} rated players are in this range"
+                )
+                await interaction.edit_original_response(
+                    embed=Embed(
+                        description=description,
+                        colour=Colour.green(),
+                    )
+                )
+        except Exception:
+            _log.exception("[setqueuerange] Failed to show the players in range")
 
     @group.command(name="setrotation", description="Assign a map rotation to a queue")
     @app_commands.check(is_admin_app_command)
@@ -1028,15 +1050,12 @@ class QueueCommands(BaseCog):
         result = []
         session: SQLAlchemySession
         with Session() as session:
-            categories: list[Category] | None = (
-                session.query(Category).order_by(Category.name).limit(25).all()
-            )  # discord only supports up to 25 choices
-            if categories:
-                for category in categories:
-                    if current in category.name:
-                        result.append(
-                            app_commands.Choice(name=category.name, value=category.name)
-                        )
+            # discord only supports up to 25 choices
+            for category_name in get_category_names(session, limit=25):
+                if current in category_name:
+                    result.append(
+                        app_commands.Choice(name=category_name, value=category_name)
+                    )
         return result
 
     @addqueuerole.autocomplete("queue_name")
@@ -1067,15 +1086,12 @@ class QueueCommands(BaseCog):
         result = []
         session: SQLAlchemySession
         with Session() as session:
-            queues: list[Queue] | None = (
-                session.query(Queue).order_by(Queue.name).limit(25).all()
-            )
-            if queues:
-                for queue in queues:
-                    if current in queue.name:
-                        result.append(
-                            app_commands.Choice(name=queue.name, value=queue.name)
-                        )
+            # discord only supports up to 25 choices
+            for queue_name in get_queue_names(session, limit=25):
+                if current in queue_name:
+                    result.append(
+                        app_commands.Choice(name=queue_name, value=queue_name)
+                    )
         return result
 
     @setqueuerotation.autocomplete("rotation_name")
@@ -4,14 +4,17 @@ from typing import List
 from discord import Colour, Embed, Interaction, Member, app_commands
 from discord.ext.commands import Bot
 from discord.utils import escape_markdown
-from numpy import std
 from sqlalchemy.orm.session import Session as SQLAlchemySession
 
+from discord_bots import db
 from discord_bots.checks import is_admin_app_command, is_command_channel
 from discord_bots.cogs.base import BaseCog
 from discord_bots.config import DEFAULT_TRUESKILL_MU, DEFAULT_TRUESKILL_SIGMA
+from discord_bots.leaderboard import update_leaderboard_entries
 from discord_bots.models import Player, PlayerCategoryTrueskill, Queue, Session
-from discord_bots.utils import mean, print_leaderboard
+from discord_bots.percentiles import update_rating_percentiles
+from discord_bots.rating_distribution import get_rating_moments, get_rating_sketch
+from discord_bots.utils import print_leaderboard
 
 _log = logging.getLogger(__name__)
 
@@ -66,11 +69,18 @@ class TrueskillCommands(BaseCog):
                 pct.mu = DEFAULT_TRUESKILL_MU
                 pct.sigma = DEFAULT_TRUESKILL_SIGMA
                 pct.rank = pct.mu - (3 * pct.sigma)
+            update_leaderboard_entries(session, pcts)
 
             player.rated_trueskill_mu = DEFAULT_TRUESKILL_MU
             player.rated_trueskill_sigma = DEFAULT_TRUESKILL_SIGMA
 
+            category_ids = [pct.category_id for pct in pcts]
             session.commit()
+        # the defaults aren't indexed, so this takes the player out
+        default_ratings = [(member.id, DEFAULT_TRUESKILL_MU, DEFAULT_TRUESKILL_SIGMA)]
+        for category_id in category_ids:
+            update_rating_percentiles(default_ratings, category_id)
+        update_rating_percentiles(default_ratings)
         await interaction.response.send_message(
             embed=Embed(
                 description=f"{escape_markdown(member.name)} trueskill reset.",
@@ -139,39 +149,33 @@ class TrueskillCommands(BaseCog):
                 )
                 return
 
-            trueskill_mus = []
-            if queue.category_id:
-                player_category_trueskills: List[PlayerCategoryTrueskill] = (
-                    session.query(PlayerCategoryTrueskill)
-                    .filter(
-                        PlayerCategoryTrueskill.category_id == queue.category_id,
-                    )
-                    .all()
-                )
-                trueskill_mus = [pct.mu for pct in player_category_trueskills]
-            else:
-                players = (
-                    session.query(Player)
-                    .filter(Player.finished_game_players.any())
-                    .all()
-                )
-                trueskill_mus = [p.rated_trueskill_mu for p in players]
+            category_id = queue.category_id
 
-        std_dev = std(trueskill_mus)
-        average = mean(trueskill_mus)
+        moments = await db.read(get_rating_moments, category_id)
+        sketch = await get_rating_sketch(category_id)
+        average = moments.mean
+        std_dev = moments.stddev
         output = []
-        output.append(f"**Data points**: {len(trueskill_mus)}")
+        output.append(f"**Data points**: {moments.count}")
         output.append(f"**Mean**: {round(average, 2)}")
         output.append(f"**Stddev**: {round(std_dev, 2)}\n")
-        output.append(f"**2%** (+2σ): {round(average + 2 * std_dev, 2)}")
-        output.append(f"**7%** (+1.5σ): {round(average + 1.5 * std_dev, 2)}")
-        output.append(f"**16%** (+1σ): {round(average + 1 * std_dev, 2)}")
-        output.append(f"**31%** (+0.5σ): {round(average + 0.5 * std_dev, 2)}")
-        output.append(f"**50%** (0σ): {round(average, 2)}")
-        output.append(f"**69%** (-0.5σ): {round(average - 0.5 * std_dev, 2)}")
-        output.append(f"**84%** (-1σ): {round(average - 1 * std_dev, 2)}")
-        output.append(f"**93%** (-1.5σ): {round(average - 1.5 * std_dev, 2)}")
-        output.append(f"**98%** (+2σ): {round(average - 2 * std_dev, 2)}")
+        # (top %, standard deviations from the mean, label)
+        for top, sigmas, label in (
+            (2, 2, "+2σ"),
+            (7, 1.5, "+1.5σ"),
+            (16, 1, "+1σ"),
+            (31, 0.5, "+0.5σ"),
+            (50, 0, "0σ"),
+            (69, -0.5, "-0.5σ"),
+            (84, -1, "-1σ"),
+            (93, -1.5, "-1.5σ"),
+            (98, -2, "-2σ"),
+        ):
+            line = f"**{top}%** ({label}): {round(average + sigmas * std_dev, 2)}"
+            actual = sketch.quantile(1 - top / 100)
+            if actual is not None:
+                line += f" (actual {round(actual, 2)})"
+            output.append(line)
 
         await interaction.response.send_message(
             embed=Embed(
@@ -1,16 +1,14 @@
 import asyncio
 import heapq
+import io
 import logging
-from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 from itertools import combinations
 from math import floor
 from random import choice, shuffle, uniform
-from tempfile import NamedTemporaryFile
 from typing import List, Literal, Optional
 
 import discord
-import imgkit
 import sqlalchemy
 from discord import (
     CategoryChannel,
@@ -27,14 +25,15 @@ from discord.ext.commands.context import Context
 from discord.guild import Guild
 from discord.member import Member
 from discord.utils import escape_markdown
-from PIL import Image
 from sqlalchemy import func, or_
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.session import Session as SQLAlchemySession
 from trueskill import Rating
 
 import discord_bots.config as config
+from discord_bots import db, dispatcher, screenshots
 from discord_bots.checks import is_admin
+from discord_bots.dispatcher import Priority
 from discord_bots.utils import (
     MU_LOWER_UNICODE,
     SIGMA_LOWER_UNICODE,
@@ -55,6 +54,7 @@ from discord_bots.utils import (
 )
 
 from .bot import bot
+from .channel_pool import pop_game_channels, pop_team_voice_channels
 from .cogs.economy import EconomyCommands
 from .cogs.in_progress_game import InProgressGameCommands, InProgressGameView
 from .models import (
@@ -88,6 +88,7 @@ from .models import (
 )
 from .names import generate_be_name, generate_ds_name
 from .queues import AddPlayerQueueMessage, add_player_queue, waitlist_messages
+from .status import get_status_embeds
 from .twitch import twitch
 
 
@@ -108,7 +109,7 @@ def get_even_teams(
     :returns: list of players and win probability for the first team
     """
     session: sqlalchemy.orm.Session
-    with Session() as session:
+    with db.UnitOfWork() as session:
         players: list[Player] = (
             session.query(Player).filter(Player.id.in_(player_ids)).all()
         )
@@ -192,7 +193,7 @@ async def create_game(
     if not channel:
         return
     session: sqlalchemy.orm.Session
-    with Session() as session:
+    with db.UnitOfWork() as session:
         queue: Queue | None = session.query(Queue).filter(Queue.id == queue_id).first()
         if not queue:
             _log.error(f"[create_game] could not find queue with id {queue_id}")
@@ -304,6 +305,9 @@ async def create_game(
                 team=1,
             )
             session.add(game_player)
+        session.query(QueuePlayer).filter(QueuePlayer.player_id.in_(player_ids)).delete()  # type: ignore
+        # before anything awaits discord, see db.UnitOfWork
+        session.commit()
 
         short_game_id = short_uuid(game.id)
         # embed = Embed(
@@ -317,14 +321,17 @@ async def create_game(
             config.TRIBES_VOICE_CATEGORY_CHANNEL_ID
         )
         if isinstance(category_channel, discord.CategoryChannel):
-            match_channel = await guild.create_text_channel(
-                f"{queue.name}-({short_game_id})", category=category_channel
-            )
-            be_voice_channel = await guild.create_voice_channel(
-                f"{game.team0_name}", category=category_channel
-            )
-            ds_voice_channel = await guild.create_voice_channel(
-                f"{game.team1_name}", category=category_channel
+            (
+                match_channel,
+                be_voice_channel,
+                ds_voice_channel,
+            ) = await pop_game_channels(
+                session,
+                guild,
+                category_channel,
+                f"{queue.name}-({short_game_id})",
+                f"{game.team0_name}",
+                f"{game.team1_name}",
             )
             session.add(
                 InProgressGameChannel(
@@ -341,6 +348,7 @@ async def create_game(
                     in_progress_game_id=game.id, channel_id=ds_voice_channel.id
                 )
             )
+            session.commit()
         else:
             _log.warning(
                 f"could not find tribes_voice_category with id {config.TRIBES_VOICE_CATEGORY_CHANNEL_ID} in guild"
@@ -358,6 +366,7 @@ async def create_game(
                 # to line everything up nicely when there's >= 5 fields and only one "column" slot left, we add a blank
                 embed.add_field(name="", value="", inline=True)
             game.channel_id = match_channel.id
+            session.commit()
         send_message_coroutines = []
         for player in team0_players:
             send_message_coroutines.append(
@@ -386,16 +395,17 @@ async def create_game(
             and isinstance(in_progress_game_cog, InProgressGameCommands)
             and match_channel
         ):
-            message = await match_channel.send(
-                embed=embed, view=InProgressGameView(game.id, in_progress_game_cog)
+            message = await dispatcher.send(
+                match_channel,
+                Priority.POP,
+                embed=embed,
+                view=InProgressGameView(game.id, in_progress_game_cog),
             )
             game.message_id = message.id
+            session.commit()
         else:
             _log.warning("Could not get InProgressGameCommands")
 
-        session.query(QueuePlayer).filter(QueuePlayer.player_id.in_(player_ids)).delete()  # type: ignore
-        session.commit()
-
         if not rolled_random_map:
             await update_next_map_to_map_after_next(queue.rotation_id, False)
 
@@ -409,7 +419,7 @@ async def create_game(
                 game.prediction_message_id = prediction_message_id
                 session.commit()
 
-        await channel.send(embed=embed)
+        await dispatcher.send(channel, Priority.POP, embed=embed)
         if (
             config.ENABLE_VOICE_MOVE
             and queue.move_enabled
@@ -430,11 +440,12 @@ async def create_team_voice_channels(
     game: InProgressGame,
     category: CategoryChannel,
 ) -> tuple[discord.VoiceChannel, discord.VoiceChannel]:
-    be_channel = await guild.create_voice_channel(
-        f"{game.team0_name}", category=category
-    )
-    ds_channel = await guild.create_voice_channel(
-        f"{game.team1_name}", category=category
+    """
+    Take the game's team voice channels from the channel pool. Commits the
+    session before awaiting discord, the caller must commit the channels
+    """
+    be_channel, ds_channel = await pop_team_voice_channels(
+        session, guild, category, game.team0_name, game.team1_name
     )
     session.add(
         InProgressGameChannel(in_progress_game_id=game.id, channel_id=be_channel.id)
@@ -461,7 +472,7 @@ async def add_player_to_queue(
     result.
     """
     session: sqlalchemy.orm.Session
-    with Session() as session:
+    with db.UnitOfWork() as session:
         queue_roles = (
             session.query(QueueRole).filter(QueueRole.queue_id == queue_id).all()
         )
@@ -518,7 +529,6 @@ async def add_player_to_queue(
             session.rollback()
             return False, False
 
-        queue: Queue = session.query(Queue).filter(Queue.id == queue_id).first()
         queue_players: list[QueuePlayer] = (
             session.query(QueuePlayer).filter(QueuePlayer.queue_id == queue_id).all()
         )
@@ -539,11 +549,13 @@ async def add_player_to_queue(
             member: Member | None = guild.get_member(queue_notification.player_id)
             if member:
                 try:
-                    await member.send(
+                    await dispatcher.send(
+                        member,
+                        Priority.POP,
                         embed=Embed(
                             description=f"'{queue.name}' is at {queue_notification.size} players!",
                             colour=Colour.blue(),
-                        )
+                        ),
                     )
                 except Exception:
                     pass
@@ -573,28 +585,23 @@ async def is_not_banned(ctx: Context):
     return not is_banned
 
 
-@bot.command()
-async def add(ctx: Context, *args):
+def _load_add_targets(
+    session: sqlalchemy.orm.Session, player_id: int, args: tuple[str, ...]
+) -> tuple[bool, FinishedGame | None, list[Queue], VotePassedWaitlist | None]:
     """
-    Players adds self to queue(s). If no args to all existing queues
+    Runs on the database thread, see db.run
 
-    Players can also add to a queue by its index. The index starts at 1.
+    :returns: whether the player is in a game, their most recent game, the queues
+    they asked for and the vote passed waitlist if there is one
     """
-    message = ctx.message
-    if is_in_game(message.author.id):
-        await send_message(
-            message.channel,
-            embed_description=f"<@{message.author.id}> you are already in a game",
-            colour=Colour.red(),
-        )
-        return
+    if get_player_game(player_id, session) is not None:
+        return True, None, [], None
 
-    session = ctx.session
     most_recent_game: FinishedGame | None = (
         session.query(FinishedGame)
         .join(FinishedGamePlayer)
         .filter(
-            FinishedGamePlayer.player_id == message.author.id,
+            FinishedGamePlayer.player_id == player_id,
         )
         .order_by(FinishedGame.finished_at.desc())  # type: ignore
         .first()
@@ -602,14 +609,6 @@ async def add(ctx: Context, *args):
 
     queues_to_add: list[Queue] = []
     if len(args) == 0:
-        if config.REQUIRE_ADD_TARGET:
-            await send_message(
-                message.channel,
-                embed_description=f"Usage: !add [queue]",
-                colour=Colour.red(),
-            )
-            session.close()
-            return
         # Don't auto-add to isolated queues
         queues_to_add += (
             session.query(Queue)
@@ -640,6 +639,88 @@ async def add(ctx: Context, *args):
             except IndexError:
                 continue
 
+    vpw: VotePassedWaitlist | None = session.query(VotePassedWaitlist).first()
+    return False, most_recent_game, queues_to_add, vpw
+
+
+def _add_to_vote_passed_waitlist(
+    session: sqlalchemy.orm.Session, vpw_id: str, player_id: int, queue_ids: list[str]
+):
+    """
+    Runs on the database thread, see db.run
+    """
+    for queue_id in queue_ids:
+        session.add(
+            VotePassedWaitlistPlayer(
+                vote_passed_waitlist_id=vpw_id,
+                player_id=player_id,
+                queue_id=queue_id,
+            )
+        )
+        try:
+            session.commit()
+        except IntegrityError as exc:
+            _log.error(f"integrity error {exc}")
+            session.rollback()
+
+
+def _add_to_queue_waitlist(
+    session: sqlalchemy.orm.Session,
+    finished_game_id: str,
+    player_id: int,
+    queue_ids: list[str],
+):
+    """
+    Runs on the database thread, see db.run
+    """
+    for queue_id in queue_ids:
+        # TODO: Check player eligibility here?
+        queue_waitlist: QueueWaitlist | None = (
+            session.query(QueueWaitlist)
+            .filter(QueueWaitlist.finished_game_id == finished_game_id)
+            .first()
+        )
+        if queue_waitlist:
+            session.add(
+                QueueWaitlistPlayer(
+                    queue_id=queue_id,
+                    queue_waitlist_id=queue_waitlist.id,
+                    player_id=player_id,
+                )
+            )
+            try:
+                session.commit()
+            except IntegrityError:
+                session.rollback()
+
+
+@bot.command()
+async def add(ctx: Context, *args):
+    """
+    Players adds self to queue(s). If no args to all existing queues
+
+    Players can also add to a queue by its index. The index starts at 1.
+    """
+    message = ctx.message
+    in_game, most_recent_game, queues_to_add, vpw = await db.run(
+        _load_add_targets, message.author.id, args
+    )
+    if in_game:
+        await send_message(
+            message.channel,
+            embed_description=f"<@{message.author.id}> you are already in a game",
+            colour=Colour.red(),
+        )
+        return
+
+    if len(args) == 0 and config.REQUIRE_ADD_TARGET:
+        await send_message(
+            message.channel,
+            embed_description=f"Usage: !add [queue]",
+            colour=Colour.red(),
+        )
+        return
+
     if len(queues_to_add) == 0:
         await send_message(
             message.channel,
@@ -648,21 +729,13 @@ async def add(ctx: Context, *args):
         )
         return
 
-    vpw: VotePassedWaitlist | None = session.query(VotePassedWaitlist).first()
     if vpw:
-        for queue in queues_to_add:
-            session.add(
-                VotePassedWaitlistPlayer(
-                    vote_passed_waitlist_id=vpw.id,
-                    player_id=message.author.id,
-                    queue_id=queue.id,
-                )
-            )
-            try:
-                session.commit()
-            except IntegrityError as exc:
-                _log.error(f"integrity error {exc}")
-                session.rollback()
+        await db.run(
+            _add_to_vote_passed_waitlist,
+            vpw.id,
+            message.author.id,
+            [queue.id for queue in queues_to_add],
+        )
 
         current_time: datetime = datetime.now(timezone.utc)
         # The assumption is the end timestamp is later than now, otherwise it
@@ -706,25 +779,12 @@ async def add(ctx: Context, *args):
             is_waitlist = True
 
     if is_waitlist and most_recent_game:
-        for queue in queues_to_add:
-            # TODO: Check player eligibility here?
-            queue_waitlist: QueueWaitlist | None = (
-                session.query(QueueWaitlist)
-                .filter(QueueWaitlist.finished_game_id == most_recent_game.id)
-                .first()
-            )
-            if queue_waitlist:
-                session.add(
-                    QueueWaitlistPlayer(
-                        queue_id=queue.id,
-                        queue_waitlist_id=queue_waitlist.id,
-                        player_id=message.author.id,
-                    )
-                )
-                try:
-                    session.commit()
-                except IntegrityError:
-                    session.rollback()
+        await db.run(
+            _add_to_queue_waitlist,
+            most_recent_game.id,
+            message.author.id,
+            [queue.id for queue in queues_to_add],
+        )
 
         queue_names = [queue.name for queue in queues_to_add]
         embed_description = f"<@{message.author.id}> your game has just finished, you will be randomized into **{', '.join(queue_names)}** {timer}"
@@ -762,233 +822,247 @@ async def autosub(ctx: Context, member: Member = None):
     not provided, then the player running the command must be in the game
     """
     message = ctx.message
-    session = ctx.session
-    guild = ctx.guild
-    assert message
-    assert guild
+    session: sqlalchemy.orm.Session
+    with db.UnitOfWork() as session:
+        guild = ctx.guild
+        assert message
+        assert guild
 
-    if config.ADMIN_AUTOSUB and not await is_admin(ctx):
-        return
+        if config.ADMIN_AUTOSUB and not await is_admin(ctx):
+            return
 
-    player_in_game_id = member.id if member else message.author.id
-    player_name = member.display_name if member else message.author.display_name
-    ipg_player: InProgressGamePlayer | None = (
-        session.query(InProgressGamePlayer)
-        .filter(InProgressGamePlayer.player_id == player_in_game_id)
-        .first()
-    )
-    if not ipg_player:
-        # If target player isn't in a game, exit early
-        await send_message(
-            message.channel,
-            embed_description=f"**{player_name}** must be in a game!",
-            colour=Colour.red(),
+        player_in_game_id = member.id if member else message.author.id
+        player_name = member.display_name if member else message.author.display_name
+        ipg_player: InProgressGamePlayer | None = (
+            session.query(InProgressGamePlayer)
+            .filter(InProgressGamePlayer.player_id == player_in_game_id)
+            .first()
         )
-        return
-    game: InProgressGame = (
-        session.query(InProgressGame)
-        .filter(InProgressGame.id == ipg_player.in_progress_game_id)
-        .first()
-    )
-    results = (
-        session.query(Player.id, Player.name)
-        .join(InProgressGamePlayer)
-        .filter(
-            InProgressGamePlayer.in_progress_game_id == game.id,
-            InProgressGamePlayer.team == 0,
+        if not ipg_player:
+            # If target player isn't in a game, exit early
+            await send_message(
+                message.channel,
+                embed_description=f"**{player_name}** must be in a game!",
+                colour=Colour.red(),
+            )
+            return
+        game: InProgressGame = (
+            session.query(InProgressGame)
+            .filter(InProgressGame.id == ipg_player.in_progress_game_id)
+            .first()
         )
-        .all()
-    )
-    # skip copying the player_ids
-    team0_player_names_before: list[str] = (
-        [res[1] for res in results if res] if results else []
-    )
-    results = (
-        session.query(Player.id, Player.name)
-        .join(InProgressGamePlayer)
-        .filter(
-            InProgressGamePlayer.in_progress_game_id == game.id,
-            InProgressGamePlayer.team == 1,
+        results = (
+            session.query(Player.id, Player.name)
+            .join(InProgressGamePlayer)
+            .filter(
+                InProgressGamePlayer.in_progress_game_id == game.id,
+                InProgressGamePlayer.team == 0,
+            )
+            .all()
         )
-        .all()
-    )
-    # skip copying the player_ids
-    team1_player_names_before: list[str] = (
-        [res[1] for res in results if res] if results else []
-    )
-    players_in_queue: List[QueuePlayer] = (
-        session.query(QueuePlayer).filter(QueuePlayer.queue_id == game.queue_id).all()
-    )
-
-    if len(players_in_queue) == 0:
-        queue: Queue = session.query(Queue).filter(Queue.id == game.queue_id).first()
-        await send_message(
-            message.channel,
-            embed_description=f"No players in queue **{queue.name}**",
-            colour=Colour.red(),
+        # skip copying the player_ids
+        team0_player_names_before: list[str] = (
+            [res[1] for res in results if res] if results else []
+        )
+        results = (
+            session.query(Player.id, Player.name)
+            .join(InProgressGamePlayer)
+            .filter(
+                InProgressGamePlayer.in_progress_game_id == game.id,
+                InProgressGamePlayer.team == 1,
+            )
+            .all()
+        )
+        # skip copying the player_ids
+        team1_player_names_before: list[str] = (
+            [res[1] for res in results if res] if results else []
+        )
+        players_in_queue: List[QueuePlayer] = (
+            session.query(QueuePlayer)
+            .filter(QueuePlayer.queue_id == game.queue_id)
+            .all()
         )
-        return
 
-    # Do the sub - swap the in progress game players and delete the subbed in player from the queue
-    player_to_sub: QueuePlayer = choice(players_in_queue)
-    session.add(
-        InProgressGamePlayer(
-            in_progress_game_id=ipg_player.in_progress_game_id,
-            player_id=player_to_sub.player_id,
-            team=ipg_player.team,
+        if len(players_in_queue) == 0:
+            queue: Queue = (
+                session.query(Queue).filter(Queue.id == game.queue_id).first()
+            )
+            await send_message(
+                message.channel,
+                embed_description=f"No players in queue **{queue.name}**",
+                colour=Colour.red(),
+            )
+            return
+
+        # Do the sub - swap the in progress game players and delete the subbed in player from the queue
+        player_to_sub: QueuePlayer = choice(players_in_queue)
+        session.add(
+            InProgressGamePlayer(
+                in_progress_game_id=ipg_player.in_progress_game_id,
+                player_id=player_to_sub.player_id,
+                team=ipg_player.team,
+            )
         )
-    )
-    session.delete(ipg_player)
-    queue_players_to_delete = (
-        session.query(QueuePlayer)
-        .filter(QueuePlayer.player_id == player_to_sub.player_id)
-        .all()
-    )
-    for qp in queue_players_to_delete:
-        session.delete(qp)
-    session.commit()
+        session.delete(ipg_player)
+        queue_players_to_delete = (
+            session.query(QueuePlayer)
+            .filter(QueuePlayer.player_id == player_to_sub.player_id)
+            .all()
+        )
+        for qp in queue_players_to_delete:
+            session.delete(qp)
+        session.commit()
 
-    subbed_in_player: Player = (
-        session.query(Player).filter(Player.id == player_to_sub.player_id).first()
-    )
-    subbed_out_player_name = (
-        member.display_name if member else message.author.display_name
-    )
-    await send_message(
-        message.channel,
-        embed_description=f"Auto-substituted **{subbed_in_player.name}** in for **{subbed_out_player_name}**",
-        colour=Colour.yellow(),
-    )
-    await _rebalance_game(game, session, message)
-    embed: discord.Embed = await create_in_progress_game_embed(session, game, guild)
-    short_game_id: str = short_uuid(game.id)
-    embed.title = f"New Teams for Game {short_game_id})"
-    embed.description = (
-        f"Auto-subbed **{subbed_in_player.name}** in for **{subbed_out_player_name}**"
-    )
-    embed.color = discord.Color.yellow()
-    results = (
-        session.query(Player.id, Player.name)
-        .join(InProgressGamePlayer)
-        .filter(
-            InProgressGamePlayer.in_progress_game_id == game.id,
-            InProgressGamePlayer.team == 0,
+        subbed_in_player: Player = (
+            session.query(Player).filter(Player.id == player_to_sub.player_id).first()
         )
-        .all()
-    )
-    team0_player_ids_after: list[int] = (
-        [res[0] for res in results if res] if results else []
-    )
-    team0_player_names_after: list[str] = [res[1] for res in results] if results else []
-    results = (
-        session.query(Player.id, Player.name)
-        .join(InProgressGamePlayer)
-        .filter(
-            InProgressGamePlayer.in_progress_game_id == game.id,
-            InProgressGamePlayer.team == 1,
+        subbed_out_player_name = (
+            member.display_name if member else message.author.display_name
         )
-        .all()
-    )
-    team1_player_ids_after: list[int] = [res[0] for res in results] if results else []
-    team1_player_names_after: list[str] = [res[1] for res in results] if results else []
-    team0_diff_vaules, team1_diff_values = get_team_name_diff(
-        team0_player_names_before,
-        team0_player_names_after,
-        team1_player_names_before,
-        team1_player_names_after,
-    )
-    for i, field in enumerate(embed.fields):
-        # brute force iteration through the embed's fields until we find the original team0 and team1 embeds to update
-        if field.name == f"⬅️ {game.team0_name} ({round(100 * game.win_probability)}%)":
-            embed.set_field_at(
-                i,
-                name=f"⬅️ {game.team0_name} ({round(100 * game.win_probability)}%)",
-                value=team0_diff_vaules,
-                inline=True,
+        await send_message(
+            message.channel,
+            embed_description=f"Auto-substituted **{subbed_in_player.name}** in for **{subbed_out_player_name}**",
+            colour=Colour.yellow(),
+        )
+        await _rebalance_game(game, session, message)
+        embed: discord.Embed = await create_in_progress_game_embed(session, game, guild)
+        short_game_id: str = short_uuid(game.id)
+        embed.title = f"New Teams for Game {short_game_id})"
+        embed.description = f"Auto-subbed **{subbed_in_player.name}** in for **{subbed_out_player_name}**"
+        embed.color = discord.Color.yellow()
+        results = (
+            session.query(Player.id, Player.name)
+            .join(InProgressGamePlayer)
+            .filter(
+                InProgressGamePlayer.in_progress_game_id == game.id,
+                InProgressGamePlayer.team == 0,
             )
-        if (
-            field.name
-            == f"➡️ {game.team1_name} ({round(100 * (1 - game.win_probability))}%)"
-        ):
-            embed.set_field_at(
-                i,
-                name=f"➡️ {game.team1_name} ({round(100 * (1 - game.win_probability))}%)",
-                value=team1_diff_values,
-                inline=True,
+            .all()
+        )
+        team0_player_ids_after: list[int] = (
+            [res[0] for res in results if res] if results else []
+        )
+        team0_player_names_after: list[str] = (
+            [res[1] for res in results] if results else []
+        )
+        results = (
+            session.query(Player.id, Player.name)
+            .join(InProgressGamePlayer)
+            .filter(
+                InProgressGamePlayer.in_progress_game_id == game.id,
+                InProgressGamePlayer.team == 1,
             )
-    be_voice_channel: discord.VoiceChannel | None = None
-    ds_voice_channel: discord.VoiceChannel | None = None
-    ipg_channels: list[InProgressGameChannel] | None = (
-        session.query(InProgressGameChannel)
-        .filter(InProgressGameChannel.in_progress_game_id == game.id)
-        .all()
-    )
-    for ipg_channel in ipg_channels or []:
-        discord_channel: discord.abc.GuildChannel | None = guild.get_channel(
-            ipg_channel.channel_id
-        )
-        if isinstance(discord_channel, discord.VoiceChannel):
-            # This is suboptimal solution but it's good enough for now. We should keep track of each team's VC in the database
-            if discord_channel.name == game.team0_name:
-                be_voice_channel = discord_channel
-            elif discord_channel.name == game.team1_name:
-                ds_voice_channel = discord_channel
-
-    coroutines = []
-    coroutines.append(message.channel.send(embed=embed))
-    # update the embed in the game channel
-    if game.message_id and game.channel_id:
-        game_channel = bot.get_channel(game.channel_id)
-        if isinstance(game_channel, TextChannel):
-            game_message: discord.PartialMessage = game_channel.get_partial_message(
-                game.message_id
+            .all()
+        )
+        team1_player_ids_after: list[int] = (
+            [res[0] for res in results] if results else []
+        )
+        team1_player_names_after: list[str] = (
+            [res[1] for res in results] if results else []
+        )
+        team0_diff_vaules, team1_diff_values = get_team_name_diff(
+            team0_player_names_before,
+            team0_player_names_after,
+            team1_player_names_before,
+            team1_player_names_after,
+        )
+        for i, field in enumerate(embed.fields):
+            # brute force iteration through the embed's fields until we find the original team0 and team1 embeds to update
+            if (
+                field.name
+                == f"⬅️ {game.team0_name} ({round(100 * game.win_probability)}%)"
+            ):
+                embed.set_field_at(
+                    i,
+                    name=f"⬅️ {game.team0_name} ({round(100 * game.win_probability)}%)",
+                    value=team0_diff_vaules,
+                    inline=True,
+                )
+            if (
+                field.name
+                == f"➡️ {game.team1_name} ({round(100 * (1 - game.win_probability))}%)"
+            ):
+                embed.set_field_at(
+                    i,
+                    name=f"➡️ {game.team1_name} ({round(100 * (1 - game.win_probability))}%)",
+                    value=team1_diff_values,
+                    inline=True,
+                )
+        be_voice_channel: discord.VoiceChannel | None = None
+        ds_voice_channel: discord.VoiceChannel | None = None
+        ipg_channels: list[InProgressGameChannel] | None = (
+            session.query(InProgressGameChannel)
+            .filter(InProgressGameChannel.in_progress_game_id == game.id)
+            .all()
+        )
+        for ipg_channel in ipg_channels or []:
+            discord_channel: discord.abc.GuildChannel | None = guild.get_channel(
+                ipg_channel.channel_id
             )
-            coroutines.append(game_message.edit(embed=embed))
+            if isinstance(discord_channel, discord.VoiceChannel):
+                # This is suboptimal solution but it's good enough for now. We should keep track of each team's VC in the database
+                if discord_channel.name == game.team0_name:
+                    be_voice_channel = discord_channel
+                elif discord_channel.name == game.team1_name:
+                    ds_voice_channel = discord_channel
+
+        coroutines = []
+        coroutines.append(
+            dispatcher.send(message.channel, Priority.DEFAULT, embed=embed)
+        )
+        # update the embed in the game channel
+        if game.message_id and game.channel_id:
+            game_channel = bot.get_channel(game.channel_id)
+            if isinstance(game_channel, TextChannel):
+                game_message: discord.PartialMessage = game_channel.get_partial_message(
+                    game.message_id
+                )
+                coroutines.append(
+                    dispatcher.edit(game_message, Priority.DEFAULT, embed=embed)
+                )
 
-    # send the new discord.Embed to each player
-    if be_voice_channel:
-        for player_id in team0_player_ids_after:
-            coroutines.append(
-                send_in_guild_message(
-                    guild,
-                    player_id,
-                    message_content=be_voice_channel.jump_url,
-                    embed=embed,
+        # send the new discord.Embed to each player
+        if be_voice_channel:
+            for player_id in team0_player_ids_after:
+                coroutines.append(
+                    send_in_guild_message(
+                        guild,
+                        player_id,
+                        message_content=be_voice_channel.jump_url,
+                        embed=embed,
+                    )
                 )
-            )
-    if ds_voice_channel:
-        for player_id in team1_player_ids_after:
-            coroutines.append(
-                send_in_guild_message(
-                    guild,
-                    player_id,
-                    message_content=ds_voice_channel.jump_url,
-                    embed=embed,
+        if ds_voice_channel:
+            for player_id in team1_player_ids_after:
+                coroutines.append(
+                    send_in_guild_message(
+                        guild,
+                        player_id,
+                        message_content=ds_voice_channel.jump_url,
+                        embed=embed,
+                    )
                 )
-            )
-    # use gather to run the sends and edit concurrently in the event loop
-    try:
-        await asyncio.gather(*coroutines)
-    except:
-        _log.exception("[autosub] Ignoring exception in asyncio.gather:")
+        # use gather to run the sends and edit concurrently in the event loop
+        try:
+            await asyncio.gather(*coroutines)
+        except:
+            _log.exception("[autosub] Ignoring exception in asyncio.gather:")
 
-    session.commit()
+        session.commit()
 
 
-@bot.command(name="del")
-async def del_(ctx: Context, *args):
+def _delete_from_queues(
+    session: sqlalchemy.orm.Session, player_id: int, args: tuple[str, ...]
+) -> list[tuple[Queue, list[str]]]:
     """
-    Players deletes self from queue(s)
+    Runs on the database thread, see db.run
 
-    If no args deletes from existing queues
+    :returns: the queues the player was removed from and who is left in each
     """
-    message = ctx.message
-    session: sqlalchemy.orm.Session = ctx.session
-    embed = discord.Embed(color=discord.Color.green())
     queues_to_del_query = (
         session.query(Queue)
         .join(QueuePlayer)
-        .filter(QueuePlayer.player_id == message.author.id)
+        .filter(QueuePlayer.player_id == player_id)
         .order_by(Queue.ordinal.asc())
     )  # type: ignore
 
@@ -1003,9 +1077,10 @@ async def del_(ctx: Context, *args):
 
     queues_to_del = queues_to_del_query.all()
 
+    deleted_from: list[tuple[Queue, list[str]]] = []
     for queue in queues_to_del:
         session.query(QueuePlayer).filter(
-            QueuePlayer.queue_id == queue.id, QueuePlayer.player_id == message.author.id
+            QueuePlayer.queue_id == queue.id, QueuePlayer.player_id == player_id
         ).delete()
         # TODO: Test this part
         queue_waitlist: QueueWaitlist | None = (
@@ -1017,7 +1092,7 @@ async def del_(ctx: Context, *args):
         )
         if queue_waitlist:
             session.query(QueueWaitlistPlayer).filter(
-                QueueWaitlistPlayer.player_id == message.author.id,
+                QueueWaitlistPlayer.player_id == player_id,
                 QueueWaitlistPlayer.queue_waitlist_id == queue_waitlist.id,
             ).delete()
         result = (
@@ -1027,6 +1102,27 @@ async def del_(ctx: Context, *args):
             .all()
         )
         player_names: list[str] = [name[0] for name in result] if result else []
+        deleted_from.append((queue, player_names))
+
+    # TODO: Check deleting by name / ordinal
+    # session.query(QueueWaitlistPlayer).filter(
+    #     QueueWaitlistPlayer.player_id == player_id
+    # ).delete()
+    session.commit()
+    return deleted_from
+
+
+@bot.command(name="del")
+async def del_(ctx: Context, *args):
+    """
+    Players deletes self from queue(s)
+
+    If no args deletes from existing queues
+    """
+    message = ctx.message
+    embed = discord.Embed(color=discord.Color.green())
+    deleted_from = await db.run(_delete_from_queues, message.author.id, args)
+    for queue, player_names in deleted_from:
         queue_title_str = (
             f"(**{queue.ordinal}**) {queue.name} [{len(player_names)}/{queue.size}]"
         )
@@ -1041,13 +1137,8 @@ async def del_(ctx: Context, *args):
             inline=True,
         )
 
-    # TODO: Check deleting by name / ordinal
-    # session.query(QueueWaitlistPlayer).filter(
-    #     QueueWaitlistPlayer.player_id == message.author.id
-    # ).delete()
-
-    if queues_to_del:
-        embed_description = f"<@{message.author.id}> removed from **{', '.join([queue.name for queue in queues_to_del])}**"
+    if deleted_from:
+        embed_description = f"<@{message.author.id}> removed from **{', '.join([queue.name for queue, _ in deleted_from])}**"
         embed.color = discord.Color.green()
     else:
         embed_description = f"<@{message.author.id}> no valid queues specified"
@@ -1059,8 +1150,6 @@ async def del_(ctx: Context, *args):
         # to line everything up nicely when there's >= 5 fields and only one "column" slot left, we add a blank
         embed.add_field(name="", value="", inline=True)
     await message.channel.send(embed=embed)
-    session.commit()
-    session.close()
 
 
 # @bot.command()
@@ -1080,175 +1169,30 @@ async def lt(ctx: Context):
     query_url = "http://tribesquery.toocrooked.com/hostQuery.php?server=207.148.13.132:28006&port=28006"
     await ctx.message.channel.send(query_url)
 
-    ntf = NamedTemporaryFile(delete=True, suffix=".png")
-    imgkit.from_url(query_url, ntf.name)
-    image = Image.open(ntf.name)
-    cropped = image.crop((0, 0, 450, 650))
-    cropped.save(ntf.name)
-    await ctx.message.channel.send(file=discord.File(ntf.name))
-    ntf.close()
+    png = await screenshots.render_url(query_url, 450, 650)
+    await ctx.message.channel.send(
+        file=discord.File(io.BytesIO(png), filename="query.png")
+    )
 
 
 @bot.command()
 async def pug(ctx: Context):
     query_url = "http://tribesquery.toocrooked.com/hostQuery.php?server=216.128.150.208port=28001"
     await ctx.message.channel.send(query_url)
-    ntf = NamedTemporaryFile(delete=True, suffix=".png")
-    imgkit.from_url(query_url, ntf.name)
-    image = Image.open(ntf.name)
-    cropped = image.crop((0, 0, 450, 650))
-    cropped.save(ntf.name)
-    await ctx.message.channel.send(file=discord.File(ntf.name))
-    ntf.close()
+    png = await screenshots.render_url(query_url, 450, 650)
+    await ctx.message.channel.send(
+        file=discord.File(io.BytesIO(png), filename="query.png")
+    )
 
 
 @bot.command()
 async def status(ctx: Context, *args):
     assert ctx.guild
-    session: sqlalchemy.orm.Session
-    with Session() as session:
-        queue_indices: list[int] = []
-        queue_names: list[str] = []
-        all_rotations: list[Rotation] = []  # TODO: use sets
-        if len(args) == 0:
-            all_rotations = (
-                session.query(Rotation).order_by(Rotation.created_at.asc()).all()
-            )
-        else:
-            # get the rotation associated to the specified queue
-            all_rotations = []
-            for arg in args:
-                # TODO: avoid looping so you only need one query
-                try:
-                    queue_index = int(arg)
-                    arg_rotation = (
-                        session.query(Rotation)
-                        .join(Queue)
-                        .filter(Queue.ordinal == queue_index)
-                        .first()
-                    )
-                    if arg_rotation:
-                        queue_indices.append(queue_index)
-                        if arg_rotation not in all_rotations:
-                            all_rotations.append(arg_rotation)
-                except ValueError:
-                    arg_rotation = (
-                        session.query(Rotation)
-                        .join(Queue)
-                        .filter(Queue.name.ilike(arg))
-                        .first()
-                    )
-                    if arg_rotation:
-                        queue_names.append(arg)
-                        if arg_rotation not in all_rotations:
-                            all_rotations.append(arg_rotation)
-                except IndexError:
-                    pass
-
-        if not all_rotations:
-            await ctx.channel.send("No Rotations")
-            return
-
-        embed = Embed(title="Queues", color=Colour.blue())
-        ipg_embeds: list[Embed] = []
-        rotation_queues: list[Queue] | None
-        for rotation in all_rotations:
-            conditions = [Queue.rotation_id == rotation.id]
-            if queue_indices:
-                conditions.append(Queue.ordinal.in_(queue_indices))
-            if queue_names:
-                conditions.append(Queue.name.in_(queue_names))
-            rotation_queues = (
-                session.query(Queue)
-                .filter(*conditions)
-                .order_by(Queue.ordinal.asc())
-                .all()
-            )
-            if not rotation_queues:
-                continue
-
-            games_by_queue: dict[str, list[InProgressGame]] = defaultdict(list)
-            for game in session.query(InProgressGame).filter(
-                InProgressGame.is_finished == False
-            ):
-                if game.queue_id:
-                    games_by_queue[game.queue_id].append(game)
-
-            next_rotation_map: RotationMap | None = (
-                session.query(RotationMap)
-                .filter(RotationMap.rotation_id == rotation.id)
-                .filter(RotationMap.is_next == True)
-                .first()
-            )
-            if not next_rotation_map:
-                continue
-            next_map: Map | None = (
-                session.query(Map)
-                .join(RotationMap, RotationMap.map_id == Map.id)
-                .filter(next_rotation_map.map_id == Map.id)
-                .first()
-            )
-            next_map_str = f"{next_map.full_name} ({next_map.short_name})"
-            if config.ENABLE_RAFFLE:
-                has_raffle_reward = next_rotation_map.raffle_ticket_reward > 0
-                raffle_reward = (
-                    next_rotation_map.raffle_ticket_reward
-                    if has_raffle_reward
-                    else config.DEFAULT_RAFFLE_VALUE
-                )
-                next_map_str += f" ({raffle_reward} tickets)"
-            embed.add_field(
-                name=f"",
-                # value="─"*10,
-                value=f"```asciidoc\n* {rotation.name}```",
-                inline=False,
-            )
-            embed.add_field(
-                name=f"🗺️ Next Map",
-                value=next_map_str,
-                inline=False,
-            )
-
-            rotation_queues_len = len(rotation_queues)
-            for i, queue in enumerate(rotation_queues):
-                if queue.is_locked:
-                    continue
-                players_in_queue: list[Player] = (
-                    session.query(Player)
-                    .join(QueuePlayer)
-                    .filter(QueuePlayer.queue_id == queue.id)
-                    .all()
-                )
-                queue_title_str = f"(**{queue.ordinal}**) {queue.name} [{len(players_in_queue)}/{queue.size}]"
-                player_display_names: list[str] = (
-                    [player.name for player in players_in_queue]
-                    if players_in_queue
-                    else []
-                )
-                newline = "\n"  # Escape sequence (backslash) not allowed in expression portion of f-string prior to Python 3.12
-                embed.add_field(
-                    name=queue_title_str,
-                    value=(
-                        "> \n** **"  # weird hack to create an empty quote
-                        if not player_display_names
-                        else f">>> {newline.join(player_display_names)}"
-                    ),
-                    inline=True,
-                )
-                if i == rotation_queues_len - 1 and i >= 5 and i % 3 == 2:
-                    # embeds are allowed 3 "columns" per "row"
-                    # to line everything up nicely when there's >= 5 queues and only one "column" slot left, we add a blank
-                    embed.add_field(name="", value="", inline=True)
-                if queue.id in games_by_queue:
-                    game: InProgressGame
-                    for game in games_by_queue[queue.id]:
-                        ipg_embed = await create_in_progress_game_embed(
-                            session, game, ctx.guild
-                        )
-                        ipg_embeds.append(ipg_embed)
-        await ctx.channel.send(
-            embeds=[embed] + ipg_embeds,
-        )
+    embeds = await get_status_embeds(args)
+    if embeds is None:
+        await ctx.channel.send("No Rotations")
+        return
+    await ctx.channel.send(embeds=embeds)
 
 
 # TODO: Re-enable when configs are stored in the db
@@ -1402,228 +1346,246 @@ async def sub(ctx: Context, member: Member):
     """
     Substitute one player in a game for another
     """
-    session = ctx.session
-    guild = ctx.guild
-    assert guild
-    caller = message.author
-    if message.author.id == member.id:
-        await send_message(
-            channel=message.channel,
-            embed_description=f"You cannot sub yourself",
-            colour=Colour.red(),
-        )
-        return
-    caller_game = get_player_game(caller.id, session)
-    callee = member
-    callee_game = get_player_game(callee.id, session)
+    session: sqlalchemy.orm.Session
+    with db.UnitOfWork() as session:
+        guild = ctx.guild
+        assert guild
+        caller = message.author
+        if message.author.id == member.id:
+            await send_message(
+                channel=message.channel,
+                embed_description=f"You cannot sub yourself",
+                colour=Colour.red(),
+            )
+            return
+        caller_game = get_player_game(caller.id, session)
+        callee = member
+        callee_game = get_player_game(callee.id, session)
 
-    if caller_game and callee_game:
-        await send_message(
-            channel=message.channel,
-            embed_description=f"{escape_markdown(caller.name)} and {escape_markdown(callee.name)} are both already in a game",
-            colour=Colour.red(),
-        )
-        return
-    elif not caller_game and not callee_game:
-        await send_message(
-            channel=message.channel,
-            embed_description=f"{escape_markdown(caller.name)} and {escape_markdown(callee.name)} are not in a game",
-            colour=Colour.red(),
-        )
-        return
+        if caller_game and callee_game:
+            await send_message(
+                channel=message.channel,
+                embed_description=f"{escape_markdown(caller.name)} and {escape_markdown(callee.name)} are both already in a game",
+                colour=Colour.red(),
+            )
+            return
+        elif not caller_game and not callee_game:
+            await send_message(
+                channel=message.channel,
+                embed_description=f"{escape_markdown(caller.name)} and {escape_markdown(callee.name)} are not in a game",
+                colour=Colour.red(),
+            )
+            return
 
-    # The callee may not be recorded in the database
-    if not session.query(Player).filter(Player.id == callee.id).first():
-        session.add(Player(id=callee.id, name=callee.name))
+        # The callee may not be recorded in the database
+        if not session.query(Player).filter(Player.id == callee.id).first():
+            session.add(Player(id=callee.id, name=callee.name))
 
-    if caller_game:
-        caller_game_player = (
-            session.query(InProgressGamePlayer)
+        if caller_game:
+            caller_game_player = (
+                session.query(InProgressGamePlayer)
+                .filter(
+                    InProgressGamePlayer.in_progress_game_id == caller_game.id,
+                    InProgressGamePlayer.player_id == caller.id,
+                )
+                .first()
+            )
+            session.add(
+                InProgressGamePlayer(
+                    in_progress_game_id=caller_game.id,
+                    player_id=callee.id,
+                    team=caller_game_player.team,
+                )
+            )
+            session.delete(caller_game_player)
+
+            # Remove the person subbed in from queues
+            session.query(QueuePlayer).filter(
+                QueuePlayer.player_id == callee.id
+            ).delete()
+            session.commit()
+        elif callee_game:
+            callee_game_player = (
+                session.query(InProgressGamePlayer)
+                .filter(
+                    InProgressGamePlayer.in_progress_game_id == callee_game.id,
+                    InProgressGamePlayer.player_id == callee.id,
+                )
+                .first()
+            )
+            session.add(
+                InProgressGamePlayer(
+                    in_progress_game_id=callee_game.id,
+                    player_id=caller.id,
+                    team=callee_game_player.team,
+                )
+            )
+            session.delete(callee_game_player)
+
+            # Remove the person subbing in from queues
+            session.query(QueuePlayer).filter(
+                QueuePlayer.player_id == caller.id
+            ).delete()
+            session.commit()
+
+        game: InProgressGame | None = callee_game or caller_game
+        if not game:
+            return
+
+        # get player_names per team before the swap
+        results = (
+            session.query(Player.id, Player.name)
+            .join(InProgressGamePlayer)
             .filter(
-                InProgressGamePlayer.in_progress_game_id == caller_game.id,
-                InProgressGamePlayer.player_id == caller.id,
+                InProgressGamePlayer.in_progress_game_id == game.id,
+                InProgressGamePlayer.team == 0,
             )
-            .first()
+            .all()
         )
-        session.add(
-            InProgressGamePlayer(
-                in_progress_game_id=caller_game.id,
-                player_id=callee.id,
-                team=caller_game_player.team,
+        # skip copying the player_ids
+        team0_player_names_before: list[str] = (
+            [res[1] for res in results if res] if results else []
+        )
+        results = (
+            session.query(Player.id, Player.name)
+            .join(InProgressGamePlayer)
+            .filter(
+                InProgressGamePlayer.in_progress_game_id == game.id,
+                InProgressGamePlayer.team == 1,
             )
+            .all()
+        )
+        # skip copying the player_ids
+        team1_player_names_before: list[str] = (
+            [res[1] for res in results if res] if results else []
         )
-        session.delete(caller_game_player)
 
-        # Remove the person subbed in from queues
-        session.query(QueuePlayer).filter(QueuePlayer.player_id == callee.id).delete()
-        session.commit()
-    elif callee_game:
-        callee_game_player = (
-            session.query(InProgressGamePlayer)
+        await _rebalance_game(game, session, message)
+        embed: discord.Embed = await create_in_progress_game_embed(session, game, guild)
+        short_game_id: str = short_uuid(game.id)
+        embed.title = f"New Teams for Game {short_game_id})"
+        embed.description = (
+            f"Substituted **{caller.display_name}** in for **{callee.display_name}**"
+        )
+        embed.color = discord.Color.yellow()
+        results = (
+            session.query(Player.id, Player.name)
+            .join(InProgressGamePlayer)
             .filter(
-                InProgressGamePlayer.in_progress_game_id == callee_game.id,
-                InProgressGamePlayer.player_id == callee.id,
+                InProgressGamePlayer.in_progress_game_id == game.id,
+                InProgressGamePlayer.team == 0,
             )
-            .first()
+            .all()
         )
-        session.add(
-            InProgressGamePlayer(
-                in_progress_game_id=callee_game.id,
-                player_id=caller.id,
-                team=callee_game_player.team,
+        team0_player_ids_after: list[int] = (
+            [res[0] for res in results if res] if results else []
+        )
+        team0_player_names_after: list[str] = (
+            [res[1] for res in results] if results else []
+        )
+        results = (
+            session.query(Player.id, Player.name)
+            .join(InProgressGamePlayer)
+            .filter(
+                InProgressGamePlayer.in_progress_game_id == game.id,
+                InProgressGamePlayer.team == 1,
             )
+            .all()
         )
-        session.delete(callee_game_player)
-
-        # Remove the person subbing in from queues
-        session.query(QueuePlayer).filter(QueuePlayer.player_id == caller.id).delete()
-        session.commit()
-
-    game: InProgressGame | None = callee_game or caller_game
-    if not game:
-        return
-
-    # get player_names per team before the swap
-    results = (
-        session.query(Player.id, Player.name)
-        .join(InProgressGamePlayer)
-        .filter(
-            InProgressGamePlayer.in_progress_game_id == game.id,
-            InProgressGamePlayer.team == 0,
+        team1_player_ids_after: list[int] = (
+            [res[0] for res in results] if results else []
         )
-        .all()
-    )
-    # skip copying the player_ids
-    team0_player_names_before: list[str] = (
-        [res[1] for res in results if res] if results else []
-    )
-    results = (
-        session.query(Player.id, Player.name)
-        .join(InProgressGamePlayer)
-        .filter(
-            InProgressGamePlayer.in_progress_game_id == game.id,
-            InProgressGamePlayer.team == 1,
+        team1_player_names_after: list[str] = (
+            [res[1] for res in results] if results else []
         )
-        .all()
-    )
-    # skip copying the player_ids
-    team1_player_names_before: list[str] = (
-        [res[1] for res in results if res] if results else []
-    )
-
-    await _rebalance_game(game, session, message)
-    embed: discord.Embed = await create_in_progress_game_embed(session, game, guild)
-    short_game_id: str = short_uuid(game.id)
-    embed.title = f"New Teams for Game {short_game_id})"
-    embed.description = (
-        f"Substituted **{caller.display_name}** in for **{callee.display_name}**"
-    )
-    embed.color = discord.Color.yellow()
-    results = (
-        session.query(Player.id, Player.name)
-        .join(InProgressGamePlayer)
-        .filter(
-            InProgressGamePlayer.in_progress_game_id == game.id,
-            InProgressGamePlayer.team == 0,
+        team0_diff_vaules, team1_diff_values = get_team_name_diff(
+            team0_player_names_before,
+            team0_player_names_after,
+            team1_player_names_before,
+            team1_player_names_after,
         )
-        .all()
-    )
-    team0_player_ids_after: list[int] = (
-        [res[0] for res in results if res] if results else []
-    )
-    team0_player_names_after: list[str] = [res[1] for res in results] if results else []
-    results = (
-        session.query(Player.id, Player.name)
-        .join(InProgressGamePlayer)
-        .filter(
-            InProgressGamePlayer.in_progress_game_id == game.id,
-            InProgressGamePlayer.team == 1,
+        for i, field in enumerate(embed.fields):
+            # brute force iteration through the embed's fields until we find the original team0 and team1 embeds to update
+            if (
+                field.name
+                == f"⬅️ {game.team0_name} ({round(100 * game.win_probability)}%)"
+            ):
+                embed.set_field_at(
+                    i,
+                    name=f"⬅️ {game.team0_name} ({round(100 * game.win_probability)}%)",
+                    value=team0_diff_vaules,
+                    inline=True,
+                )
+            if (
+                field.name
+                == f"➡️ {game.team1_name} ({round(100 * (1 - game.win_probability))}%)"
+            ):
+                embed.set_field_at(
+                    i,
+                    name=f"➡️ {game.team1_name} ({round(100 * (1 - game.win_probability))}%)",
+                    value=team1_diff_values,
+                    inline=True,
+                )
+        be_voice_channel: discord.VoiceChannel | None = None
+        ds_voice_channel: discord.VoiceChannel | None = None
+        ipg_channels: list[InProgressGameChannel] | None = (
+            session.query(InProgressGameChannel)
+            .filter(InProgressGameChannel.in_progress_game_id == game.id)
+            .all()
         )
-        .all()
-    )
-    team1_player_ids_after: list[int] = [res[0] for res in results] if results else []
-    team1_player_names_after: list[str] = [res[1] for res in results] if results else []
-    team0_diff_vaules, team1_diff_values = get_team_name_diff(
-        team0_player_names_before,
-        team0_player_names_after,
-        team1_player_names_before,
-        team1_player_names_after,
-    )
-    for i, field in enumerate(embed.fields):
-        # brute force iteration through the embed's fields until we find the original team0 and team1 embeds to update
-        if field.name == f"⬅️ {game.team0_name} ({round(100 * game.win_probability)}%)":
-            embed.set_field_at(
-                i,
-                name=f"⬅️ {game.team0_name} ({round(100 * game.win_probability)}%)",
-                value=team0_diff_vaules,
-                inline=True,
-            )
-        if (
-            field.name
-            == f"➡️ {game.team1_name} ({round(100 * (1 - game.win_probability))}%)"
-        ):
-            embed.set_field_at(
-                i,
-                name=f"➡️ {game.team1_name} ({round(100 * (1 - game.win_probability))}%)",
-                value=team1_diff_values,
-                inline=True,
-            )
-    be_voice_channel: discord.VoiceChannel | None = None
-    ds_voice_channel: discord.VoiceChannel | None = None
-    ipg_channels: list[InProgressGameChannel] | None = (
-        session.query(InProgressGameChannel)
-        .filter(InProgressGameChannel.in_progress_game_id == game.id)
-        .all()
-    )
-    for ipg_channel in ipg_channels or []:
-        discord_channel: discord.abc.GuildChannel | None = guild.get_channel(
-            ipg_channel.channel_id
-        )
-        if isinstance(discord_channel, discord.VoiceChannel):
-            # This is suboptimal solution but it's good enough for now. We should keep track of each team's VC in the database
-            if discord_channel.name == game.team0_name:
-                be_voice_channel = discord_channel
-            elif discord_channel.name == game.team1_name:
-                ds_voice_channel = discord_channel
-
-    coroutines = []
-    coroutines.append(message.channel.send(embed=embed))
-    # update the embed in the game channel
-    if game.message_id and game.channel_id:
-        game_channel = bot.get_channel(game.channel_id)
-        if isinstance(game_channel, TextChannel):
-            game_message: discord.PartialMessage = game_channel.get_partial_message(
-                game.message_id
+        for ipg_channel in ipg_channels or []:
+            discord_channel: discord.abc.GuildChannel | None = guild.get_channel(
+                ipg_channel.channel_id
             )
-            coroutines.append(game_message.edit(embed=embed))
+            if isinstance(discord_channel, discord.VoiceChannel):
+                # This is suboptimal solution but it's good enough for now. We should keep track of each team's VC in the database
+                if discord_channel.name == game.team0_name:
+                    be_voice_channel = discord_channel
+                elif discord_channel.name == game.team1_name:
+                    ds_voice_channel = discord_channel
+
+        coroutines = []
+        coroutines.append(
+            dispatcher.send(message.channel, Priority.DEFAULT, embed=embed)
+        )
+        # update the embed in the game channel
+        if game.message_id and game.channel_id:
+            game_channel = bot.get_channel(game.channel_id)
+            if isinstance(game_channel, TextChannel):
+                game_message: discord.PartialMessage = game_channel.get_partial_message(
+                    game.message_id
+                )
+                coroutines.append(
+                    dispatcher.edit(game_message, Priority.DEFAULT, embed=embed)
+                )
 
-    # send the new discord.Embed to each player
-    if be_voice_channel:
-        for player_id in team0_player_ids_after:
-            coroutines.append(
-                send_in_guild_message(
-                    guild,
-                    player_id,
-                    message_content=be_voice_channel.jump_url,
-                    embed=embed,
+        # send the new discord.Embed to each player
+        if be_voice_channel:
+            for player_id in team0_player_ids_after:
+                coroutines.append(
+                    send_in_guild_message(
+                        guild,
+                        player_id,
+                        message_content=be_voice_channel.jump_url,
+                        embed=embed,
+                    )
                 )
-            )
-    if ds_voice_channel:
-        for player_id in team1_player_ids_after:
-            coroutines.append(
-                send_in_guild_message(
-                    guild,
-                    player_id,
-                    message_content=ds_voice_channel.jump_url,
-                    embed=embed,
+        if ds_voice_channel:
+            for player_id in team1_player_ids_after:
+                coroutines.append(
+                    send_in_guild_message(
+                        guild,
+                        player_id,
+                        message_content=ds_voice_channel.jump_url,
+                        embed=embed,
+                    )
                 )
-            )
-    # use gather to run the sends and edit concurrently in the event loop
-    try:
-        await asyncio.gather(*coroutines)
-    except:
-        _log.exception("[autosub] Ignoring exception in asyncio.gather:")
-    session.commit()
+        # use gather to run the sends and edit concurrently in the event loop
+        try:
+            await asyncio.gather(*coroutines)
+        except:
+            _log.exception("[autosub] Ignoring exception in asyncio.gather:")
+        session.commit()
 
 
 @bot.command()
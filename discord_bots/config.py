@@ -187,6 +187,7 @@ MAP_VOTE_THRESHOLD: int = _to_int(key="MAP_VOTE_THRESHOLD", default=7)
 STATS_DIR: str | None = _to_str(key="STATS_DIR")
 STATS_WIDTH = _to_int(key="STATS_WIDTH")
 STATS_HEIGHT = _to_int(key="STATS_HEIGHT")
+SCREENSHOT_PROCESSES: int = _to_int(key="SCREENSHOT_PROCESSES", default=1)
 ECONOMY_ENABLED: bool = _to_bool(key="ECONOMY_ENABLED", default=False)
 CURRENCY_NAME: str = _to_str(key="CURRENCY_NAME", default="Shazbucks")
 STARTING_CURRENCY: int = _to_int(key="STARTING_CURRENCY", default=100)
@@ -194,4 +195,18 @@ PREDICTION_TIMEOUT: int = _to_int(key="PREDICTION_TIMEOUT", default=300)
 CURRENCY_AWARD: int = _to_int(key="CURRENCY_AWARD", default=25)
 GAME_HISTORY_CHANNEL: int = _to_int(key="GAME_HISTORY_CHANNEL", required=True)
 ADMIN_AUTOSUB: bool = _to_bool(key="ADMIN_AUTOSUB", default=False)
+CHANNEL_POOL_SIZE: int = _to_int(key="CHANNEL_POOL_SIZE", default=0)
+DISPATCHER_CONCURRENCY: int = _to_int(key="DISPATCHER_CONCURRENCY", default=8)
+DISPATCHER_GLOBAL_RATE: int = _to_int(key="DISPATCHER_GLOBAL_RATE", default=40)
+DATABASE_THREADS: int = _to_int(key="DATABASE_THREADS", default=4)
+SQLITE_READ_THREADS: int = _to_int(key="SQLITE_READ_THREADS", default=4)
+SQLITE_STORAGE_PROFILE: str = _to_str(key="SQLITE_STORAGE_PROFILE", default="wal")
+SQLITE_CHECKPOINT_MINUTES: int = _to_int(key="SQLITE_CHECKPOINT_MINUTES", default=15)
+STATUS_CACHE_SECONDS: int = _to_int(key="STATUS_CACHE_SECONDS", default=10)
+ARCHIVE_AFTER_DAYS: int = _to_int(key="ARCHIVE_AFTER_DAYS", default=0)
+BACKUP_DIR: str = _to_str(key="BACKUP_DIR", default=".")
+BACKUP_COMPRESS: bool = _to_bool(key="BACKUP_COMPRESS", default=False)
+BACKUP_KEEP: int = _to_int(key="BACKUP_KEEP", default=0)
+COMPACT_UUIDS: bool = _to_bool(key="COMPACT_UUIDS", default=False)
+CONVERTING_UUIDS: bool = _to_bool(key="CONVERTING_UUIDS", default=False)
 # TODO grouping here and in docs
@@ -0,0 +1,217 @@
+"""
+Runs database work off of the event loop.
+
+SQLAlchemy's queries are blocking, so a slow query (or waiting on a SQLite lock
+held by a long commit) used to freeze every command along with the gateway
+heartbeat. Functions passed to run() get a fresh session on a dedicated database
+thread instead, and the event loop awaits the result:
+
+    def get_player_name(session: SQLAlchemySession, player_id: int) -> str | None:
+        return session.query(Player.name).filter(Player.id == player_id).scalar()
+
+    name = await db.read(get_player_name, player.id)
+
+Use run() for anything that writes and read() for anything that doesn't. With
+SQLite, run() goes to a single database thread, so the writes made through it
+are serialized with each other. They aren't serialized with the writes that are
+still made with Session() on the event loop (see below), which SQLite's lock
+and busy timeout still have to sort out. read() goes to a pool of threads
+with their own read-only connections, which the database's WAL journal lets
+read while something else is writing, whether that's run() or a session on the
+event loop (see storage.py). With postgres both go to the same pool.
+
+Rules for functions passed to run() and read():
+- Commit before returning, anything uncommitted is rolled back
+- Return plain values, embeds or loaded objects. The session is closed by the
+time the caller gets the result, so relationships can't be lazy loaded from it
+- Don't await or touch discord objects other than reading their ids
+
+Only some hot paths go through run() so far: !add and !del, finishing a game,
+settling predictions, archiving and checkpointing. Everything else (on_message,
+most of tasks.py, the cogs, the channel pool) still opens Session() on the event
+loop, so writes come from two threads. A session on the event loop that has
+written and then awaits holds SQLite's write lock, and run() waits on it for up
+to the busy timeout. Those can be moved over one function at a time.
+
+Helpers that need a session open it with UnitOfWork() instead of Session(). If
+the caller is already in a unit of work (e.g. !add, or a function passed to run()
+or read()), the helper joins its session rather than opening another one. Only
+the outermost unit commits when it ends. A unit on the event loop that has
+written must commit before it awaits discord, for the reason above.
+"""
+
+import asyncio
+import contextvars
+import functools
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Concatenate, ParamSpec, TypeVar
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session as SQLAlchemySession
+from sqlalchemy.pool import SingletonThreadPool
+
+import discord_bots.config as config
+from discord_bots.models import Session, engine
+from discord_bots.storage import apply_storage_profile
+
+_log = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+_is_sqlite = engine.dialect.name == "sqlite"
+
+# SQLite only handles one writer at a time and its connections must stay on the
+# thread that created them, so run() gets exactly one thread. Sessions opened on
+# the event loop write through their own connections
+_executor = ThreadPoolExecutor(
+    max_workers=1 if _is_sqlite else config.DATABASE_THREADS,
+    thread_name_prefix="db",
+)
+
+
+def _create_read_pool() -> tuple[ThreadPoolExecutor, sessionmaker]:
+    if not _is_sqlite:
+        return _executor, Session
+    database = engine.url.database
+    if config.SQLITE_READ_THREADS <= 0 or not database or database == ":memory:":
+        return _executor, Session
+
+    read_engine = create_engine(
+        f"sqlite:///file:{database}?mode=ro&uri=true",
+        echo=False,
+        connect_args={"timeout": 15},
+        # one connection per reader thread, reused for as long as the thread lives
+        poolclass=SingletonThreadPool,
+        pool_size=config.SQLITE_READ_THREADS,
+    )
+    # readers only read alongside writes (from run() or the event loop) if the
+    # storage profile uses WAL
+    apply_storage_profile(read_engine, read_only=True)
+    _log.info(
+        f"[db] Serving SQLite reads from {config.SQLITE_READ_THREADS} read-only connections"
+    )
+    reader = ThreadPoolExecutor(
+        max_workers=config.SQLITE_READ_THREADS, thread_name_prefix="db-read"
+    )
+    return reader, sessionmaker(bind=read_engine)
+
+
+_reader, ReadSession = _create_read_pool()
+
+# (session, owner), see _owner
+_current_unit_of_work: contextvars.ContextVar[
+    tuple[SQLAlchemySession, object] | None
+] = contextvars.ContextVar("current_unit_of_work", default=None)
+
+
+def _owner() -> object:
+    """
+    Tasks created while a unit of work is open inherit it along with the rest of
+    the context, but must not share its session. Only the task (or database
+    thread) that opened a unit can join it
+    """
+    try:
+        return asyncio.current_task()
+    except RuntimeError:
+        return threading.get_ident()
+
+
+class UnitOfWork:
+    """
+    Join the current unit of work, or start one with a new session:
+
+        with UnitOfWork() as session:
+            ...
+
+    The unit that started the session commits it on the way out, or rolls back
+    if there was an exception. Joined units leave that to it, so helpers don't
+    need to commit unless they're about to await discord with writes pending
+    (see the top of this module). Sessions don't expire on commit, so objects stay usable
+    without being reloaded.
+    """
+
+    def __init__(self):
+        self._session: SQLAlchemySession | None = None
+        self._token: contextvars.Token | None = None
+
+    def __enter__(self) -> SQLAlchemySession:
+        current = _current_unit_of_work.get()
+        if current and current[1] is _owner():
+            self._session = current[0]
+            return self._session
+        self._session = Session(expire_on_commit=False)
+        self._token = _current_unit_of_work.set((self._session, _owner()))
+        return self._session
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._token is None:
+            return
+        try:
+            if exc_type is None:
+                self._session.commit()
+            else:
+                self._session.rollback()
+        finally:
+            _current_unit_of_work.reset(self._token)
+            self._session.close()
+
+
+def _run_with_session(
+    session_factory: sessionmaker,
+    func: Callable[Concatenate[SQLAlchemySession, P], T],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> T:
+    session: SQLAlchemySession
+    # keep loaded attributes around after commit, since the session is closed
+    # before the caller ever sees them
+    with session_factory(expire_on_commit=False) as session:
+        # helpers called by func join this session, see UnitOfWork. This runs in a
+        # copy of the caller's context, so it doesn't need to be reset
+        _current_unit_of_work.set((session, _owner()))
+        return func(session, *args, **kwargs)
+
+
+async def run(
+    func: Callable[Concatenate[SQLAlchemySession, P], T],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> T:
+    """
+    Call func(session, *args, **kwargs) on the database thread with a new session.
+    With SQLite, calls run one at a time
+    """
+    loop = asyncio.get_running_loop()
+    # carry the context over so the queries count towards the caller's unit of
+    # work, see sqlstats.py
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _executor,
+        functools.partial(
+            context.run, _run_with_session, Session, func, *args, **kwargs
+        ),
+    )
+
+
+async def read(
+    func: Callable[Concatenate[SQLAlchemySession, P], T],
+    *args: P.args,
+    **kwargs: P.kwargs,
+) -> T:
+    """
+    Call func(session, *args, **kwargs) on a reader thread with a new read-only
+    session. With SQLite and WAL it doesn't wait on writes, but it doesn't
+    serialize them either, see run()
+    """
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        _reader,
+        functools.partial(
+            context.run, _run_with_session, ReadSession, func, *args, **kwargs
+        ),
+    )
@@ -0,0 +1,296 @@
+"""
+Central queue for outbound discord messages.
+
+Sending a message, DMing a member and editing a message all go through here
+instead of being awaited directly. Each route (a channel or a member's DMs)
+gets its own token bucket. A bounded number of workers send the most important
+traffic first. Repeated edits of the same message that haven't been sent yet
+are coalesced into one, so refreshes can't pile up in front of a game pop.
+
+discord.py still handles any 429s it gets back, this just makes them rare.
+"""
+
+import asyncio
+import heapq
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import IntEnum
+from itertools import count
+from typing import Any, Awaitable, Callable, Hashable
+
+from discord import Member, Message, PartialMessage, User
+from discord.abc import Messageable
+
+import discord_bots.config as config
+
+_log = logging.getLogger(__name__)
+
+
+class Priority(IntEnum):
+    # game pops, lobby codes and anything else players are waiting on
+    POP = 0
+    DEFAULT = 1
+    # embed refreshes (predictions, leaderboard, ...) that can wait and be coalesced
+    REFRESH = 2
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, period: float):
+        """
+        :capacity: the number of requests allowed per period
+        :period: in seconds
+        """
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def acquire(self) -> float:
+        """
+        Take a token if one is available
+
+        :returns: 0 if a token was taken, otherwise how many seconds until one will be available
+        """
+        now = time.monotonic()
+        self.tokens = min(
+            self.capacity, self.tokens + (now - self.updated_at) * self.rate
+        )
+        self.updated_at = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+    def refund(self):
+        """
+        Give back a token taken by acquire() that ended up unused
+        """
+        self.tokens = min(self.capacity, self.tokens + 1)
+
+
+@dataclass(order=True)
+class _Job:
+    priority: int
+    sequence: int
+    route: Hashable = field(compare=False)
+    func: Callable[..., Awaitable[Any]] = field(compare=False)
+    kwargs: dict = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+    coalesce_key: Hashable | None = field(compare=False, default=None)
+    superseded: bool = field(compare=False, default=False)
+
+
+class Dispatcher:
+    def __init__(
+        self,
+        concurrency: int,
+        route_capacity: float,
+        route_period: float,
+        global_capacity: float,
+    ):
+        self.concurrency = concurrency
+        self.route_capacity = route_capacity
+        self.route_period = route_period
+        self._global_bucket = TokenBucket(global_capacity, 1)
+        self._buckets: dict[Hashable, TokenBucket] = {}
+        self._heap: list[_Job] = []
+        self._sequence = count()
+        self._pending_edits: dict[Hashable, _Job] = {}
+        self._wakeup: asyncio.Event | None = None
+        self._workers: list[asyncio.Task] = []
+        self._depth_by_priority: Counter[Priority] = Counter()
+        self._max_depth = 0
+        self._delayed = 0
+        self._in_flight = 0
+        self._sent_by_priority: Counter[Priority] = Counter()
+        self._coalesced = 0
+        self._throttled = 0
+        self._failed = 0
+
+    def _start(self):
+        # started lazily so that the workers are created inside the bot's event loop
+        if self._workers and not all(worker.done() for worker in self._workers):
+            return
+        self._wakeup = asyncio.Event()
+        self._workers = [
+            asyncio.create_task(self._work(), name=f"dispatcher-worker-{i}")
+            for i in range(self.concurrency)
+        ]
+
+    def _push(self, job: _Job):
+        heapq.heappush(self._heap, job)
+        self._depth_by_priority[Priority(job.priority)] += 1
+        self._max_depth = max(self._max_depth, len(self._heap))
+        if self._wakeup:
+            self._wakeup.set()
+
+    def _requeue(self, job: _Job):
+        # the job keeps its sequence number, so it doesn't lose its place in line
+        self._delayed -= 1
+        if not job.superseded:
+            self._push(job)
+
+    def submit(
+        self,
+        route: Hashable,
+        func: Callable[..., Awaitable[Any]],
+        priority: Priority = Priority.DEFAULT,
+        coalesce_key: Hashable | None = None,
+        **kwargs,
+    ) -> asyncio.Future:
+        """
+        Queue up a call to func(**kwargs). If coalesce_key matches a job that
+        hasn't been sent yet, the kwargs are merged into that job instead and
+        both callers get the same result
+        """
+        self._start()
+        pending = self._pending_edits.get(coalesce_key) if coalesce_key else None
+        if pending and not pending.future.done():
+            self._coalesced += 1
+            pending.kwargs.update(kwargs)
+            if priority < pending.priority:
+                # bump it up the queue by replacing it
+                pending.superseded = True
+                job = _Job(
+                    priority=priority,
+                    sequence=next(self._sequence),
+                    route=route,
+                    func=func,
+                    kwargs=pending.kwargs,
+                    future=pending.future,
+                    coalesce_key=coalesce_key,
+                )
+                self._pending_edits[coalesce_key] = job
+                self._push(job)
+            return pending.future
+
+        job = _Job(
+            priority=priority,
+            sequence=next(self._sequence),
+            route=route,
+            func=func,
+            kwargs=kwargs,
+            future=asyncio.get_running_loop().create_future(),
+            coalesce_key=coalesce_key,
+        )
+        if coalesce_key:
+            self._pending_edits[coalesce_key] = job
+        self._push(job)
+        return job.future
+
+    async def _work(self):
+        assert self._wakeup
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            job = heapq.heappop(self._heap)
+            self._depth_by_priority[Priority(job.priority)] -= 1
+            if job.superseded:
+                continue
+
+            bucket = self._buckets.get(job.route)
+            if not bucket:
+                bucket = TokenBucket(self.route_capacity, self.route_period)
+                self._buckets[job.route] = bucket
+            # the route first, so a throttled route doesn't use up global tokens
+            # that other routes could have sent with
+            delay = bucket.acquire()
+            if not delay:
+                delay = self._global_bucket.acquire()
+                if delay:
+                    bucket.refund()
+            if delay:
+                # don't hold a worker while this route cools down, other routes can go
+                self._throttled += 1
+                self._delayed += 1
+                loop.call_later(delay, self._requeue, job)
+                continue
+
+            if job.coalesce_key and self._pending_edits.get(job.coalesce_key) is job:
+                # anything submitted from here on is a new edit
+                del self._pending_edits[job.coalesce_key]
+            self._in_flight += 1
+            try:
+                result = await job.func(**job.kwargs)
+            except Exception as e:
+                self._failed += 1
+                if not job.future.done():
+                    job.future.set_exception(e)
+            else:
+                self._sent_by_priority[Priority(job.priority)] += 1
+                if not job.future.done():
+                    job.future.set_result(result)
+            finally:
+                self._in_flight -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "queued": {
+                priority.name: self._depth_by_priority[priority]
+                for priority in Priority
+            },
+            "max_queued": self._max_depth,
+            "throttled_waiting": self._delayed,
+            "in_flight": self._in_flight,
+            "sent": {
+                priority.name: self._sent_by_priority[priority] for priority in Priority
+            },
+            "coalesced": self._coalesced,
+            "throttled": self._throttled,
+            "failed": self._failed,
+            "routes": len(self._buckets),
+        }
+
+
+# Discord allows 5 messages per 5 seconds per channel and 50 requests per
+# second overall
+dispatcher = Dispatcher(
+    concurrency=config.DISPATCHER_CONCURRENCY,
+    route_capacity=5,
+    route_period=5,
+    global_capacity=config.DISPATCHER_GLOBAL_RATE,
+)
+
+
+def _route(destination: Messageable | Message | PartialMessage) -> Hashable:
+    if isinstance(destination, (Member, User)):
+        return ("dm", destination.id)
+    if isinstance(destination, (Message, PartialMessage)):
+        return ("channel", destination.channel.id)
+    return ("channel", getattr(destination, "id", None))
+
+
+async def send(
+    destination: Messageable,
+    priority: Priority = Priority.DEFAULT,
+    **kwargs,
+) -> Message:
+    """
+    Drop-in for destination.send(**kwargs), e.g. channel.send or member.send
+    """
+    return await dispatcher.submit(
+        _route(destination), destination.send, priority, **kwargs
+    )
+
+
+async def edit(
+    message: Message | PartialMessage,
+    priority: Priority = Priority.REFRESH,
+    **kwargs,
+) -> Message | None:
+    """
+    Drop-in for message.edit(**kwargs). Edits of the same message that are
+    still waiting to be sent are merged, the last value for each kwarg wins
+    """
+    return await dispatcher.submit(
+        _route(message),
+        message.edit,
+        priority,
+        coalesce_key=("edit", message.id),
+        **kwargs,
+    )
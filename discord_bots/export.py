@@ -0,0 +1,253 @@
+"""
+Exports the match history, one row per player per game, for analysing outside
+of the bot.
+
+Games are read a chunk at a time in (finished_at, id) order, each chunk picking
+up after the last game of the one before, so an export reads the same amount
+per chunk however far into the history it is and never holds more than one
+chunk in memory. Archived games (see archive.py) are exported too, before the
+rest.
+
+Rows are written as they're read, either as gzipped CSV or as parquet. Parquet
+goes through pandas and needs pyarrow, which isn't in requirements.txt since
+nothing else uses it.
+"""
+
+import csv
+import gzip
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Literal
+
+import pandas
+import sqlalchemy
+from sqlalchemy import and_, or_, select
+from sqlalchemy.sql.schema import Table
+
+from discord_bots.models import (
+    FinishedGame,
+    FinishedGamePlayer,
+    finished_game_archive,
+    finished_game_player_archive,
+)
+
+_log = logging.getLogger(__name__)
+
+# games read per query
+EXPORT_CHUNK_SIZE = 1000
+
+ExportFormat = Literal["csv", "parquet"]
+EXTENSIONS: dict[str, str] = {"csv": ".csv.gz", "parquet": ".parquet"}
+
+GAME_COLUMNS = [
+    "finished_game_id",
+    "game_id",
+    "started_at",
+    "finished_at",
+    "queue_name",
+    "category_name",
+    "map_full_name",
+    "map_short_name",
+    "is_rated",
+    "average_trueskill",
+    "win_probability",
+    "winning_team",
+]
+PLAYER_COLUMNS = [
+    "team",
+    "player_id",
+    "player_name",
+    "rated_trueskill_mu_before",
+    "rated_trueskill_sigma_before",
+    "rated_trueskill_mu_after",
+    "rated_trueskill_sigma_after",
+]
+COLUMNS = GAME_COLUMNS + PLAYER_COLUMNS
+
+
+class ExportError(Exception):
+    pass
+
+
+@dataclass
+class ExportFilter:
+    """
+    :player_ids: Only export games that any of these players were in. Every
+    player in those games is exported
+    """
+
+    category_name: str | None = None
+    queue_name: str | None = None
+    since: datetime | None = None
+    until: datetime | None = None
+    player_ids: list[int] = field(default_factory=list)
+
+
+@dataclass
+class ExportProgress:
+    """
+    Updated from the export thread as rows are written
+    """
+
+    games: int = 0
+    rows: int = 0
+
+    def __str__(self) -> str:
+        return f"{self.games} games"
+
+
+class _CsvWriter:
+    def __init__(self, path: str):
+        self._file = gzip.open(path, "wt", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(COLUMNS)
+
+    def write(self, rows: list[tuple]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+
+class _ParquetWriter:
+    def __init__(self, path: str):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ExportError("Parquet exports need pyarrow to be installed")
+        self._path = path
+        self._pyarrow = pyarrow
+        self._writer: Any = None
+
+    def write(self, rows: list[tuple]):
+        frame = pandas.DataFrame.from_records(rows, columns=COLUMNS)
+        table = self._pyarrow.Table.from_pandas(frame, preserve_index=False)
+        if self._writer is None:
+            # the first chunk decides the schema, later chunks are cast to it so
+            # a chunk of all null categories doesn't change the column's type
+            self._writer = self._pyarrow.parquet.ParquetWriter(self._path, table.schema)
+        else:
+            table = table.cast(self._writer.schema)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        else:
+            # nothing matched, still leave a readable file behind
+            self.write([])
+            self._writer.close()
+
+
+def _game_filters(
+    games: Table, game_players: Table, export_filter: ExportFilter
+) -> list:
+    filters = []
+    if export_filter.category_name:
+        filters.append(games.c.category_name == export_filter.category_name)
+    if export_filter.queue_name:
+        filters.append(games.c.queue_name == export_filter.queue_name)
+    if export_filter.since:
+        filters.append(games.c.finished_at >= export_filter.since)
+    if export_filter.until:
+        filters.append(games.c.finished_at < export_filter.until)
+    if export_filter.player_ids:
+        filters.append(
+            games.c.id.in_(
+                select(game_players.c.finished_game_id).where(
+                    game_players.c.player_id.in_(export_filter.player_ids)
+                )
+            )
+        )
+    return filters
+
+
+def _export_tables(
+    session: sqlalchemy.orm.Session,
+    games: Table,
+    game_players: Table,
+    export_filter: ExportFilter,
+    writer: _CsvWriter | _ParquetWriter,
+    progress: ExportProgress,
+    chunk_size: int,
+):
+    filters = _game_filters(games, game_players, export_filter)
+    game_columns = [games.c[name] for name in GAME_COLUMNS[1:]]
+    player_columns = [game_players.c[name] for name in PLAYER_COLUMNS]
+    last: tuple[datetime, str] | None = None
+    while True:
+        statement = select(games.c.id, *game_columns).where(*filters)
+        if last:
+            finished_at, last_id = last
+            statement = statement.where(
+                or_(
+                    games.c.finished_at > finished_at,
+                    and_(games.c.finished_at == finished_at, games.c.id > last_id),
+                )
+            )
+        chunk = session.execute(
+            statement.order_by(games.c.finished_at, games.c.id).limit(chunk_size)
+        ).all()
+        if not chunk:
+            return
+        players_by_game_id: dict[str, list[tuple]] = {game.id: [] for game in chunk}
+        player_rows = session.execute(
+            select(game_players.c.finished_game_id, *player_columns)
+            .where(game_players.c.finished_game_id.in_(players_by_game_id))
+            .order_by(game_players.c.team, game_players.c.player_name)
+        )
+        for player_row in player_rows:
+            players_by_game_id[player_row[0]].append(tuple(player_row[1:]))
+        rows = [
+            tuple(game) + player
+            for game in chunk
+            for player in players_by_game_id[game.id]
+        ]
+        writer.write(rows)
+        progress.games += len(chunk)
+        progress.rows += len(rows)
+        last = chunk[-1].finished_at, chunk[-1].id
+
+
+def export_match_history(
+    session: sqlalchemy.orm.Session,
+    path: str,
+    export_format: ExportFormat = "csv",
+    export_filter: ExportFilter | None = None,
+    progress: ExportProgress | None = None,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+) -> ExportProgress:
+    """
+    Write the games matching export_filter to path, one row per player, oldest
+    game first
+
+    :raises ExportError: if the format can't be written
+    :returns: how many games and rows were written
+    """
+    export_filter = export_filter or ExportFilter()
+    progress = progress or ExportProgress()
+    writer: _CsvWriter | _ParquetWriter
+    if export_format == "parquet":
+        writer = _ParquetWriter(path)
+    else:
+        writer = _CsvWriter(path)
+    try:
+        for games, game_players in (
+            (finished_game_archive, finished_game_player_archive),
+            (FinishedGame.__table__, FinishedGamePlayer.__table__),
+        ):
+            _export_tables(
+                session,
+                games,
+                game_players,
+                export_filter,
+                writer,
+                progress,
+                chunk_size,
+            )
+    finally:
+        writer.close()
+    _log.info(f"[export] Wrote {progress.games} games ({progress.rows} rows) to {path}")
+    return progress
@@ -0,0 +1,45 @@
+"""
+Counters that caches outside the bot (e.g. the analytics cache of the scripts,
+see analytics.py) add to their keys, for changes they can't detect by looking
+at the rows. Whatever makes such a change bumps the counter in the same
+transaction:
+
+    bump_generation(session, FINISHED_GAMES)
+"""
+
+from uuid import uuid4
+
+import sqlalchemy
+from sqlalchemy.dialects import postgresql, sqlite
+
+from discord_bots.models import Generation
+
+# bumped when a finished game's winner is edited or a finished game is deleted
+FINISHED_GAMES = "finished_games"
+
+
+def bump_generation(session: sqlalchemy.orm.Session, name: str):
+    """
+    Add one to the counter, creating it if needed. The caller must commit the
+    session
+    """
+    table = Generation.__table__
+    if session.get_bind().dialect.name == "postgresql":
+        statement = postgresql.insert(table)
+    else:
+        statement = sqlite.insert(table)
+    session.execute(
+        statement.values(id=str(uuid4()), name=name, value=1).on_conflict_do_update(
+            index_elements=[table.c.name], set_={"value": table.c.value + 1}
+        )
+    )
+
+
+def get_generation(session: sqlalchemy.orm.Session, name: str) -> int:
+    """
+    :returns: the counter's value, 0 if it has never been bumped
+    """
+    value: int | None = (
+        session.query(Generation.value).filter(Generation.name == name).scalar()
+    )
+    return value or 0
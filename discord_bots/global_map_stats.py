@@ -0,0 +1,45 @@
+"""
+/map globalmapstats adds up every game ever played, so its results are cached
+per category until a finished game or a map is committed (a game finishing, an
+admin editing or deleting one, or a map being renamed or removed).
+"""
+
+from discord_bots import db
+from discord_bots.cache_invalidation import register_cache_invalidation
+from discord_bots.models import FinishedGame, Map
+from discord_bots.read_models import MapStatsRow, get_global_map_stats
+
+# categories are free text, this only stops someone from growing the cache
+# forever with garbage names
+MAX_CACHED_CATEGORIES = 64
+
+_cache: dict[str | None, list[MapStatsRow]] = {}
+# bumped on every invalidation, so results that were being loaded while a game
+# finished don't get cached
+_cache_version = 0
+
+
+def invalidate_global_map_stats():
+    global _cache_version
+    _cache_version += 1
+    _cache.clear()
+
+
+async def get_cached_global_map_stats(
+    category_name: str | None = None,
+) -> list[MapStatsRow]:
+    cached = _cache.get(category_name)
+    if cached is not None:
+        return cached
+    version = _cache_version
+    rows = await db.read(get_global_map_stats, category_name)
+    if version == _cache_version:
+        if len(_cache) >= MAX_CACHED_CATEGORIES:
+            _cache.clear()
+        _cache[category_name] = rows
+    return rows
+
+
+# Archiving moves games with Core statements, which is fine since the archive is
+# counted too
+register_cache_invalidation((FinishedGame, Map), invalidate_global_map_stats)
@@ -0,0 +1,166 @@
+"""
+Maintains the leaderboard_entry table. Rather than counting every player's games
+each time the leaderboard is printed, entries are updated as games finish, change
+winner (/admin editgamewinner) or are deleted (/admin deletegame), and fully
+recounted once a day so that games older than the window drop out.
+"""
+
+import logging
+from datetime import datetime, timedelta, timezone
+
+import sqlalchemy
+from sqlalchemy import func
+
+from discord_bots.models import (
+    Category,
+    FinishedGame,
+    FinishedGamePlayer,
+    LeaderboardEntry,
+    PlayerCategoryTrueskill,
+)
+
+_log = logging.getLogger(__name__)
+
+LEADERBOARD_WINDOW_DAYS = 30
+# DiscordMessage.name of the leaderboard message
+LEADERBOARD_MESSAGE_NAME = "leaderboard"
+
+
+def update_leaderboard_entries(
+    session: sqlalchemy.orm.Session,
+    pcts: list[PlayerCategoryTrueskill],
+    finished_game_started_at: datetime | None = None,
+):
+    """
+    Copy the ratings in pcts onto the leaderboard. The caller must commit the session
+
+    :finished_game_started_at: set when the ratings changed because a game finished,
+    so the game can be counted towards each player's games played
+    """
+    if not pcts:
+        return
+    entries: list[LeaderboardEntry] = (
+        session.query(LeaderboardEntry)
+        .filter(
+            LeaderboardEntry.category_id.in_({pct.category_id for pct in pcts}),
+            LeaderboardEntry.player_id.in_({pct.player_id for pct in pcts}),
+        )
+        .all()
+    )
+    entries_by_key: dict[tuple[str, int], LeaderboardEntry] = {
+        (entry.category_id, entry.player_id): entry for entry in entries
+    }
+    now = datetime.now(timezone.utc)
+    counts_towards_window = False
+    if finished_game_started_at:
+        # timezones aren't stored in the DB
+        counts_towards_window = finished_game_started_at.replace(
+            tzinfo=timezone.utc
+        ) > now - timedelta(days=LEADERBOARD_WINDOW_DAYS)
+    for pct in pcts:
+        entry = entries_by_key.get((pct.category_id, pct.player_id))
+        if not entry:
+            entry = LeaderboardEntry(
+                category_id=pct.category_id,
+                player_id=pct.player_id,
+                mu=pct.mu,
+                sigma=pct.sigma,
+                rank=pct.rank,
+            )
+            session.add(entry)
+            entries_by_key[(pct.category_id, pct.player_id)] = entry
+        entry.mu = pct.mu
+        entry.sigma = pct.sigma
+        entry.rank = pct.rank
+        entry.updated_at = now
+        if counts_towards_window:
+            entry.games_played_last_30_days = (entry.games_played_last_30_days or 0) + 1
+
+
+def update_leaderboard_games_played(
+    session: sqlalchemy.orm.Session,
+    finished_game: FinishedGame,
+    player_teams: list[tuple[int | None, int]],
+    sign: int = 1,
+):
+    """
+    Count finished_game towards its players' games played, or take it back out
+    if sign is -1. Games that started before the window don't count either way.
+    The caller must commit the session
+
+    :player_teams: (player_id, team) of each player in the game
+    """
+    # timezones aren't stored in the DB
+    started_at = finished_game.started_at.replace(tzinfo=timezone.utc)
+    window_start = datetime.now(timezone.utc) - timedelta(days=LEADERBOARD_WINDOW_DAYS)
+    player_ids = [player_id for player_id, _ in player_teams if player_id is not None]
+    if started_at <= window_start or not player_ids:
+        return
+    category_id = (
+        session.query(Category.id)
+        .filter(Category.name == finished_game.category_name)
+        .scalar_subquery()
+    )
+    games_played = LeaderboardEntry.games_played_last_30_days
+    session.query(LeaderboardEntry).filter(
+        LeaderboardEntry.category_id == category_id,
+        LeaderboardEntry.player_id.in_(player_ids),
+    ).update({games_played: games_played + sign}, synchronize_session=False)
+
+
+def rebuild_leaderboard(session: sqlalchemy.orm.Session):
+    """
+    Recompute every entry from scratch. The caller must commit the session
+    """
+    now = datetime.now(timezone.utc)
+    category_names: dict[str, str] = {
+        category_id: name
+        for category_id, name in session.query(Category.id, Category.name)
+    }
+    games_played: dict[tuple[str, int], int] = {
+        (category_name, player_id): num_games
+        for category_name, player_id, num_games in (
+            session.query(
+                FinishedGame.category_name,
+                FinishedGamePlayer.player_id,
+                func.count(),
+            )
+            .join(FinishedGame, FinishedGame.id == FinishedGamePlayer.finished_game_id)
+            .filter(
+                FinishedGame.started_at > now - timedelta(days=LEADERBOARD_WINDOW_DAYS)
+            )
+            .group_by(FinishedGame.category_name, FinishedGamePlayer.player_id)
+        )
+    }
+    entries_by_key: dict[tuple[str, int], LeaderboardEntry] = {
+        (entry.category_id, entry.player_id): entry
+        for entry in session.query(LeaderboardEntry)
+    }
+    num_created = 0
+    for pct in session.query(PlayerCategoryTrueskill):
+        if pct.category_id not in category_names:
+            continue
+        entry = entries_by_key.pop((pct.category_id, pct.player_id), None)
+        if not entry:
+            entry = LeaderboardEntry(
+                category_id=pct.category_id,
+                player_id=pct.player_id,
+                mu=pct.mu,
+                sigma=pct.sigma,
+                rank=pct.rank,
+            )
+            session.add(entry)
+            num_created += 1
+        entry.mu = pct.mu
+        entry.sigma = pct.sigma
+        entry.rank = pct.rank
+        entry.games_played_last_30_days = games_played.get(
+            (category_names[pct.category_id], pct.player_id), 0
+        )
+        entry.updated_at = now
+    # whatever is left no longer has a trueskill in that category
+    for entry in entries_by_key.values():
+        session.delete(entry)
+    _log.info(
+        f"[rebuild_leaderboard] Created {num_created} and removed {len(entries_by_key)} leaderboard entries"
+    )
@@ -37,6 +37,8 @@ from .models import (
 from .tasks import (
     add_player_task,
     afk_timer_task,
+    archive_task,
+    channel_pool_task,
     leaderboard_task,
     map_rotation_task,
     prediction_task,
@@ -44,7 +46,10 @@ from .tasks import (
     schedule_task,
     vote_passed_waitlist_task,
     sigma_decay_task,
+    sqlite_checkpoint_task,
 )
+from .sqlstats import start_unit
+from .storage import log_storage_report
 
 _log = logging.getLogger(__name__)
 
@@ -249,13 +254,7 @@ async def on_leave(member: Member):
 
 @bot.before_invoke
 async def before_invoke(context: Context):
-    session = Session()
-    context.session = session
-
-
-@bot.after_invoke
-async def after_invoke(context: Context):
-    context.session.close()
+    start_unit(f"{config.COMMAND_PREFIX}{context.command.qualified_name}")
 
 
 async def setup():
@@ -276,6 +275,7 @@ async def setup():
     await bot.add_cog(VoteCommands(bot))
     add_player_task.start()
     afk_timer_task.start()
+    channel_pool_task.start()
     leaderboard_task.start()
     map_rotation_task.start()
     queue_waitlist_task.start()
@@ -285,9 +285,14 @@ async def setup():
     if config.ECONOMY_ENABLED:
         prediction_task.start()
     sigma_decay_task.start()
+    if config.ARCHIVE_AFTER_DAYS > 0:
+        archive_task.start()
+    if engine.dialect.name == "sqlite":
+        sqlite_checkpoint_task.start()
 
 
 async def main():
+    log_storage_report(engine)
     await create_seed_admins()
     await setup()
     await bot.start(config.API_KEY)
@@ -2,17 +2,20 @@ from __future__ import annotations
 
 import logging
 from dataclasses import dataclass, field
-from datetime import datetime, time, timezone
+from datetime import date, datetime, time, timezone
 from uuid import uuid4
 
 from sqlalchemy import (
     BigInteger,
     Boolean,
     Column,
+    Date,
     DateTime,
     Float,
+    Index,
     Integer,
     String,
+    Table,
     Time,
     UniqueConstraint,
     create_engine,
@@ -30,10 +33,13 @@ from sqlalchemy.sql import expression, func
 from sqlalchemy.sql.schema import ForeignKey, MetaData
 
 import discord_bots.config as config
+from discord_bots.storage import apply_storage_profile
+from discord_bots.uuid_storage import UUIDString
 
 # It may be tempting, but do not set check_same_thread=False here. Sqlite
-# doesn't handle concurrency well and writing to the db on different threads
-# could cause file corruption. Use tasks to ensure that writes happen on the main thread.
+# doesn't handle concurrency well and sharing a connection between threads could
+# cause file corruption. Writes happen on the event loop and on db.run's
+# database thread, each through its own connections, see db.py.
 if config.DATABASE_URI:
     db_url = config.DATABASE_URI
 else:
@@ -44,6 +50,8 @@ if db_url.startswith("postgresql://"):
     engine = create_engine(db_url, echo=False, pool_size=40, max_overflow=50)
 else:
     engine = create_engine(db_url, echo=False, connect_args={"timeout": 15})
+    # WAL, synchronous=NORMAL, etc., see storage.py
+    apply_storage_profile(engine)
 naming_convention = {
     "ix": "ix_%(column_0_label)s",
     "uq": "uq_%(table_name)s_%(column_0_name)s",
@@ -74,7 +82,7 @@ class AdminRole:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -120,7 +128,7 @@ class Category:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -140,7 +148,7 @@ class Commend:
     finished_game_id: str = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("finished_game.id"), nullable=False, index=True
+                UUIDString, ForeignKey("finished_game.id"), nullable=False, index=True
             )
         },
     )
@@ -159,7 +167,7 @@ class Commend:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -182,7 +190,7 @@ class CustomCommand:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -205,7 +213,7 @@ class DiscordChannel:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -229,7 +237,7 @@ class DiscordGuild:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -249,7 +257,29 @@ class DiscordMember:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
+@mapper_registry.mapped
+@dataclass
+class DiscordMessage:
+    """
+    A message the bot keeps editing, e.g. the leaderboard
+
+    :name: What the message is for
+    """
+
+    __sa_dataclass_metadata_key__ = "sa"
+    __tablename__ = "discord_message"
+
+    name: str = field(metadata={"sa": Column(String, nullable=False, unique=True)})
+    channel_id: int = field(metadata={"sa": Column(BigInteger, nullable=False)})
+    message_id: int = field(metadata={"sa": Column(BigInteger, nullable=False)})
+    id: str = field(
+        init=False,
+        default_factory=lambda: str(uuid4()),
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -267,7 +297,7 @@ class EconomyDonation:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
     sending_player_id: int | None = field(
         metadata={
@@ -314,7 +344,7 @@ class EconomyPrediction:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
     player_id: int = field(
         metadata={
@@ -326,14 +356,14 @@ class EconomyPrediction:
     finished_game_id: str | None = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("finished_game.id"), nullable=True, index=True
+                UUIDString, ForeignKey("finished_game.id"), nullable=True, index=True
             )
         },
     )
     in_progress_game_id: str | None = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("in_progress_game.id"), nullable=True, index=True
+                UUIDString, ForeignKey("in_progress_game.id"), nullable=True, index=True
             )
         },
     )
@@ -365,7 +395,7 @@ class EconomyTransaction:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
     player_id: int | None = field(
         metadata={
@@ -375,14 +405,14 @@ class EconomyTransaction:
     finished_game_id: str | None = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("finished_game.id"), nullable=True, index=True
+                UUIDString, ForeignKey("finished_game.id"), nullable=True, index=True
             )
         },
     )
     in_progress_game_id: str | None = field(
         metadata={
             "sa": Column(
-                String,
+                UUIDString,
                 ForeignKey("in_progress_game.id"),
                 nullable=True,
                 index=True,
@@ -402,7 +432,7 @@ class EconomyTransaction:
     economy_prediction_id: str | None = field(
         metadata={
             "sa": Column(
-                String,
+                UUIDString,
                 ForeignKey("economy_prediction.id"),
                 nullable=True,
                 index=True,
@@ -412,7 +442,7 @@ class EconomyTransaction:
     economy_donation_id: str | None = field(
         metadata={
             "sa": Column(
-                String,
+                UUIDString,
                 ForeignKey("economy_donation.id"),
                 nullable=True,
                 index=True,
@@ -437,6 +467,11 @@ class EconomyTransaction:
 class FinishedGame:
     __sa_dataclass_metadata_key__ = "sa"
     __tablename__ = "finished_game"
+    __table_args__ = (
+        Index(
+            "ix_finished_game_category_name_started_at", "category_name", "started_at"
+        ),
+    )
 
     average_trueskill: float = field(metadata={"sa": Column(Float, nullable=False)})
     game_id: str = field(metadata={"sa": Column(String, index=True, nullable=False)})
@@ -468,12 +503,12 @@ class FinishedGame:
     )
     category_name: str = field(
         default=None,
-        metadata={"sa": Column(String, index=True, nullable=True)},
+        metadata={"sa": Column(String, nullable=True)},
     )
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
     transactions = relationship("EconomyTransaction", back_populates="finished_game")
@@ -485,16 +520,23 @@ class FinishedGame:
 class FinishedGamePlayer:
     __sa_dataclass_metadata_key__ = "sa"
     __tablename__ = "finished_game_player"
+    __table_args__ = (
+        Index(
+            "ix_finished_game_player_player_id_finished_game_id",
+            "player_id",
+            "finished_game_id",
+        ),
+    )
 
     finished_game_id: str = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("finished_game.id"), nullable=False, index=True
+                UUIDString, ForeignKey("finished_game.id"), nullable=False, index=True
             )
         },
     )
     player_id: int = field(
-        metadata={"sa": Column(BigInteger, ForeignKey("player.id"), index=True)},
+        metadata={"sa": Column(BigInteger, ForeignKey("player.id"))},
     )
     player = relationship("Player", back_populates="finished_game_players")
     player_name: str = field(
@@ -516,13 +558,39 @@ class FinishedGamePlayer:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
     def __lt__(self, other: FinishedGamePlayer):
         return self.player_id < other.player_id
 
 
+@mapper_registry.mapped
+@dataclass
+class Generation:
+    """
+    A counter that is bumped whenever what it's named after changes in a way
+    that caches outside the bot can't tell from the rows themselves, see
+    generations.py
+
+    :name: What the counter is for
+    """
+
+    __sa_dataclass_metadata_key__ = "sa"
+    __tablename__ = "generation"
+
+    name: str = field(metadata={"sa": Column(String, nullable=False, unique=True)})
+    value: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    id: str = field(
+        init=False,
+        default_factory=lambda: str(uuid4()),
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
 @mapper_registry.mapped
 @dataclass
 class InProgressGame:
@@ -539,7 +607,7 @@ class InProgressGame:
         metadata={"sa": Column(String, index=True, server_default="")}
     )
     queue_id: str | None = field(
-        metadata={"sa": Column(String, ForeignKey("queue.id"), index=True)},
+        metadata={"sa": Column(UUIDString, ForeignKey("queue.id"), index=True)},
     )
     win_probability: float = field(metadata={"sa": Column(Float, nullable=False)})
     code: str | None = field(
@@ -581,7 +649,7 @@ class InProgressGame:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
     transactions = relationship("EconomyTransaction", back_populates="in_progress_game")
@@ -597,12 +665,17 @@ class InProgressGamePlayer:
 
     __sa_dataclass_metadata_key__ = "sa"
     __tablename__ = "in_progress_game_player"
+    __table_args__ = (
+        Index(
+            "ix_in_progress_game_player_in_progress_game_id_team",
+            "in_progress_game_id",
+            "team",
+        ),
+    )
 
     in_progress_game_id: str = field(
         metadata={
-            "sa": Column(
-                String, ForeignKey("in_progress_game.id"), nullable=False, index=True
-            )
+            "sa": Column(UUIDString, ForeignKey("in_progress_game.id"), nullable=False)
         },
     )
     player_id: int = field(
@@ -616,7 +689,7 @@ class InProgressGamePlayer:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
     player = relationship("Player", back_populates="in_progress_game_players")
@@ -635,7 +708,7 @@ class InProgressGameChannel:
     in_progress_game_id: str = field(
         metadata={
             "sa": Column(
-                String,
+                UUIDString,
                 ForeignKey("in_progress_game.id"),
                 nullable=True,
                 index=True,
@@ -648,7 +721,62 @@ class InProgressGameChannel:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
+@mapper_registry.mapped
+@dataclass
+class LeaderboardEntry:
+    """
+    A player's row on the leaderboard of a category. Kept up to date as games
+    finish and sigma decays, so the leaderboard is a single top N read
+
+    :rank: Copied from PlayerCategoryTrueskill.rank
+    :games_played_last_30_days: Counts up as games finish, recounted every day
+    so that old games drop out
+    """
+
+    __sa_dataclass_metadata_key__ = "sa"
+    __tablename__ = "leaderboard_entry"
+    __table_args__ = (
+        UniqueConstraint("category_id", "player_id"),
+        Index("ix_leaderboard_entry_category_id_rank", "category_id", "rank"),
+    )
+
+    category_id: str = field(
+        metadata={
+            "sa": Column(
+                UUIDString,
+                ForeignKey("category.id"),
+                nullable=False,
+                index=True,
+            )
+        },
+    )
+    player_id: int = field(
+        metadata={
+            "sa": Column(
+                BigInteger, ForeignKey("player.id"), nullable=False, index=True
+            )
+        },
+    )
+    mu: float = field(metadata={"sa": Column(Float, nullable=False)})
+    sigma: float = field(metadata={"sa": Column(Float, nullable=False)})
+    rank: float = field(metadata={"sa": Column(Float, nullable=False)})
+    games_played_last_30_days: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    updated_at: datetime = field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        init=False,
+        metadata={"sa": Column(DateTime, nullable=False)},
+    )
+    id: str = field(
+        init=False,
+        default_factory=lambda: str(uuid4()),
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -672,7 +800,7 @@ class Map:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
     rotation_maps = relationship("RotationMap", cascade="all, delete-orphan")
@@ -700,14 +828,14 @@ class MapVote:
     rotation_map_id: str = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("rotation_map.id"), nullable=False, index=True
+                UUIDString, ForeignKey("rotation_map.id"), nullable=False, index=True
             )
         },
     )
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -736,13 +864,18 @@ class SkipMapVote:
     rotation_id: str = field(
         default=None,
         metadata={
-            "sa": Column(String, ForeignKey("rotation.id"), nullable=True, index=True)
+            "sa": Column(
+                UUIDString,
+                ForeignKey("rotation.id"),
+                nullable=True,
+                index=True,
+            )
         },
     )
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -769,7 +902,7 @@ class Player:
     )
     last_activity_at: datetime = field(
         default_factory=lambda: datetime.now(timezone.utc),
-        metadata={"sa": Column(DateTime)},
+        metadata={"sa": Column(DateTime, index=True)},
     )
     rated_trueskill_mu: float = field(
         default=config.DEFAULT_TRUESKILL_MU,
@@ -863,7 +996,7 @@ class PlayerDecay:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -876,6 +1009,13 @@ class PlayerCategoryTrueskill:
 
     __sa_dataclass_metadata_key__ = "sa"
     __tablename__ = "player_category_trueskill"
+    __table_args__ = (
+        Index(
+            "ix_player_category_trueskill_category_id_player_id",
+            "category_id",
+            "player_id",
+        ),
+    )
 
     player_id: int = field(
         metadata={
@@ -885,14 +1025,7 @@ class PlayerCategoryTrueskill:
         },
     )
     category_id: str = field(
-        metadata={
-            "sa": Column(
-                String,
-                ForeignKey("category.id"),
-                nullable=False,
-                index=True,
-            )
-        },
+        metadata={"sa": Column(UUIDString, ForeignKey("category.id"), nullable=False)},
     )
     mu: float = field(metadata={"sa": Column(Float, nullable=False)})
     sigma: float = field(metadata={"sa": Column(Float, nullable=False)})
@@ -908,7 +1041,271 @@ class PlayerCategoryTrueskill:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
+@mapper_registry.mapped
+@dataclass
+class PlayerHistoryRollup:
+    """
+    What a player's archived games add up to, per category and map, so that
+    totals don't need to read the archive. See archive.py
+
+    :archived_through: finished_at of the last game rolled up
+    """
+
+    __sa_dataclass_metadata_key__ = "sa"
+    __tablename__ = "player_history_rollup"
+    __table_args__ = (
+        Index(
+            "ix_player_history_rollup_player_id_category_name",
+            "player_id",
+            "category_name",
+        ),
+    )
+
+    player_id: int = field(
+        metadata={"sa": Column(BigInteger, ForeignKey("player.id"), nullable=False)},
+    )
+    category_name: str | None = field(
+        metadata={"sa": Column(String, nullable=True)},
+    )
+    map_full_name: str | None = field(
+        metadata={"sa": Column(String, nullable=True)},
+    )
+    archived_through: datetime = field(
+        metadata={"sa": Column(DateTime, nullable=False)},
+    )
+    wins: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    losses: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    ties: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    id: str = field(
+        init=False,
+        default_factory=lambda: str(uuid4()),
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
+@mapper_registry.mapped
+@dataclass
+class PlayerStatsSummary:
+    """
+    A player's wins, losses and ties per category and map, archived games
+    included. Kept up to date as games finish, change winner or are deleted, see
+    player_stats.py
+    """
+
+    __sa_dataclass_metadata_key__ = "sa"
+    __tablename__ = "player_stats_summary"
+    __table_args__ = (
+        Index(
+            "ix_player_stats_summary_player_id_category_name",
+            "player_id",
+            "category_name",
+        ),
+        # NULLs are distinct in a plain unique constraint
+        Index(
+            "uq_player_stats_summary_player_id_category_name_map_full_name",
+            "player_id",
+            text("coalesce(category_name, '')"),
+            text("coalesce(map_full_name, '')"),
+            unique=True,
+        ),
+    )
+
+    player_id: int = field(
+        metadata={"sa": Column(BigInteger, ForeignKey("player.id"), nullable=False)},
+    )
+    category_name: str | None = field(
+        metadata={"sa": Column(String, nullable=True)},
+    )
+    map_full_name: str | None = field(
+        metadata={"sa": Column(String, nullable=True)},
+    )
+    wins: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    losses: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    ties: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    id: str = field(
+        init=False,
+        default_factory=lambda: str(uuid4()),
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
+@mapper_registry.mapped
+@dataclass
+class PlayerPairStats:
+    """
+    How two players have done with and against each other per category,
+    archived games included. Each pair has one row, with player_id lower than
+    other_player_id. Kept up to date as games finish, change winner or are
+    deleted, see player_pairs.py
+
+    :wins_against: Games player_id's team beat other_player_id's
+    :losses_against: Games other_player_id's team beat player_id's
+    """
+
+    __sa_dataclass_metadata_key__ = "sa"
+    __tablename__ = "player_pair_stats"
+    __table_args__ = (
+        # NULLs are distinct in a plain unique constraint
+        Index(
+            "uq_player_pair_stats_player_id_other_player_id_category_name",
+            "player_id",
+            "other_player_id",
+            text("coalesce(category_name, '')"),
+            unique=True,
+        ),
+        Index(
+            "ix_player_pair_stats_player_id_other_player_id",
+            "player_id",
+            "other_player_id",
+        ),
+        Index("ix_player_pair_stats_category_name", "category_name"),
+    )
+
+    player_id: int = field(
+        metadata={"sa": Column(BigInteger, ForeignKey("player.id"), nullable=False)},
+    )
+    other_player_id: int = field(
+        metadata={"sa": Column(BigInteger, ForeignKey("player.id"), nullable=False)},
+    )
+    category_name: str | None = field(
+        metadata={"sa": Column(String, nullable=True)},
+    )
+    games_together: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    wins_together: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    losses_together: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    games_against: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    wins_against: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    losses_against: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    id: str = field(
+        init=False,
+        default_factory=lambda: str(uuid4()),
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
+@mapper_registry.mapped
+@dataclass
+class PlayerStatsDay:
+    """
+    Like PlayerStatsSummary, but for the games that finished on one day (UTC),
+    so /stats can add up the last 7, 30, 90 and 365 days. Days older than that
+    are deleted by the sigma decay job
+
+    :day: finished_at of the games, truncated to the day
+    """
+
+    __sa_dataclass_metadata_key__ = "sa"
+    __tablename__ = "player_stats_day"
+    __table_args__ = (
+        Index("ix_player_stats_day_player_id_day", "player_id", "day"),
+        # NULLs are distinct in a plain unique constraint
+        Index(
+            "uq_player_stats_day_player_id_category_name_map_full_name_day",
+            "player_id",
+            text("coalesce(category_name, '')"),
+            text("coalesce(map_full_name, '')"),
+            "day",
+            unique=True,
+        ),
+    )
+
+    player_id: int = field(
+        metadata={"sa": Column(BigInteger, ForeignKey("player.id"), nullable=False)},
+    )
+    category_name: str | None = field(
+        metadata={"sa": Column(String, nullable=True)},
+    )
+    map_full_name: str | None = field(
+        metadata={"sa": Column(String, nullable=True)},
+    )
+    day: date = field(
+        metadata={"sa": Column(Date, nullable=False, index=True)},
+    )
+    wins: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    losses: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    ties: int = field(
+        default=0,
+        metadata={"sa": Column(Integer, nullable=False, server_default=text("0"))},
+    )
+    id: str = field(
+        init=False,
+        default_factory=lambda: str(uuid4()),
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
+@mapper_registry.mapped
+@dataclass
+class PooledChannel:
+    """
+    An idle game channel kept around so that it can be reused by the next game
+    instead of creating a new one. See channel_pool.py
+    """
+
+    __sa_dataclass_metadata_key__ = "sa"
+    __tablename__ = "pooled_channel"
+
+    channel_id: int = field(
+        metadata={"sa": Column(BigInteger, nullable=False, unique=True)},
+    )
+    is_voice: bool = field(
+        metadata={"sa": Column(Boolean, nullable=False, index=True)},
+    )
+    created_at: datetime = field(
+        default_factory=lambda: datetime.now(timezone.utc),
+        init=False,
+        metadata={"sa": Column(DateTime, index=True)},
+    )
+    id: str = field(
+        init=False,
+        default_factory=lambda: str(uuid4()),
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -971,7 +1368,7 @@ class Queue:
         default=None,
         metadata={
             "sa": Column(
-                String,
+                UUIDString,
                 ForeignKey("category.id"),
                 nullable=True,
                 index=True,
@@ -986,13 +1383,18 @@ class Queue:
     rotation_id: str = field(
         default=None,
         metadata={
-            "sa": Column(String, ForeignKey("rotation.id"), nullable=True, index=True)
+            "sa": Column(
+                UUIDString,
+                ForeignKey("rotation.id"),
+                nullable=True,
+                index=True,
+            )
         },
     )
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
     move_enabled: bool = field(
         default=config.DEFAULT_VOICE_MOVE,
@@ -1017,7 +1419,7 @@ class QueueNotification:
 
     queue_id: str = field(
         metadata={
-            "sa": Column(String, ForeignKey("queue.id"), nullable=False, index=True)
+            "sa": Column(UUIDString, ForeignKey("queue.id"), nullable=False, index=True)
         },
     )
     player_id: int = field(
@@ -1036,7 +1438,7 @@ class QueueNotification:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1055,7 +1457,7 @@ class QueuePlayer:
 
     queue_id: str = field(
         metadata={
-            "sa": Column(String, ForeignKey("queue.id"), nullable=False, index=True)
+            "sa": Column(UUIDString, ForeignKey("queue.id"), nullable=False, index=True)
         },
     )
     player_id: int = field(
@@ -1069,7 +1471,7 @@ class QueuePlayer:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1085,7 +1487,7 @@ class QueueRole:
 
     queue_id: str = field(
         metadata={
-            "sa": Column(String, ForeignKey("queue.id"), index=True, nullable=False)
+            "sa": Column(UUIDString, ForeignKey("queue.id"), index=True, nullable=False)
         },
     )
     role_id: int = field(
@@ -1094,7 +1496,7 @@ class QueueRole:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1115,7 +1517,7 @@ class QueueWaitlist:
     finished_game_id: str = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("finished_game.id"), nullable=False, unique=True
+                UUIDString, ForeignKey("finished_game.id"), nullable=False, unique=True
             )
         },
     )
@@ -1123,12 +1525,15 @@ class QueueWaitlist:
     in_progress_game_id: str = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("in_progress_game.id"), nullable=False, unique=True
+                UUIDString,
+                ForeignKey("in_progress_game.id"),
+                nullable=False,
+                unique=True,
             )
         },
     )
     queue_id: str = field(
-        metadata={"sa": Column(String, ForeignKey("queue.id"), nullable=False)},
+        metadata={"sa": Column(UUIDString, ForeignKey("queue.id"), nullable=False)},
     )
     end_waitlist_at: datetime = field(
         metadata={"sa": Column(DateTime, index=True, nullable=False)},
@@ -1136,7 +1541,7 @@ class QueueWaitlist:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1155,12 +1560,12 @@ class QueueWaitlistPlayer:
     __table_args__ = (UniqueConstraint("queue_id", "queue_waitlist_id", "player_id"),)
 
     queue_id: str | None = field(
-        metadata={"sa": Column(String, ForeignKey("queue.id"), nullable=True)}
+        metadata={"sa": Column(UUIDString, ForeignKey("queue.id"), nullable=True)}
     )
     queue_waitlist_id: str = field(
         metadata={
             "sa": Column(
-                String, ForeignKey("queue_waitlist.id"), nullable=False, index=True
+                UUIDString, ForeignKey("queue_waitlist.id"), nullable=False, index=True
             )
         },
     )
@@ -1170,7 +1575,7 @@ class QueueWaitlistPlayer:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1205,7 +1610,7 @@ class Raffle:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1236,7 +1641,7 @@ class Rotation:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
     rotation_maps = relationship("RotationMap", cascade="all, delete-orphan")
@@ -1259,6 +1664,9 @@ class RotationMap:
 
     __sa_dataclass_metadata_key__ = "sa"
     __tablename__ = "rotation_map"
+    __table_args__ = (
+        Index("ix_rotation_map_rotation_id_is_next", "rotation_id", "is_next"),
+    )
 
     raffle_ticket_reward: int = field(
         default=0,
@@ -1302,16 +1710,16 @@ class RotationMap:
     )
     rotation_id: str = field(
         default=None,
-        metadata={"sa": Column(String, ForeignKey("rotation.id"), index=True)},
+        metadata={"sa": Column(UUIDString, ForeignKey("rotation.id"))},
     )
     map_id: str = field(
         default=None,
-        metadata={"sa": Column(String, ForeignKey("map.id"), index=True)},
+        metadata={"sa": Column(UUIDString, ForeignKey("map.id"), index=True)},
     )
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
     map_votes = relationship("MapVote", cascade="all, delete-orphan")
@@ -1337,7 +1745,7 @@ class Schedule:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1354,7 +1762,12 @@ class SchedulePlayer:
 
     schedule_id: str = field(
         metadata={
-            "sa": Column(String, ForeignKey("schedule.id"), index=True, nullable=False)
+            "sa": Column(
+                UUIDString,
+                ForeignKey("schedule.id"),
+                index=True,
+                nullable=False,
+            )
         }
     )
     player_id: str = field(
@@ -1367,7 +1780,7 @@ class SchedulePlayer:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1391,7 +1804,7 @@ class VotePassedWaitlist:
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
     )
 
 
@@ -1405,7 +1818,7 @@ class VotePassedWaitlistPlayer:
     vote_passed_waitlist_id: str = field(
         metadata={
             "sa": Column(
-                String,
+                UUIDString,
                 ForeignKey("vote_passed_waitlist.id"),
                 nullable=False,
                 index=True,
@@ -1415,13 +1828,62 @@ class VotePassedWaitlistPlayer:
     player_id: int = field(
         metadata={"sa": Column(BigInteger, ForeignKey("player.id"), nullable=False)},
     )
-    queue_id: str = field(metadata={"sa": Column(String, ForeignKey("queue.id"))})
+    queue_id: str = field(metadata={"sa": Column(UUIDString, ForeignKey("queue.id"))})
     id: str = field(
         init=False,
         default_factory=lambda: str(uuid4()),
-        metadata={"sa": Column(String, primary_key=True)},
+        metadata={"sa": Column(UUIDString, primary_key=True)},
+    )
+
+
+def _archive_table(table: Table, *indexes: Index) -> Table:
+    """
+    A copy of table's columns, without foreign keys or defaults, for the rows
+    archive.py moves out of it
+    """
+    return Table(
+        f"{table.name}_archive",
+        mapper_registry.metadata,
+        *(
+            Column(
+                column.name,
+                column.type,
+                primary_key=column.primary_key,
+                nullable=column.nullable,
+            )
+            for column in table.columns
+        ),
+        *indexes,
     )
 
 
+finished_game_archive = _archive_table(
+    FinishedGame.__table__,
+    Index("ix_finished_game_archive_finished_at", "finished_at"),
+    Index("ix_finished_game_archive_game_id", "game_id"),
+)
+finished_game_player_archive = _archive_table(
+    FinishedGamePlayer.__table__,
+    Index(
+        "ix_finished_game_player_archive_player_id_finished_game_id",
+        "player_id",
+        "finished_game_id",
+    ),
+    Index("ix_finished_game_player_archive_finished_game_id", "finished_game_id"),
+)
+commend_archive = _archive_table(
+    Commend.__table__,
+    Index("ix_commend_archive_commender_id", "commender_id"),
+    Index("ix_commend_archive_commendee_id", "commendee_id"),
+)
+economy_prediction_archive = _archive_table(
+    EconomyPrediction.__table__,
+    Index("ix_economy_prediction_archive_player_id", "player_id"),
+)
+economy_transaction_archive = _archive_table(
+    EconomyTransaction.__table__,
+    Index("ix_economy_transaction_archive_player_id", "player_id"),
+)
+
 Session: sessionmaker = sessionmaker(bind=engine)
 ScopedSession = scoped_session(Session)
@@ -0,0 +1,127 @@
+"""
+Sorted rating ranks (mu - 3 * sigma) per category, so /stats can say which
+percentile a player is in with a bisect instead of loading and sorting every
+player's rating each time.
+
+Each index is loaded from the database the first time it's asked for, then
+kept up to date as ratings change (finish_in_progress_game and /trueskill
+resetplayer) and dropped to be loaded again whenever ratings change in bulk
+(the sigma decay job and the leaderboard rebuild).
+
+The index under category_id None is of Player.rated_trueskill_mu/sigma, which
+is what /stats shows. The others are of PlayerCategoryTrueskill.
+"""
+
+import threading
+from bisect import bisect, bisect_left, insort
+
+import sqlalchemy
+from sqlalchemy import select
+from trueskill import Rating
+
+from discord_bots.config import DEFAULT_TRUESKILL_MU, DEFAULT_TRUESKILL_SIGMA
+from discord_bots.models import Player, PlayerCategoryTrueskill
+
+
+class _Index:
+    def __init__(self, ranks_by_player_id: dict[int, float]):
+        self.ranks_by_player_id = ranks_by_player_id
+        self.ranks = sorted(ranks_by_player_id.values())
+
+
+# read from the reader threads, updated from the database thread
+_lock = threading.Lock()
+_indexes: dict[str | None, _Index] = {}
+
+
+def _rank(mu: float, sigma: float) -> float | None:
+    """
+    :returns: the rank to index, or None for players that haven't played a game
+    """
+    default_rating = Rating()
+    if (mu != default_rating.mu and sigma != default_rating.sigma) and (
+        mu != DEFAULT_TRUESKILL_MU and sigma != DEFAULT_TRUESKILL_SIGMA
+    ):
+        return round(mu - 3 * sigma, 2)
+    return None
+
+
+def _load(session: sqlalchemy.orm.Session, category_id: str | None) -> _Index:
+    if category_id is None:
+        statement = select(
+            Player.id, Player.rated_trueskill_mu, Player.rated_trueskill_sigma
+        )
+    else:
+        statement = select(
+            PlayerCategoryTrueskill.player_id,
+            PlayerCategoryTrueskill.mu,
+            PlayerCategoryTrueskill.sigma,
+        ).where(PlayerCategoryTrueskill.category_id == category_id)
+    ranks_by_player_id: dict[int, float] = {}
+    for player_id, mu, sigma in session.connection().execute(statement):
+        rank = _rank(mu, sigma)
+        if rank is not None:
+            ranks_by_player_id[player_id] = rank
+    return _Index(ranks_by_player_id)
+
+
+def get_top_ratio(
+    session: sqlalchemy.orm.Session,
+    mu: float,
+    sigma: float,
+    category_id: str | None = None,
+) -> float:
+    """
+    :returns: the fraction of rated players ranked above mu and sigma, 0.05 is
+    the top 5%
+    """
+    with _lock:
+        index = _indexes.get(category_id)
+        if index is None:
+            index = _indexes[category_id] = _load(session, category_id)
+        position = bisect(index.ranks, round(mu - 3 * sigma, 2))
+        return (len(index.ranks) - position) / (len(index.ranks) or 1)
+
+
+def update_rating_percentiles(
+    ratings: list[tuple[int, float, float]], category_id: str | None = None
+):
+    """
+    Move players to their new (player_id, mu, sigma) in the index of
+    category_id. Indexes that haven't been loaded yet are left to load the
+    new ratings from the database
+    """
+    with _lock:
+        index = _indexes.get(category_id)
+        if index is None:
+            return
+        for player_id, mu, sigma in ratings:
+            old_rank = index.ranks_by_player_id.pop(player_id, None)
+            if old_rank is not None:
+                del index.ranks[bisect_left(index.ranks, old_rank)]
+            rank = _rank(mu, sigma)
+            if rank is not None:
+                index.ranks_by_player_id[player_id] = rank
+                insort(index.ranks, rank)
+
+
+def invalidate_rating_percentiles():
+    """
+    Drop every index, to be loaded again the next time it's needed
+    """
+    with _lock:
+        _indexes.clear()
+
+
+def percentile_label(top_ratio: float) -> str:
+    if top_ratio <= 0.05:
+        return "Top 5%"
+    elif top_ratio <= 0.10:
+        return "Top 10%"
+    elif top_ratio <= 0.25:
+        return "Top 25%"
+    elif top_ratio <= 0.50:
+        return "Top 50%"
+    elif top_ratio <= 0.75:
+        return "Top 75%"
+    return "Top 100%"
@@ -0,0 +1,426 @@
+"""
+Maintains the player_pair_stats table, how every two players have done with and
+against each other, and an in-memory copy of it for the best teammate and
+nemesis lookups behind /player teammates and, later, pair effects when
+balancing teams.
+
+Working this out from finished_game_player means joining every game with itself,
+so rows are updated as games finish (finish_in_progress_game), change winner
+(/admin editgamewinner) or are deleted (/admin deletegame), and can be rebuilt
+from scratch with scripts/rebuild_player_pairs.py. Totals include games that
+have been archived, see archive.py.
+
+The in-memory copy of a category is loaded the first time it's asked for. After
+that, changes are applied to it when the session that made them commits, so
+lookups never go back to the database. A copy loaded while changes were being
+committed may or may not include them, so it's used once and not kept.
+"""
+
+import itertools
+import logging
+import threading
+from typing import NamedTuple
+
+import sqlalchemy
+from sqlalchemy import and_, case, event, func, select, union_all
+
+from discord_bots.archive import ARCHIVE_TABLES, with_archived
+from discord_bots.models import (
+    FinishedGame,
+    FinishedGamePlayer,
+    PlayerPairStats,
+    Session,
+)
+
+_log = logging.getLogger(__name__)
+
+
+class PairStats(NamedTuple):
+    """
+    How a player has done with and against another player
+    """
+
+    games_together: int = 0
+    wins_together: int = 0
+    losses_together: int = 0
+    games_against: int = 0
+    wins_against: int = 0
+    losses_against: int = 0
+
+    def __add__(self, other: "PairStats") -> "PairStats":  # type: ignore[override]
+        return PairStats(*(a + b for a, b in zip(self, other)))
+
+    def scaled(self, sign: int) -> "PairStats":
+        return PairStats(*(sign * value for value in self))
+
+    def swapped(self) -> "PairStats":
+        """
+        :returns: the same stats from the other player's side
+        """
+        return self._replace(
+            wins_against=self.losses_against, losses_against=self.wins_against
+        )
+
+    @property
+    def win_rate_together(self) -> float:
+        return self.wins_together / self.games_together if self.games_together else 0
+
+    @property
+    def win_rate_against(self) -> float:
+        return self.wins_against / self.games_against if self.games_against else 0
+
+
+_COUNTERS = PairStats._fields
+
+
+def _pair_outcome(winning_team: int, team: int, other_team: int) -> PairStats:
+    if team == other_team:
+        return PairStats(
+            games_together=1,
+            wins_together=int(winning_team == team),
+            losses_together=int(winning_team not in (-1, team)),
+        )
+    return PairStats(
+        games_against=1,
+        wins_against=int(winning_team == team),
+        losses_against=int(winning_team == other_team),
+    )
+
+
+# the pair stats of each loaded category, in both directions:
+# _matrices[category_name][player_id][other_player_id]. Read from the reader
+# threads and the event loop, updated from the database thread
+_lock = threading.Lock()
+_matrices: dict[str | None, dict[int, dict[int, PairStats]]] = {}
+# sessions between committing pair changes and applying them to _matrices, and
+# a counter bumped whenever one starts committing. Loads that overlap either are
+# not kept, see _get_matrix
+_commits_in_flight = 0
+_generation = 0
+
+
+def _add_to_matrix(
+    matrix: dict[int, dict[int, PairStats]],
+    player_id: int,
+    other_player_id: int,
+    stats: PairStats,
+):
+    row = matrix.setdefault(player_id, {})
+    row[other_player_id] = row.get(other_player_id, PairStats()) + stats
+    other_row = matrix.setdefault(other_player_id, {})
+    other_row[player_id] = other_row.get(player_id, PairStats()) + stats.swapped()
+
+
+def _get_matrix(
+    session: sqlalchemy.orm.Session, category_name: str | None
+) -> dict[int, dict[int, PairStats]]:
+    """
+    Read the result with _lock held, it's updated in place as changes commit
+    """
+    with _lock:
+        matrix = _matrices.get(category_name)
+        if matrix is not None:
+            return matrix
+        generation = _generation
+        # a commit in flight may already be in what's loaded, and will still be
+        # applied on top of it. So would this session's own uncommitted changes
+        cacheable = (
+            not _commits_in_flight
+            and not session.info.get(_PENDING_PAIR_CHANGES)
+            and not session.info.get(_PAIRS_WERE_REBUILT)
+        )
+    matrix = {}
+    statement = select(
+        PlayerPairStats.player_id,
+        PlayerPairStats.other_player_id,
+        *[getattr(PlayerPairStats, counter) for counter in _COUNTERS],
+    ).where(PlayerPairStats.category_name == category_name)
+    for player_id, other_player_id, *counters in session.connection().execute(
+        statement
+    ):
+        _add_to_matrix(matrix, player_id, other_player_id, PairStats(*counters))
+    with _lock:
+        if cacheable and generation == _generation:
+            return _matrices.setdefault(category_name, matrix)
+    return matrix
+
+
+def get_pair_stats(
+    session: sqlalchemy.orm.Session,
+    player_id: int,
+    other_player_id: int,
+    category_name: str | None = None,
+) -> PairStats:
+    """
+    :returns: how player_id has done with and against other_player_id
+    """
+    matrix = _get_matrix(session, category_name)
+    with _lock:
+        return matrix.get(player_id, {}).get(other_player_id, PairStats())
+
+
+def get_pairs(
+    session: sqlalchemy.orm.Session,
+    player_ids: list[int],
+    category_name: str | None = None,
+) -> dict[tuple[int, int], PairStats]:
+    """
+    For weighing pair effects when picking teams out of player_ids
+
+    :returns: the stats of every pair of player_ids that has played together or
+    against each other, keyed by (player_id, other_player_id) in the order of
+    player_ids
+    """
+    matrix = _get_matrix(session, category_name)
+    with _lock:
+        pairs: dict[tuple[int, int], PairStats] = {}
+        for player_id, other_player_id in itertools.combinations(player_ids, 2):
+            stats = matrix.get(player_id, {}).get(other_player_id)
+            if stats:
+                pairs[(player_id, other_player_id)] = stats
+        return pairs
+
+
+def _rank_pairs(
+    session: sqlalchemy.orm.Session,
+    player_id: int,
+    category_name: str | None,
+    min_games: int,
+    limit: int,
+    together: bool,
+) -> list[tuple[int, PairStats]]:
+    matrix = _get_matrix(session, category_name)
+    with _lock:
+        row = dict(matrix.get(player_id, {}))
+    if together:
+        candidates = [
+            (other_player_id, stats)
+            for other_player_id, stats in row.items()
+            if stats.games_together >= min_games
+        ]
+        candidates.sort(key=lambda pair: pair[1].win_rate_together, reverse=True)
+    else:
+        candidates = [
+            (other_player_id, stats)
+            for other_player_id, stats in row.items()
+            if stats.games_against >= min_games
+        ]
+        candidates.sort(key=lambda pair: pair[1].win_rate_against)
+    return candidates[:limit]
+
+
+def get_best_teammates(
+    session: sqlalchemy.orm.Session,
+    player_id: int,
+    category_name: str | None = None,
+    min_games: int = 10,
+    limit: int = 5,
+) -> list[tuple[int, PairStats]]:
+    """
+    :returns: (other_player_id, stats) of the players that player_id wins with
+    the most, out of those they've played at least min_games with
+    """
+    return _rank_pairs(session, player_id, category_name, min_games, limit, True)
+
+
+def get_nemeses(
+    session: sqlalchemy.orm.Session,
+    player_id: int,
+    category_name: str | None = None,
+    min_games: int = 10,
+    limit: int = 5,
+) -> list[tuple[int, PairStats]]:
+    """
+    :returns: (other_player_id, stats) of the players that player_id wins
+    against the least, out of those they've played at least min_games against
+    """
+    return _rank_pairs(session, player_id, category_name, min_games, limit, False)
+
+
+def invalidate_player_pairs():
+    """
+    Drop every category's pair stats, to be loaded again the next time they're
+    needed
+    """
+    global _generation
+    with _lock:
+        # and keep any load that's under way from putting them back
+        _generation += 1
+        _matrices.clear()
+
+
+# (category_name, player_id, other_player_id, stats) applied to the loaded
+# matrices once the session commits
+_PENDING_PAIR_CHANGES = "pending_pair_changes"
+_PAIRS_WERE_REBUILT = "pairs_were_rebuilt"
+# set while the session's pair changes count towards _commits_in_flight
+_COMMITTING_PAIRS = "committing_pairs"
+
+
+def update_player_pairs(
+    session: sqlalchemy.orm.Session,
+    finished_game: FinishedGame,
+    player_teams: list[tuple[int | None, int]],
+    sign: int = 1,
+):
+    """
+    Count finished_game towards every pair of its players, or take it back out
+    if sign is -1. The caller must commit the session
+
+    :player_teams: (player_id, team) of each player in the game
+    """
+    teams = sorted(
+        (player_id, team) for player_id, team in player_teams if player_id is not None
+    )
+    if len(teams) < 2:
+        return
+    category_name = finished_game.category_name
+    player_ids = [player_id for player_id, _ in teams]
+    rows: dict[tuple[int, int], PlayerPairStats] = {
+        (row.player_id, row.other_player_id): row
+        for row in session.query(PlayerPairStats).filter(
+            PlayerPairStats.player_id.in_(player_ids),
+            PlayerPairStats.other_player_id.in_(player_ids),
+            PlayerPairStats.category_name == category_name,
+        )
+    }
+    pending = session.info.setdefault(_PENDING_PAIR_CHANGES, [])
+    # teams is sorted, so player_id is always the lower of the two
+    for (player_id, team), (other_player_id, other_team) in itertools.combinations(
+        teams, 2
+    ):
+        if player_id == other_player_id:
+            continue
+        stats = _pair_outcome(finished_game.winning_team, team, other_team).scaled(sign)
+        row = rows.get((player_id, other_player_id))
+        if not row:
+            row = PlayerPairStats(
+                player_id=player_id,
+                other_player_id=other_player_id,
+                category_name=category_name,
+            )
+            session.add(row)
+            rows[(player_id, other_player_id)] = row
+        for counter, value in zip(_COUNTERS, stats):
+            setattr(row, counter, (getattr(row, counter) or 0) + value)
+        pending.append((category_name, player_id, other_player_id, stats))
+
+
+def player_pairs_need_rebuild(session: sqlalchemy.orm.Session) -> bool:
+    """
+    :returns: whether there are finished games but no pair stats, e.g. right
+    after the table was created
+    """
+    has_pairs = session.query(PlayerPairStats.id).limit(1).first() is not None
+    if has_pairs:
+        return False
+    games = with_archived(FinishedGame.__table__)
+    return session.execute(select(games.c.id).limit(1)).first() is not None
+
+
+def rebuild_player_pairs(session: sqlalchemy.orm.Session):
+    """
+    Recompute every row from the finished games, archived ones included. The
+    caller must commit the session
+    """
+    games = with_archived(FinishedGame.__table__)
+    game_player = with_archived(FinishedGamePlayer.__table__)
+    other_game_player = union_all(
+        select(FinishedGamePlayer.__table__),
+        select(ARCHIVE_TABLES[FinishedGamePlayer.__tablename__]),
+    ).subquery("other_finished_game_player")
+    together = game_player.c.team == other_game_player.c.team
+    against = game_player.c.team != other_game_player.c.team
+    won = games.c.winning_team == game_player.c.team
+    lost = and_(games.c.winning_team != -1, games.c.winning_team != game_player.c.team)
+    other_won = games.c.winning_team == other_game_player.c.team
+    counts = [
+        func.sum(case((condition, 1), else_=0))
+        for condition in (
+            together,
+            and_(together, won),
+            and_(together, lost),
+            against,
+            and_(against, won),
+            and_(against, other_won),
+        )
+    ]
+    keys = [
+        game_player.c.player_id,
+        other_game_player.c.player_id,
+        games.c.category_name,
+    ]
+    # each pair once, in the same order as update_player_pairs
+    statement = (
+        select(*keys, *counts)
+        .select_from(game_player)
+        .join(
+            other_game_player,
+            and_(
+                other_game_player.c.finished_game_id == game_player.c.finished_game_id,
+                other_game_player.c.player_id > game_player.c.player_id,
+            ),
+        )
+        .join(games, games.c.id == game_player.c.finished_game_id)
+        .group_by(*keys)
+    )
+    pairs = session.execute(statement).all()
+
+    session.query(PlayerPairStats).delete(synchronize_session=False)
+    session.add_all(
+        PlayerPairStats(
+            player_id=player_id,
+            other_player_id=other_player_id,
+            category_name=category_name,
+            **dict(zip(_COUNTERS, counters)),
+        )
+        for player_id, other_player_id, category_name, *counters in pairs
+    )
+    session.info[_PAIRS_WERE_REBUILT] = True
+    _log.info(f"[rebuild_player_pairs] Rebuilt {len(pairs)} player pairs")
+
+
+def _end_commit(session: sqlalchemy.orm.Session):
+    global _commits_in_flight
+    if not session.info.pop(_COMMITTING_PAIRS, False):
+        return
+    with _lock:
+        _commits_in_flight -= 1
+
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session: sqlalchemy.orm.Session):
+    global _commits_in_flight, _generation
+    if session.info.get(_COMMITTING_PAIRS) or not (
+        session.info.get(_PENDING_PAIR_CHANGES) or session.info.get(_PAIRS_WERE_REBUILT)
+    ):
+        return
+    with _lock:
+        _commits_in_flight += 1
+        _generation += 1
+        session.info[_COMMITTING_PAIRS] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: sqlalchemy.orm.Session):
+    pending = session.info.pop(_PENDING_PAIR_CHANGES, None)
+    if session.info.pop(_PAIRS_WERE_REBUILT, False):
+        invalidate_player_pairs()
+        _end_commit(session)
+        return
+    if not pending:
+        return
+    with _lock:
+        for category_name, player_id, other_player_id, stats in pending:
+            # categories that aren't loaded yet will load the committed rows
+            matrix = _matrices.get(category_name)
+            if matrix is not None:
+                _add_to_matrix(matrix, player_id, other_player_id, stats)
+    _end_commit(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: sqlalchemy.orm.Session):
+    session.info.pop(_PENDING_PAIR_CHANGES, None)
+    session.info.pop(_PAIRS_WERE_REBUILT, None)
+    _end_commit(session)
@@ -0,0 +1,217 @@
+"""
+Maintains the player_stats_summary and player_stats_day tables, which /stats and
+/map stats read instead of counting each player's games every time.
+
+Rows are updated as games finish (finish_in_progress_game), change winner
+(/admin editgamewinner) or are deleted (/admin deletegame), and can be rebuilt
+from scratch with scripts/rebuild_player_stats.py. Totals include games that
+have been archived, see archive.py.
+"""
+
+import logging
+from datetime import date, datetime, timedelta, timezone
+from uuid import uuid4
+
+import sqlalchemy
+from sqlalchemy import Date, Table, and_, case, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+
+from discord_bots.models import (
+    FinishedGame,
+    FinishedGamePlayer,
+    PlayerHistoryRollup,
+    PlayerStatsDay,
+    PlayerStatsSummary,
+)
+
+_log = logging.getLogger(__name__)
+
+# the longest window /stats shows, older days are deleted
+PLAYER_STATS_DAYS = 365
+
+
+def _outcome(winning_team: int, team: int) -> tuple[int, int, int]:
+    if winning_team == -1:
+        return 0, 0, 1
+    if winning_team == team:
+        return 1, 0, 0
+    return 0, 1, 0
+
+
+def stats_day_cutoff() -> date:
+    """
+    :returns: the oldest day that is still kept in player_stats_day
+    """
+    return datetime.now(timezone.utc).date() - timedelta(days=PLAYER_STATS_DAYS - 1)
+
+
+def _upsert_counts(session: sqlalchemy.orm.Session, table: Table, rows: list[dict]):
+    """
+    Insert rows, or add their counts to the rows already there with the same
+    key, so concurrent games can't duplicate or overwrite each other's rows
+    """
+    if not rows:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        statement = postgresql.insert(table).values(rows)
+    else:
+        statement = sqlite.insert(table).values(rows)
+    key = next(index for index in table.indexes if index.name.startswith("uq_"))
+    session.execute(
+        statement.on_conflict_do_update(
+            index_elements=key.expressions,
+            set_={
+                counter: table.c[counter] + statement.excluded[counter]
+                for counter in ("wins", "losses", "ties")
+            },
+        )
+    )
+
+
+def update_player_stats(
+    session: sqlalchemy.orm.Session,
+    finished_game: FinishedGame,
+    player_teams: list[tuple[int | None, int]],
+    sign: int = 1,
+):
+    """
+    Count finished_game towards the stats of its players, or take it back out
+    if sign is -1. The caller must commit the session
+
+    :player_teams: (player_id, team) of each player in the game
+    """
+    category_name = finished_game.category_name
+    map_full_name = finished_game.map_full_name
+    # timezones aren't stored in the DB
+    day = finished_game.finished_at.replace(tzinfo=timezone.utc).date()
+    # one row per player, a statement can't upsert the same key twice
+    outcomes: dict[int, list[int]] = {}
+    for player_id, team in player_teams:
+        if player_id is None:
+            continue
+        total = outcomes.setdefault(player_id, [0, 0, 0])
+        for i, count in enumerate(_outcome(finished_game.winning_team, team)):
+            total[i] += sign * count
+    summaries: list[dict] = []
+    days: list[dict] = []
+    for player_id, (wins, losses, ties) in outcomes.items():
+        counts = {
+            "player_id": player_id,
+            "category_name": category_name,
+            "map_full_name": map_full_name,
+            "wins": wins,
+            "losses": losses,
+            "ties": ties,
+        }
+        summaries.append({**counts, "id": str(uuid4())})
+        if day >= stats_day_cutoff():
+            days.append({**counts, "day": day, "id": str(uuid4())})
+    _upsert_counts(session, PlayerStatsSummary.__table__, summaries)
+    _upsert_counts(session, PlayerStatsDay.__table__, days)
+
+
+def prune_player_stats_days(session: sqlalchemy.orm.Session) -> int:
+    """
+    Delete the days that are older than every /stats window. The caller must
+    commit the session
+
+    :returns: the number of rows deleted
+    """
+    return (
+        session.query(PlayerStatsDay)
+        .filter(PlayerStatsDay.day < stats_day_cutoff())
+        .delete(synchronize_session=False)
+    )
+
+
+def player_stats_need_rebuild(session: sqlalchemy.orm.Session) -> bool:
+    """
+    :returns: whether there are finished games but no stats, e.g. right after
+    the tables were created
+    """
+    has_stats = session.query(PlayerStatsSummary.id).limit(1).first() is not None
+    has_games = session.query(FinishedGame.id).limit(1).first() is not None
+    has_archived = session.query(PlayerHistoryRollup.id).limit(1).first() is not None
+    return not has_stats and (has_games or has_archived)
+
+
+def rebuild_player_stats(session: sqlalchemy.orm.Session):
+    """
+    Recompute every row from the finished games and the archive rollups. The
+    caller must commit the session
+    """
+    is_win = FinishedGame.winning_team == FinishedGamePlayer.team
+    is_loss = and_(
+        FinishedGame.winning_team != FinishedGamePlayer.team,
+        FinishedGame.winning_team != -1,
+    )
+    is_tie = FinishedGame.winning_team == -1
+    counts = [
+        func.sum(case((outcome, 1), else_=0)) for outcome in (is_win, is_loss, is_tie)
+    ]
+    keys = [
+        FinishedGamePlayer.player_id,
+        FinishedGame.category_name,
+        FinishedGame.map_full_name,
+    ]
+    joined = (
+        select(*keys, *counts)
+        .select_from(FinishedGamePlayer)
+        .join(FinishedGame, FinishedGame.id == FinishedGamePlayer.finished_game_id)
+        .where(FinishedGamePlayer.player_id.is_not(None))
+    )
+
+    totals: dict[tuple[int, str | None, str | None], list[int]] = {
+        (player_id, category_name, map_full_name): [wins, losses, ties]
+        for player_id, category_name, map_full_name, wins, losses, ties in (
+            session.execute(joined.group_by(*keys))
+        )
+    }
+    # archived games, see archive.py
+    for rollup in session.query(PlayerHistoryRollup):
+        total = totals.setdefault(
+            (rollup.player_id, rollup.category_name, rollup.map_full_name), [0, 0, 0]
+        )
+        total[0] += rollup.wins
+        total[1] += rollup.losses
+        total[2] += rollup.ties
+
+    day_column = func.date(FinishedGame.finished_at, type_=Date)
+    days = session.execute(
+        joined.add_columns(day_column)
+        .where(
+            FinishedGame.finished_at
+            >= datetime.combine(stats_day_cutoff(), datetime.min.time())
+        )
+        .group_by(*keys, day_column)
+    ).all()
+
+    session.query(PlayerStatsDay).delete(synchronize_session=False)
+    session.query(PlayerStatsSummary).delete(synchronize_session=False)
+    for (player_id, category_name, map_full_name), outcomes in totals.items():
+        wins, losses, ties = outcomes
+        session.add(
+            PlayerStatsSummary(
+                player_id=player_id,
+                category_name=category_name,
+                map_full_name=map_full_name,
+                wins=wins,
+                losses=losses,
+                ties=ties,
+            )
+        )
+    session.add_all(
+        PlayerStatsDay(
+            player_id=player_id,
+            category_name=category_name,
+            map_full_name=map_full_name,
+            day=day,
+            wins=wins,
+            losses=losses,
+            ties=ties,
+        )
+        for player_id, category_name, map_full_name, wins, losses, ties, day in days
+    )
+    _log.info(
+        f"[rebuild_player_stats] Rebuilt {len(totals)} player stats summaries and {len(days)} days"
+    )
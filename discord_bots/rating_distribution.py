@@ -0,0 +1,128 @@
+"""
+How rated mu is spread across the players of a category, for tuning queue mu
+ranges (/trueskill shownormaldist and /queue setrange).
+
+The mean and standard deviation are computed by the database. The actual
+quantiles come from a sketch of the sorted mus (the mu at every percentile),
+which is cached per category for SKETCH_CACHE_SECONDS since ratings only move
+a little with each game.
+
+Category None is every player's Player.rated_trueskill_mu, counting only
+players that have played a game.
+"""
+
+import math
+import time
+from bisect import bisect_right
+from typing import NamedTuple
+
+import sqlalchemy
+from sqlalchemy import func, select
+
+from discord_bots import db
+from discord_bots.models import Player, PlayerCategoryTrueskill, PlayerStatsSummary
+
+# mu at every percentile from 0 to 100
+SKETCH_POINTS = 101
+SKETCH_CACHE_SECONDS = 300
+
+
+class RatingMoments(NamedTuple):
+    count: int
+    mean: float
+    stddev: float
+
+
+class RatingSketch:
+    def __init__(self, count: int, points: list[float]):
+        """
+        :points: the mu at evenly spaced quantiles, from lowest to highest
+        """
+        self.count = count
+        self.points = points
+
+    def quantile(self, q: float) -> float | None:
+        """
+        :returns: the mu that a fraction q of players are rated below
+        """
+        if not self.points:
+            return None
+        if len(self.points) == 1:
+            return self.points[0]
+        position = min(max(q, 0), 1) * (len(self.points) - 1)
+        i = min(int(position), len(self.points) - 2)
+        return self.points[i] + (self.points[i + 1] - self.points[i]) * (position - i)
+
+    def fraction_below(self, mu: float) -> float:
+        if not self.points or mu <= self.points[0]:
+            return 0
+        if mu >= self.points[-1]:
+            return 1
+        i = bisect_right(self.points, mu) - 1
+        between = (mu - self.points[i]) / (self.points[i + 1] - self.points[i])
+        return (i + between) / (len(self.points) - 1)
+
+    def fraction_between(self, low: float, high: float) -> float:
+        return max(self.fraction_below(high) - self.fraction_below(low), 0)
+
+
+def _rated_mus(category_id: str | None):
+    if category_id is None:
+        # the summaries have a row for every player with a game, archived ones
+        # included, which is much cheaper to check than their games
+        has_played = (
+            select(PlayerStatsSummary.player_id)
+            .where(
+                PlayerStatsSummary.wins
+                + PlayerStatsSummary.losses
+                + PlayerStatsSummary.ties
+                > 0
+            )
+            .distinct()
+        )
+        return Player.rated_trueskill_mu, Player.id.in_(has_played)
+    return (
+        PlayerCategoryTrueskill.mu,
+        PlayerCategoryTrueskill.category_id == category_id,
+    )
+
+
+def get_rating_moments(
+    session: sqlalchemy.orm.Session, category_id: str | None = None
+) -> RatingMoments:
+    mu, where = _rated_mus(category_id)
+    count, mean, mean_of_squares = session.execute(
+        select(func.count(), func.avg(mu), func.avg(mu * mu)).where(where)
+    ).one()
+    if not count:
+        return RatingMoments(0, 0, 0)
+    # the population standard deviation, like numpy.std
+    variance = max(mean_of_squares - mean * mean, 0)
+    return RatingMoments(count, mean, math.sqrt(variance))
+
+
+def _load_sketch(
+    session: sqlalchemy.orm.Session, category_id: str | None
+) -> RatingSketch:
+    mu, where = _rated_mus(category_id)
+    mus = session.execute(select(mu).where(where).order_by(mu)).scalars().all()
+    if not mus:
+        return RatingSketch(0, [])
+    points = [
+        mus[round(i * (len(mus) - 1) / (SKETCH_POINTS - 1))]
+        for i in range(SKETCH_POINTS)
+    ]
+    return RatingSketch(len(mus), points)
+
+
+# category_id: (loaded at, sketch)
+_sketches: dict[str | None, tuple[float, RatingSketch]] = {}
+
+
+async def get_rating_sketch(category_id: str | None = None) -> RatingSketch:
+    cached = _sketches.get(category_id)
+    if cached and time.monotonic() - cached[0] < SKETCH_CACHE_SECONDS:
+        return cached[1]
+    sketch = await db.read(_load_sketch, category_id)
+    _sketches[category_id] = (time.monotonic(), sketch)
+    return sketch
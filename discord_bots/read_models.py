@@ -0,0 +1,373 @@
+"""
+Read models for the read-heavy paths (/stats, /map stats, /game history, the
+leaderboard and autocomplete).
+
+Loading mapped objects to read two or three of their columns pays for the
+identity map, attribute instrumentation and relationship bookkeeping of every
+row. These functions run Core select()s on the session's connection instead
+and return plain named tuples with only the columns the caller needs. Rows are
+read only, so write through the models as usual.
+
+Finished games that have been archived (see archive.py) are only read from the
+archive tables when the hot ones don't have enough. Win, loss and tie counts
+come from player_stats_summary and player_stats_day, see player_stats.py.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import sqlalchemy
+from sqlalchemy import Column, case, func, null, select, true
+from sqlalchemy.sql.schema import Table
+from sqlalchemy.sql.selectable import Select
+
+from discord_bots.archive import with_archived
+from discord_bots.models import (
+    Category,
+    FinishedGame,
+    FinishedGamePlayer,
+    LeaderboardEntry,
+    Map,
+    Player,
+    PlayerStatsDay,
+    PlayerStatsSummary,
+    Queue,
+    finished_game_archive,
+    finished_game_player_archive,
+)
+
+
+class PlayerGameResult(NamedTuple):
+    """
+    A finished game from the point of view of one of its players
+    """
+
+    finished_game_id: str
+    team: int
+    winning_team: int
+    category_name: str | None
+    map_full_name: str
+    finished_at: datetime
+
+    @property
+    def is_win(self) -> bool:
+        return self.winning_team == self.team
+
+    @property
+    def is_loss(self) -> bool:
+        return self.winning_team != self.team and self.winning_team != -1
+
+    @property
+    def is_tie(self) -> bool:
+        return self.winning_team == -1
+
+
+class FinishedGameSummary(NamedTuple):
+    """
+    Everything create_finished_game_embed shows, other than the player names
+    """
+
+    id: str
+    game_id: str
+    queue_name: str
+    team0_name: str
+    team1_name: str
+    winning_team: int
+    win_probability: float
+    map_full_name: str
+    map_short_name: str
+    average_trueskill: float
+    started_at: datetime
+    finished_at: datetime
+
+
+class WinLossTie(NamedTuple):
+    wins: int
+    losses: int
+    ties: int
+
+    @property
+    def total(self) -> int:
+        return self.wins + self.losses + self.ties
+
+    def __add__(self, other: "WinLossTie") -> "WinLossTie":  # type: ignore
+        return WinLossTie(
+            self.wins + other.wins, self.losses + other.losses, self.ties + other.ties
+        )
+
+
+# the periods /stats breaks results down by, in days. None is all time
+STATS_WINDOWS: tuple[int | None, ...] = (7, 30, 90, 365, None)
+
+
+class MapStatsRow(NamedTuple):
+    """
+    The results of every game played on a map
+    """
+
+    map_full_name: str
+    team0_wins: int
+    team1_wins: int
+    ties: int
+
+    @property
+    def total(self) -> int:
+        return self.team0_wins + self.team1_wins + self.ties
+
+
+class LeaderboardRow(NamedTuple):
+    player_name: str
+    rank: float
+    mu: float
+    sigma: float
+
+
+def _summary_columns(table: Table) -> list[Column]:
+    """
+    The FinishedGameSummary columns of finished_game or finished_game_archive
+    """
+    return [table.c[name] for name in FinishedGameSummary._fields]
+
+
+def _execute(session: sqlalchemy.orm.Session, statement):
+    # straight to Core, skipping the ORM's result processing
+    return session.connection().execute(statement)
+
+
+def get_player_game_results(
+    session: sqlalchemy.orm.Session,
+    player_id: int,
+    category_name: str | None = None,
+) -> list[PlayerGameResult]:
+    statement = (
+        select(
+            FinishedGamePlayer.finished_game_id,
+            FinishedGamePlayer.team,
+            FinishedGame.winning_team,
+            FinishedGame.category_name,
+            FinishedGame.map_full_name,
+            FinishedGame.finished_at,
+        )
+        .join(FinishedGame, FinishedGame.id == FinishedGamePlayer.finished_game_id)
+        .where(FinishedGamePlayer.player_id == player_id)
+    )
+    if category_name:
+        statement = statement.where(FinishedGame.category_name == category_name)
+    return [PlayerGameResult._make(row) for row in _execute(session, statement)]
+
+
+def _sum_stats(
+    table: Table, group_by: str | None, where: list, windows: list
+) -> Select:
+    # one SUM per window and outcome, each window a condition on the row
+    columns = [
+        func.sum(case((in_window, table.c[outcome]), else_=0))
+        for in_window in windows
+        for outcome in ("wins", "losses", "ties")
+    ]
+    group = table.c[group_by] if group_by else null()
+    statement = select(group, *columns).where(*where)
+    if group_by:
+        statement = statement.group_by(group)
+    return statement
+
+
+def get_player_windowed_results(
+    session: sqlalchemy.orm.Session,
+    player_id: int,
+    group_by: str | None = None,
+    category_name: str | None = None,
+    windows: tuple[int | None, ...] = STATS_WINDOWS,
+) -> dict[str | None, list[WinLossTie]]:
+    """
+    The player's wins, losses and ties from player_stats_summary (all time) and
+    player_stats_day (the last n days), see player_stats.py. Archived games are
+    included in the all time totals
+
+    :group_by: "category_name" or "map_full_name", or None for a single group
+    under None
+    :returns: a WinLossTie per window, in the order of windows, per group
+    """
+    summary = PlayerStatsSummary.__table__
+    day = PlayerStatsDay.__table__
+    # (statement, the windows its columns are for)
+    statements: list[tuple[Select, list[int | None]]] = []
+    if None in windows:
+        where = [summary.c.player_id == player_id]
+        if category_name:
+            where.append(summary.c.category_name == category_name)
+        statements.append((_sum_stats(summary, group_by, where, [true()]), [None]))
+    days: list[int | None] = [n for n in windows if n is not None]
+    if days:
+        today = datetime.now(timezone.utc).date()
+        where = [
+            day.c.player_id == player_id,
+            day.c.day > today - timedelta(days=max(days)),
+        ]
+        if category_name:
+            where.append(day.c.category_name == category_name)
+        in_windows = [day.c.day > today - timedelta(days=n) for n in days]
+        statements.append((_sum_stats(day, group_by, where, in_windows), days))
+
+    counts_by_group: dict[str | None, dict[int | None, WinLossTie]] = defaultdict(dict)
+    for statement, statement_windows in statements:
+        for group, *counts in _execute(session, statement):
+            if all(count is None for count in counts):
+                # no rows at all, the aggregate still returns one
+                continue
+            for i, n in enumerate(statement_windows):
+                counts_by_group[group][n] = WinLossTie(
+                    *(count or 0 for count in counts[3 * i : 3 * i + 3])
+                )
+    return {
+        group: [counts.get(n, WinLossTie(0, 0, 0)) for n in windows]
+        for group, counts in counts_by_group.items()
+        if any(count.total for count in counts.values())
+    }
+
+
+def get_player_ratings(session: sqlalchemy.orm.Session) -> list[tuple[float, float]]:
+    """
+    :returns: (rated_trueskill_mu, rated_trueskill_sigma) of every player
+    """
+    statement = select(Player.rated_trueskill_mu, Player.rated_trueskill_sigma)
+    return [(mu, sigma) for mu, sigma in _execute(session, statement)]
+
+
+def get_finished_game_summary(
+    session: sqlalchemy.orm.Session, finished_game_id: str
+) -> FinishedGameSummary | None:
+    for table in (FinishedGame.__table__, finished_game_archive):
+        statement = select(*_summary_columns(table)).where(
+            table.c.id == finished_game_id
+        )
+        row = _execute(session, statement).first()
+        if row:
+            return FinishedGameSummary._make(row)
+    return None
+
+
+def get_archived_finished_game_summary(
+    session: sqlalchemy.orm.Session, game_id: str
+) -> FinishedGameSummary | None:
+    """
+    :returns: the archived game whose game_id starts with game_id, if any
+    """
+    statement = (
+        select(*_summary_columns(finished_game_archive))
+        .where(finished_game_archive.c.game_id.startswith(game_id))
+        .limit(1)
+    )
+    row = _execute(session, statement).first()
+    return FinishedGameSummary._make(row) if row else None
+
+
+def get_recent_finished_game_summaries(
+    session: sqlalchemy.orm.Session, player_id: int, count: int
+) -> list[FinishedGameSummary]:
+    """
+    :returns: the player's last count games, most recent first. Archived games
+    are only read if there aren't enough newer ones
+    """
+    summaries: list[FinishedGameSummary] = []
+    for games, players in (
+        (FinishedGame.__table__, FinishedGamePlayer.__table__),
+        (finished_game_archive, finished_game_player_archive),
+    ):
+        statement = (
+            select(*_summary_columns(games))
+            .join(players, players.c.finished_game_id == games.c.id)
+            .where(players.c.player_id == player_id)
+            .order_by(games.c.finished_at.desc())
+            .limit(count - len(summaries))
+        )
+        summaries.extend(
+            FinishedGameSummary._make(row) for row in _execute(session, statement)
+        )
+        if len(summaries) >= count:
+            break
+    return summaries
+
+
+def get_finished_game_player_names(
+    session: sqlalchemy.orm.Session, finished_game_ids: list[str]
+) -> dict[tuple[str, int], list[str]]:
+    """
+    :returns: player names keyed by (finished_game_id, team)
+    """
+    player_names: dict[tuple[str, int], list[str]] = defaultdict(list)
+    missing = set(finished_game_ids)
+    # games missing from the hot table have been archived
+    for table in (FinishedGamePlayer.__table__, finished_game_player_archive):
+        if not missing:
+            break
+        statement = select(
+            table.c.finished_game_id, table.c.team, table.c.player_name
+        ).where(table.c.finished_game_id.in_(list(missing)))
+        found = set()
+        for finished_game_id, team, player_name in _execute(session, statement):
+            player_names[(finished_game_id, team)].append(player_name)
+            found.add(finished_game_id)
+        missing -= found
+    return player_names
+
+
+def get_leaderboard_rows(
+    session: sqlalchemy.orm.Session,
+    category_id: str,
+    min_games: int,
+    limit: int = 10,
+) -> list[LeaderboardRow]:
+    statement = (
+        select(
+            Player.name,
+            LeaderboardEntry.rank,
+            LeaderboardEntry.mu,
+            LeaderboardEntry.sigma,
+        )
+        .join(Player, Player.id == LeaderboardEntry.player_id)
+        .where(
+            LeaderboardEntry.category_id == category_id,
+            LeaderboardEntry.games_played_last_30_days >= min_games,
+            Player.leaderboard_enabled == True,
+        )
+        .order_by(LeaderboardEntry.rank.desc())
+        .limit(limit)
+    )
+    return [LeaderboardRow._make(row) for row in _execute(session, statement)]
+
+
+def get_global_map_stats(
+    session: sqlalchemy.orm.Session, category_name: str | None = None
+) -> list[MapStatsRow]:
+    """
+    :returns: the results on each map that still exists, by name, in one grouped
+    query over the finished games and the archive
+    """
+    finished_game = with_archived(FinishedGame.__table__)
+    statement = (
+        select(
+            finished_game.c.map_full_name,
+            *(
+                func.sum(case((finished_game.c.winning_team == team, 1), else_=0))
+                for team in (0, 1, -1)
+            ),
+        )
+        .where(finished_game.c.map_full_name.in_(select(Map.full_name)))
+        .group_by(finished_game.c.map_full_name)
+        .order_by(finished_game.c.map_full_name)
+    )
+    if category_name:
+        statement = statement.where(finished_game.c.category_name == category_name)
+    return [MapStatsRow._make(row) for row in _execute(session, statement)]
+
+
+def get_queue_names(session: sqlalchemy.orm.Session, limit: int = 25) -> list[str]:
+    statement = select(Queue.name).order_by(Queue.name).limit(limit)
+    return list(_execute(session, statement).scalars())
+
+
+def get_category_names(session: sqlalchemy.orm.Session, limit: int = 25) -> list[str]:
+    statement = select(Category.name).order_by(Category.name).limit(limit)
+    return list(_execute(session, statement).scalars())
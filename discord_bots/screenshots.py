@@ -0,0 +1,202 @@
+"""
+Renders stats screenshots off of the event loop.
+
+imgkit starts a wkhtmltoimage process and waits for it, and cropping with PIL
+is CPU work, so rendering on the event loop used to stall the bot (heartbeat
+included) for as long as a render took after every finished game. Renders run
+in a small process pool instead (SCREENSHOT_PROCESSES) and the event loop awaits
+the PNG bytes.
+
+- The newest stats sheet in STATS_DIR is kept in an index that's only rescanned
+  when the directory itself changes (a file is added, removed or renamed)
+- Renders of the same stats sheet or url that are already running are awaited
+  rather than started again
+- Rendered stats sheets are cached by the sha256 of their contents, so uploading
+  the same sheet twice only renders it once
+"""
+
+import asyncio
+import hashlib
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable
+
+import imgkit
+from PIL import Image
+
+import discord_bots.config as config
+
+_log = logging.getLogger(__name__)
+
+# rendered stats sheets are ~100KB each
+MAX_CACHED_SCREENSHOTS = 32
+
+
+def _crop(png: bytes, width: int | None, height: int | None) -> bytes:
+    if not (width and height):
+        return png
+    image = Image.open(io.BytesIO(png))
+    output = io.BytesIO()
+    image.crop((0, 0, width, height)).save(output, format="PNG")
+    return output.getvalue()
+
+
+def _render_file(path: str, width: int | None, height: int | None) -> bytes:
+    # runs in the process pool, returning the bytes means nothing is left on disk
+    png = imgkit.from_file(
+        path, False, options={"enable-local-file-access": None, "format": "png"}
+    )
+    return _crop(png, width, height)
+
+
+def _render_url(url: str, width: int | None, height: int | None) -> bytes:
+    png = imgkit.from_url(url, False, options={"format": "png"})
+    return _crop(png, width, height)
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # forking copies the database and discord threads' locks in whatever state
+        # they happen to be in, so workers start from a fresh interpreter instead
+        _pool = ProcessPoolExecutor(
+            max_workers=max(config.SCREENSHOT_PROCESSES, 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+class _StatsDirIndex:
+    """
+    The html files in a directory by mtime, rescanned only when the directory's
+    own mtime changes. Files that are rewritten in place don't change it, which
+    is fine since stats sheets are always written as new files
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.directory_mtime_ns: int | None = None
+        self.mtimes: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def _scan(self):
+        mtimes: dict[str, int] = {}
+        with os.scandir(self.directory) as entries:
+            for entry in entries:
+                if entry.name.endswith(".html") and entry.is_file():
+                    mtimes[entry.path] = entry.stat().st_mtime_ns
+        self.mtimes = mtimes
+
+    def latest(self) -> str | None:
+        with self.lock:
+            directory_mtime_ns = os.stat(self.directory).st_mtime_ns
+            if directory_mtime_ns != self.directory_mtime_ns:
+                self._scan()
+                self.directory_mtime_ns = directory_mtime_ns
+            if not self.mtimes:
+                return None
+            return max(self.mtimes, key=self.mtimes.__getitem__)
+
+    def invalidate(self):
+        with self.lock:
+            self.directory_mtime_ns = None
+
+
+_stats_dir_index: _StatsDirIndex | None = None
+_cache: OrderedDict[str, bytes] = OrderedDict()
+_in_flight: dict[str, asyncio.Future[bytes]] = {}
+
+
+def _get_stats_dir_index() -> _StatsDirIndex | None:
+    global _stats_dir_index
+    if not config.STATS_DIR:
+        return None
+    if _stats_dir_index is None or _stats_dir_index.directory != config.STATS_DIR:
+        _stats_dir_index = _StatsDirIndex(config.STATS_DIR)
+    return _stats_dir_index
+
+
+def _find_latest_stats_file(index: _StatsDirIndex) -> tuple[str, str] | None:
+    """
+    :returns: the path and content hash of the newest stats sheet
+    """
+    path = index.latest()
+    if path is None:
+        return None
+    try:
+        with open(path, "rb") as f:
+            return path, hashlib.sha256(f.read()).hexdigest()
+    except FileNotFoundError:
+        # removed since the last scan
+        index.invalidate()
+        return None
+
+
+async def _render_once(key: str, render: Callable[..., bytes], *args) -> bytes:
+    future = _in_flight.get(key)
+    if future is not None:
+        return await asyncio.shield(future)
+    loop = asyncio.get_running_loop()
+    future = loop.run_in_executor(_get_pool(), render, *args)
+    _in_flight[key] = future
+    # callers that are cancelled stop waiting, the render carries on for the rest
+    future.add_done_callback(lambda _: _in_flight.pop(key, None))
+    return await asyncio.shield(future)
+
+
+async def render_latest_stats() -> tuple[str, bytes] | None:
+    """
+    Render the newest stats sheet in STATS_DIR
+
+    :returns: the sheet's file name and the PNG, or None if there isn't one
+    """
+    index = _get_stats_dir_index()
+    if index is None:
+        return None
+    latest = await asyncio.to_thread(_find_latest_stats_file, index)
+    if latest is None:
+        return None
+    path, digest = latest
+    png = _cache.get(digest)
+    if png is not None:
+        _cache.move_to_end(digest)
+        return os.path.basename(path), png
+    png = await _render_once(
+        digest, _render_file, path, config.STATS_WIDTH, config.STATS_HEIGHT
+    )
+    _cache[digest] = png
+    while len(_cache) > MAX_CACHED_SCREENSHOTS:
+        _cache.popitem(last=False)
+    return os.path.basename(path), png
+
+
+async def render_url(url: str, width: int, height: int) -> bytes:
+    """
+    Render a web page, which is never cached since pages like server queries
+    change from one minute to the next
+    """
+    return await _render_once(url, _render_url, url, width, height)
+
+
+def _remove_stats_files(index: _StatsDirIndex):
+    for file_ in os.listdir(index.directory):
+        if file_.endswith(".png") or file_.endswith(".html"):
+            os.remove(os.path.join(index.directory, file_))
+    index.invalidate()
+
+
+async def remove_stats_files():
+    """
+    Delete every stats sheet and screenshot in STATS_DIR
+    """
+    index = _get_stats_dir_index()
+    if index is not None:
+        await asyncio.to_thread(_remove_stats_files, index)
@@ -0,0 +1,176 @@
+"""
+Pays out and refunds predictions (see cogs/economy.py) in bulk.
+
+Each prediction gets the same pair of ledger entries create_transaction would
+write, one out of the game's account and one into the player's, but every entry,
+balance change and prediction update is written in a single transaction with a
+handful of statements, instead of two commits per prediction.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import NamedTuple
+from uuid import uuid4
+
+import sqlalchemy
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from discord_bots.config import ECONOMY_ENABLED
+from discord_bots.models import EconomyPrediction, EconomyTransaction, Player
+
+
+class Payout(NamedTuple):
+    prediction_id: str
+    in_progress_game_id: str
+    player_id: int
+    value: int
+
+
+class PredictionResults(NamedTuple):
+    """
+    :payouts: What each winning prediction is paid, in the order of predictions
+    :losses: How much each player on the losing side lost in total
+    """
+
+    payouts: list[Payout]
+    losses: dict[int, int]
+
+
+def compute_payouts(
+    predictions: list[EconomyPrediction], winning_team: int
+) -> PredictionResults:
+    """
+    Split everything that was predicted between the winning predictions, in
+    proportion to how much each of them put in
+    """
+    winning_predictions = [p for p in predictions if p.team == winning_team]
+    losing_predictions = [p for p in predictions if p.team != winning_team]
+    winning_total = sum(p.prediction_value for p in winning_predictions)
+    losing_total = sum(p.prediction_value for p in losing_predictions)
+
+    payouts = [
+        Payout(
+            prediction.id,
+            prediction.in_progress_game_id,
+            prediction.player_id,
+            round(
+                (winning_total + losing_total)
+                * (prediction.prediction_value / winning_total),
+                None,
+            ),
+        )
+        for prediction in winning_predictions
+    ]
+    losses: dict[int, int] = defaultdict(int)
+    for prediction in losing_predictions:
+        losses[prediction.player_id] += prediction.prediction_value
+    return PredictionResults(payouts, dict(losses))
+
+
+def compute_refunds(predictions: list[EconomyPrediction]) -> list[Payout]:
+    return [
+        Payout(
+            prediction.id,
+            prediction.in_progress_game_id,
+            prediction.player_id,
+            prediction.prediction_value,
+        )
+        for prediction in predictions
+    ]
+
+
+def settle_predictions(
+    session: sqlalchemy.orm.Session, payouts: list[Payout], refund: bool = False
+):
+    """
+    Pay each prediction out of its game into its player's balance, and mark it
+    correct. With refund, the predictions are deleted instead, like cancelling
+    them always has. Commits the session
+
+    Runs on the database thread, see db.run
+    """
+    if not ECONOMY_ENABLED:
+        raise Exception("Player economy is disabled")
+    if not payouts:
+        return
+
+    player_ids = {payout.player_id for payout in payouts}
+    balances: dict[int, int] = dict(
+        session.execute(
+            select(Player.id, Player.currency).where(Player.id.in_(player_ids))
+        ).all()
+    )
+    totals: dict[int, int] = defaultdict(int)
+    transacted_at = datetime.now(timezone.utc)
+    transactions = []
+    for payout in payouts:
+        # each entry shows the balance after it, as if they'd been written one
+        # at a time
+        balances[payout.player_id] += payout.value
+        totals[payout.player_id] += payout.value
+        common = {
+            "finished_game_id": None,
+            "transaction_type": EconomyPrediction.__name__,
+            "economy_prediction_id": payout.prediction_id,
+            "economy_donation_id": None,
+            "transacted_at": transacted_at,
+        }
+        # out of the game
+        transactions.append(
+            {
+                "id": str(uuid4()),
+                "player_id": None,
+                "in_progress_game_id": payout.in_progress_game_id,
+                "debit": 0,
+                "credit": payout.value,
+                "new_balance": 0,
+                **common,
+            }
+        )
+        # into the player
+        transactions.append(
+            {
+                "id": str(uuid4()),
+                "player_id": payout.player_id,
+                "in_progress_game_id": None,
+                "debit": payout.value,
+                "credit": 0,
+                "new_balance": balances[payout.player_id],
+                **common,
+            }
+        )
+    session.execute(insert(EconomyTransaction.__table__), transactions)
+
+    player = Player.__table__
+    session.execute(
+        update(player)
+        .where(player.c.id == bindparam("b_player_id"))
+        .values(currency=player.c.currency + bindparam("b_amount")),
+        [
+            {"b_player_id": player_id, "b_amount": amount}
+            for player_id, amount in totals.items()
+        ],
+    )
+
+    prediction_ids = [payout.prediction_id for payout in payouts]
+    if refund:
+        # what the ORM does when deleting a prediction: its ledger entries are
+        # kept, without the reference to it
+        transaction = EconomyTransaction.__table__
+        session.execute(
+            update(transaction)
+            .where(transaction.c.economy_prediction_id.in_(prediction_ids))
+            .values(economy_prediction_id=None)
+        )
+        session.execute(
+            delete(EconomyPrediction.__table__).where(
+                EconomyPrediction.__table__.c.id.in_(prediction_ids)
+            )
+        )
+    else:
+        session.execute(
+            update(EconomyPrediction.__table__)
+            .where(EconomyPrediction.__table__.c.id.in_(prediction_ids))
+            .values(is_correct=True)
+        )
+    session.commit()
@@ -0,0 +1,172 @@
+"""
+Counts the queries run by each command, interaction and task.
+
+Each of those starts a unit of work, named after the command or task, in a
+context variable. The engine hooks below add every query to the current unit,
+and to the totals kept for all units with the same name, which /admin dbstats
+shows. Functions run through db.run and db.read count towards the unit that
+awaited them.
+
+Running the same statement over and over in one unit usually means a query in a
+loop that could have been a single query (an N+1), so the unit is flagged when
+that happens.
+"""
+
+import functools
+import logging
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, ParamSpec, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_log = logging.getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+# running the same statement this many times in one unit flags it
+N_PLUS_ONE_THRESHOLD = 10
+# number of statements kept in each unit's slowest list
+SLOWEST_STATEMENTS = 5
+# queries run outside of any command or task, e.g. in views and events
+UNATTRIBUTED = "(other)"
+
+# IN lists and multi-row VALUES vary in length, but are the same statement
+_PARAMETER_LIST = re.compile(r"\(\s*(?:\?|%\(\w+\)s)(?:\s*,\s*(?:\?|%\(\w+\)s))+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class TrackedUnit:
+    """
+    The queries of one unit of work so far. Unrelated to db.UnitOfWork, which
+    shares a session rather than counting queries
+    """
+
+    name: str
+    queries: int = 0
+    seconds: float = 0.0
+    shapes: Counter[str] = field(default_factory=Counter)
+
+
+@dataclass
+class QueryStats:
+    """
+    Totals for every unit of work with the same name
+    """
+
+    units: int = 0
+    queries: int = 0
+    seconds: float = 0.0
+    max_queries: int = 0
+    n_plus_one_suspects: int = 0
+    # (seconds, statement), slowest first
+    slowest: list[tuple[float, str]] = field(default_factory=list)
+
+
+_current_unit: ContextVar[TrackedUnit | None] = ContextVar("current_unit", default=None)
+# db.read runs queries on several threads at once
+_lock = threading.Lock()
+_stats: dict[str, QueryStats] = {}
+# (unit name, statement) pairs already logged as N+1 suspects
+_reported: set[tuple[str, str]] = set()
+
+
+def start_unit(name: str):
+    """
+    Attribute queries run from here on, in the current task, to name. Tasks
+    created from this one (and db.run / db.read) inherit it
+    """
+    with _lock:
+        _stats.setdefault(name, QueryStats()).units += 1
+    _current_unit.set(TrackedUnit(name))
+
+
+def track_queries(func: Callable[P, Awaitable[T]]) -> Callable[P, Awaitable[T]]:
+    """
+    Make each call to the coroutine function its own unit of work, named after
+    it. Meant for the bodies of tasks.loop
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args: P.args, **kwargs: P.kwargs) -> T:
+        start_unit(func.__name__)
+        return await func(*args, **kwargs)
+
+    return wrapper
+
+
+def statement_shape(statement: str) -> str:
+    return _PARAMETER_LIST.sub("(...)", _WHITESPACE.sub(" ", statement).strip())
+
+
+def _record(statement: str, seconds: float):
+    unit = _current_unit.get()
+    name = unit.name if unit else UNATTRIBUTED
+    shape = statement_shape(statement)
+    with _lock:
+        stats = _stats.setdefault(name, QueryStats())
+        stats.queries += 1
+        stats.seconds += seconds
+        if len(stats.slowest) < SLOWEST_STATEMENTS or seconds > stats.slowest[-1][0]:
+            stats.slowest.append((seconds, shape))
+            stats.slowest.sort(key=lambda slow: slow[0], reverse=True)
+            del stats.slowest[SLOWEST_STATEMENTS:]
+        if not unit:
+            return
+        unit.queries += 1
+        unit.seconds += seconds
+        unit.shapes[shape] += 1
+        stats.max_queries = max(stats.max_queries, unit.queries)
+        if unit.shapes[shape] != N_PLUS_ONE_THRESHOLD:
+            return
+        stats.n_plus_one_suspects += 1
+        first_report = (name, shape) not in _reported
+        _reported.add((name, shape))
+    if first_report:
+        _log.warning(
+            f"[sqlstats] Possible N+1 in {name}, ran {N_PLUS_ONE_THRESHOLD} times: {shape[:300]}"
+        )
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start_times: list[float] = conn.info.get("query_start_time", [])
+    if not start_times:
+        return
+    _record(statement, time.perf_counter() - start_times.pop())
+
+
+def get_stats() -> dict[str, QueryStats]:
+    """
+    :returns: a copy of the totals, keyed by unit of work name
+    """
+    with _lock:
+        return {
+            name: QueryStats(
+                stats.units,
+                stats.queries,
+                stats.seconds,
+                stats.max_queries,
+                stats.n_plus_one_suspects,
+                list(stats.slowest),
+            )
+            for name, stats in _stats.items()
+        }
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+        _reported.clear()
@@ -0,0 +1,308 @@
+"""
+Everything !status shows is loaded in a fixed number of queries, no matter how
+many rotations, queues and games there are. The rendered embeds are cached for
+a few seconds, since people tend to spam the command. Committing anything that
+changes what !status shows throws the cache away.
+"""
+
+import re
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import sqlalchemy
+from discord import Colour, Embed
+
+import discord_bots.config as config
+from discord_bots import db
+from discord_bots.cache_invalidation import register_cache_invalidation
+from discord_bots.models import (
+    InProgressGame,
+    InProgressGamePlayer,
+    Map,
+    Player,
+    Queue,
+    QueuePlayer,
+    Rotation,
+    RotationMap,
+)
+from discord_bots.utils import render_in_progress_game_embed
+
+# a handful of different argument combinations is normal, this only stops
+# someone from growing the cache forever with garbage arguments
+MAX_CACHED_STATUSES = 64
+
+
+@dataclass
+class RotationStatus:
+    rotation: Rotation
+    next_rotation_map: RotationMap
+    next_map: Map
+    queues: list[Queue]
+
+
+@dataclass
+class StatusSnapshot:
+    rotations: list[RotationStatus] = field(default_factory=list)
+    queue_player_names: dict[str, list[str]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    games_by_queue: dict[str, list[InProgressGame]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    # keyed by (in_progress_game_id, team)
+    game_player_names: dict[tuple[str, int], list[str]] = field(
+        default_factory=lambda: defaultdict(list)
+    )
+    has_rotations: bool = False
+
+
+def _ilike(pattern: str, value: str) -> bool:
+    """
+    Same as SQL's value ILIKE pattern
+    """
+    regex = "".join(
+        ".*" if c == "%" else "." if c == "_" else re.escape(c) for c in pattern
+    )
+    return re.fullmatch(regex, value, flags=re.IGNORECASE | re.DOTALL) is not None
+
+
+def load_status_snapshot(
+    session: sqlalchemy.orm.Session, args: tuple[str, ...]
+) -> StatusSnapshot:
+    """
+    :args: queue ordinals and/or queue names, as passed to !status
+    """
+    snapshot = StatusSnapshot()
+    all_queues: list[Queue] = session.query(Queue).order_by(Queue.ordinal.asc()).all()
+    rotations_by_id: dict[str, Rotation] = {
+        rotation.id: rotation
+        for rotation in session.query(Rotation).order_by(Rotation.created_at.asc())
+    }
+
+    queue_indices: list[int] = []
+    queue_names: list[str] = []
+    all_rotations: list[Rotation] = []
+    if len(args) == 0:
+        all_rotations = list(rotations_by_id.values())
+    else:
+        # get the rotation associated to the specified queue
+        for arg in args:
+            try:
+                queue_index = int(arg)
+                matches = lambda queue: queue.ordinal == queue_index
+            except ValueError:
+                queue_index = None
+                matches = lambda queue: _ilike(arg, queue.name)
+            arg_rotation: Rotation | None = next(
+                (
+                    rotations_by_id[queue.rotation_id]
+                    for queue in all_queues
+                    if queue.rotation_id in rotations_by_id and matches(queue)
+                ),
+                None,
+            )
+            if not arg_rotation:
+                continue
+            if queue_index is not None:
+                queue_indices.append(queue_index)
+            else:
+                queue_names.append(arg)
+            if arg_rotation not in all_rotations:
+                all_rotations.append(arg_rotation)
+    snapshot.has_rotations = bool(all_rotations)
+    if not all_rotations:
+        return snapshot
+
+    next_maps: dict[str, tuple[RotationMap, Map]] = {}
+    for rotation_map, map in (
+        session.query(RotationMap, Map)
+        .join(Map, RotationMap.map_id == Map.id)
+        .filter(
+            RotationMap.rotation_id.in_([rotation.id for rotation in all_rotations]),
+            RotationMap.is_next == True,
+        )
+    ):
+        next_maps.setdefault(rotation_map.rotation_id, (rotation_map, map))
+
+    for rotation in all_rotations:
+        if rotation.id not in next_maps:
+            continue
+        rotation_queues = [
+            queue
+            for queue in all_queues
+            if queue.rotation_id == rotation.id
+            and (not queue_indices or queue.ordinal in queue_indices)
+            and (not queue_names or queue.name in queue_names)
+        ]
+        if not rotation_queues:
+            continue
+        next_rotation_map, next_map = next_maps[rotation.id]
+        snapshot.rotations.append(
+            RotationStatus(rotation, next_rotation_map, next_map, rotation_queues)
+        )
+
+    queue_ids: list[str] = [
+        queue.id
+        for rotation_status in snapshot.rotations
+        for queue in rotation_status.queues
+        if not queue.is_locked
+    ]
+    if not queue_ids:
+        return snapshot
+
+    for queue_id, player_name in (
+        session.query(QueuePlayer.queue_id, Player.name)
+        .join(Player, QueuePlayer.player_id == Player.id)
+        .filter(QueuePlayer.queue_id.in_(queue_ids))
+    ):
+        snapshot.queue_player_names[queue_id].append(player_name)
+
+    games: list[InProgressGame] = (
+        session.query(InProgressGame)
+        .filter(
+            InProgressGame.is_finished == False,
+            InProgressGame.queue_id.in_(queue_ids),
+        )
+        .all()
+    )
+    for game in games:
+        snapshot.games_by_queue[game.queue_id].append(game)
+    if games:
+        for game_id, team, player_name in (
+            session.query(
+                InProgressGamePlayer.in_progress_game_id,
+                InProgressGamePlayer.team,
+                Player.name,
+            )
+            .join(Player, InProgressGamePlayer.player_id == Player.id)
+            .filter(
+                InProgressGamePlayer.in_progress_game_id.in_(
+                    [game.id for game in games]
+                )
+            )
+        ):
+            snapshot.game_player_names[(game_id, team)].append(player_name)
+    return snapshot
+
+
+def render_status_embeds(snapshot: StatusSnapshot) -> list[Embed]:
+    embed = Embed(title="Queues", color=Colour.blue())
+    ipg_embeds: list[Embed] = []
+    newline = "\n"  # Escape sequence (backslash) not allowed in expression portion of f-string prior to Python 3.12
+    for rotation_status in snapshot.rotations:
+        next_rotation_map = rotation_status.next_rotation_map
+        next_map = rotation_status.next_map
+        next_map_str = f"{next_map.full_name} ({next_map.short_name})"
+        if config.ENABLE_RAFFLE:
+            has_raffle_reward = next_rotation_map.raffle_ticket_reward > 0
+            raffle_reward = (
+                next_rotation_map.raffle_ticket_reward
+                if has_raffle_reward
+                else config.DEFAULT_RAFFLE_VALUE
+            )
+            next_map_str += f" ({raffle_reward} tickets)"
+        embed.add_field(
+            name=f"",
+            value=f"```asciidoc\n* {rotation_status.rotation.name}```",
+            inline=False,
+        )
+        embed.add_field(
+            name=f"🗺️ Next Map",
+            value=next_map_str,
+            inline=False,
+        )
+
+        rotation_queues_len = len(rotation_status.queues)
+        for i, queue in enumerate(rotation_status.queues):
+            if queue.is_locked:
+                continue
+            player_display_names = snapshot.queue_player_names.get(queue.id, [])
+            queue_title_str = f"(**{queue.ordinal}**) {queue.name} [{len(player_display_names)}/{queue.size}]"
+            embed.add_field(
+                name=queue_title_str,
+                value=(
+                    "> \n** **"  # weird hack to create an empty quote
+                    if not player_display_names
+                    else f">>> {newline.join(player_display_names)}"
+                ),
+                inline=True,
+            )
+            if i == rotation_queues_len - 1 and i >= 5 and i % 3 == 2:
+                # embeds are allowed 3 "columns" per "row"
+                # to line everything up nicely when there's >= 5 queues and only one "column" slot left, we add a blank
+                embed.add_field(name="", value="", inline=True)
+            for game in snapshot.games_by_queue.get(queue.id, []):
+                ipg_embeds.append(
+                    render_in_progress_game_embed(
+                        game,
+                        queue.name,
+                        snapshot.game_player_names.get((game.id, 0), []),
+                        snapshot.game_player_names.get((game.id, 1), []),
+                    )
+                )
+    return [embed] + ipg_embeds
+
+
+_status_cache: dict[tuple[str, ...], tuple[float, list[Embed]]] = {}
+# bumped on every invalidation, so a snapshot that was being loaded while
+# something changed doesn't get cached
+_status_cache_version = 0
+
+
+def invalidate_status_cache():
+    global _status_cache_version
+    _status_cache_version += 1
+    _status_cache.clear()
+
+
+def _load_status_embeds(
+    session: sqlalchemy.orm.Session, args: tuple[str, ...]
+) -> list[Embed] | None:
+    snapshot = load_status_snapshot(session, args)
+    if not snapshot.has_rotations:
+        return None
+    return render_status_embeds(snapshot)
+
+
+async def get_status_embeds(args: tuple[str, ...]) -> list[Embed] | None:
+    """
+    :returns: the embeds to show for !status, or None if there are no rotations
+    """
+    cached = _status_cache.get(args)
+    if cached and time.monotonic() - cached[0] < config.STATUS_CACHE_SECONDS:
+        return [embed.copy() for embed in cached[1]]
+
+    version = _status_cache_version
+    embeds = await db.read(_load_status_embeds, args)
+    if embeds is None:
+        return None
+    if version == _status_cache_version:
+        if len(_status_cache) >= MAX_CACHED_STATUSES:
+            _status_cache.clear()
+        _status_cache[args] = (time.monotonic(), embeds)
+    return [embed.copy() for embed in embeds]
+
+
+# Invalidation, see cache_invalidation.py
+_WATCHED_MODELS = (
+    InProgressGame,
+    InProgressGamePlayer,
+    Map,
+    Queue,
+    QueuePlayer,
+    Rotation,
+    RotationMap,
+)
+
+
+def _changes_status(obj) -> bool:
+    if isinstance(obj, _WATCHED_MODELS):
+        return True
+    # players are updated on every message they send, only renames matter here
+    return isinstance(obj, Player) and (
+        sqlalchemy.inspect(obj).attrs.name.history.has_changes()
+    )
+
+
+register_cache_invalidation(_WATCHED_MODELS, invalidate_status_cache, _changes_status)
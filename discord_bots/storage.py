@@ -0,0 +1,145 @@
+"""
+SQLite storage profiles. A profile is a set of PRAGMAs applied to every new
+connection through the engine's connect event, since most of them only last as
+long as the connection does.
+
+- legacy: sqlite's defaults, a rollback journal that fsyncs on every commit and
+blocks readers while a write is in progress
+- wal: write-ahead logging so readers and writers don't block each other,
+only fsyncing at checkpoints, and bigger caches
+
+Neither profile turns on foreign key enforcement. Some of the foreign keys to
+in_progress_game are still missing their ON DELETE SET NULL (the migration
+meant to add it is empty), so deleting a finished game's in_progress_game would
+fail for every game with predictions.
+
+Postgres connections are left alone.
+"""
+
+import logging
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+import discord_bots.config as config
+
+_log = logging.getLogger(__name__)
+
+STORAGE_PROFILES: dict[str, dict[str, str | int]] = {
+    "legacy": {},
+    "wal": {
+        "journal_mode": "WAL",
+        # with WAL, a crash can lose the last few commits but can't corrupt the db
+        "synchronous": "NORMAL",
+        "mmap_size": 256 * 1024 * 1024,
+        # negative means KiB rather than pages, so 64 MiB
+        "cache_size": -64 * 1024,
+        "temp_store": "MEMORY",
+    },
+}
+# journal_mode is stored in the database file and can't be changed from a
+# read-only connection. The rest are per connection
+_READ_ONLY_SKIPPED_PRAGMAS = {"journal_mode"}
+# reported at startup, whether or not the profile sets them
+REPORTED_PRAGMAS = [
+    "journal_mode",
+    "synchronous",
+    "mmap_size",
+    "cache_size",
+    "temp_store",
+    "foreign_keys",
+    "busy_timeout",
+]
+
+
+def get_storage_profile() -> dict[str, str | int]:
+    profile = STORAGE_PROFILES.get(config.SQLITE_STORAGE_PROFILE)
+    if profile is None:
+        _log.warning(
+            f"[get_storage_profile] Unknown SQLITE_STORAGE_PROFILE '{config.SQLITE_STORAGE_PROFILE}', using 'legacy'"
+        )
+        return STORAGE_PROFILES["legacy"]
+    return profile
+
+
+def apply_storage_profile(
+    engine: Engine,
+    profile: dict[str, str | int] | None = None,
+    read_only: bool = False,
+):
+    """
+    Apply the profile to every connection the engine opens from now on
+
+    :profile: defaults to the one set by SQLITE_STORAGE_PROFILE
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    if profile is None:
+        profile = get_storage_profile()
+    pragmas = [
+        f"PRAGMA {name}={value}"
+        for name, value in profile.items()
+        if not (read_only and name in _READ_ONLY_SKIPPED_PRAGMAS)
+    ]
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def storage_report(engine: Engine) -> dict[str, str]:
+    """
+    :returns: the effective value of each of REPORTED_PRAGMAS
+    """
+    if engine.dialect.name != "sqlite":
+        return {}
+    report: dict[str, str] = {}
+    with engine.connect() as connection:
+        for name in REPORTED_PRAGMAS:
+            row = connection.exec_driver_sql(f"PRAGMA {name}").first()
+            report[name] = str(row[0]) if row else "?"
+    return report
+
+
+def log_storage_report(engine: Engine):
+    report = storage_report(engine)
+    if not report:
+        return
+    settings = ", ".join(f"{name}={value}" for name, value in report.items())
+    _log.info(
+        f"[log_storage_report] SQLite profile '{config.SQLITE_STORAGE_PROFILE}': {settings}"
+    )
+    expected = get_storage_profile().get("journal_mode")
+    if expected and report.get("journal_mode", "").lower() != str(expected).lower():
+        # e.g. the database is on a network filesystem, which can't do WAL
+        _log.warning(
+            f"[log_storage_report] Asked for journal_mode={expected} but got {report.get('journal_mode')}"
+        )
+
+
+def checkpoint(engine: Engine) -> tuple[int, int, int] | None:
+    """
+    Copy the WAL back into the database file and run PRAGMA optimize. Meant to
+    be called periodically, SQLite only checkpoints on its own once the WAL gets
+    to 1000 pages and never runs optimize by itself
+
+    :returns: (busy, wal pages, pages checkpointed) as reported by sqlite, or None
+    if the database isn't in WAL mode
+    """
+    if engine.dialect.name != "sqlite":
+        return None
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+        if str(journal_mode).lower() != "wal":
+            return None
+        # PASSIVE doesn't wait on readers, anything it can't copy now is copied next time
+        row = connection.exec_driver_sql("PRAGMA wal_checkpoint(PASSIVE)").first()
+        connection.exec_driver_sql("PRAGMA optimize")
+    return (row[0], row[1], row[2]) if row else None
@@ -18,7 +18,9 @@ from discord.member import Member
 from discord.utils import escape_markdown
 
 import discord_bots.config as config
+from discord_bots import db, dispatcher
 from discord_bots.cogs.schedule import ScheduleUtils
+from discord_bots.dispatcher import Priority
 from discord_bots.utils import (
     print_leaderboard,
     send_message,
@@ -26,13 +28,19 @@ from discord_bots.utils import (
     move_game_players_lobby
 )
 
+from .archive import archive_cutoff, archive_finished_games
 from .bot import bot
+from .channel_pool import (
+    reconcile_channel_pool,
+    release_game_channels,
+    replenish_channel_pool,
+)
 from .cogs.economy import EconomyCommands
 from .commands import add_player_to_queue, create_game, is_in_game
+from .leaderboard import rebuild_leaderboard
 from .models import (
     Category,
     InProgressGame,
-    InProgressGameChannel,
     MapVote,
     Player,
     PlayerCategoryTrueskill,
@@ -49,7 +57,16 @@ from .models import (
     VotePassedWaitlist,
     VotePassedWaitlistPlayer,
 )
+from .percentiles import invalidate_rating_percentiles
+from .player_pairs import player_pairs_need_rebuild, rebuild_player_pairs
+from .player_stats import (
+    player_stats_need_rebuild,
+    prune_player_stats_days,
+    rebuild_player_stats,
+)
 from .queues import AddPlayerQueueMessage, add_player_queue, waitlist_messages
+from .sqlstats import track_queries
+from .storage import checkpoint
 
 _log = logging.getLogger(__name__)
 
@@ -145,7 +162,7 @@ async def add_players(session: sqlalchemy.orm.Session):
             # embeds are allowed 3 "columns" per "row"
             # to line everything up nicely when there's >= 5 fields and only one "column" slot left, we add a blank
             embed.add_field(name="", value="", inline=True)
-        await message.channel.send(embed=embed)
+        await dispatcher.send(message.channel, Priority.DEFAULT, embed=embed)
 
     # No messages processed, so no way that sweaty queues popped
     if not message:
@@ -194,6 +211,7 @@ async def add_players(session: sqlalchemy.orm.Session):
 
 
 @tasks.loop(seconds=1)
+@track_queries
 async def add_player_task():
     session: sqlalchemy.orm.Session
     with Session() as session:
@@ -201,6 +219,7 @@ async def add_player_task():
 
 
 @tasks.loop(minutes=1)
+@track_queries
 async def afk_timer_task():
     session: sqlalchemy.orm.Session
     with Session() as session:
@@ -296,6 +315,7 @@ async def afk_timer_task():
 
 
 @tasks.loop(seconds=1800)
+@track_queries
 async def leaderboard_task():
     """
     Periodically print the leaderboard
@@ -303,7 +323,80 @@ async def leaderboard_task():
     await print_leaderboard()
 
 
+def _rebuild_materialized_tables(session: sqlalchemy.orm.Session):
+    """
+    Runs on the database thread, see db.run. Backfilling the stats goes through
+    every game ever played, which would stall the event loop for a while
+    """
+    rebuild_leaderboard(session)
+    # first start after the stats tables were added
+    if player_stats_need_rebuild(session):
+        rebuild_player_stats(session)
+    if player_pairs_need_rebuild(session):
+        rebuild_player_pairs(session)
+    session.commit()
+
+
+@leaderboard_task.before_loop
+@track_queries
+async def rebuild_leaderboard_task():
+    """
+    Fill in the leaderboard table on the first run and catch up on anything that
+    changed while the bot was down
+    """
+    await bot.wait_until_ready()
+    await db.run(_rebuild_materialized_tables)
+    invalidate_rating_percentiles()
+
+
+def _checkpoint_sqlite(session: sqlalchemy.orm.Session) -> tuple[int, int, int] | None:
+    """
+    Runs on the database thread, see db.run
+    """
+    return checkpoint(session.get_bind())
+
+
+@tasks.loop(minutes=config.SQLITE_CHECKPOINT_MINUTES)
+@track_queries
+async def sqlite_checkpoint_task():
+    """
+    Periodically copy the WAL back into the database file. Runs on the database
+    thread, so it doesn't hold up the event loop. It's PASSIVE, so it skips
+    whatever it can't copy while something else is writing
+    """
+    result = await db.run(_checkpoint_sqlite)
+    if result:
+        busy, wal_pages, checkpointed_pages = result
+        _log.debug(
+            f"[sqlite_checkpoint_task] busy={busy}, wal pages={wal_pages}, checkpointed={checkpointed_pages}"
+        )
+
+
+def _archive_finished_games(session: sqlalchemy.orm.Session) -> int:
+    """
+    Runs on the database thread, see db.run
+    """
+    cutoff = archive_cutoff()
+    if not cutoff:
+        return 0
+    archived = archive_finished_games(session, cutoff)
+    session.commit()
+    return archived
+
+
+@tasks.loop(hours=6)
+@track_queries
+async def archive_task():
+    """
+    Move games older than ARCHIVE_AFTER_DAYS into the archive tables, see
+    archive.py. One batch per transaction, so other writes get a turn in between
+    """
+    while await db.run(_archive_finished_games):
+        await asyncio.sleep(1)
+
+
 @tasks.loop(minutes=1)
+@track_queries
 async def map_rotation_task():
     """Rotate the map automatically, stopping on the 1st map
     TODO: tests
@@ -333,10 +426,11 @@ async def map_rotation_task():
 
 
 @tasks.loop(seconds=5)
+@track_queries
 async def prediction_task():
     """
-    Updates prediction embeds.
-    Closes prediction after submission period
+    Closes prediction after submission period.
+    Prediction embeds are updated as predictions come in, see economy.record_prediction
     """
     session = Session()
     in_progress_games: list[InProgressGame] | None = (
@@ -344,23 +438,12 @@ async def prediction_task():
         .filter(InProgressGame.prediction_open == True)
         .all()
     )
-    try:
-        await EconomyCommands.update_embeds(None, in_progress_games)
-    except Exception as e:
-        # Task fails if attemping to update an embed that hasn't been posted yet
-        # Occurs during game channel creation depending on when task runs.
-        # Cleanly cancel & restart task to resolve
-        _log.warning(e)
-        _log.info("prediction_task restarting...")
-        session.close()
-        prediction_task.cancel()
-        prediction_task.restart()
-
     await EconomyCommands.close_predictions(None, in_progress_games=in_progress_games)
     session.close()
 
 
 @tasks.loop(seconds=1)
+@track_queries
 async def queue_waitlist_task():
     """
     Move players in the waitlist into the queues. Pop queues if needed.
@@ -439,37 +522,18 @@ async def queue_waitlist_task():
                                 guild,
                             )
                         )
-            ipg_channels: list[InProgressGameChannel] = (
-                session.query(InProgressGameChannel)
-                .filter(
-                    InProgressGameChannel.in_progress_game_id
-                    == queue_waitlist.in_progress_game_id
-                )
-                .all()
-            )
-            if guild:
-                ipg_discord_channels: list[discord.abc.GuildChannel] = [
-                    channel
-                    for ipg_channel in ipg_channels
-                    if (channel := guild.get_channel(ipg_channel.channel_id))
-                    is not None
-                ]
-                channel_delete_coroutines = [
-                    channel.delete() for channel in ipg_discord_channels
-                ]
+            if guild and config.ENABLE_VOICE_MOVE and config.VOICE_MOVE_LOBBY:
                 try:
-                    if config.ENABLE_VOICE_MOVE and config.VOICE_MOVE_LOBBY:
-                        await move_game_players_lobby(queue_waitlist.in_progress_game_id, guild)
-                    await asyncio.gather(*channel_delete_coroutines)
+                    await move_game_players_lobby(
+                        queue_waitlist.in_progress_game_id, guild
+                    )
                 except:
                     _log.exception(
-                        f"[queue_waitlist_task] Failed to delete in_progress_game channels {ipg_discord_channels} from guild {guild.id}"
+                        f"[queue_waitlist_task] Failed to move players of in_progress_game {queue_waitlist.in_progress_game_id} to the lobby"
                     )
-            # TODO: deleting channels from the guild and from the DB isn't atomic
-            session.query(InProgressGameChannel).filter(
-                InProgressGameChannel.in_progress_game_id
-                == queue_waitlist.in_progress_game_id
-            ).delete()
+            await release_game_channels(
+                session, guild, queue_waitlist.in_progress_game_id
+            )
             session.query(QueueWaitlistPlayer).filter(
                 QueueWaitlistPlayer.queue_waitlist_id == queue_waitlist.id
             ).delete()
@@ -481,6 +545,7 @@ async def queue_waitlist_task():
 
 
 @tasks.loop(hours=24)
+@track_queries
 async def schedule_task():
     """
     An hour after schedules end, roll over to the next day.
@@ -517,6 +582,7 @@ async def schedule_task():
 
 
 @schedule_task.before_loop
+@track_queries
 async def delay_schedule_task():
     """
     Delay start of schedule task until an hour after today's last schedule
@@ -542,6 +608,7 @@ async def delay_schedule_task():
 
 
 @tasks.loop(seconds=1)
+@track_queries
 async def vote_passed_waitlist_task():
     """
     Move players in the waitlist into the queues. Pop queues if needed.
@@ -612,7 +679,35 @@ async def vote_passed_waitlist_task():
         session.commit()
 
 
+@tasks.loop(minutes=1)
+@track_queries
+async def channel_pool_task():
+    """
+    Top the channel pool back up after games have taken channels from it
+    """
+    category = bot.get_channel(config.TRIBES_VOICE_CATEGORY_CHANNEL_ID)
+    if isinstance(category, discord.CategoryChannel):
+        await replenish_channel_pool(category)
+
+
+@channel_pool_task.before_loop
+@track_queries
+async def reconcile_channel_pool_task():
+    """
+    Clean up channels left behind by a crash before the pool is used
+    """
+    await bot.wait_until_ready()
+    category = bot.get_channel(config.TRIBES_VOICE_CATEGORY_CHANNEL_ID)
+    if isinstance(category, discord.CategoryChannel):
+        await reconcile_channel_pool(category)
+    else:
+        _log.warning(
+            f"[reconcile_channel_pool_task] could not find tribes_voice_category with id {config.TRIBES_VOICE_CATEGORY_CHANNEL_ID}"
+        )
+
+
 @tasks.loop(time=config.TRUESKILL_SIGMA_DECAY_JOB_SCHEDULED_TIME)
+@track_queries
 async def sigma_decay_task():
     session: sqlalchemy.orm.Session
     with Session() as session:
@@ -650,4 +745,9 @@ async def sigma_decay_task():
                     pct.sigma + category.sigma_decay_amount,
                     config.DEFAULT_TRUESKILL_SIGMA * category.sigma_decay_max_decay_proportion,
                 )
+                pct.rank = pct.mu - 3 * pct.sigma
+        # also drops games that are now older than the leaderboard window
+        rebuild_leaderboard(session)
+        prune_player_stats_days(session)
         session.commit()
+        invalidate_rating_percentiles()
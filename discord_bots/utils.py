@@ -1,5 +1,6 @@
 # Misc helper functions
 import asyncio
+import io
 import itertools
 import logging
 import math
@@ -11,7 +12,6 @@ from itertools import combinations
 from typing import Optional
 
 import discord
-import imgkit
 import sqlalchemy.orm.session
 from discord import (
     Colour,
@@ -38,9 +38,13 @@ from table2ascii import Alignment, Merge, PresetStyle, table2ascii
 from trueskill import Rating, global_env
 
 import discord_bots.config as config
+from discord_bots import db, dispatcher, screenshots
 from discord_bots.bot import bot
+from discord_bots.dispatcher import Priority
+from discord_bots.leaderboard import LEADERBOARD_MESSAGE_NAME
 from discord_bots.models import (
     Category,
+    DiscordMessage,
     FinishedGame,
     FinishedGamePlayer,
     InProgressGame,
@@ -56,6 +60,13 @@ from discord_bots.models import (
     Session,
     SkipMapVote,
 )
+from discord_bots.read_models import (
+    FinishedGameSummary,
+    get_finished_game_player_names,
+    get_finished_game_summary,
+    get_leaderboard_rows,
+)
+from discord_bots.uuid_storage import id_startswith
 
 _log = logging.getLogger(__name__)
 
@@ -394,7 +405,7 @@ def mock_finished_game_teams_str(
 
 def is_in_game(player_id: int) -> bool:
     session: sqlalchemy.orm.Session
-    with Session() as session:
+    with db.UnitOfWork() as session:
         return get_player_game(player_id, session) is not None
 
 
@@ -600,22 +611,6 @@ async def create_in_progress_game_embed(
     guild: discord.Guild,
 ) -> Embed:
     queue: Queue | None = session.query(Queue).filter(Queue.id == game.queue_id).first()
-    embed: discord.Embed
-    if queue:
-        embed = Embed(
-            title=f"⏳In Progress Game '{queue.name}' ({short_uuid(game.id)})",
-            color=discord.Color.blue(),
-        )
-    else:
-        embed = Embed(
-            title=f"⏳In Progress Game ({short_uuid(game.id)})",
-            color=discord.Color.blue(),
-        )
-
-    aware_db_datetime: datetime = game.created_at.replace(
-        tzinfo=timezone.utc
-    )  # timezones aren't stored in the DB, so add it ourselves
-    timestamp = discord.utils.format_dt(aware_db_datetime, style="R")
     result: list[str] | None = (
         session.query(Player.name)
         .join(InProgressGamePlayer)
@@ -638,6 +633,42 @@ async def create_in_progress_game_embed(
     team1_player_names: list[str] = (
         [name[0] for name in result if name] if result else []
     )
+    return render_in_progress_game_embed(
+        game,
+        queue.name if queue else None,
+        team0_player_names,
+        team1_player_names,
+    )
+
+
+def render_in_progress_game_embed(
+    game: InProgressGame,
+    queue_name: str | None,
+    team0_player_names: list[str],
+    team1_player_names: list[str],
+) -> Embed:
+    """
+    Builds the embed from data that has already been loaded, so that callers
+    showing many games at once (e.g. !status) can fetch every roster up front
+    """
+    team0_player_names = list(team0_player_names)
+    team1_player_names = list(team1_player_names)
+    embed: discord.Embed
+    if queue_name:
+        embed = Embed(
+            title=f"⏳In Progress Game '{queue_name}' ({short_uuid(game.id)})",
+            color=discord.Color.blue(),
+        )
+    else:
+        embed = Embed(
+            title=f"⏳In Progress Game ({short_uuid(game.id)})",
+            color=discord.Color.blue(),
+        )
+
+    aware_db_datetime: datetime = game.created_at.replace(
+        tzinfo=timezone.utc
+    )  # timezones aren't stored in the DB, so add it ourselves
+    timestamp = discord.utils.format_dt(aware_db_datetime, style="R")
     if config.SHOW_CAPTAINS:
         if team0_player_names:
             team0_player_names[0] = "(C) " + team0_player_names[0]
@@ -701,9 +732,7 @@ def create_finished_game_embed(
     name_tuple: Optional[tuple[str, str]] = None,  # (user_name, display_name)
 ) -> Embed:
     # assumes that the FinishedGamePlayers have already been comitted
-    finished_game = (
-        session.query(FinishedGame).filter(FinishedGame.id == finished_game_id).first()
-    )
+    finished_game = get_finished_game_summary(session, finished_game_id)
     if not finished_game:
         _log.error(
             f"[create_finished_game_embed] Could not find finished_game with id={finished_game_id}"
@@ -721,6 +750,21 @@ def create_finished_game_embed(
             description=f"Oops! Could not find the Finished Game...️☹️",
             color=discord.Color.red(),
         )
+    player_names = get_finished_game_player_names(session, [finished_game.id])
+    return render_finished_game_embed(
+        finished_game,
+        player_names[(finished_game.id, 0)],
+        player_names[(finished_game.id, 1)],
+        name_tuple,
+    )
+
+
+def render_finished_game_embed(
+    finished_game: FinishedGameSummary,
+    team0_player_names: list[str],
+    team1_player_names: list[str],
+    name_tuple: Optional[tuple[str, str]] = None,  # (user_name, display_name)
+) -> Embed:
     embed = Embed(
         title=f"✅ Game '{finished_game.queue_name}' ({short_uuid(finished_game.game_id)}) Results",
         color=Colour.green(),
@@ -728,27 +772,9 @@ def create_finished_game_embed(
     if name_tuple is not None:
         user_name, display_name = name_tuple[0], name_tuple[1]
         embed.set_footer(text=f"Finished by {display_name} ({user_name})")
-    result = (
-        session.query(FinishedGamePlayer.player_name)
-        .filter(
-            FinishedGamePlayer.finished_game_id == finished_game.id,
-            FinishedGamePlayer.team == 0,
-        )
-        .all()
-    )
-    team0_player_names: list[str] = [p.player_name for p in result] if result else []
-    result = (
-        session.query(FinishedGamePlayer.player_name)
-        .filter(
-            FinishedGamePlayer.finished_game_id == finished_game.id,
-            FinishedGamePlayer.team == 1,
-        )
-        .all()
-    )
-    team1_player_names: list[str] = [p.player_name for p in result] if result else []
     # sort the names alphabetically and caselessly to make them easier to read
-    team0_player_names.sort(key=str.casefold)
-    team1_player_names.sort(key=str.casefold)
+    team0_player_names = sorted(team0_player_names, key=str.casefold)
+    team1_player_names = sorted(team1_player_names, key=str.casefold)
     if finished_game.winning_team == 0:
         be_str = f"🥇 {finished_game.team0_name}"
         ds_str = f"🥈 {finished_game.team1_name}"
@@ -879,39 +905,18 @@ async def upload_stats_screenshot_imgkit_interaction(
     interaction: discord.Interaction, cleanup=True
 ):
     # Assume the most recently modified HTML file is the correct stat sheet
-    if not config.STATS_DIR:
+    rendered = await screenshots.render_latest_stats()
+    if rendered is None:
         return
 
-    html_files = list(
-        filter(lambda x: x.endswith(".html"), os.listdir(config.STATS_DIR))
-    )
-    html_files.sort(
-        key=lambda x: os.path.getmtime(os.path.join(config.STATS_DIR, x)), reverse=True
-    )
-
-    if len(html_files) == 0:
-        return
-
-    image_path = os.path.join(config.STATS_DIR, html_files[0] + ".png")
-    imgkit.from_file(
-        os.path.join(config.STATS_DIR, html_files[0]),
-        image_path,
-        options={"enable-local-file-access": None},
-    )
-    if config.STATS_WIDTH and config.STATS_HEIGHT:
-        image = Image.open(image_path)
-        cropped = image.crop((0, 0, config.STATS_WIDTH, config.STATS_HEIGHT))
-        cropped.save(image_path)
-
+    file_name, png = rendered
     await interaction.channel.send(
-        file=discord.File(image_path)
+        file=discord.File(io.BytesIO(png), filename=file_name + ".png")
     )  # ideally edit the original resonse, but sending to the channel is fine
 
     # Clean up everything
     if cleanup:
-        for file_ in os.listdir(config.STATS_DIR):
-            if file_.endswith(".png") or file_.endswith(".html"):
-                os.remove(os.path.join(config.STATS_DIR, file_))
+        await screenshots.remove_stats_files()
 
 
 """
@@ -923,37 +928,16 @@ async def upload_stats_screenshot_imgkit_channel(
     channel: TextChannel | DMChannel | GroupChannel, cleanup=True
 ):
     # Assume the most recently modified HTML file is the correct stat sheet
-    if not config.STATS_DIR:
+    rendered = await screenshots.render_latest_stats()
+    if rendered is None:
         return
 
-    html_files = list(
-        filter(lambda x: x.endswith(".html"), os.listdir(config.STATS_DIR))
-    )
-    html_files.sort(
-        key=lambda x: os.path.getmtime(os.path.join(config.STATS_DIR, x)), reverse=True
-    )
-
-    if len(html_files) == 0:
-        return
-
-    image_path = os.path.join(config.STATS_DIR, html_files[0] + ".png")
-    imgkit.from_file(
-        os.path.join(config.STATS_DIR, html_files[0]),
-        image_path,
-        options={"enable-local-file-access": None},
-    )
-    if config.STATS_WIDTH and config.STATS_HEIGHT:
-        image = Image.open(image_path)
-        cropped = image.crop((0, 0, config.STATS_WIDTH, config.STATS_HEIGHT))
-        cropped.save(image_path)
-
-    await channel.send(file=discord.File(image_path))
+    file_name, png = rendered
+    await channel.send(file=discord.File(io.BytesIO(png), filename=file_name + ".png"))
 
     # Clean up everything
     if cleanup:
-        for file_ in os.listdir(config.STATS_DIR):
-            if file_.endswith(".png") or file_.endswith(".html"):
-                os.remove(os.path.join(config.STATS_DIR, file_))
+        await screenshots.remove_stats_files()
 
 
 def win_probability(team0: list[Rating], team1: list[Rating]) -> float:
@@ -977,7 +961,7 @@ async def update_next_map_to_map_after_next(rotation_id: str, is_verbose: bool):
         currently passing in False for when game pops, True for everything else.
     """
     session: sqlalchemy.orm.Session
-    with Session() as session:
+    with db.UnitOfWork() as session:
         rotation: Rotation | None = (
             session.query(Rotation).filter(Rotation.id == rotation_id).first()
         )
@@ -1024,6 +1008,20 @@ async def update_next_map_to_map_after_next(rotation_id: str, is_verbose: bool):
             .scalar()
         )
 
+        map_votes = (
+            session.query(MapVote)
+            .join(RotationMap, RotationMap.id == MapVote.rotation_map_id)
+            .filter(RotationMap.rotation_id == rotation_id)
+            .all()
+        )
+        for map_vote in map_votes:
+            session.delete(map_vote)
+        session.query(SkipMapVote).filter(
+            SkipMapVote.rotation_id == rotation_id
+        ).delete()
+        # before awaiting discord, see db.UnitOfWork
+        session.commit()
+
         channel = bot.get_channel(config.CHANNEL_ID)
         if isinstance(channel, discord.TextChannel):
             if is_verbose:
@@ -1048,19 +1046,6 @@ async def update_next_map_to_map_after_next(rotation_id: str, is_verbose: bool):
                     colour=Colour.blue(),
                 )
 
-        map_votes = (
-            session.query(MapVote)
-            .join(RotationMap, RotationMap.id == MapVote.rotation_map_id)
-            .filter(RotationMap.rotation_id == rotation_id)
-            .all()
-        )
-        for map_vote in map_votes:
-            session.delete(map_vote)
-        session.query(SkipMapVote).filter(
-            SkipMapVote.rotation_id == rotation_id
-        ).delete()
-        session.commit()
-
 
 async def send_in_guild_message(
     guild: Guild,
@@ -1073,7 +1058,9 @@ async def send_in_guild_message(
         member: Member | None = guild.get_member(user_id)
         if member:
             try:
-                await member.send(content=message_content, embed=embed)
+                await dispatcher.send(
+                    member, Priority.POP, content=message_content, embed=embed
+                )
             except Exception:
                 _log.exception("[send_in_guild_message] exception:")
 
@@ -1126,16 +1113,22 @@ async def send_message(
     if colour:
         embed.colour = colour
     try:
-        message = await channel.send(
-            content=content, embed=embed, delete_after=delete_after
+        message = await dispatcher.send(
+            channel,
+            Priority.DEFAULT,
+            content=content,
+            embed=embed,
+            delete_after=delete_after,
         )
     except Exception:
         _log.exception("[send_message] Ignoring exception:")
     return message
 
 
-async def print_leaderboard():
-    output = "**Leaderboard**"  # TODO: remove output str, it's not used anymore
+def _build_leaderboard_embeds(session: SQLAlchemySession) -> list[Embed]:
+    """
+    Runs on a database reader thread, see db.read
+    """
     embeds = []
     embed = discord.Embed(
         title="Leaderboard",
@@ -1146,113 +1139,103 @@ async def print_leaderboard():
     embed_footer += "\n/player toggleleaderboard to show/hide yourself from the leaderboard"
     embed_footer += "\nLast Updated"
     embed.set_footer(text=embed_footer)
-    session: SQLAlchemySession
-    with Session() as session:
-        categories: list[Category] = (
-            session.query(Category)
-            .filter(Category.is_rated == True)
-            .order_by("name")
-            .all()
-        )
-        if len(categories) > 0:
-            for i, category in enumerate(categories):
-                output += f"\n_{category.name}_"
-                subquery = (
-                    session.query(FinishedGamePlayer.player_id)
-                    .join(
-                        FinishedGame,
-                        FinishedGame.id == FinishedGamePlayer.finished_game_id,
-                    )
-                    .filter(
-                        FinishedGame.started_at
-                        > (datetime.now(timezone.utc) - timedelta(days=30))
-                    )
-                    .filter(FinishedGame.category_name == category.name)
-                    .group_by(FinishedGamePlayer.player_id)
-                    .having(func.count() >= category.min_games_for_leaderboard)
-                    .subquery()
-                )
-                top_10_pcts: list[PlayerCategoryTrueskill] | None = (
-                    session.query(PlayerCategoryTrueskill)
-                    .join(Player, Player.id == PlayerCategoryTrueskill.player_id)
-                    .filter(PlayerCategoryTrueskill.player_id.in_(select(subquery)))
-                    .filter(PlayerCategoryTrueskill.category_id == category.id)
-                    .filter(Player.leaderboard_enabled == True)
-                    .order_by(PlayerCategoryTrueskill.rank.desc())
-                    .limit(10)
-                    .all()
-                )
-                if top_10_pcts:
-                    cols = []
-                    for i, pct in enumerate(top_10_pcts, 1):
-                        # TODO: merge this with the pct query
-                        player: Player | None = (
-                            session.query(Player)
-                            .filter(Player.id == pct.player_id)
-                            .first()
-                        )
-                        if player:
-                            col = [
-                                i,
-                                player.name,
-                                round(pct.rank, 1),
-                                round(pct.mu, 1),
-                                round(pct.sigma, 1),
-                            ]
-                            cols.append(col)
-                    if category.min_games_for_leaderboard > 0:
-                        cols.append(
-                            [
-                                f"Minimum of {category.min_games_for_leaderboard} {'games' if category.min_games_for_leaderboard > 1 else 'game'} played in the last 30 days",
-                                Merge.LEFT,
-                                Merge.LEFT,
-                                Merge.LEFT,
-                                Merge.LEFT,
-                            ]
-                        )
-                    table = table2ascii(
-                        header=[
-                            category.name,
+    categories: list[Category] = (
+        session.query(Category).filter(Category.is_rated == True).order_by("name").all()
+    )
+    if len(categories) > 0:
+        for i, category in enumerate(categories):
+            top_10_rows = get_leaderboard_rows(
+                session, category.id, category.min_games_for_leaderboard
+            )
+            if top_10_rows:
+                cols = []
+                for i, row in enumerate(top_10_rows, 1):
+                    col = [
+                        i,
+                        row.player_name,
+                        round(row.rank, 1),
+                        round(row.mu, 1),
+                        round(row.sigma, 1),
+                    ]
+                    cols.append(col)
+                if category.min_games_for_leaderboard > 0:
+                    cols.append(
+                        [
+                            f"Minimum of {category.min_games_for_leaderboard} {'games' if category.min_games_for_leaderboard > 1 else 'game'} played in the last 30 days",
                             Merge.LEFT,
-                            "Rank",
-                            MU_LOWER_UNICODE,
-                            SIGMA_LOWER_UNICODE,
-                        ],
-                        body=cols,
-                        style=PresetStyle.plain,
-                        alignments=[
-                            Alignment.LEFT,
-                            Alignment.LEFT,
-                            Alignment.DECIMAL,
-                            Alignment.DECIMAL,
-                            Alignment.DECIMAL,
-                        ],
+                            Merge.LEFT,
+                            Merge.LEFT,
+                            Merge.LEFT,
+                        ]
                     )
-                    embed.add_field(name="", value=f"{code_block(table)}", inline=False)
-        embeds.append(embed)
-        if config.ECONOMY_ENABLED:
-            output += f"\n\n**{config.CURRENCY_NAME}**"
-            top_10_player_currency: list[Player] = (
-                session.query(Player).order_by(Player.currency.desc()).limit(10)
-            )
-            for i, player_currency in enumerate(top_10_player_currency, 1):
-                output += f"\n{i}. {player_currency.currency} - <@{player_currency.id}>"
+                table = table2ascii(
+                    header=[
+                        category.name,
+                        Merge.LEFT,
+                        "Rank",
+                        MU_LOWER_UNICODE,
+                        SIGMA_LOWER_UNICODE,
+                    ],
+                    body=cols,
+                    style=PresetStyle.plain,
+                    alignments=[
+                        Alignment.LEFT,
+                        Alignment.LEFT,
+                        Alignment.DECIMAL,
+                        Alignment.DECIMAL,
+                        Alignment.DECIMAL,
+                    ],
+                )
+                embed.add_field(name="", value=f"{code_block(table)}", inline=False)
+    embeds.append(embed)
+    return embeds
+
+
+async def print_leaderboard():
+    embeds = await db.read(_build_leaderboard_embeds)
 
     if config.LEADERBOARD_CHANNEL:
         # TODO: merge with new leaderboard style
         leaderboard_channel = bot.get_channel(config.LEADERBOARD_CHANNEL)
         if leaderboard_channel and isinstance(leaderboard_channel, TextChannel):
-            try:
-                if leaderboard_channel.last_message_id:
-                    last_message: Message = await leaderboard_channel.fetch_message(
-                        leaderboard_channel.last_message_id
+            with Session() as session:
+                leaderboard_message: DiscordMessage | None = (
+                    session.query(DiscordMessage)
+                    .filter(DiscordMessage.name == LEADERBOARD_MESSAGE_NAME)
+                    .first()
+                )
+                message_id: int | None = None
+                if (
+                    leaderboard_message
+                    and leaderboard_message.channel_id == leaderboard_channel.id
+                ):
+                    message_id = leaderboard_message.message_id
+                # before the message id was stored, the leaderboard was always the
+                # last message in the channel
+                message_id = message_id or leaderboard_channel.last_message_id
+                try:
+                    if not message_id:
+                        raise ValueError("No leaderboard message")
+                    # editing a partial message doesn't need a fetch first
+                    await dispatcher.edit(
+                        leaderboard_channel.get_partial_message(message_id),
+                        embeds=embeds,
+                    )
+                except Exception:
+                    message = await dispatcher.send(
+                        leaderboard_channel, Priority.REFRESH, embeds=embeds
+                    )
+                    message_id = message.id
+                if not leaderboard_message:
+                    leaderboard_message = DiscordMessage(
+                        name=LEADERBOARD_MESSAGE_NAME,
+                        channel_id=leaderboard_channel.id,
+                        message_id=message_id,
                     )
-                if last_message:
-                    await last_message.edit(embeds=embeds)
-                    return
-            except Exception as e:
-                pass
-            await leaderboard_channel.send(embeds=embeds)
+                    session.add(leaderboard_message)
+                leaderboard_message.channel_id = leaderboard_channel.id
+                leaderboard_message.message_id = message_id
+                session.commit()
 
 
 def code_block(content: str, language: str = "autohotkey") -> str:
@@ -1328,7 +1311,7 @@ async def move_game_players(
 
         in_progress_game = (
             session.query(InProgressGame)
-            .filter(InProgressGame.id.startswith(game_id))
+            .filter(id_startswith(InProgressGame.id, game_id))
             .first()
         )
         if not in_progress_game:
@@ -0,0 +1,616 @@
+"""
+How the uuid4 ids of every table but player are stored.
+
+By default they're 36 character strings, which are repeated in every foreign
+key and index that points at them. With COMPACT_UUIDS they're stored as 16 bytes
+on sqlite and as the native uuid type on postgres instead. They're str in Python
+either way, so nothing outside of this module and the conversion needs to know.
+
+Existing databases are converted with convert_uuid_storage, either by alembic
+revision e1b7d3a9c5f4 when COMPACT_UUIDS is turned on, or by
+scripts/convert_uuid_storage.py (in either direction) while the bot keeps
+running:
+
+- postgres: each column gets a shadow column of the new type, which a trigger
+keeps up to date and the conversion backfills a chunk at a time. Once they're
+filled and indexed, one short transaction swaps every column for its shadow.
+Postgres compares bound ids with either type, so the bot doesn't have to change
+anything until then
+- sqlite: the values are converted in place, a chunk at a time. Each chunk of
+keys is converted together with the columns that reference them, so joins keep
+matching. Bound ids only match one format though, so the bot has to run with
+CONVERTING_UUIDS set (and COMPACT_UUIDS set to the new format) until it's done.
+That makes every comparison with a bound id match both formats, see
+_match_both_formats
+"""
+
+import hashlib
+import logging
+import sqlite3
+import uuid
+from typing import Callable
+
+from sqlalchemy import LargeBinary, String, cast, event, func, inspect, or_
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.sql import operators, visitors
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter, ColumnElement
+from sqlalchemy.sql.expression import bindparam
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+from sqlalchemy.sql.schema import MetaData
+from sqlalchemy.types import TypeDecorator
+
+import discord_bots.config as config
+
+_log = logging.getLogger(__name__)
+
+# keys converted per transaction. The bot waits on the current chunk, so keep
+# them small enough to commit quickly
+CONVERT_CHUNK_SIZE = 1000
+# seconds the swap at the end of a postgres conversion waits for the bot's
+# transactions to let go of the tables, before giving up until it's run again
+SWAP_LOCK_TIMEOUT = 10
+
+_MAX_ROWID = 2**63 - 1
+
+
+class UUIDString(TypeDecorator):
+    """
+    A uuid4 id as a str, stored compactly if COMPACT_UUIDS is set
+    """
+
+    impl = String
+    cache_ok = True
+
+    def load_dialect_impl(self, dialect):
+        if not config.COMPACT_UUIDS:
+            return dialect.type_descriptor(String())
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.UUID(as_uuid=False))
+        return dialect.type_descriptor(LargeBinary(16))
+
+    def bind_processor(self, dialect):
+        # LargeBinary's own processors only take bytes, this takes either format
+        def process(value):
+            return self.process_bind_param(value, dialect)
+
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            return self.process_result_value(value, dialect)
+
+        return process
+
+    def process_bind_param(self, value, dialect):
+        if value is None or not config.COMPACT_UUIDS or dialect.name == "postgresql":
+            return value
+        try:
+            return uuid.UUID(value).bytes
+        except ValueError:
+            # can't be one of ours, so it can't match anything either
+            return value
+
+    def process_result_value(self, value, dialect):
+        # sqlite databases that are being converted have both formats
+        if isinstance(value, bytes):
+            return str(uuid.UUID(bytes=value))
+        return value
+
+
+def _other_format(value):
+    """
+    The bytes of a uuid string, or the string of uuid bytes. Anything else is
+    returned as it is
+    """
+    try:
+        if isinstance(value, bytes):
+            return str(uuid.UUID(bytes=value))
+        if isinstance(value, str):
+            return uuid.UUID(value).bytes
+    except ValueError:
+        pass
+    return value
+
+
+def _register_functions(dbapi_connection):
+    dbapi_connection.create_function(
+        "uuid_other_format", 1, _other_format, deterministic=True
+    )
+
+
+@event.listens_for(Engine, "connect")
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        _register_functions(dbapi_connection)
+
+
+def _is_uuid_column(element) -> bool:
+    return (
+        isinstance(element, ColumnElement)
+        and not isinstance(element, BindParameter)
+        and isinstance(element.type, UUIDString)
+    )
+
+
+def _both_formats(element):
+    """
+    Replaces comparisons of a uuid column with bound ids by ones that match
+    either format. Comparisons between columns are left alone, see
+    _convert_sqlite
+    """
+    if not isinstance(element, BinaryExpression):
+        return None
+    column, value = element.left, element.right
+    if isinstance(column, BindParameter):
+        column, value = value, column
+    if not _is_uuid_column(column) or not isinstance(value, BindParameter):
+        return None
+
+    if element.operator in (operators.eq, operators.ne) and not value.expanding:
+        # uuid_other_format(?) is a constant, so the column's index still works
+        both = [value, func.uuid_other_format(value)]
+        if element.operator is operators.eq:
+            return column.in_(both)
+        return column.not_in(both)
+
+    if element.operator not in (operators.in_op, operators.not_in_op):
+        return None
+    if value.callable is not None or value.value is None:
+        # only known when the statement runs, so this can't use an index
+        other = func.uuid_other_format(column)
+    else:
+        # bind the other format directly, so both lists can use the index
+        if config.COMPACT_UUIDS:
+            # the unconverted ones are still strings
+            value = bindparam(None, list(value.value), type_=String(), expanding=True)
+        else:
+            other_values = [_other_format(v) for v in value.value]
+            value = bindparam(
+                None,
+                [v for v in other_values if isinstance(v, bytes)],
+                type_=LargeBinary(),
+                expanding=True,
+            )
+        other = column
+    if element.operator is operators.in_op:
+        return or_(column.in_(element.right), other.in_(value))
+    return column.not_in(element.right) & other.not_in(value)
+
+
+def _match_both_formats(conn, clauseelement, multiparams, params, execution_options):
+    """
+    While CONVERTING_UUIDS is set, make every sqlite statement's comparisons
+    with bound ids match both formats
+    """
+    if conn.dialect.name != "sqlite":
+        return clauseelement, multiparams, params
+    if isinstance(clauseelement, StatementLambdaElement):
+        # lazy loads build their statements this way
+        clauseelement = clauseelement._resolved
+    if getattr(clauseelement, "is_select", False) or getattr(
+        clauseelement, "is_dml", False
+    ):
+        clauseelement = visitors.replacement_traverse(clauseelement, {}, _both_formats)
+    return clauseelement, multiparams, params
+
+
+if config.CONVERTING_UUIDS:
+    event.listen(Engine, "before_execute", _match_both_formats, retval=True)
+
+
+def id_startswith(column, prefix: str):
+    """
+    column.startswith(prefix) for a UUIDString column, e.g. to look up a game
+    by the short id shown in Discord
+    """
+    if (config.DATABASE_URI or "").startswith("postgresql"):
+        # works whether or not the column has been converted to uuid yet
+        return cast(column, String).startswith(prefix)
+    # hex() of the bytes is the string without dashes, in upper case
+    compact = func.hex(column, type_=String).startswith(prefix.replace("-", "").upper())
+    if config.CONVERTING_UUIDS:
+        return or_(compact, cast(column, String).startswith(prefix))
+    if config.COMPACT_UUIDS:
+        return compact
+    return column.startswith(prefix)
+
+
+def uuid_columns(metadata: MetaData) -> list[tuple[str, str]]:
+    """
+    :returns: (table, column) of every UUIDString column in metadata
+    """
+    return [
+        (table.name, column.name)
+        for table in metadata.sorted_tables
+        for column in table.columns
+        if isinstance(column.type, UUIDString)
+    ]
+
+
+def _live_table(table: str) -> str:
+    return table.removesuffix("_archive")
+
+
+def _key_references(
+    connection: Connection, columns: list[tuple[str, str]]
+) -> dict[str, tuple[str, list[tuple[str, str]]]]:
+    """
+    :returns: for every table keyed by one of columns, its key column and the
+    columns that can hold its keys. The archive tables don't have foreign keys,
+    so their columns are taken to point at whatever the live table's do, in
+    either the live or the archive table
+    """
+    inspector = inspect(connection)
+    tables = sorted({table for table, _ in columns})
+    referred_tables: dict[tuple[str, str], str] = {}
+    for table in tables:
+        for foreign_key in inspector.get_foreign_keys(table):
+            if len(foreign_key["constrained_columns"]) == 1:
+                referred_tables[(table, foreign_key["constrained_columns"][0])] = (
+                    foreign_key["referred_table"]
+                )
+
+    keys: dict[str, str] = {}
+    for table in tables:
+        primary_key = inspector.get_pk_constraint(table)["constrained_columns"]
+        if len(primary_key) == 1 and (table, primary_key[0]) in columns:
+            keys[table] = primary_key[0]
+
+    references: dict[str, tuple[str, list[tuple[str, str]]]] = {
+        table: (key, []) for table, key in keys.items()
+    }
+    for table, column in columns:
+        if keys.get(table) == column:
+            continue
+        referred_table = referred_tables.get((_live_table(table), column))
+        if referred_table is None:
+            continue
+        for key_table in keys:
+            if _live_table(key_table) == referred_table:
+                references[key_table][1].append((table, column))
+    return references
+
+
+def _convert_sqlite(
+    connection: Connection,
+    table: str,
+    column: str,
+    references: list[tuple[str, str]],
+    compact: bool,
+    chunk_size: int,
+) -> int:
+    # sqlite columns take any type of value, so converting is just an UPDATE.
+    # Walk the table by rowid, newest rows first since they're the likeliest to
+    # be looked up, so each chunk starts where the last one stopped and the
+    # conversion can be stopped and picked up again
+    from_type = "text" if compact else "blob"
+    converted = 0
+    last_rowid = _MAX_ROWID
+    while True:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+        rows = connection.exec_driver_sql(
+            f"SELECT rowid, {column} FROM {table} "
+            f"WHERE rowid < ? AND typeof({column}) = ? ORDER BY rowid DESC LIMIT ?",
+            (last_rowid, from_type, chunk_size),
+        ).all()
+        if not rows:
+            connection.exec_driver_sql("COMMIT")
+            return converted
+        last_rowid = rows[-1][0]
+        connection.exec_driver_sql("DELETE FROM temp.uuid_chunk")
+        connection.exec_driver_sql(
+            "INSERT INTO temp.uuid_chunk VALUES (?, ?)", [tuple(row) for row in rows]
+        )
+        # values that aren't uuids come back as they are
+        connection.exec_driver_sql(
+            f"UPDATE {table} SET {column} = uuid_other_format({column}) "
+            f"WHERE rowid IN (SELECT row_id FROM temp.uuid_chunk)"
+        )
+        # the bot writes references in the new format, and those are left alone
+        for referencing_table, referencing_column in references:
+            connection.exec_driver_sql(
+                f"UPDATE {referencing_table} "
+                f"SET {referencing_column} = uuid_other_format({referencing_column}) "
+                f"WHERE {referencing_column} IN (SELECT value FROM temp.uuid_chunk)"
+            )
+        connection.exec_driver_sql("COMMIT")
+        converted += len(rows)
+
+
+def _convert_sqlite_columns(
+    connection: Connection,
+    columns: list[tuple[str, str]],
+    compact: bool,
+    chunk_size: int,
+    on_progress: Callable[[str, str, int], None] | None,
+):
+    _register_functions(connection.connection)
+    # the keys and their references are converted in separate statements, and
+    # foreign keys are checked after each one if they're enforced
+    connection.exec_driver_sql("PRAGMA foreign_keys=OFF")
+    connection.exec_driver_sql(
+        "CREATE TEMP TABLE IF NOT EXISTS uuid_chunk (row_id INTEGER, value)"
+    )
+    key_references = _key_references(connection, columns)
+    done: set[tuple[str, str]] = set()
+    # keys first, with everything that references them. What's left over are
+    # references to rows that don't exist anymore, and columns without a key
+    for table, (key, references) in key_references.items():
+        converted = _convert_sqlite(
+            connection, table, key, references, compact, chunk_size
+        )
+        done.add((table, key))
+        _log.info(
+            f"[convert_uuid_storage] Converted {converted} {table}.{key} and their references"
+        )
+        if on_progress:
+            on_progress(table, key, converted)
+    for table, column in columns:
+        if (table, column) in done:
+            continue
+        converted = _convert_sqlite(connection, table, column, [], compact, chunk_size)
+        _log.info(f"[convert_uuid_storage] Converted {converted} {table}.{column}")
+        if on_progress:
+            on_progress(table, column, converted)
+
+
+def _temporary_name(name: str) -> str:
+    # postgres names are limited to 63 characters
+    return f"uuid_{hashlib.md5(name.encode()).hexdigest()[:24]}"
+
+
+def _shadow_column(column: str) -> str:
+    return f"{column}__converted"
+
+
+def _has_type(column_info: dict, compact: bool) -> bool:
+    if compact:
+        return isinstance(column_info["type"], postgresql.UUID)
+    return not isinstance(column_info["type"], postgresql.UUID)
+
+
+def _drop_invalid_index(connection: Connection, name: str):
+    # a CREATE INDEX CONCURRENTLY that failed leaves an invalid index behind,
+    # which IF NOT EXISTS would then skip
+    invalid = connection.exec_driver_sql(
+        "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+        "WHERE pg_class.relname = %s AND NOT pg_index.indisvalid",
+        (name,),
+    ).first()
+    if invalid:
+        connection.exec_driver_sql(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"')
+
+
+def _convert_postgres(
+    connection: Connection,
+    columns: list[tuple[str, str]],
+    compact: bool,
+    chunk_size: int,
+):
+    new_type = "uuid" if compact else "varchar"
+    inspector = inspect(connection)
+    by_table: dict[str, list[str]] = {}
+    for table, column in columns:
+        column_info = next(
+            info for info in inspector.get_columns(table) if info["name"] == column
+        )
+        # converted by an earlier run that got as far as the swap
+        if not _has_type(column_info, compact):
+            by_table.setdefault(table, []).append(column)
+    if not by_table:
+        return
+    targets = {(table, column) for table in by_table for column in by_table[table]}
+
+    # 1. shadow columns, kept up to date by a trigger from here on
+    for table, table_columns in by_table.items():
+        for column in table_columns:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS "
+                f"{_shadow_column(column)} {new_type}"
+            )
+        assignments = " ".join(
+            f"NEW.{_shadow_column(column)} := NEW.{column}::{new_type};"
+            for column in table_columns
+        )
+        trigger = _temporary_name(f"{table}.trigger")
+        connection.exec_driver_sql("BEGIN")
+        connection.exec_driver_sql(
+            f"CREATE OR REPLACE FUNCTION {trigger}() RETURNS trigger AS $$ "
+            f"BEGIN {assignments} RETURN NEW; END $$ LANGUAGE plpgsql"
+        )
+        connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {trigger} ON {table}")
+        connection.exec_driver_sql(
+            f"CREATE TRIGGER {trigger} BEFORE INSERT OR UPDATE ON {table} "
+            f"FOR EACH ROW EXECUTE PROCEDURE {trigger}()"
+        )
+        connection.exec_driver_sql("COMMIT")
+
+    # 2. backfill what was there before the trigger, a chunk per transaction
+    for table, table_columns in by_table.items():
+        primary_key = inspector.get_pk_constraint(table)["constrained_columns"][0]
+        assignments = ", ".join(
+            f"{_shadow_column(column)} = {column}::{new_type}"
+            for column in table_columns
+        )
+        last_key = None
+        backfilled = 0
+        while True:
+            # walked in the database's order, which isn't python's for strings
+            if last_key is None:
+                keys = connection.exec_driver_sql(
+                    f"SELECT {primary_key} FROM {table} "
+                    f"ORDER BY {primary_key} LIMIT {int(chunk_size)}"
+                ).scalars()
+            else:
+                keys = connection.exec_driver_sql(
+                    f"SELECT {primary_key} FROM {table} WHERE {primary_key} > %s "
+                    f"ORDER BY {primary_key} LIMIT {int(chunk_size)}",
+                    (last_key,),
+                ).scalars()
+            keys = list(keys)
+            if not keys:
+                break
+            connection.exec_driver_sql(
+                f"UPDATE {table} SET {assignments} WHERE {primary_key} = ANY(%s)",
+                (keys,),
+            )
+            last_key = keys[-1]
+            backfilled += len(keys)
+        _log.info(f"[convert_uuid_storage] Backfilled {backfilled} {table} rows")
+
+    # 3. build the shadows' indexes and constraints without locking out writes
+    swaps: dict[str, list[str]] = {}
+    for table, table_columns in by_table.items():
+        shadows = {column: _shadow_column(column) for column in table_columns}
+        statements = []
+
+        def shadowed(names: list[str]) -> str:
+            return ", ".join(shadows.get(name, name) for name in names)
+
+        primary_key = inspector.get_pk_constraint(table)
+        if set(primary_key["constrained_columns"]) & set(shadows):
+            index = _temporary_name(primary_key["name"])
+            _drop_invalid_index(connection, index)
+            connection.exec_driver_sql(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {index} "
+                f"ON {table} ({shadowed(primary_key['constrained_columns'])})"
+            )
+            statements.append(
+                f'ALTER TABLE {table} ADD CONSTRAINT "{primary_key["name"]}" '
+                f"PRIMARY KEY USING INDEX {index}"
+            )
+        for unique in inspector.get_unique_constraints(table):
+            if not set(unique["column_names"]) & set(shadows):
+                continue
+            index = _temporary_name(unique["name"])
+            _drop_invalid_index(connection, index)
+            connection.exec_driver_sql(
+                f"CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {index} "
+                f"ON {table} ({shadowed(unique['column_names'])})"
+            )
+            statements.append(
+                f'ALTER TABLE {table} ADD CONSTRAINT "{unique["name"]}" '
+                f"UNIQUE USING INDEX {index}"
+            )
+        for index_info in inspector.get_indexes(table):
+            if "duplicates_constraint" in index_info or not (
+                set(index_info["column_names"]) & set(shadows)
+            ):
+                continue
+            if None in index_info["column_names"]:
+                _log.warning(
+                    f"[convert_uuid_storage] Not rebuilding expression index {index_info['name']}"
+                )
+                continue
+            index = _temporary_name(index_info["name"])
+            _drop_invalid_index(connection, index)
+            unique = "UNIQUE " if index_info["unique"] else ""
+            connection.exec_driver_sql(
+                f"CREATE {unique}INDEX CONCURRENTLY IF NOT EXISTS {index} "
+                f"ON {table} ({shadowed(index_info['column_names'])})"
+            )
+            statements.append(f'ALTER INDEX {index} RENAME TO "{index_info["name"]}"')
+
+        check_constraints = {
+            check["name"] for check in inspector.get_check_constraints(table)
+        }
+        column_infos = {info["name"]: info for info in inspector.get_columns(table)}
+        for column, shadow in shadows.items():
+            if column_infos[column]["nullable"]:
+                continue
+            # validated separately, so that SET NOT NULL in the swap doesn't
+            # have to scan the table
+            check = _temporary_name(f"{table}.{shadow}")
+            if check not in check_constraints:
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table} ADD CONSTRAINT {check} "
+                    f"CHECK ({shadow} IS NOT NULL) NOT VALID"
+                )
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table} VALIDATE CONSTRAINT {check}"
+            )
+        swaps[table] = statements
+
+    # 4. swap every column for its shadow at once, so joins never compare the
+    # two types
+    foreign_keys = [
+        (table, foreign_key)
+        for table in sorted({table for table, _ in columns})
+        for foreign_key in inspector.get_foreign_keys(table)
+        if (foreign_key["referred_table"], foreign_key["referred_columns"][0])
+        in targets
+        or (table, foreign_key["constrained_columns"][0]) in targets
+    ]
+    connection.exec_driver_sql("BEGIN")
+    connection.exec_driver_sql(f"SET LOCAL lock_timeout = '{SWAP_LOCK_TIMEOUT}s'")
+    for table, foreign_key in foreign_keys:
+        connection.exec_driver_sql(
+            f'ALTER TABLE {table} DROP CONSTRAINT IF EXISTS "{foreign_key["name"]}"'
+        )
+    for table, table_columns in by_table.items():
+        trigger = _temporary_name(f"{table}.trigger")
+        connection.exec_driver_sql(f"DROP TRIGGER {trigger} ON {table}")
+        connection.exec_driver_sql(f"DROP FUNCTION {trigger}()")
+        column_infos = {info["name"]: info for info in inspector.get_columns(table)}
+        for column in table_columns:
+            shadow = _shadow_column(column)
+            # takes the old column's key, indexes and constraints with it
+            connection.exec_driver_sql(f"ALTER TABLE {table} DROP COLUMN {column}")
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table} RENAME COLUMN {shadow} TO {column}"
+            )
+            if not column_infos[column]["nullable"]:
+                check = _temporary_name(f"{table}.{shadow}")
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"
+                )
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table} DROP CONSTRAINT {check}"
+                )
+        for statement in swaps[table]:
+            connection.exec_driver_sql(statement)
+    for table, foreign_key in foreign_keys:
+        options = "".join(
+            f" ON {action.upper()} {foreign_key['options'][action].upper()}"
+            for action in ["ondelete", "onupdate"]
+            if foreign_key["options"].get(action)
+        )
+        # checked below, without holding every table's lock while it scans them
+        connection.exec_driver_sql(
+            f'ALTER TABLE {table} ADD CONSTRAINT "{foreign_key["name"]}" '
+            f'FOREIGN KEY ({", ".join(foreign_key["constrained_columns"])}) '
+            f'REFERENCES {foreign_key["referred_table"]} '
+            f'({", ".join(foreign_key["referred_columns"])}){options} NOT VALID'
+        )
+    connection.exec_driver_sql("COMMIT")
+    for table, foreign_key in foreign_keys:
+        connection.exec_driver_sql(
+            f'ALTER TABLE {table} VALIDATE CONSTRAINT "{foreign_key["name"]}"'
+        )
+
+
+def convert_uuid_storage(
+    connection: Connection,
+    columns: list[tuple[str, str]],
+    compact: bool = True,
+    chunk_size: int = CONVERT_CHUNK_SIZE,
+    on_progress: Callable[[str, str, int], None] | None = None,
+):
+    """
+    Convert the stored ids in columns to the compact format, or back to strings
+    if compact is False. connection has to be in AUTOCOMMIT, this commits as it
+    goes. Safe to run again if it's stopped part way through. The bot can keep
+    running, see the top of this module
+
+    :on_progress: Called with (table, column, rows converted) after each column
+    """
+    # the transactions are begun and committed explicitly, chunk by chunk
+    connection = connection.execution_options(autocommit=False)
+    if connection.dialect.name == "postgresql":
+        _convert_postgres(connection, columns, compact, chunk_size)
+        if on_progress:
+            for table, column in columns:
+                on_progress(table, column, -1)
+        return
+    _convert_sqlite_columns(connection, columns, compact, chunk_size, on_progress)
@@ -0,0 +1,334 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Connection
+from table2ascii import Alignment, PresetStyle, table2ascii
+
+from discord_bots.models import mapper_registry
+
+"""
+Builds a synthetic sqlite database (1M finished_game_player rows by default),
+then times the bot's hottest queries with and without the composite indexes
+added in migration 5d8a3c7f1b2e.
+
+That the queries use those indexes at all is checked by tests/test_indexes.py.
+"""
+
+PLAYERS_PER_GAME = 10
+NUM_CATEGORIES = 4
+NUM_ROTATIONS = 5
+MAPS_PER_ROTATION = 20
+
+# (description, SQL, parameters, index the plan must use). These mirror the
+# filters in commands.py, tasks.py, leaderboard.py and cogs/common.py
+HOT_QUERIES: list[tuple[str, str, dict, str]] = [
+    (
+        "/stats games for a player",
+        "SELECT finished_game_player.finished_game_id FROM finished_game_player "
+        "WHERE finished_game_player.player_id = :player_id",
+        {"player_id": 42},
+        "ix_finished_game_player_player_id_finished_game_id",
+    ),
+    (
+        "Games played in a category since",
+        "SELECT count(*) FROM finished_game "
+        "WHERE finished_game.category_name = :category_name "
+        "AND finished_game.started_at > :started_at",
+        {"category_name": "category1", "started_at": None},
+        "ix_finished_game_category_name_started_at",
+    ),
+    (
+        "A team in a game",
+        "SELECT in_progress_game_player.player_id FROM in_progress_game_player "
+        "WHERE in_progress_game_player.in_progress_game_id = :game_id "
+        "AND in_progress_game_player.team = 0",
+        {"game_id": None},
+        "ix_in_progress_game_player_in_progress_game_id_team",
+    ),
+    (
+        "A player's trueskill in a category",
+        "SELECT player_category_trueskill.mu FROM player_category_trueskill "
+        "WHERE player_category_trueskill.category_id = :category_id "
+        "AND player_category_trueskill.player_id = :player_id",
+        {"category_id": None, "player_id": 42},
+        "ix_player_category_trueskill_category_id_player_id",
+    ),
+    (
+        "Next map in a rotation",
+        "SELECT rotation_map.map_id FROM rotation_map "
+        "WHERE rotation_map.rotation_id = :rotation_id AND rotation_map.is_next = 1",
+        {"rotation_id": None},
+        "ix_rotation_map_rotation_id_is_next",
+    ),
+    (
+        "AFK players",
+        "SELECT player.id FROM player WHERE player.last_activity_at < :timeout",
+        {"timeout": None},
+        "ix_player_last_activity_at",
+    ),
+]
+
+# the single-column indexes the composite ones replaced, for the "before" run
+OLD_INDEXES: list[tuple[str, str, str]] = [
+    ("ix_finished_game_category_name", "finished_game", "category_name"),
+    ("ix_finished_game_player_player_id", "finished_game_player", "player_id"),
+    (
+        "ix_in_progress_game_player_in_progress_game_id",
+        "in_progress_game_player",
+        "in_progress_game_id",
+    ),
+    (
+        "ix_player_category_trueskill_category_id",
+        "player_category_trueskill",
+        "category_id",
+    ),
+    ("ix_rotation_map_rotation_id", "rotation_map", "rotation_id"),
+]
+
+
+def insert(connection: Connection, table_name: str, rows: list[dict]):
+    table = mapper_registry.metadata.tables[table_name]
+    for i in range(0, len(rows), 10000):
+        connection.execute(table.insert(), rows[i : i + 10000])
+
+
+def populate(connection: Connection, num_rows: int, num_players: int) -> dict:
+    """
+    :returns: parameters for the hot queries that point at real rows
+    """
+    now = datetime.utcnow()
+    category_ids = [str(uuid4()) for _ in range(NUM_CATEGORIES)]
+    insert(
+        connection,
+        "category",
+        [
+            {"id": category_id, "name": f"category{i}", "is_rated": True}
+            for i, category_id in enumerate(category_ids)
+        ],
+    )
+    insert(
+        connection,
+        "player",
+        [
+            {
+                "id": player_id,
+                "name": f"player{player_id}",
+                "is_admin": False,
+                "is_banned": False,
+                "last_activity_at": now - timedelta(minutes=random.randint(0, 60 * 24)),
+                "rated_trueskill_mu": 25.0,
+                "rated_trueskill_sigma": 8.333,
+                "move_enabled": False,
+            }
+            for player_id in range(1, num_players + 1)
+        ],
+    )
+    insert(
+        connection,
+        "player_category_trueskill",
+        [
+            {
+                "id": str(uuid4()),
+                "player_id": player_id,
+                "category_id": category_id,
+                "mu": 25.0,
+                "sigma": 8.333,
+                "rank": 0.0,
+            }
+            for player_id in range(1, num_players + 1)
+            for category_id in category_ids
+        ],
+    )
+
+    rotation_ids = [str(uuid4()) for _ in range(NUM_ROTATIONS)]
+    insert(
+        connection,
+        "rotation",
+        [
+            {"id": rotation_id, "name": f"rotation{i}"}
+            for i, rotation_id in enumerate(rotation_ids)
+        ],
+    )
+    insert(
+        connection,
+        "rotation_map",
+        [
+            {
+                "id": str(uuid4()),
+                "rotation_id": rotation_id,
+                "ordinal": ordinal,
+                "is_next": ordinal == 0,
+            }
+            for rotation_id in rotation_ids
+            for ordinal in range(MAPS_PER_ROTATION)
+        ],
+    )
+
+    games = []
+    game_players = []
+    for _ in range(num_rows // PLAYERS_PER_GAME):
+        game_id = str(uuid4())
+        started_at = now - timedelta(minutes=random.randint(0, 60 * 24 * 365 * 3))
+        games.append(
+            {
+                "id": game_id,
+                "average_trueskill": 25.0,
+                "game_id": game_id[:8],
+                "finished_at": started_at + timedelta(minutes=20),
+                "is_rated": True,
+                "queue_name": "benchmark",
+                "started_at": started_at,
+                "win_probability": 0.5,
+                "winning_team": random.randint(0, 1),
+                "category_name": f"category{random.randrange(NUM_CATEGORIES)}",
+            }
+        )
+        for i, player_id in enumerate(
+            random.sample(range(1, num_players + 1), PLAYERS_PER_GAME)
+        ):
+            game_players.append(
+                {
+                    "id": str(uuid4()),
+                    "finished_game_id": game_id,
+                    "player_id": player_id,
+                    "player_name": f"player{player_id}",
+                    "team": i % 2,
+                    "rated_trueskill_mu_after": 25.0,
+                    "rated_trueskill_mu_before": 25.0,
+                    "rated_trueskill_sigma_after": 8.333,
+                    "rated_trueskill_sigma_before": 8.333,
+                }
+            )
+    insert(connection, "finished_game", games)
+    insert(connection, "finished_game_player", game_players)
+    # in progress games are always a small table, but a busy one
+    in_progress_game_id = str(uuid4())
+    insert(
+        connection,
+        "in_progress_game_player",
+        [
+            {
+                "id": str(uuid4()),
+                "in_progress_game_id": (
+                    in_progress_game_id if game == 0 else str(uuid4())
+                ),
+                "player_id": player_id,
+                "team": player_id % 2,
+            }
+            for game in range(20)
+            for player_id in range(1, PLAYERS_PER_GAME + 1)
+        ],
+    )
+    return {
+        "started_at": now - timedelta(days=30),
+        "game_id": in_progress_game_id,
+        "category_id": category_ids[1],
+        "rotation_id": rotation_ids[0],
+        "timeout": now - timedelta(minutes=45),
+    }
+
+
+def query_plan(connection: Connection, sql: str, parameters: dict) -> str:
+    rows = connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"), parameters)
+    return "; ".join(row[-1] for row in rows)
+
+
+def time_query(
+    connection: Connection, sql: str, parameters: dict, iterations: int
+) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        connection.execute(text(sql), parameters).fetchall()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def run_queries(
+    connection: Connection, values: dict, iterations: int
+) -> list[tuple[str, float, bool]]:
+    """
+    :returns: (plan, average milliseconds, whether the expected index was used)
+    for each of HOT_QUERIES
+    """
+    results = []
+    for _, sql, parameters, index_name in HOT_QUERIES:
+        parameters = {
+            name: values[name] if value is None else value
+            for name, value in parameters.items()
+        }
+        plan = query_plan(connection, sql, parameters)
+        results.append(
+            (
+                plan,
+                time_query(connection, sql, parameters, iterations),
+                index_name in plan,
+            )
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Check and time the bot's hot queries against a synthetic database"
+    )
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--verbose", action="store_true", help="Print query plans")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'benchmark.db')}", echo=False
+        )
+        mapper_registry.metadata.create_all(engine)
+        with engine.begin() as connection:
+            print(f"Inserting {args.rows} finished_game_player rows...")
+            values = populate(connection, args.rows, args.players)
+            connection.execute(text("ANALYZE"))
+
+        with engine.begin() as connection:
+            after = run_queries(connection, values, args.iterations)
+            for _, _, _, index_name in HOT_QUERIES:
+                if index_name != "ix_player_last_activity_at":
+                    connection.execute(text(f"DROP INDEX {index_name}"))
+            for index_name, table_name, column_name in OLD_INDEXES:
+                connection.execute(
+                    text(f"CREATE INDEX {index_name} ON {table_name} ({column_name})")
+                )
+            connection.execute(text("DROP INDEX ix_player_last_activity_at"))
+            connection.execute(text("ANALYZE"))
+            before = run_queries(connection, values, args.iterations)
+        engine.dispose()
+
+    body = []
+    for (description, _, _, _), (_, before_ms, _), (plan, after_ms, uses_index) in zip(
+        HOT_QUERIES, before, after
+    ):
+        body.append(
+            [
+                description,
+                f"{before_ms:.3f}",
+                f"{after_ms:.3f}",
+                "yes" if uses_index else "NO",
+            ]
+        )
+        if args.verbose or not uses_index:
+            print(f"{description}: {plan}")
+    print(
+        table2ascii(
+            header=["Query", "Before (ms)", "After (ms)", "Uses index"],
+            body=body,
+            style=PresetStyle.plain,
+            alignments=[Alignment.LEFT] + [Alignment.RIGHT] * 3,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Callable
+from uuid import uuid4
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session as SQLAlchemySession
+from table2ascii import Alignment, PresetStyle, table2ascii
+
+from discord_bots.models import (
+    FinishedGame,
+    FinishedGamePlayer,
+    Player,
+    mapper_registry,
+)
+from discord_bots.read_models import get_player_game_results, get_player_ratings
+
+"""
+Compares loading /stats data through mapped objects (the way it used to be
+done) with the read models in discord_bots/read_models.py, on a synthetic
+sqlite database. Reports the time and memory allocated per call.
+"""
+
+PLAYERS_PER_GAME = 10
+
+
+def populate(session: SQLAlchemySession, num_players: int, num_games: int):
+    now = datetime.utcnow()
+    connection = session.connection()
+    tables = mapper_registry.metadata.tables
+    connection.execute(
+        tables["player"].insert(),
+        [
+            {
+                "id": player_id,
+                "name": f"player{player_id}",
+                "is_admin": False,
+                "is_banned": False,
+                "rated_trueskill_mu": random.gauss(25, 5),
+                "rated_trueskill_sigma": random.uniform(1, 8),
+                "move_enabled": False,
+            }
+            for player_id in range(1, num_players + 1)
+        ],
+    )
+    games = []
+    game_players = []
+    for _ in range(num_games):
+        game_id = str(uuid4())
+        started_at = now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+        games.append(
+            {
+                "id": game_id,
+                "average_trueskill": 25.0,
+                "game_id": game_id[:8],
+                "finished_at": started_at + timedelta(minutes=20),
+                "is_rated": True,
+                "map_full_name": f"map{random.randrange(20)}",
+                "queue_name": "benchmark",
+                "started_at": started_at,
+                "win_probability": 0.5,
+                "winning_team": random.choice([-1, 0, 1]),
+                "category_name": "benchmark",
+            }
+        )
+        # player 1 is in every game, like a regular asking for /stats
+        player_ids = [1] + random.sample(
+            range(2, num_players + 1), PLAYERS_PER_GAME - 1
+        )
+        for i, player_id in enumerate(player_ids):
+            game_players.append(
+                {
+                    "id": str(uuid4()),
+                    "finished_game_id": game_id,
+                    "player_id": player_id,
+                    "player_name": f"player{player_id}",
+                    "team": i % 2,
+                    "rated_trueskill_mu_after": 25.0,
+                    "rated_trueskill_mu_before": 25.0,
+                    "rated_trueskill_sigma_after": 8.333,
+                    "rated_trueskill_sigma_before": 8.333,
+                }
+            )
+    connection.execute(tables["finished_game"].insert(), games)
+    connection.execute(tables["finished_game_player"].insert(), game_players)
+    session.commit()
+
+
+def load_with_orm(session: SQLAlchemySession):
+    fgps = (
+        session.query(FinishedGamePlayer)
+        .filter(FinishedGamePlayer.player_id == 1)
+        .all()
+    )
+    fgs = (
+        session.query(FinishedGame)
+        .filter(FinishedGame.id.in_([fgp.finished_game_id for fgp in fgps]))
+        .all()
+    )
+    players = session.query(Player).all()
+    return fgps, fgs, players
+
+
+def load_with_read_models(session: SQLAlchemySession):
+    return get_player_game_results(session, 1), get_player_ratings(session)
+
+
+def measure(
+    Session: sessionmaker, load: Callable, iterations: int
+) -> tuple[float, float, int]:
+    """
+    :returns: (milliseconds per call, KiB allocated per call, allocations per call)
+    """
+    elapsed = 0.0
+    for _ in range(iterations):
+        with Session() as session:
+            start = time.perf_counter()
+            load(session)
+            elapsed += time.perf_counter() - start
+
+    with Session() as session:
+        tracemalloc.start()
+        load(session)
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+    statistics = snapshot.statistics("filename")
+    allocated = sum(stat.size for stat in statistics)
+    allocations = sum(stat.count for stat in statistics)
+    return elapsed / iterations * 1000, allocated / 1024, allocations
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare the /stats queries with and without read models"
+    )
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--games", type=int, default=2000)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(
+            f"sqlite:///{os.path.join(directory, 'benchmark.db')}", echo=False
+        )
+        mapper_registry.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        with Session() as session:
+            populate(session, args.players, args.games)
+
+        body = []
+        for name, load in (
+            ("Mapped objects", load_with_orm),
+            ("Read models", load_with_read_models),
+        ):
+            ms, kib, allocations = measure(Session, load, args.iterations)
+            body.append([name, f"{ms:.2f}", f"{kib:.0f}", allocations])
+        engine.dispose()
+
+    print(
+        table2ascii(
+            header=["/stats data", "ms/call", "KiB/call", "Allocations/call"],
+            body=body,
+            style=PresetStyle.plain,
+            alignments=[Alignment.LEFT] + [Alignment.RIGHT] * 3,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm.session import Session as SQLAlchemySession
+from table2ascii import Alignment, PresetStyle, table2ascii
+
+from discord_bots.models import (
+    Category,
+    FinishedGame,
+    FinishedGamePlayer,
+    Player,
+    PlayerCategoryTrueskill,
+    Queue,
+    QueuePlayer,
+    mapper_registry,
+)
+from discord_bots.storage import STORAGE_PROFILES, apply_storage_profile
+
+"""
+Compares the sqlite storage profiles (see discord_bots/storage.py) on the two
+hottest write paths: a player adding to and leaving a queue, and a game
+finishing. Each profile gets a fresh database in a temporary directory, so the
+bot's own database is never touched.
+"""
+
+TEAM_SIZE = 5
+
+
+def seed(session: SQLAlchemySession, num_players: int) -> tuple[Queue, Category]:
+    category = Category(name="benchmark", is_rated=True)
+    session.add(category)
+    session.flush()
+    queue = Queue(name="benchmark", size=TEAM_SIZE * 2, category_id=category.id)
+    session.add(queue)
+    for player_id in range(1, num_players + 1):
+        session.add(Player(id=player_id, name=f"player{player_id}"))
+    session.flush()
+    for player_id in range(1, num_players + 1):
+        session.add(
+            PlayerCategoryTrueskill(
+                player_id=player_id,
+                category_id=category.id,
+                mu=25.0,
+                sigma=8.333,
+                rank=0.0,
+                last_game_finished_at=None,
+            )
+        )
+    session.commit()
+    return queue, category
+
+
+def add_and_remove(
+    session: SQLAlchemySession, queue: Queue, player_id: int
+) -> tuple[float, float]:
+    start = time.perf_counter()
+    session.add(QueuePlayer(queue_id=queue.id, player_id=player_id, channel_id=0))
+    session.commit()
+    added = time.perf_counter()
+    session.query(QueuePlayer).filter(
+        QueuePlayer.queue_id == queue.id, QueuePlayer.player_id == player_id
+    ).delete()
+    session.commit()
+    return added - start, time.perf_counter() - added
+
+
+def finish(
+    session: SQLAlchemySession, category: Category, player_ids: list[int]
+) -> float:
+    start = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    finished_game = FinishedGame(
+        average_trueskill=25.0,
+        game_id="benchmark",
+        finished_at=now,
+        is_rated=True,
+        map_full_name="",
+        map_short_name="",
+        queue_name="benchmark",
+        started_at=now,
+        win_probability=0.5,
+        winning_team=0,
+        category_name=category.name,
+    )
+    session.add(finished_game)
+    session.flush()
+    pcts: list[PlayerCategoryTrueskill] = (
+        session.query(PlayerCategoryTrueskill)
+        .filter(
+            PlayerCategoryTrueskill.category_id == category.id,
+            PlayerCategoryTrueskill.player_id.in_(player_ids),
+        )
+        .all()
+    )
+    for i, pct in enumerate(pcts):
+        session.add(
+            FinishedGamePlayer(
+                finished_game_id=finished_game.id,
+                player_id=pct.player_id,
+                player_name=f"player{pct.player_id}",
+                team=i % 2,
+                rated_trueskill_mu_after=pct.mu + 0.1,
+                rated_trueskill_mu_before=pct.mu,
+                rated_trueskill_sigma_after=pct.sigma - 0.01,
+                rated_trueskill_sigma_before=pct.sigma,
+            )
+        )
+        pct.mu += 0.1
+        pct.sigma -= 0.01
+        pct.last_game_finished_at = now
+    session.commit()
+    return time.perf_counter() - start
+
+
+def run_profile(directory: str, profile_name: str, iterations: int) -> list[float]:
+    engine = create_engine(
+        f"sqlite:///{os.path.join(directory, profile_name + '.db')}",
+        echo=False,
+        connect_args={"timeout": 15},
+    )
+    apply_storage_profile(engine, STORAGE_PROFILES[profile_name])
+    mapper_registry.metadata.create_all(engine)
+    session: SQLAlchemySession
+    with sessionmaker(bind=engine)() as session:
+        queue, category = seed(session, TEAM_SIZE * 2)
+        add_total = 0.0
+        del_total = 0.0
+        finish_total = 0.0
+        player_ids = list(range(1, TEAM_SIZE * 2 + 1))
+        for i in range(iterations):
+            add_time, del_time = add_and_remove(
+                session, queue, player_ids[i % len(player_ids)]
+            )
+            add_total += add_time
+            del_total += del_time
+            finish_total += finish(session, category, player_ids)
+    engine.dispose()
+    return [
+        add_total / iterations * 1000,
+        del_total / iterations * 1000,
+        finish_total / iterations * 1000,
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the add and finish paths under each sqlite storage profile"
+    )
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument(
+        "--dir",
+        default=None,
+        help="Where to create the databases. Use the same disk as the bot's database for realistic fsync costs",
+    )
+    args = parser.parse_args()
+
+    body = []
+    with tempfile.TemporaryDirectory(dir=args.dir) as directory:
+        for profile_name in STORAGE_PROFILES:
+            timings = run_profile(directory, profile_name, args.iterations)
+            body.append([profile_name] + [f"{timing:.2f}" for timing in timings])
+    print(
+        table2ascii(
+            header=["Profile", "!add (ms)", "!del (ms)", "/finishgame (ms)"],
+            body=body,
+            style=PresetStyle.plain,
+            alignments=[Alignment.LEFT] + [Alignment.RIGHT] * 3,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+import argparse
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.engine import Engine
+from table2ascii import Alignment, PresetStyle, table2ascii
+
+from discord_bots import config
+from discord_bots.models import FinishedGame, FinishedGamePlayer, mapper_registry
+
+"""
+Compares storing ids as strings with COMPACT_UUIDS (see
+discord_bots/uuid_storage.py) on a synthetic sqlite database: the size of the
+finished_game_player table and its indexes, and the time of the join between
+finished_game_player and finished_game that /stats and the game history use.
+"""
+
+PLAYERS_PER_GAME = 10
+
+
+def populate(engine: Engine, num_players: int, num_games: int):
+    now = datetime.utcnow()
+    tables = mapper_registry.metadata.tables
+    with engine.begin() as connection:
+        connection.execute(
+            tables["player"].insert(),
+            [
+                {
+                    "id": player_id,
+                    "name": f"player{player_id}",
+                    "is_admin": False,
+                    "is_banned": False,
+                    "rated_trueskill_mu": 25.0,
+                    "rated_trueskill_sigma": 8.333,
+                    "move_enabled": False,
+                }
+                for player_id in range(1, num_players + 1)
+            ],
+        )
+        games = []
+        game_players = []
+        for _ in range(num_games):
+            game_id = str(uuid4())
+            started_at = now - timedelta(minutes=random.randint(0, 60 * 24 * 365))
+            games.append(
+                {
+                    "id": game_id,
+                    "average_trueskill": 25.0,
+                    "game_id": game_id[:8],
+                    "finished_at": started_at + timedelta(minutes=20),
+                    "is_rated": True,
+                    "queue_name": "benchmark",
+                    "started_at": started_at,
+                    "win_probability": 0.5,
+                    "winning_team": random.choice([-1, 0, 1]),
+                }
+            )
+            player_ids = [1] + random.sample(
+                range(2, num_players + 1), PLAYERS_PER_GAME - 1
+            )
+            for i, player_id in enumerate(player_ids):
+                game_players.append(
+                    {
+                        "id": str(uuid4()),
+                        "finished_game_id": game_id,
+                        "player_id": player_id,
+                        "player_name": f"player{player_id}",
+                        "team": i % 2,
+                        "rated_trueskill_mu_after": 25.0,
+                        "rated_trueskill_mu_before": 25.0,
+                        "rated_trueskill_sigma_after": 8.333,
+                        "rated_trueskill_sigma_before": 8.333,
+                    }
+                )
+        connection.execute(tables["finished_game"].insert(), games)
+        connection.execute(tables["finished_game_player"].insert(), game_players)
+
+
+def table_sizes(path: str) -> tuple[int, int]:
+    """
+    :returns: bytes used by finished_game_player and by its indexes
+    """
+    connection = sqlite3.connect(path)
+    try:
+        rows = connection.execute(
+            "SELECT name, sum(pgsize) FROM dbstat GROUP BY name"
+        ).fetchall()
+    except sqlite3.OperationalError:
+        # dbstat is optional, fall back to the file size
+        return os.path.getsize(path), 0
+    finally:
+        connection.close()
+    sizes = dict(rows)
+    indexes = sum(
+        size
+        for name, size in sizes.items()
+        if name.startswith(
+            ("ix_finished_game_player", "sqlite_autoindex_finished_game_player")
+        )
+    )
+    return sizes.get("finished_game_player", 0), indexes
+
+
+def time_join(engine: Engine, iterations: int) -> float:
+    """
+    :returns: milliseconds per join of one player's games
+    """
+    statement = (
+        select(FinishedGame.winning_team, FinishedGamePlayer.team, func.count())
+        .join(FinishedGame, FinishedGame.id == FinishedGamePlayer.finished_game_id)
+        .where(FinishedGamePlayer.player_id == 1)
+        .group_by(FinishedGame.winning_team, FinishedGamePlayer.team)
+    )
+    with engine.connect() as connection:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            connection.execute(statement).all()
+        return (time.perf_counter() - start) / iterations * 1000
+
+
+def time_lookups(engine: Engine, iterations: int) -> float:
+    """
+    :returns: microseconds per lookup of a finished_game_player by id
+    """
+    with engine.connect() as connection:
+        ids = (
+            connection.execute(select(FinishedGamePlayer.id).limit(iterations))
+            .scalars()
+            .all()
+        )
+        statement = select(FinishedGamePlayer.player_id)
+        start = time.perf_counter()
+        for id in ids:
+            connection.execute(statement.where(FinishedGamePlayer.id == id)).one()
+        return (time.perf_counter() - start) / len(ids) * 1_000_000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare string and compact storage of ids"
+    )
+    parser.add_argument("--players", type=int, default=5000)
+    parser.add_argument("--games", type=int, default=100_000)
+    parser.add_argument("--iterations", type=int, default=100)
+    args = parser.parse_args()
+
+    body = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, compact in (("Strings", False), ("Compact", True)):
+            # each engine resolves UUIDString for its own dialect
+            config.COMPACT_UUIDS = compact
+            random.seed(0)
+            path = os.path.join(directory, f"{name.lower()}.db")
+            engine = create_engine(f"sqlite:///{path}", echo=False)
+            mapper_registry.metadata.create_all(engine)
+            populate(engine, args.players, args.games)
+            table, indexes = table_sizes(path)
+            body.append(
+                [
+                    name,
+                    f"{os.path.getsize(path) / 1024 / 1024:.1f}",
+                    f"{table / 1024 / 1024:.1f}",
+                    f"{indexes / 1024 / 1024:.1f}",
+                    f"{time_join(engine, args.iterations):.2f}",
+                    f"{time_lookups(engine, args.iterations * 10):.1f}",
+                ]
+            )
+            engine.dispose()
+
+    print(
+        table2ascii(
+            header=[
+                "Ids",
+                "File MB",
+                "fgp MB",
+                "fgp index MB",
+                "Join ms",
+                "Lookup us",
+            ],
+            body=body,
+            style=PresetStyle.plain,
+            alignments=[Alignment.LEFT] + [Alignment.RIGHT] * 5,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import argparse
+import logging
+
+from sqlalchemy import create_engine
+
+from discord_bots.models import db_url, mapper_registry
+from discord_bots.uuid_storage import (
+    CONVERT_CHUNK_SIZE,
+    convert_uuid_storage,
+    uuid_columns,
+)
+
+"""
+Converts the ids in the bot's database to the compact storage used with
+COMPACT_UUIDS (see discord_bots/uuid_storage.py), or back to strings, while the
+bot keeps running.
+
+On sqlite, restart the bot with CONVERTING_UUIDS=true and COMPACT_UUIDS matching
+the direction first, so its lookups and joins match both formats in the
+meantime. On postgres nothing needs to change until the columns are swapped at
+the end.
+
+Either way it commits a chunk at a time and can be stopped and run again.
+"""
+
+_log = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert the stored ids to compact uuids or back to strings"
+    )
+    parser.add_argument(
+        "--to", choices=["compact", "string"], default="compact", dest="to"
+    )
+    parser.add_argument("--chunk-size", type=int, default=CONVERT_CHUNK_SIZE)
+    parser.add_argument(
+        "--vacuum",
+        action="store_true",
+        help="VACUUM afterwards to give the freed space back (sqlite only)",
+    )
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    engine = create_engine(db_url)
+    columns = uuid_columns(mapper_registry.metadata)
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        convert_uuid_storage(
+            connection,
+            columns,
+            compact=args.to == "compact",
+            chunk_size=args.chunk_size,
+        )
+        if args.vacuum and connection.dialect.name == "sqlite":
+            _log.info("[convert_uuid_storage] Vacuuming")
+            connection.exec_driver_sql("VACUUM")
+    engine.dispose()
+    setting = "true" if args.to == "compact" else "false"
+    _log.info(
+        f"[convert_uuid_storage] Converted {len(columns)} columns, restart the bot with COMPACT_UUIDS={setting} and without CONVERTING_UUIDS"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import logging
+from datetime import datetime
+
+from discord_bots.export import (
+    EXPORT_CHUNK_SIZE,
+    EXTENSIONS,
+    ExportFilter,
+    export_match_history,
+)
+from discord_bots.models import Session
+
+"""
+Exports the match history, one row per player per game, as gzipped CSV or
+parquet (see discord_bots/export.py). /admin exportgames does the same from
+discord.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the match history")
+    parser.add_argument("--format", choices=list(EXTENSIONS), default="csv")
+    parser.add_argument(
+        "--output", help="Defaults to match_history.csv.gz or match_history.parquet"
+    )
+    parser.add_argument("--category")
+    parser.add_argument("--queue")
+    parser.add_argument(
+        "--since",
+        type=datetime.fromisoformat,
+        help="Only games that finished at or after this UTC date, e.g. 2024-01-31",
+    )
+    parser.add_argument(
+        "--until",
+        type=datetime.fromisoformat,
+        help="Only games that finished before this UTC date",
+    )
+    parser.add_argument(
+        "--player",
+        type=int,
+        action="append",
+        default=[],
+        dest="players",
+        help="Only games this player id was in, can be given more than once",
+    )
+    parser.add_argument("--chunk-size", type=int, default=EXPORT_CHUNK_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with Session() as session:
+        export_match_history(
+            session,
+            args.output or "match_history" + EXTENSIONS[args.format],
+            args.format,
+            ExportFilter(
+                category_name=args.category,
+                queue_name=args.queue,
+                since=args.since,
+                until=args.until,
+                player_ids=args.players,
+            ),
+            chunk_size=args.chunk_size,
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+import argparse
+import logging
+
+from discord_bots.models import Session
+from discord_bots.player_pairs import rebuild_player_pairs
+
+"""
+Recomputes player_pair_stats (see discord_bots/player_pairs.py) from the
+finished games, archived ones included. Run it if the pairs drift, e.g. after
+editing finished games by hand.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the stats of every pair of players"
+    )
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with Session() as session:
+        rebuild_player_pairs(session)
+        session.commit()
+
+
+if __name__ == "__main__":
+    main()
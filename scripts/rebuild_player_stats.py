@@ -0,0 +1,27 @@
+import argparse
+import logging
+
+from discord_bots.models import Session
+from discord_bots.player_stats import rebuild_player_stats
+
+"""
+Recomputes player_stats_summary and player_stats_day (see
+discord_bots/player_stats.py) from the finished games and the archive rollups.
+Run it if the stats drift, e.g. after editing finished games by hand.
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Rebuild the player stats that /stats and /map stats read"
+    )
+    parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with Session() as session:
+        rebuild_player_stats(session)
+        session.commit()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,12 @@ from datetime import datetime
 
 import numpy
 from dateutil.parser import parse as parse_date
-from sqlalchemy import or_
+from sqlalchemy import or_, select
 from table2ascii import Alignment, PresetStyle, table2ascii
 from trueskill import Rating, rate
 from typing_extensions import Literal
 
+from discord_bots.archive import archive_has_games, with_archived
 from discord_bots.models import (
     Category,
     FinishedGame,
@@ -358,29 +359,31 @@ def do_soft_reset(
             raise ValueError(f"Category {target_category_name} does not exist")
 
         log.info("Loading game history")
-        # noinspection PyUnresolvedReferences
-        game_history: list[FinishedGame] = (
-            session.query(FinishedGame)
-            .filter(
+        finished_games = FinishedGame.__table__
+        finished_game_players = FinishedGamePlayer.__table__
+        if archive_has_games(session, from_date):
+            log.info("Including archived games")
+            finished_games = with_archived(finished_games)
+            finished_game_players = with_archived(finished_game_players)
+        # rows have the same attributes as FinishedGame and FinishedGamePlayer
+        game_history: list[FinishedGame] = session.execute(
+            select(finished_games)
+            .where(
                 or_(
-                    FinishedGame.queue_name.in_(src_queues),
-                    FinishedGame.category_name.in_(src_categories),
+                    finished_games.c.queue_name.in_(src_queues),
+                    finished_games.c.category_name.in_(src_categories),
                 ),
-                FinishedGame.finished_at >= from_date,
+                finished_games.c.finished_at >= from_date,
             )
-            .order_by(FinishedGame.finished_at.asc())
-            .all()
-        )
-        # noinspection PyUnresolvedReferences
-        game_players: list[FinishedGamePlayer] = (
-            session.query(FinishedGamePlayer)
-            .filter(
-                FinishedGamePlayer.finished_game_id.in_(
+            .order_by(finished_games.c.finished_at.asc())
+        ).all()
+        game_players: list[FinishedGamePlayer] = session.execute(
+            select(finished_game_players).where(
+                finished_game_players.c.finished_game_id.in_(
                     list(map(lambda x: x.id, game_history))
                 )
             )
-            .all()
-        )
+        ).all()
         log.info("Finished loading game history")
 
         games = map_raw_games(game_history, game_players)
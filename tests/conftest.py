@@ -0,0 +1,28 @@
+import pytest
+from sqlalchemy import create_engine
+
+from discord_bots.models import Session, mapper_registry
+
+
+@pytest.fixture
+def make_session():
+    """
+    :returns: a function that opens a session on a new, empty in-memory sqlite
+    database with every table created
+    """
+    engines = []
+    sessions = []
+
+    def _make_session():
+        engine = create_engine("sqlite://")
+        mapper_registry.metadata.create_all(engine)
+        session = Session(bind=engine)
+        engines.append(engine)
+        sessions.append(session)
+        return session
+
+    yield _make_session
+    for session in sessions:
+        session.close()
+    for engine in engines:
+        engine.dispose()
@@ -0,0 +1,227 @@
+"""
+The bot's hottest queries must keep using the composite indexes added in
+migration 5d8a3c7f1b2e. scripts/benchmark_indexes.py times the same queries
+against a much bigger database
+"""
+
+import random
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+import pytest
+from sqlalchemy import create_engine, func, insert, select
+
+from discord_bots.models import (
+    Category,
+    FinishedGame,
+    FinishedGamePlayer,
+    InProgressGamePlayer,
+    Player,
+    PlayerCategoryTrueskill,
+    Rotation,
+    RotationMap,
+    Session,
+    mapper_registry,
+)
+
+NUM_PLAYERS = 500
+NUM_GAMES = 2000
+PLAYERS_PER_GAME = 10
+
+NOW = datetime(2024, 5, 1)
+CATEGORY_ID = str(uuid4())
+ROTATION_ID = str(uuid4())
+IN_PROGRESS_GAME_ID = str(uuid4())
+
+# (statement, index its plan must use). These mirror the filters in
+# commands.py, tasks.py, leaderboard.py and cogs/common.py
+HOT_QUERIES = [
+    (
+        select(FinishedGamePlayer.finished_game_id).where(
+            FinishedGamePlayer.player_id == 42
+        ),
+        "ix_finished_game_player_player_id_finished_game_id",
+    ),
+    (
+        select(func.count())
+        .select_from(FinishedGame)
+        .where(
+            FinishedGame.category_name == "category1",
+            FinishedGame.started_at > NOW - timedelta(days=30),
+        ),
+        "ix_finished_game_category_name_started_at",
+    ),
+    (
+        select(InProgressGamePlayer.player_id).where(
+            InProgressGamePlayer.in_progress_game_id == IN_PROGRESS_GAME_ID,
+            InProgressGamePlayer.team == 0,
+        ),
+        "ix_in_progress_game_player_in_progress_game_id_team",
+    ),
+    (
+        select(PlayerCategoryTrueskill.mu).where(
+            PlayerCategoryTrueskill.category_id == CATEGORY_ID,
+            PlayerCategoryTrueskill.player_id == 42,
+        ),
+        "ix_player_category_trueskill_category_id_player_id",
+    ),
+    (
+        select(RotationMap.map_id).where(
+            RotationMap.rotation_id == ROTATION_ID, RotationMap.is_next == True
+        ),
+        "ix_rotation_map_rotation_id_is_next",
+    ),
+    (
+        select(Player.id).where(Player.last_activity_at < NOW - timedelta(minutes=45)),
+        "ix_player_last_activity_at",
+    ),
+]
+
+
+def _populate(session):
+    rng = random.Random(0)
+    category_ids = [CATEGORY_ID] + [str(uuid4()) for _ in range(3)]
+    session.execute(
+        insert(Category.__table__),
+        [
+            {"id": category_id, "name": f"category{i}", "is_rated": True}
+            for i, category_id in enumerate(category_ids)
+        ],
+    )
+    session.execute(
+        insert(Player.__table__),
+        [
+            {
+                "id": player_id,
+                "name": f"player{player_id}",
+                "is_admin": False,
+                "is_banned": False,
+                "last_activity_at": NOW - timedelta(minutes=rng.randint(0, 60 * 24)),
+                "rated_trueskill_mu": 25.0,
+                "rated_trueskill_sigma": 8.333,
+                "move_enabled": False,
+            }
+            for player_id in range(1, NUM_PLAYERS + 1)
+        ],
+    )
+    session.execute(
+        insert(PlayerCategoryTrueskill.__table__),
+        [
+            {
+                "id": str(uuid4()),
+                "player_id": player_id,
+                "category_id": category_id,
+                "mu": 25.0,
+                "sigma": 8.333,
+                "rank": 0.0,
+            }
+            for player_id in range(1, NUM_PLAYERS + 1)
+            for category_id in category_ids
+        ],
+    )
+    rotation_ids = [ROTATION_ID] + [str(uuid4()) for _ in range(4)]
+    session.execute(
+        insert(Rotation.__table__),
+        [
+            {"id": rotation_id, "name": f"rotation{i}"}
+            for i, rotation_id in enumerate(rotation_ids)
+        ],
+    )
+    session.execute(
+        insert(RotationMap.__table__),
+        [
+            {
+                "id": str(uuid4()),
+                "rotation_id": rotation_id,
+                "ordinal": ordinal,
+                "is_next": ordinal == 0,
+            }
+            for rotation_id in rotation_ids
+            for ordinal in range(20)
+        ],
+    )
+
+    games = []
+    game_players = []
+    for _ in range(NUM_GAMES):
+        game_id = str(uuid4())
+        started_at = NOW - timedelta(minutes=rng.randint(0, 60 * 24 * 365))
+        games.append(
+            {
+                "id": game_id,
+                "average_trueskill": 25.0,
+                "game_id": game_id[:8],
+                "finished_at": started_at + timedelta(minutes=20),
+                "is_rated": True,
+                "queue_name": "test",
+                "started_at": started_at,
+                "win_probability": 0.5,
+                "winning_team": rng.randint(0, 1),
+                "category_name": f"category{rng.randrange(len(category_ids))}",
+            }
+        )
+        for i, player_id in enumerate(
+            rng.sample(range(1, NUM_PLAYERS + 1), PLAYERS_PER_GAME)
+        ):
+            game_players.append(
+                {
+                    "id": str(uuid4()),
+                    "finished_game_id": game_id,
+                    "player_id": player_id,
+                    "player_name": f"player{player_id}",
+                    "team": i % 2,
+                    "rated_trueskill_mu_after": 25.0,
+                    "rated_trueskill_mu_before": 25.0,
+                    "rated_trueskill_sigma_after": 8.333,
+                    "rated_trueskill_sigma_before": 8.333,
+                }
+            )
+    session.execute(insert(FinishedGame.__table__), games)
+    session.execute(insert(FinishedGamePlayer.__table__), game_players)
+    session.execute(
+        insert(InProgressGamePlayer.__table__),
+        [
+            {
+                "id": str(uuid4()),
+                "in_progress_game_id": (
+                    IN_PROGRESS_GAME_ID if game == 0 else str(uuid4())
+                ),
+                "player_id": player_id,
+                "team": player_id % 2,
+            }
+            for game in range(20)
+            for player_id in range(1, PLAYERS_PER_GAME + 1)
+        ],
+    )
+    session.commit()
+    session.connection().exec_driver_sql("ANALYZE")
+
+
+@pytest.fixture(scope="module")
+def session():
+    # shared by every query, populating takes a moment
+    engine = create_engine("sqlite://")
+    mapper_registry.metadata.create_all(engine)
+    with Session(bind=engine) as session:
+        _populate(session)
+        yield session
+    engine.dispose()
+
+
+def _query_plan(session, statement) -> str:
+    compiled = statement.compile(session.get_bind())
+    parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+    rows = session.connection().exec_driver_sql(
+        f"EXPLAIN QUERY PLAN {compiled}", parameters
+    )
+    return "; ".join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize(
+    "statement,index_name",
+    HOT_QUERIES,
+    ids=[index_name for _, index_name in HOT_QUERIES],
+)
+def test_hot_query_uses_index(session, statement, index_name: str):
+    plan = _query_plan(session, statement)
+    assert index_name in plan, plan
@@ -0,0 +1,253 @@
+"""
+settlement.py against the way cogs/economy.py used to resolve and cancel
+predictions, one prediction and two commits at a time
+"""
+
+import random
+from collections import defaultdict
+
+import pytest
+from sqlalchemy import select
+
+import discord_bots.settlement as settlement
+from discord_bots.models import (
+    EconomyPrediction,
+    EconomyTransaction,
+    InProgressGame,
+    Player,
+)
+from discord_bots.settlement import (
+    compute_payouts,
+    compute_refunds,
+    settle_predictions,
+)
+
+GAME_ID = "7c0e5e0c-3f4b-4a53-9d44-54a7d5a1c1f1"
+
+
+@pytest.fixture(autouse=True)
+def economy_enabled(monkeypatch):
+    monkeypatch.setattr(settlement, "ECONOMY_ENABLED", True)
+
+
+def _random_predictions(seed: int) -> tuple[dict[int, int], list[tuple]]:
+    """
+    :returns: each player's starting currency, and (prediction id, player_id,
+    team, prediction_value) of each prediction. Some players predict more than
+    once, and some on both teams
+    """
+    rng = random.Random(seed)
+    currencies = {player_id: rng.randint(0, 5000) for player_id in range(1, 9)}
+    predictions = []
+    for i in range(rng.randint(2, 20)):
+        predictions.append(
+            (
+                f"00000000-0000-4000-8000-{seed:06d}{i:06d}",
+                rng.choice(list(currencies)),
+                # both teams always have a prediction
+                i % 2 if i < 2 else rng.randint(0, 1),
+                rng.randint(1, 1000),
+            )
+        )
+    return currencies, predictions
+
+
+def _populate(session, currencies: dict[int, int], predictions: list[tuple]):
+    game = InProgressGame(
+        average_trueskill=25,
+        map_full_name="Katabatic",
+        map_short_name="kat",
+        queue_id=None,
+        win_probability=0.5,
+    )
+    game.id = GAME_ID
+    session.add(game)
+    for player_id, currency in currencies.items():
+        session.add(Player(id=player_id, name=f"player{player_id}", currency=currency))
+    for prediction_id, player_id, team, value in predictions:
+        prediction = EconomyPrediction(
+            player_id=player_id,
+            finished_game_id=None,
+            in_progress_game_id=GAME_ID,
+            team=team,
+            prediction_value=value,
+            is_correct=None,
+            cancelled=None,
+        )
+        prediction.id = prediction_id
+        session.add(prediction)
+    session.commit()
+
+
+def _load_predictions(session) -> list[EconomyPrediction]:
+    return (
+        session.query(EconomyPrediction)
+        .filter(EconomyPrediction.in_progress_game_id == GAME_ID)
+        .order_by(EconomyPrediction.id)
+        .all()
+    )
+
+
+def _add_transaction_pair(session, prediction: EconomyPrediction, value: int):
+    """
+    What EconomyCommands.create_transaction wrote for a prediction, from the
+    game to the player
+    """
+    common = {
+        "finished_game_id": None,
+        "transaction_type": "EconomyPrediction",
+        "economy_prediction_id": prediction.id,
+        "economy_donation_id": None,
+    }
+    session.add(
+        EconomyTransaction(
+            player_id=None,
+            in_progress_game_id=prediction.in_progress_game_id,
+            debit=0,
+            credit=value,
+            new_balance=0,
+            **common,
+        )
+    )
+    session.add(
+        EconomyTransaction(
+            player_id=prediction.player_id,
+            in_progress_game_id=None,
+            debit=value,
+            credit=0,
+            new_balance=prediction.player.currency + value,
+            **common,
+        )
+    )
+    session.commit()
+
+
+def _resolve_one_at_a_time(
+    session, winning_team: int
+) -> tuple[dict[int, int], dict[int, int]]:
+    """
+    The old resolve_predictions loop
+
+    :returns: what each winner was paid and what each loser lost
+    """
+    predictions = _load_predictions(session)
+    winning_predictions = [p for p in predictions if p.team == winning_team]
+    losing_predictions = [p for p in predictions if p.team != winning_team]
+    winning_total = sum(p.prediction_value for p in winning_predictions)
+    losing_total = sum(p.prediction_value for p in losing_predictions)
+    summed_losers: dict[int, int] = defaultdict(int)
+    for prediction in losing_predictions:
+        summed_losers[prediction.player_id] += prediction.prediction_value
+    summed_winners: dict[int, int] = defaultdict(int)
+    for prediction in winning_predictions:
+        win_value = round(
+            (winning_total + losing_total)
+            * (prediction.prediction_value / winning_total),
+            None,
+        )
+        _add_transaction_pair(session, prediction, win_value)
+        player = session.query(Player).filter(Player.id == prediction.player_id).one()
+        player.currency += win_value
+        prediction.is_correct = True
+        session.commit()
+        summed_winners[prediction.player_id] += win_value
+    return dict(summed_winners), dict(summed_losers)
+
+
+def _cancel_one_at_a_time(session):
+    """
+    The old cancel_predictions loop
+    """
+    for prediction in _load_predictions(session):
+        _add_transaction_pair(session, prediction, prediction.prediction_value)
+        player = session.query(Player).filter(Player.id == prediction.player_id).one()
+        player.currency += prediction.prediction_value
+        prediction.cancelled = True
+        session.delete(prediction)
+        session.commit()
+
+
+def _state(session) -> tuple:
+    """
+    :returns: everything settling predictions can change, in a comparable form
+    """
+    transaction = EconomyTransaction.__table__
+    ledger = sorted(
+        session.execute(
+            select(
+                transaction.c.player_id,
+                transaction.c.in_progress_game_id,
+                transaction.c.debit,
+                transaction.c.credit,
+                transaction.c.new_balance,
+                transaction.c.transaction_type,
+                transaction.c.economy_prediction_id,
+            )
+        ).all(),
+        key=repr,
+    )
+    currencies = dict(session.execute(select(Player.id, Player.currency)).all())
+    prediction = EconomyPrediction.__table__
+    predictions = sorted(
+        session.execute(
+            select(prediction.c.id, prediction.c.is_correct, prediction.c.cancelled)
+        ).all()
+    )
+    return ledger, currencies, predictions
+
+
+def _running_balances(session) -> dict[int, list[int]]:
+    """
+    :returns: the new_balance of each player's ledger entries, in the order the
+    predictions were settled
+    """
+    balances: dict[int, list[int]] = defaultdict(list)
+    for player_id, new_balance in session.execute(
+        select(EconomyTransaction.player_id, EconomyTransaction.new_balance)
+        .where(EconomyTransaction.player_id.is_not(None))
+        .order_by(EconomyTransaction.economy_prediction_id)
+    ):
+        balances[player_id].append(new_balance)
+    return dict(balances)
+
+
+@pytest.mark.parametrize("seed", range(25))
+@pytest.mark.parametrize("winning_team", [0, 1])
+def test_resolve_matches_one_at_a_time(make_session, seed: int, winning_team: int):
+    currencies, predictions = _random_predictions(seed)
+    old_session, new_session = make_session(), make_session()
+    _populate(old_session, currencies, predictions)
+    _populate(new_session, currencies, predictions)
+
+    summed_winners, summed_losers = _resolve_one_at_a_time(old_session, winning_team)
+
+    results = compute_payouts(_load_predictions(new_session), winning_team)
+    payouts: dict[int, int] = defaultdict(int)
+    for payout in results.payouts:
+        payouts[payout.player_id] += payout.value
+    assert dict(payouts) == summed_winners
+    assert results.losses == summed_losers
+
+    settle_predictions(new_session, results.payouts)
+    new_session.expire_all()
+    assert _state(new_session) == _state(old_session)
+    assert _running_balances(new_session) == _running_balances(old_session)
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_refund_matches_one_at_a_time(make_session, seed: int):
+    currencies, predictions = _random_predictions(seed)
+    old_session, new_session = make_session(), make_session()
+    _populate(old_session, currencies, predictions)
+    _populate(new_session, currencies, predictions)
+
+    _cancel_one_at_a_time(old_session)
+    settle_predictions(
+        new_session, compute_refunds(_load_predictions(new_session)), refund=True
+    )
+    new_session.expire_all()
+
+    ledger, _, remaining_predictions = _state(new_session)
+    assert remaining_predictions == []
+    assert all(entry.economy_prediction_id is None for entry in ledger)
+    assert _state(new_session) == _state(old_session)